@@ -3,6 +3,15 @@
 set -eo pipefail
 trap 'echo "[ERROR] ACE hook failed: $(basename $0) line $LINENO" >&2; exit 0' ERR
 
+# v6.5.0: Single-process dispatcher (ace_hook.py) — one stdin parse, no
+# jq/iconv forks. ACE_LEGACY_HOOKS=1 keeps the bash path below.
+ACE_HOOK_DIR="${BASH_SOURCE[0]%/*}"
+[[ "$ACE_HOOK_DIR" == "${BASH_SOURCE[0]}" ]] && ACE_HOOK_DIR="."
+ACE_HOOK_DISPATCHER="${ACE_HOOK_DIR}/../shared-hooks/ace_hook.py"
+if [[ "${ACE_LEGACY_HOOKS:-0}" != "1" ]] && [[ -f "$ACE_HOOK_DISPATCHER" ]] && command -v python3 >/dev/null 2>&1; then
+  exec python3 "$ACE_HOOK_DISPATCHER" UserPromptSubmit "$@"
+fi
+
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 PLUGIN_ROOT="$(cd "${SCRIPT_DIR}/.." && pwd)"
 HOOK_SCRIPT="${PLUGIN_ROOT}/shared-hooks/ace_before_task.py"
@@ -33,5 +42,14 @@ if [[ -n "$WORKING_DIR" ]] && [[ -d "$WORKING_DIR" ]]; then
   }
 fi
 
+# v6.5.0: Opt-in warm daemon (ACE_HOOKD=1) — same handler, pre-imported
+ACE_HOOKD_LIB="${SCRIPT_DIR}/lib/ace_hookd.sh"
+if [[ "${ACE_HOOKD:-0}" == "1" ]] && [[ -f "$ACE_HOOKD_LIB" ]]; then
+  source "$ACE_HOOKD_LIB"
+  if ace_hookd_dispatch UserPromptSubmit "$@" <<< "$INPUT_JSON"; then
+    exit "$ACE_HOOKD_EXIT_CODE"
+  fi
+fi
+
 # Pass INPUT_JSON to ace_before_task.py via stdin
 echo "$INPUT_JSON" | exec python3 "${HOOK_SCRIPT}" "$@"
@@ -14,6 +14,15 @@
 set -eo pipefail
 trap 'echo "[ERROR] ACE CwdChanged: $(basename $0) line $LINENO" >&2; exit 0' ERR
 
+# v6.5.0: Single-process dispatcher (ace_hook.py) — one stdin parse, no
+# jq/iconv forks. ACE_LEGACY_HOOKS=1 keeps the bash path below.
+ACE_HOOK_DIR="${BASH_SOURCE[0]%/*}"
+[[ "$ACE_HOOK_DIR" == "${BASH_SOURCE[0]}" ]] && ACE_HOOK_DIR="."
+ACE_HOOK_DISPATCHER="${ACE_HOOK_DIR}/../shared-hooks/ace_hook.py"
+if [[ "${ACE_LEGACY_HOOKS:-0}" != "1" ]] && [[ -f "$ACE_HOOK_DISPATCHER" ]] && command -v python3 >/dev/null 2>&1; then
+  exec python3 "$ACE_HOOK_DISPATCHER" CwdChanged "$@"
+fi
+
 ACE_PLUGIN_VERSION="6.3.0"
 
 # Read input JSON from stdin
@@ -132,6 +141,9 @@ echo "$MATCHED_DOMAIN" > "$DOMAIN_FILE"
 
 LOG_DIR=".claude/data/logs"
 mkdir -p "$LOG_DIR" 2>/dev/null || true
+# v6.5.0: Locked, single-write JSONL appends (ace_jsonl_writer)
+PLUGIN_ROOT="${ACE_HOOK_DIR}/.."
+source "${ACE_HOOK_DIR}/lib/ace_jsonl.sh"
 TIMESTAMP=$(date -u +"%Y-%m-%dT%H:%M:%SZ")
 jq -nc --arg ts "$TIMESTAMP" \
       --arg hook "CwdChanged" \
@@ -151,7 +163,7 @@ jq -nc --arg ts "$TIMESTAMP" \
     to_domain: $to,
     old_cwd: $old_cwd,
     new_cwd: $new_cwd
-  }' >> "${LOG_DIR}/ace-search-events.jsonl" 2>/dev/null || true
+  }' 2>/dev/null | ace_append_jsonl "${LOG_DIR}/ace-search-events.jsonl" || true
 
 # --- Search for domain-specific patterns (if we have org context) ---
 
@@ -201,7 +213,7 @@ print(json.dumps(d))
         project_id: $pid,
         domain: $domain,
         count: $count
-      }' >> "${LOG_DIR}/ace-search-events.jsonl" 2>/dev/null || true
+      }' 2>/dev/null | ace_append_jsonl "${LOG_DIR}/ace-search-events.jsonl" || true
   fi
 fi
 
@@ -1,5 +1,6 @@
 #!/usr/bin/env bash
 # ACE SessionStart Hook - Consolidated CLI Detection, Migration & Pattern Restoration
+# v6.5.0: --version / whoami answered from the shared CLI cache (lib/ace_cli_cache.sh)
 # v6.0.1: Remove incorrect stale projectId warning (ace-cli manages its own projectId)
 # v6.0.0: Consolidated SessionStart (source field routing for CC 2.1.69+)
 #   - startup: Full CLI check, version validation, auth check
@@ -22,6 +23,7 @@ trap 'echo "[ERROR] ACE hook failed: $(basename $0) line $LINENO" >&2; exit 0' E
 
 # Resolve script directory for auto-sync statusline
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+source "$SCRIPT_DIR/lib/ace_cli_cache.sh"
 
 # Read stdin JSON (Claude Code 2.1.69+ provides source, agent_type, agent_id)
 INPUT_JSON=$(cat 2>/dev/null || echo "{}")
@@ -66,7 +68,16 @@ output_warning() {
 archive_relevance_log() {
   local log_file=".claude/data/logs/ace-relevance.jsonl"
   [ -s "$log_file" ] || return 0
-  mv -f "$log_file" "${log_file%.jsonl}.prev.jsonl" 2>/dev/null || true
+  # v6.5.0: Seal into the segment store (keeps history); .prev only as fallback
+  if command -v python3 >/dev/null 2>&1 && \
+     python3 "$SCRIPT_DIR/../shared-hooks/utils/ace_log_store.py" seal --name ace-relevance >/dev/null 2>&1 && \
+     [ ! -s "$log_file" ]; then
+    :
+  else
+    mv -f "$log_file" "${log_file%.jsonl}.prev.jsonl" 2>/dev/null || true
+  fi
+  # v6.5.0: Current-task snapshot derived from the archived log
+  rm -f ".claude/data/logs/ace-task-state.json" 2>/dev/null || true
 }
 
 # Helper: Restore patterns from PreCompact temp file (compact/clear sources)
@@ -175,7 +186,7 @@ fi
 CLI_CMD="ace-cli"
 
 # 3. Check version meets minimum
-CURRENT_VERSION=$($CLI_CMD --version 2>/dev/null | grep -oE '[0-9]+\.[0-9]+\.[0-9]+' || echo "0.0.0")
+CURRENT_VERSION=$(ace_cached_cli_version 2>/dev/null | grep -oE '[0-9]+\.[0-9]+\.[0-9]+' || echo "0.0.0")
 if ! printf '%s\n' "$MIN_VERSION" "$CURRENT_VERSION" | sort -V -C 2>/dev/null; then
   # Version too old - disable ACE hooks
   disable_ace_hooks "CLI version $CURRENT_VERSION < $MIN_VERSION"
@@ -214,7 +225,7 @@ fi
 # Per-project override via ACE_PROJECT_ID in .claude/settings.json takes precedence — no warning needed
 
 # 6. v5.4.13: Token expiration check (catches 48h standby scenario on new sessions)
-TOKEN_JSON=$($CLI_CMD whoami --json 2>/dev/null || echo '{}')
+TOKEN_JSON=$(ace_cached_whoami 2>/dev/null || echo '{}')
 AUTHENTICATED=$(echo "$TOKEN_JSON" | jq -r '.authenticated // false' 2>/dev/null)
 TOKEN_STATUS=$(echo "$TOKEN_JSON" | jq -r '.token_status // empty' 2>/dev/null)
 
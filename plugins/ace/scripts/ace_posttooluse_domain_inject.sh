@@ -2,6 +2,16 @@
 set -eo pipefail
 trap 'echo "[ERROR] ACE PostToolUse domain inject: $(basename $0) line $LINENO" >&2; exit 0' ERR
 
+# v6.5.0: Single-process dispatcher (ace_hook.py) — the domain search joins
+# the shared search path (cache, hookd/window coalescing). ACE_LEGACY_HOOKS=1
+# keeps the bash path below.
+ACE_HOOK_DIR="${BASH_SOURCE[0]%/*}"
+[[ "$ACE_HOOK_DIR" == "${BASH_SOURCE[0]}" ]] && ACE_HOOK_DIR="."
+ACE_HOOK_DISPATCHER="${ACE_HOOK_DIR}/../shared-hooks/ace_hook.py"
+if [[ "${ACE_LEGACY_HOOKS:-0}" != "1" ]] && [[ -f "$ACE_HOOK_DISPATCHER" ]] && command -v python3 >/dev/null 2>&1; then
+  exec python3 "$ACE_HOOK_DISPATCHER" PostToolUseRead "$@"
+fi
+
 INPUT_JSON=$(cat 2>/dev/null || echo "{}")
 SESSION_ID=$(echo "$INPUT_JSON" | jq -r '.session_id // empty' 2>/dev/null || echo "")
 ACE_DISABLED_FLAG="/tmp/ace-disabled-${SESSION_ID:-default}.flag"
@@ -4,6 +4,15 @@
 set -eo pipefail
 trap 'echo "[ERROR] ACE hook failed: $(basename $0) line $LINENO" >&2; exit 0' ERR
 
+# v6.5.0: Single-process dispatcher (ace_hook.py) — one stdin parse, no
+# jq/iconv forks. ACE_LEGACY_HOOKS=1 keeps the bash path below.
+ACE_HOOK_DIR="${BASH_SOURCE[0]%/*}"
+[[ "$ACE_HOOK_DIR" == "${BASH_SOURCE[0]}" ]] && ACE_HOOK_DIR="."
+ACE_HOOK_DISPATCHER="${ACE_HOOK_DIR}/../shared-hooks/ace_hook.py"
+if [[ "${ACE_LEGACY_HOOKS:-0}" != "1" ]] && [[ -f "$ACE_HOOK_DISPATCHER" ]] && command -v python3 >/dev/null 2>&1; then
+  exec python3 "$ACE_HOOK_DISPATCHER" PostToolUse "$@"
+fi
+
 # ACE disable flag check (set by SessionStart if CLI issues detected)
 # Official Claude Code pattern: flag file coordination between hooks
 SESSION_ID="${SESSION_ID:-default}"
@@ -46,9 +55,23 @@ done
 }
 
 # Read stdin (PostToolUse event JSON)
+RAW_INPUT=$(cat)
+
+# v6.5.0: Opt-in warm daemon (ACE_HOOKD=1) — parses, sanitizes and appends
+# over a warm SQLite connection. Falls through to this script when down.
+ACE_HOOKD_LIB="${SCRIPT_DIR}/lib/ace_hookd.sh"
+if [[ "${ACE_HOOKD:-0}" == "1" ]] && [[ -f "$ACE_HOOKD_LIB" ]]; then
+  source "$ACE_HOOKD_LIB"
+  HOOKD_ARGS=""
+  [[ "$ENABLE_LOG" == "true" ]] || HOOKD_ARGS="--no-log"
+  if ace_hookd_dispatch PostToolUse $HOOKD_ARGS <<< "$RAW_INPUT"; then
+    exit 0
+  fi
+fi
+
 # Sanitize invalid UTF-8 sequences (e.g., unpaired surrogates) to prevent jq parse errors
 # iconv with -c silently discards invalid characters
-INPUT_JSON=$(cat | iconv -f UTF-8 -t UTF-8 -c 2>/dev/null || cat)
+INPUT_JSON=$(printf '%s' "$RAW_INPUT" | iconv -f UTF-8 -t UTF-8 -c 2>/dev/null || printf '%s' "$RAW_INPUT")
 
 # Extract working directory from event (with error handling for malformed JSON)
 WORKING_DIR=$(echo "$INPUT_JSON" | jq -r '.cwd // .working_directory // .workingDirectory // empty' 2>/dev/null || echo "")
@@ -10,6 +10,15 @@
 
 set -eo pipefail
 
+# v6.5.0: Single-process dispatcher (ace_hook.py) — one stdin parse, no
+# jq/iconv forks. ACE_LEGACY_HOOKS=1 keeps the bash path below.
+ACE_HOOK_DIR="${BASH_SOURCE[0]%/*}"
+[[ "$ACE_HOOK_DIR" == "${BASH_SOURCE[0]}" ]] && ACE_HOOK_DIR="."
+ACE_HOOK_DISPATCHER="${ACE_HOOK_DIR}/../shared-hooks/ace_hook.py"
+if [[ "${ACE_LEGACY_HOOKS:-0}" != "1" ]] && [[ -f "$ACE_HOOK_DISPATCHER" ]] && command -v python3 >/dev/null 2>&1; then
+  exec python3 "$ACE_HOOK_DISPATCHER" PreToolUse "$@"
+fi
+
 ACE_PLUGIN_VERSION="6.3.0"
 
 # ACE disable flag check (set by SessionStart if CLI issues detected)
@@ -88,6 +97,20 @@ match_domain_to_path() {
 # Read hook input from stdin
 INPUT_JSON=$(cat)
 
+# v6.5.0: Opt-in warm daemon (ACE_HOOKD=1) answers the common no-shift case
+# in-process; actual domain shifts are declined and handled below.
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+PLUGIN_ROOT="$(cd "${SCRIPT_DIR}/.." && pwd)"
+ACE_HOOKD_LIB="${SCRIPT_DIR}/lib/ace_hookd.sh"
+# v6.5.0: Locked, single-write JSONL appends (ace_jsonl_writer)
+source "${SCRIPT_DIR}/lib/ace_jsonl.sh"
+if [[ "${ACE_HOOKD:-0}" == "1" ]] && [[ -f "$ACE_HOOKD_LIB" ]]; then
+  source "$ACE_HOOKD_LIB"
+  if ace_hookd_dispatch PreToolUse <<< "$INPUT_JSON"; then
+    exit 0
+  fi
+fi
+
 # Extract tool name and file path
 TOOL_NAME=$(echo "$INPUT_JSON" | jq -r '.tool_name // empty')
 FILE_PATH=$(echo "$INPUT_JSON" | jq -r '.tool_input.file_path // .tool_input.path // .tool_input.pattern // empty')
@@ -215,7 +238,7 @@ ${SEARCH_RESULT}
         file_path: ($path | if length > 200 then .[:200] else . end),
         patterns_found: $count,
         search_succeeded: $success
-      }' >> "$LOG_DIR/ace-relevance.jsonl" 2>/dev/null || true
+      }' 2>/dev/null | ace_append_jsonl "$LOG_DIR/ace-relevance.jsonl" || true
 
     # 5. Output with additionalContext (patterns injected into Claude's context)
     jq -n \
@@ -256,7 +279,7 @@ ${SEARCH_RESULT}
         file_path: ($path | if length > 200 then .[:200] else . end),
         patterns_found: $count,
         search_succeeded: $success
-      }' >> "$LOG_DIR/ace-relevance.jsonl" 2>/dev/null || true
+      }' 2>/dev/null | ace_append_jsonl "$LOG_DIR/ace-relevance.jsonl" || true
 
     jq -n \
       --arg old "$LAST_DOMAIN" \
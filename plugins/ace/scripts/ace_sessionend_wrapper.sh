@@ -1,7 +1,8 @@
 #!/usr/bin/env bash
 # ACE SessionEnd Hook - Per-session temp file cleanup
 # v6.0.0: Clean up per-session temp files when session ends
-# Pure bash (no Python) for fast execution
+# Pure bash (no Python) for fast execution; v6.5.0: one python3 call to prune
+# ace-tools.db, only when the database exists, and a detached log compaction
 #
 # SessionEnd provides: session_id, reason ('clear'|'logout'|'prompt_input_exit'|'other')
 set -eo pipefail
@@ -28,5 +29,31 @@ rm -f "/tmp/ace-eval-requested-${SESSION_ID}.flag" 2>/dev/null || true
 # Clean fire-and-forget eval state files (ace-eval-request.json, ace-review-result.json)
 rm -f .claude/data/logs/ace-eval-request.json 2>/dev/null || true
 
+# v6.5.0: Cancel this session's domain prefetch (ace_prefetch.py) if it is
+# still running; the worker leads its own process group
+PREFETCH_PID_FILE="/tmp/ace-prefetch-${SESSION_ID}.pid"
+if [ -f "$PREFETCH_PID_FILE" ]; then
+  PREFETCH_PID=$(cat "$PREFETCH_PID_FILE" 2>/dev/null || echo "")
+  rm -f "$PREFETCH_PID_FILE" 2>/dev/null || true
+  if [[ "$PREFETCH_PID" =~ ^[0-9]+$ ]]; then
+    kill -TERM -- "-$PREFETCH_PID" 2>/dev/null || true
+  fi
+fi
+
+# v6.5.0: Purge ace-tools.db rows of sessions that never reached Stop (crash,
+# kill, timeout). Batched with a 2s deadline to stay inside the 3s budget; a
+# database that still needs its one-time VACUUM gets it in a detached process.
+ACCUMULATOR="${BASH_SOURCE[0]%/*}/../shared-hooks/ace_tool_accumulator.py"
+if [ -f .claude/data/logs/ace-tools.db ] && [ -f "$ACCUMULATOR" ] && command -v python3 >/dev/null 2>&1; then
+  python3 "$ACCUMULATOR" prune --deadline 2 --schedule-vacuum --session-id "$SESSION_ID" >/dev/null 2>&1 || true
+fi
+
+# v6.5.0: Compress log segments rotated during the session (ace_log_store)
+# in a detached process; the appending hooks only renamed them
+LOG_STORE="${BASH_SOURCE[0]%/*}/../shared-hooks/utils/ace_log_store.py"
+if compgen -G ".claude/data/logs/segments/*.[0-9]*.jsonl" >/dev/null && [ -f "$LOG_STORE" ] && command -v python3 >/dev/null 2>&1; then
+  nohup python3 "$LOG_STORE" --log-dir .claude/data/logs compact >/dev/null 2>&1 &
+fi
+
 # Always exit 0 — cleanup is best-effort
 exit 0
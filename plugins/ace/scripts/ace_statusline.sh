@@ -1,6 +1,6 @@
 #!/usr/bin/env bash
 # ACE Statusline — 2-line: CC session info + per-task ACE metrics
-# Reads CC JSON stdin + ace-relevance.jsonl (local, no network calls)
+# Reads CC JSON stdin + ace-task-state.json (local, no network calls)
 set -eo pipefail
 
 # ── Colors ──
@@ -54,12 +54,22 @@ domain_shifts=0
 helpful_pct=0
 time_saved=""
 
-# ── Read per-task metrics from JSONL ──
+# ── Read per-task metrics ──
 # Task boundary: events since last "execution" event (Stop hook writes these)
-# This gives us "current task" metrics that reset after each learn cycle
+# This gives us "current task" metrics that reset after each learn cycle.
+# v6.5.0: ACERelevanceLogger keeps running sums in ace-task-state.json, so a
+# refresh reads one small file whatever the JSONL's size.
 if [ -n "$RELEVANCE_FILE" ] && [ -f "$RELEVANCE_FILE" ]; then
-  # Use python for reliable task-boundary detection (fast, <50ms)
-  METRICS=$(python3 -c "
+  TASK_STATE_FILE="${cwd}/.claude/data/logs/ace-task-state.json"
+  if [ -f "$TASK_STATE_FILE" ]; then
+    METRICS=$(jq -r '"patterns_injected=\(.patterns_injected // 0)",
+      "avg_relevance=\(.avg_relevance // 0)",
+      "domains_count=\(.domains_count // 0)",
+      "domain_shifts=\(.domain_shifts // 0)"' "$TASK_STATE_FILE" 2>/dev/null || echo "")
+  else
+    # Logs written before the snapshot existed (the next search creates it).
+    # This script is copied to ~/.claude, so it can't import the logger.
+    METRICS=$(python3 -c "
 import json, sys
 events = []
 with open('$RELEVANCE_FILE') as f:
@@ -88,6 +98,7 @@ print(f'avg_relevance={rel}')
 print(f'domains_count={doms}')
 print(f'domain_shifts={shf}')
 " 2>/dev/null || echo "")
+  fi
   patterns_injected=$(echo "$METRICS" | grep '^patterns_injected=' | cut -d= -f2)
   avg_relevance=$(echo "$METRICS" | grep '^avg_relevance=' | cut -d= -f2)
   domains_count=$(echo "$METRICS" | grep '^domains_count=' | cut -d= -f2)
@@ -4,6 +4,15 @@
 set -eo pipefail
 trap 'echo "[ERROR] ACE hook failed: $(basename $0) line $LINENO" >&2; exit 0' ERR
 
+# v6.5.0: Single-process dispatcher (ace_hook.py) — one stdin parse, no
+# jq/iconv forks. ACE_LEGACY_HOOKS=1 keeps the bash path below.
+ACE_HOOK_DIR="${BASH_SOURCE[0]%/*}"
+[[ "$ACE_HOOK_DIR" == "${BASH_SOURCE[0]}" ]] && ACE_HOOK_DIR="."
+ACE_HOOK_DISPATCHER="${ACE_HOOK_DIR}/../shared-hooks/ace_hook.py"
+if [[ "${ACE_LEGACY_HOOKS:-0}" != "1" ]] && [[ -f "$ACE_HOOK_DISPATCHER" ]] && command -v python3 >/dev/null 2>&1; then
+  exec python3 "$ACE_HOOK_DISPATCHER" Stop "$@"
+fi
+
 # Read stdin early (can only be read once) for session_id
 INPUT_JSON=$(cat)
 SESSION_ID=$(echo "$INPUT_JSON" | jq -r '.session_id // empty' 2>/dev/null || echo "")
@@ -133,6 +142,20 @@ if echo "$LAST_MSG" | grep -qE 'ACE_REVIEW:'; then
     || echo "{\"helpful_pct\": ${HELPFUL_PCT}, \"time_saved\": \"${TIME_SAVED}\"}" > "$REVIEW_FILE"
 fi
 
+# v6.5.0: Opt-in warm daemon (ACE_HOOKD=1) runs ace_after_task.py pre-imported
+ACE_HOOKD_LIB="${SCRIPT_DIR}/lib/ace_hookd.sh"
+if [[ "${ACE_HOOKD:-0}" == "1" ]] && [[ -f "$ACE_HOOKD_LIB" ]]; then
+  source "$ACE_HOOKD_LIB"
+fi
+run_after_task() {
+  local input
+  input=$(cat)
+  if declare -F ace_hookd_dispatch >/dev/null && ace_hookd_dispatch AfterTask <<< "$input"; then
+    return "$ACE_HOOKD_EXIT_CODE"
+  fi
+  printf '%s\n' "$input" | python3 "${HOOK_SCRIPT}"
+}
+
 # Check if async mode is enabled (Issue #3 fix)
 ACE_ASYNC_LEARNING="${ACE_ASYNC_LEARNING:-1}"  # Default: enabled
 
@@ -154,7 +177,7 @@ if [[ "$ACE_ASYNC_LEARNING" == "1" ]]; then
 
   # Launch in background with proper error logging
   (
-    python3 "${HOOK_SCRIPT}" < "$TEMP_INPUT" 2>&1 > "$TEMP_OUTPUT"
+    run_after_task < "$TEMP_INPUT" 2>&1 > "$TEMP_OUTPUT"
     LEARN_EXIT=$?
     if [[ $LEARN_EXIT -ne 0 ]]; then
       echo "[ERROR] Background learning failed with exit code $LEARN_EXIT" >> "$LOG_FILE"
@@ -174,7 +197,7 @@ if [[ "$ACE_ASYNC_LEARNING" == "1" ]]; then
 else
   # === SYNC MODE (original behavior) ===
   # Forward to ace_after_task.py and wait for completion
-  RESULT=$(echo "$INPUT_JSON" | python3 "${HOOK_SCRIPT}" 2>&1)
+  RESULT=$(echo "$INPUT_JSON" | run_after_task 2>&1)
   EXIT_CODE=$?
 
   # Calculate execution time (cross-platform milliseconds)
@@ -225,30 +248,15 @@ DOMAINS_COUNT=0
 TOOLS_EXECUTED=0
 
 if [ -f "$RELEVANCE_FILE" ]; then
-  METRICS=$(python3 -c "
-import json
-events = []
-with open('$RELEVANCE_FILE') as f:
-    for line in f:
-        line = line.strip()
-        if line:
-            try: events.append(json.loads(line))
-            except: pass
-last_exec = -1
-for i, e in enumerate(events):
-    if e.get('event') == 'execution': last_exec = i
-current = events[last_exec + 1:] if last_exec >= 0 else events
-searches = [e for e in current if e.get('event') == 'search']
-execs = [e for e in current if e.get('event') == 'execution']
-inj = sum(s.get('patterns_injected', 0) for s in searches)
-rel = int(sum(s.get('avg_confidence', 0) for s in searches) / len(searches) * 100) if searches else 0
-doms = len(set(d for s in searches for d in s.get('domains', [])))
-tools = sum(e.get('tools_executed', 0) for e in execs) if execs else 0
-print(f'INJECTED={inj}')
-print(f'AVG_REL={rel}')
-print(f'DOMAINS_COUNT={doms}')
-print(f'TOOLS_EXECUTED={tools}')
-" 2>/dev/null || echo "")
+  # v6.5.0: Current-task sums from the logger's snapshot (rebuilt from the
+  # JSONL once if missing) instead of decoding the whole log
+  TASK_STATE_FILE=".claude/data/logs/ace-task-state.json"
+  [ -f "$TASK_STATE_FILE" ] || python3 "${PLUGIN_ROOT}/shared-hooks/utils/ace_relevance_logger.py" \
+    task-state ".claude/data/logs" >/dev/null 2>&1 || true
+  METRICS=$(jq -r '"INJECTED=\(.patterns_injected // 0)",
+    "AVG_REL=\(.avg_relevance // 0)",
+    "DOMAINS_COUNT=\(.domains_count // 0)",
+    "TOOLS_EXECUTED=0"' "$TASK_STATE_FILE" 2>/dev/null || echo "")
   INJECTED=$(echo "$METRICS" | grep '^INJECTED=' | cut -d= -f2)
   AVG_REL=$(echo "$METRICS" | grep '^AVG_REL=' | cut -d= -f2)
   DOMAINS_COUNT=$(echo "$METRICS" | grep '^DOMAINS_COUNT=' | cut -d= -f2)
@@ -5,6 +5,15 @@
 set -eo pipefail
 trap 'echo "[ERROR] ACE hook failed: $(basename $0) line $LINENO" >&2; exit 0' ERR
 
+# v6.5.0: Single-process dispatcher (ace_hook.py) — one stdin parse, no
+# jq/iconv forks. ACE_LEGACY_HOOKS=1 keeps the bash path below.
+ACE_HOOK_DIR="${BASH_SOURCE[0]%/*}"
+[[ "$ACE_HOOK_DIR" == "${BASH_SOURCE[0]}" ]] && ACE_HOOK_DIR="."
+ACE_HOOK_DISPATCHER="${ACE_HOOK_DIR}/../shared-hooks/ace_hook.py"
+if [[ "${ACE_LEGACY_HOOKS:-0}" != "1" ]] && [[ -f "$ACE_HOOK_DISPATCHER" ]] && command -v python3 >/dev/null 2>&1; then
+  exec python3 "$ACE_HOOK_DISPATCHER" SubagentStop "$@"
+fi
+
 # ACE disable flag check (set by SessionStart if CLI issues detected)
 # Official Claude Code pattern: flag file coordination between hooks
 SESSION_ID="${SESSION_ID:-default}"
@@ -72,16 +81,20 @@ if [[ -n "$WORKING_DIR_EARLY" ]] && [[ -d "$WORKING_DIR_EARLY" ]]; then
 fi
 
 # v6.4.0: Log subagent completion for parent-child attribution tracking.
-# ace_after_task.py reads this spawn log to resolve parent_agent_id.
+# ace_after_task.py looks up parent_agent_id in the accumulator's spawn
+# registry (v6.5.0); the JSONL spawn log is only a fallback it imports.
 CHILD_AGENT_ID=$(echo "$INPUT_JSON" | jq -r '.agent_id // empty' 2>/dev/null || echo "")
 CHILD_SESSION_ID=$(echo "$INPUT_JSON" | jq -r '.session_id // empty' 2>/dev/null || echo "")
 if [ -n "$CHILD_AGENT_ID" ] && [ -n "$CHILD_SESSION_ID" ]; then
-  LOG_DIR=".claude/data/logs"
-  mkdir -p "$LOG_DIR" 2>/dev/null || true
-  TS=$(date -u +"%Y-%m-%dT%H:%M:%SZ")
-  jq -nc --arg ts "$TS" --arg sid "$CHILD_SESSION_ID" --arg cid "$CHILD_AGENT_ID" \
-    '{timestamp: $ts, event: "subagent_done", session_id: $sid, child_agent_id: $cid, parent_agent_id: "main"}' \
-    >> "$LOG_DIR/ace-spawn-log.jsonl" 2>/dev/null || true
+  if ! python3 "${PLUGIN_ROOT}/shared-hooks/ace_tool_accumulator.py" register-spawn \
+      --child-agent-id "$CHILD_AGENT_ID" --session-id "$CHILD_SESSION_ID" >/dev/null 2>&1; then
+    LOG_DIR=".claude/data/logs"
+    mkdir -p "$LOG_DIR" 2>/dev/null || true
+    TS=$(date -u +"%Y-%m-%dT%H:%M:%SZ")
+    jq -nc --arg ts "$TS" --arg sid "$CHILD_SESSION_ID" --arg cid "$CHILD_AGENT_ID" \
+      '{timestamp: $ts, event: "subagent_done", session_id: $sid, child_agent_id: $cid, parent_agent_id: "main"}' \
+      >> "$LOG_DIR/ace-spawn-log.jsonl" 2>/dev/null || true
+  fi
 fi
 
 # Extract working directory from event and cd to it
@@ -117,8 +130,22 @@ START_TIME=$(($(date +%s) * 1000))
 # v5.2.0: ace_after_task.py uses this to select agent_transcript_path
 INPUT_JSON=$(echo "$INPUT_JSON" | jq '. + {"hook_event_name": "SubagentStop"}')
 
+# v6.5.0: Opt-in warm daemon (ACE_HOOKD=1) runs ace_after_task.py pre-imported
+ACE_HOOKD_LIB="${SCRIPT_DIR}/lib/ace_hookd.sh"
+if [[ "${ACE_HOOKD:-0}" == "1" ]] && [[ -f "$ACE_HOOKD_LIB" ]]; then
+  source "$ACE_HOOKD_LIB"
+fi
+run_after_task() {
+  local input
+  input=$(cat)
+  if declare -F ace_hookd_dispatch >/dev/null && ace_hookd_dispatch AfterTask <<< "$input"; then
+    return "$ACE_HOOKD_EXIT_CODE"
+  fi
+  printf '%s\n' "$input" | python3 "${HOOK_SCRIPT}"
+}
+
 # Forward to ace_after_task.py (captures learning from subagent work)
-RESULT=$(echo "$INPUT_JSON" | python3 "${HOOK_SCRIPT}" 2>&1)
+RESULT=$(echo "$INPUT_JSON" | run_after_task 2>&1)
 EXIT_CODE=$?
 
 # Calculate execution time (cross-platform milliseconds)
@@ -0,0 +1,120 @@
+#!/usr/bin/env bash
+# ace_cli_cache.sh - bash side of shared-hooks/utils/ace_cli_cache.py
+#
+# Same files, same keys: $XDG_CACHE_HOME/ace/cli-version.json and
+# cli-whoami.json, keyed on the ace-cli binary (path + mtime + size) and, for
+# whoami, on ~/.config/ace/config.json. Requires jq.
+#
+#   CURRENT_VERSION=$(ace_cached_cli_version)   # raw `ace-cli --version` output
+#   TOKEN_JSON=$(ace_cached_whoami)             # `ace-cli whoami --json` payload
+#   ace_cli_cache_invalidate [--auth-only]      # after /ace-login, logout
+#
+# On a miss both run the CLI and store the result (atomic temp file + mv).
+# Never fail the caller: errors just mean "no cache".
+
+ace_cli_cache_dir() {
+  echo "${XDG_CACHE_HOME:-$HOME/.cache}/ace"
+}
+
+# {"mtime":N,"size":N} for a file (symlinks followed), empty if missing
+_ace_cache_fingerprint() {
+  local stat_out
+  stat_out=$(stat -L -c '%Y %s' "$1" 2>/dev/null || stat -L -f '%m %z' "$1" 2>/dev/null) || return 1
+  set -- $stat_out
+  echo "{\"mtime\":$1,\"size\":$2}"
+}
+
+_ace_cache_binary() {
+  local path fp
+  path=$(command -v ace-cli 2>/dev/null) || return 1
+  fp=$(_ace_cache_fingerprint "$path") || return 1
+  jq -cn --arg path "$path" --argjson fp "$fp" '$fp + {path: $path}'
+}
+
+_ace_cache_config() {
+  _ace_cache_fingerprint "${XDG_CONFIG_HOME:-$HOME/.config}/ace/config.json" \
+    || echo '{"mtime":0,"size":0}'
+}
+
+_ace_cache_write() {
+  local dir tmp
+  dir=$(ace_cli_cache_dir)
+  mkdir -p "$dir" 2>/dev/null || return 0
+  tmp=$(mktemp "$dir/.$1.XXXXXX" 2>/dev/null) || return 0
+  if cat > "$tmp" 2>/dev/null && [[ -s "$tmp" ]]; then
+    mv -f "$tmp" "$dir/$1" 2>/dev/null || rm -f "$tmp"
+  else
+    rm -f "$tmp"
+  fi
+  return 0
+}
+
+_ace_cache_enabled() {
+  [[ "${ACE_CLI_CACHE:-1}" != "0" ]]
+}
+
+ace_cached_cli_version() {
+  local binary version pinning file
+  binary=$(_ace_cache_binary) || { ace-cli --version 2>/dev/null; return; }
+  file="$(ace_cli_cache_dir)/cli-version.json"
+
+  if _ace_cache_enabled && [[ -f "$file" ]] \
+      && jq -e --argjson b "$binary" '.binary == $b' "$file" >/dev/null 2>&1; then
+    jq -r '.version // empty' "$file" 2>/dev/null
+    return 0
+  fi
+
+  version=$(ace-cli --version 2>/dev/null) || return 1
+  version=$(echo "$version" | tr -d '[:space:]')
+  _ace_cache_enabled || { echo "$version"; return 0; }
+  pinning=false
+  if printf '%s\n' "1.0.11" "$(echo "$version" | grep -oE '[0-9]+\.[0-9]+\.[0-9]+' | head -1)" \
+      | sort -V -C 2>/dev/null; then
+    pinning=true
+  fi
+  jq -cn --argjson b "$binary" --arg v "$version" --argjson p "$pinning" \
+    '{binary: $b, version: $v, features: {session_pinning: $p}}' 2>/dev/null \
+    | _ace_cache_write cli-version.json
+  echo "$version"
+}
+
+ace_cached_whoami() {
+  local binary config file now data
+  binary=$(_ace_cache_binary) || { ace-cli whoami --json 2>/dev/null; return; }
+  config=$(_ace_cache_config)
+  file="$(ace_cli_cache_dir)/cli-whoami.json"
+  now=$(date +%s)
+
+  if _ace_cache_enabled && [[ -f "$file" ]] && jq -e --argjson b "$binary" --argjson c "$config" \
+      --argjson now "$now" '.binary == $b and .config == $c and .expires_at > $now' \
+      "$file" >/dev/null 2>&1; then
+    # Age token_expires_in like the Python reader does
+    jq -c --argjson now "$now" '.fetched_at as $f | .data
+      | if (.token_expires_in | type) == "number"
+        then .token_expires_in -= ($now - $f) else . end' "$file" 2>/dev/null
+    return 0
+  fi
+
+  data=$(ace-cli whoami --json 2>/dev/null) || true
+  [[ -n "$data" ]] || return 1
+  if _ace_cache_enabled; then
+    # TTL mirrors ace_cli_cache._whoami_ttl()
+    jq -c --argjson b "$binary" --argjson c "$config" --argjson now "$now" \
+      --argjson ttl "${ACE_CLI_CACHE_AUTH_TTL:-600}" '
+      (if (.authenticated // false) | not then ([60, $ttl] | min)
+       elif (.token_expires_in | type) == "number"
+       then ([0, ([$ttl, .token_expires_in - 7200] | min)] | max | floor)
+       else $ttl end) as $t
+      | select($t > 0)
+      | {binary: $b, config: $c, fetched_at: $now, expires_at: ($now + $t), data: .}' \
+      <<< "$data" 2>/dev/null | _ace_cache_write cli-whoami.json
+  fi
+  echo "$data"
+}
+
+ace_cli_cache_invalidate() {
+  local dir
+  dir=$(ace_cli_cache_dir)
+  rm -f "$dir/cli-whoami.json" 2>/dev/null || true
+  [[ "$1" == "--auth-only" ]] || rm -f "$dir/cli-version.json" 2>/dev/null || true
+}
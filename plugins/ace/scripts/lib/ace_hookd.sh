@@ -0,0 +1,29 @@
+#!/usr/bin/env bash
+# ace_hookd.sh - Thin client helper for the opt-in ace-hookd daemon
+#
+# Source from a hook wrapper (PLUGIN_ROOT must be set), then:
+#
+#   if ace_hookd_dispatch PostToolUse <<< "$INPUT_JSON"; then
+#     exit 0
+#   fi
+#   # ... daemon down or declined: continue on the regular path
+#
+# Returns 0 when the daemon handled the event (its stdout is already relayed
+# and its exit code stored in ACE_HOOKD_EXIT_CODE), 1 when the caller must
+# fall back. Never fails the caller: all errors map to "fall back".
+
+ACE_HOOKD_EXIT_CODE=0
+
+ace_hookd_dispatch() {
+  [[ "${ACE_HOOKD:-0}" == "1" ]] || return 1
+  local client="${PLUGIN_ROOT}/shared-hooks/ace_hookd_client.py"
+  [[ -f "$client" ]] || return 1
+
+  local rc=0
+  # -S: skip site import, the client is stdlib-only
+  python3 -S "$client" "$@" || rc=$?
+  [[ $rc -eq 75 ]] && return 1
+
+  ACE_HOOKD_EXIT_CODE=$rc
+  return 0
+}
@@ -0,0 +1,24 @@
+#!/usr/bin/env bash
+# ace_jsonl.sh - Locked JSONL appends for the legacy bash hooks
+#
+# Source from a hook wrapper (PLUGIN_ROOT must be set), then pipe records in:
+#
+#   jq -nc '{...}' | ace_append_jsonl "$LOG_DIR/ace-relevance.jsonl"
+#
+# Writes through shared-hooks/utils/ace_jsonl_writer.py: one flock-coordinated
+# write() per batch, segment sealing, and the current-task snapshot for
+# ace-relevance.jsonl. Falls back to a plain >> append without python3.
+# Never fails the caller.
+
+ace_append_jsonl() {
+  local target="$1" records
+  records=$(cat) || return 0
+  [[ -n "$records" ]] || return 0
+  local writer="${PLUGIN_ROOT}/shared-hooks/utils/ace_jsonl_writer.py"
+  if [[ -f "$writer" ]] && command -v python3 >/dev/null 2>&1; then
+    printf '%s\n' "$records" | python3 "$writer" append "$target" 2>/dev/null && return 0
+  fi
+  mkdir -p "$(dirname "$target")" 2>/dev/null || true
+  printf '%s\n' "$records" >> "$target" 2>/dev/null || true
+  return 0
+}
@@ -37,8 +37,15 @@ sys.path.insert(0, str(Path(__file__).parent / 'utils'))
 
 from ace_context import get_context
 from ace_cli import recall_session
+from ace_search_cache import learn_changed_playbook, invalidate_project as invalidate_search_cache
 from utils.git_utils import get_git_context, detect_commits_in_session
 from ace_relevance_logger import log_execution_metrics, log_hook_error
+from ace_transcript import find_last_user_prompt, scan_agent_tools
+# Re-exported: summarizers moved to utils in v6.5.0 (shared with PostToolUse)
+from ace_tool_summary import (  # noqa: F401
+    decode_payload, is_error_response, is_state_changing,
+    summarize_tool_action, summarize_tool_response,
+)
 
 # Add plugin utils to path for validation
 sys.path.insert(0, str(Path(__file__).parent.parent / 'utils'))
@@ -118,125 +125,26 @@ def has_substantial_work_from_accumulated(tools: list) -> bool:
     State-changing tools (Edit, Write, Bash, etc.) = meaningful work.
 
     Args:
-        tools: List of tuples (tool_name, tool_input, tool_response, tool_use_id)
+        tools: List of tuples (tool_name, tool_input, tool_response, tool_use_id, ...)
 
     Returns:
         True if ANY state-changing tool was used
     """
-    state_changing = ['Edit', 'Write', 'Bash', 'mcp__', 'NotebookEdit']
+    return any(tool_is_state_changing(tool) for tool in tools)
 
-    for tool_name, _, _, _, *_ in tools:
-        if any(t in tool_name for t in state_changing):
-            return True
-
-    return False
-
-
-def summarize_tool_action(tool_name: str, tool_input: dict) -> str:
-    """
-    Create human-readable action summary for tool call.
-
-    Per ACE Research Paper Page 19: Trajectory should show what tool did.
-    """
-    if tool_name == 'Edit':
-        file_path = tool_input.get('file_path', 'unknown file')
-        return f"Edited {Path(file_path).name}"
-
-    elif tool_name == 'Write':
-        file_path = tool_input.get('file_path', 'unknown file')
-        return f"Wrote {Path(file_path).name}"
-
-    elif tool_name == 'Read':
-        file_path = tool_input.get('file_path', 'unknown file')
-        return f"Read {Path(file_path).name}"
-
-    elif tool_name == 'Bash':
-        command = tool_input.get('command', tool_input.get('description', ''))
-        if len(command) > 60:
-            command = command[:60] + '...'
-        return f"Ran: {command}"
 
-    elif tool_name == 'Grep':
-        pattern = tool_input.get('pattern', '')
-        return f"Searched for: {pattern}"
+def tool_is_state_changing(tool: tuple) -> bool:
+    """Precomputed flag (accumulator v2 rows) or derived from the tool name."""
+    if len(tool) > 6 and tool[6] is not None:
+        return bool(tool[6])
+    return is_state_changing(tool[0])
 
-    elif tool_name == 'Glob':
-        pattern = tool_input.get('pattern', '')
-        return f"Found files matching: {pattern}"
 
-    elif tool_name == 'Task':
-        description = tool_input.get('description', tool_input.get('prompt', ''))
-        if len(description) > 60:
-            description = description[:60] + '...'
-        return f"Spawned task: {description}"
-
-    elif tool_name == 'TodoWrite':
-        return "Updated todo list"
-
-    elif tool_name.startswith('mcp__'):
-        # MCP tool call
-        return f"Called MCP: {tool_name}"
-
-    else:
-        return f"{tool_name}"
-
-
-def summarize_tool_response(tool_name: str, tool_response: dict) -> str:
-    """
-    Create human-readable result summary for tool response.
-
-    Per ACE Research Paper Page 19: Trajectory should show execution feedback.
-    """
-    if isinstance(tool_response, str):
-        if len(tool_response) > 100:
-            return tool_response[:100] + '...'
-        return tool_response
-
-    # Handle error responses
-    if tool_response.get('error'):
-        return f"Error: {tool_response.get('error', 'Unknown error')[:100]}"
-
-    if tool_response.get('stderr'):
-        return f"Stderr: {tool_response.get('stderr', '')[:100]}"
-
-    # Handle success responses
-    if tool_name in ['Edit', 'Write']:
-        success = tool_response.get('success', False)
-        return "Success" if success else "Failed"
-
-    elif tool_name == 'Read':
-        content = tool_response.get('content', '')
-        lines = content.count('\n') + 1 if content else 0
-        return f"Read {lines} lines"
-
-    elif tool_name == 'Bash':
-        stdout = tool_response.get('stdout', '')
-        exit_code = tool_response.get('exit_code', tool_response.get('exitCode', 0))
-        if exit_code != 0:
-            return f"Exit code {exit_code}"
-        if stdout:
-            first_line = stdout.split('\n')[0]
-            if len(first_line) > 60:
-                first_line = first_line[:60] + '...'
-            return first_line or "Success"
-        return "Success"
-
-    elif tool_name in ['Grep', 'Glob']:
-        # Files found
-        files = tool_response.get('files', [])
-        if isinstance(files, list):
-            return f"Found {len(files)} files"
-        return str(tool_response)[:100]
-
-    elif tool_name == 'Task':
-        return "Task completed"
-
-    else:
-        # Generic response summary
-        response_str = str(tool_response)
-        if len(response_str) > 100:
-            return response_str[:100] + '...'
-        return response_str
+def tool_is_error(tool: tuple) -> bool:
+    """Precomputed flag (accumulator v2 rows) or decoded from the response JSON."""
+    if len(tool) > 5 and tool[5] is not None:
+        return bool(tool[5])
+    return is_error_response(decode_payload(tool[2]))
 
 
 def parse_agent_transcript(path: str) -> list:
@@ -254,69 +162,9 @@ def parse_agent_transcript(path: str) -> list:
     Raises:
         Exceptions are propagated to caller so it can fall back.
     """
-    tool_uses = {}   # tool_use_id -> (tool_name, tool_input_json)
-    tool_results = {}  # tool_use_id -> tool_response_json
-    order = []  # preserve encounter order by tool_use_id
-
-    transcript_file = Path(path).expanduser()
-    with open(transcript_file, 'r') as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                entry = json.loads(line)
-            except json.JSONDecodeError:
-                continue
-
-            message = entry.get('message') or {}
-            content = message.get('content')
-            if not isinstance(content, list):
-                continue
-
-            for block in content:
-                if not isinstance(block, dict):
-                    continue
-                btype = block.get('type')
-                if btype == 'tool_use':
-                    tu_id = block.get('id') or ''
-                    tname = block.get('name', '')
-                    tinput = block.get('input', {})
-                    try:
-                        tinput_json = json.dumps(tinput)
-                    except (TypeError, ValueError):
-                        tinput_json = '{}'
-                    if tu_id and tu_id not in tool_uses:
-                        tool_uses[tu_id] = (tname, tinput_json)
-                        order.append(tu_id)
-                elif btype == 'tool_result':
-                    tu_id = block.get('tool_use_id') or ''
-                    tcontent = block.get('content', '')
-                    if isinstance(tcontent, list):
-                        parts = []
-                        for c in tcontent:
-                            if isinstance(c, dict) and c.get('type') == 'text':
-                                parts.append(c.get('text', ''))
-                            elif isinstance(c, str):
-                                parts.append(c)
-                        tresp = {'content': '\n'.join(parts)}
-                        if block.get('is_error'):
-                            tresp['error'] = tresp.get('content', '')
-                        try:
-                            tresp_json = json.dumps(tresp)
-                        except (TypeError, ValueError):
-                            tresp_json = '{}'
-                    elif isinstance(tcontent, str):
-                        payload = {'content': tcontent}
-                        if block.get('is_error'):
-                            payload['error'] = tcontent
-                        tresp_json = json.dumps(payload)
-                    else:
-                        try:
-                            tresp_json = json.dumps(tcontent)
-                        except (TypeError, ValueError):
-                            tresp_json = '{}'
-                    if tu_id:
-                        tool_results[tu_id] = tresp_json
+    # v6.5.0: resumes from a byte-offset checkpoint (ace_transcript.py), so
+    # repeated SubagentStops only decode the lines appended since the last one
+    state = scan_agent_tools(path)
 
     # Derive agent_id from filename: agent-{uuid}.jsonl
     agent_id = None
@@ -328,34 +176,42 @@ def parse_agent_transcript(path: str) -> list:
         agent_id = None
 
     results = []
-    for tu_id in order:
-        tname, tinput_json = tool_uses[tu_id]
-        tresp_json = tool_results.get(tu_id, '{}')
+    for tu_id in state['order']:
+        tname, tinput_json = state['tool_uses'][tu_id]
+        tresp_json = state['tool_results'].get(tu_id, '{}')
         results.append((tname, tinput_json, tresp_json, tu_id, agent_id))
     return results
 
 
-def build_trajectory_from_accumulated_tools(session_id: str, working_dir: str = None, agent_transcript_path: str = None) -> tuple:
+def build_trajectory_from_accumulated_tools(session_id: str, working_dir: str = None,
+                                           agent_transcript_path: str = None,
+                                           agent_id: str = None) -> tuple:
     """
     Build REAL trajectory from PostToolUse accumulated data or per-agent transcript.
 
-    Per-agent transcript (CC's agent_transcript_path) is preferred when present
-    because the session-wide SQLite accumulator cross-contaminates subagents.
+    For a subagent (agent_id set), its own accumulator rows are read through
+    the (session_id, agent_id) index. The per-agent transcript is only parsed
+    when the accumulator has no rows for that agent (CC builds that do not
+    send agent_id on PostToolUse), since the session-wide rows would mix agents.
 
     Args:
         session_id: Claude Code session ID
         working_dir: Project working directory (optional)
         agent_transcript_path: CC per-agent transcript path (optional)
+        agent_id: Subagent ID from the SubagentStop event (optional)
 
     Returns:
         Tuple of (trajectory_list, tools_list)
     """
     # Import accumulator functions
     sys.path.insert(0, str(Path(__file__).parent))
-    from ace_tool_accumulator import get_session_tools, clear_session
+    from ace_tool_accumulator import get_session_trajectory
 
     tools = None
-    if agent_transcript_path:
+    if agent_id:
+        tools = get_session_trajectory(session_id, working_dir, agent_id=agent_id) or None
+
+    if tools is None and agent_transcript_path:
         try:
             p = Path(agent_transcript_path).expanduser()
             if p.exists():
@@ -375,26 +231,27 @@ def build_trajectory_from_accumulated_tools(session_id: str, working_dir: str =
             tools = None
 
     if tools is None:
-        tools = get_session_tools(session_id, working_dir)
+        # Narrow SELECT of precomputed summaries; payload blobs only where needed
+        tools = get_session_trajectory(session_id, working_dir)
     trajectory = []
 
-    for i, (tool_name, tool_input_json, tool_response_json, tool_use_id, agent_id) in enumerate(tools, 1):
-        try:
-            tool_input = json.loads(tool_input_json) if tool_input_json else {}
-        except json.JSONDecodeError:
-            tool_input = {}
-
-        try:
-            tool_response = json.loads(tool_response_json) if tool_response_json else {}
-        except json.JSONDecodeError:
-            tool_response = {}
+    for i, tool in enumerate(tools, 1):
+        tool_name = tool[0]
+        summaries = tool[7:9] if len(tool) > 8 else (None, None)
+        if summaries[0] is None:
+            # Per-agent transcript or a row written before accumulator v2
+            tool_input = decode_payload(tool[1])
+            summaries = (
+                summarize_tool_action(tool_name, tool_input if isinstance(tool_input, dict) else {}),
+                summarize_tool_response(tool_name, decode_payload(tool[2])),
+            )
 
         # Build trajectory step with REAL data
         trajectory.append({
             "step": i,
             "tool": tool_name,
-            "action": summarize_tool_action(tool_name, tool_input),
-            "result": summarize_tool_response(tool_name, tool_response)
+            "action": summaries[0],
+            "result": summaries[1]
         })
 
     return trajectory, tools
@@ -424,52 +281,16 @@ def get_user_prompt_from_transcript(transcript_path: str) -> str:
 
     This is the ONLY transcript parsing we do - just to get the user's request.
     All tool execution data comes from accumulated tools.
+
+    v6.5.0: Reads the transcript backwards from EOF (ace_transcript.py) and
+    decodes only user-message lines, so Stop no longer pays a full JSON decode
+    of long session transcripts.
     """
     try:
         transcript_file = Path(transcript_path).expanduser()
         if not transcript_file.exists():
             return "No user prompt found"
-
-        all_entries = []
-        with open(transcript_file, 'r') as f:
-            for line in f:
-                if not line.strip():
-                    continue
-                try:
-                    entry = json.loads(line)
-                    all_entries.append(entry)
-                except json.JSONDecodeError:
-                    continue
-
-        # Find LAST user message (task start) - search backwards
-        # Skip tool_result messages - they have role=user but are not user prompts
-        for i in range(len(all_entries) - 1, -1, -1):
-            message = all_entries[i].get('message', {})
-            if message.get('role') == 'user':
-                content = message.get('content', '')
-
-                if isinstance(content, list):
-                    # Skip tool_result messages
-                    has_tool_result = any(
-                        isinstance(b, dict) and b.get('type') == 'tool_result'
-                        for b in content
-                    )
-                    if has_tool_result:
-                        continue
-
-                    # Extract text content
-                    text_parts = []
-                    for block in content:
-                        if isinstance(block, dict) and block.get('type') == 'text':
-                            text_parts.append(block.get('text', ''))
-                    user_prompt = '\n'.join(text_parts)
-                    if user_prompt.strip():
-                        return user_prompt[:2000]
-
-                elif isinstance(content, str) and len(content.strip()) > 10:
-                    return content[:2000]
-
-        return "No user prompt found"
+        return find_last_user_prompt(transcript_file) or "No user prompt found"
 
     except Exception as e:
         if os.environ.get('ACE_DEBUG_HOOKS') == '1':
@@ -478,7 +299,7 @@ def get_user_prompt_from_transcript(transcript_path: str) -> str:
         return "No user prompt found"
 
 
-def main():
+def main(event: dict = None):
     """
     ACE After Task Hook - PostToolUse Accumulation Architecture (v5.3.0)
 
@@ -492,8 +313,9 @@ def main():
         # Track execution start time for metrics
         execution_start_time = time.time()
 
-        # Read hook event from stdin
-        event = json.load(sys.stdin)
+        # Read hook event from stdin (ace_hook.py passes it already parsed)
+        if event is None:
+            event = json.load(sys.stdin)
 
         # DEBUG: Log raw event
         if os.environ.get('ACE_DEBUG_HOOKS') == '1':
@@ -535,11 +357,13 @@ def main():
 
         # v6.4.0: Prefer CC's per-agent transcript (agent_transcript_path) to avoid
         # cross-agent contamination from the session-wide SQLite accumulator.
+        # v6.5.0: Subagents read their own accumulator rows first (indexed).
         agent_transcript_path = event.get('agent_transcript_path') or None
 
         # STEP 1: Build trajectory from accumulated tools (GROUND TRUTH)
         trajectory, tools = build_trajectory_from_accumulated_tools(
-            session_id, working_dir, agent_transcript_path=agent_transcript_path
+            session_id, working_dir, agent_transcript_path=agent_transcript_path,
+            agent_id=event.get('agent_id') or None
         )
 
         if os.environ.get('ACE_DEBUG_HOOKS') == '1':
@@ -569,15 +393,7 @@ def main():
 
         # STEP 5: Build ExecutionTrace (ACE Paper compliant format)
         # Check for errors in tool responses
-        has_errors = False
-        for _, _, tool_response_json, _, *_ in tools:
-            try:
-                resp = json.loads(tool_response_json) if tool_response_json else {}
-                if resp.get('error') or resp.get('stderr'):
-                    has_errors = True
-                    break
-            except Exception:
-                pass
+        has_errors = any(tool_is_error(tool) for tool in tools)
 
         # v6.0.0: Read agent_type natively from hook event (CC 2.1.69+)
         # agent_type identifies subagent type: "main", "refactorer", "coder", etc.
@@ -585,24 +401,16 @@ def main():
         # v6.4.0: Per-agent scope — None for main agent, UUID for subagents
         agent_id = event.get('agent_id') or None
 
-        # v6.4.0: Resolve parent_agent_id from spawn log (best-effort).
-        # SubagentStop wrapper writes {event: "subagent_done", child_agent_id, parent_agent_id}
-        # BEFORE invoking ace_after_task.py, so the entry is present at read time.
+        # v6.4.0: Resolve parent_agent_id (best-effort). The SubagentStop hook
+        # records {child_agent_id -> parent_agent_id} BEFORE invoking
+        # ace_after_task.py, so the entry is present at read time.
+        # v6.5.0: Primary-key lookup in the accumulator's spawn_registry table;
+        # a legacy ace-spawn-log.jsonl (subagent_done entries) is imported once.
         parent_agent_id = None
         if agent_id:
             try:
-                spawn_log_path = Path('.claude/data/logs/ace-spawn-log.jsonl')
-                if spawn_log_path.exists():
-                    with open(spawn_log_path) as _sl:
-                        for _line in reversed(list(_sl)):
-                            try:
-                                _sp = json.loads(_line)
-                                if (_sp.get('event') == 'subagent_done'
-                                        and _sp.get('child_agent_id') == agent_id):
-                                    parent_agent_id = _sp.get('parent_agent_id')
-                                    break
-                            except Exception:
-                                continue
+                from ace_tool_accumulator import get_spawn_parent
+                parent_agent_id = get_spawn_parent(agent_id)
             except Exception:
                 pass  # non-fatal
 
@@ -719,6 +527,10 @@ def main():
                     if 'learning_statistics' in stats:
                         stats = stats.get('learning_statistics', {})
 
+                    # v6.5.0: Playbook changed - cached searches for this project are stale
+                    if learn_changed_playbook(stats):
+                        invalidate_search_cache(context['project'])
+
                     if stats:
                         created = stats.get('patterns_created', 0)
                         updated = stats.get('patterns_updated', 0)
@@ -804,11 +616,7 @@ def main():
         # STEP 8.5: Log execution metrics for relevance analysis (v5.4.2)
         try:
             # Count state-changing tools for metrics
-            state_changing_tools = ['Edit', 'Write', 'Bash', 'mcp__', 'NotebookEdit']
-            state_changing_count = sum(
-                1 for tool_name, _, _, _, *_ in tools
-                if any(t in tool_name for t in state_changing_tools)
-            )
+            state_changing_count = sum(1 for tool in tools if tool_is_state_changing(tool))
 
             execution_time = time.time() - execution_start_time
 
@@ -827,9 +635,14 @@ def main():
             pass  # Non-fatal: continue without metrics logging
 
         # STEP 9: Clear accumulated tools (cleanup)
+        # v6.5.0: A subagent only clears its own rows, so the main agent's
+        # trajectory keeps its tools and skips the ones already learned from
         sys.path.insert(0, str(Path(__file__).parent))
-        from ace_tool_accumulator import clear_session
-        clear_session(session_id, working_dir)
+        from ace_tool_accumulator import clear_agent, clear_session
+        if agent_id:
+            clear_agent(session_id, agent_id, working_dir)
+        else:
+            clear_session(session_id, working_dir)
 
         if os.environ.get('ACE_DEBUG_HOOKS') == '1':
             with open('/tmp/ace_hook_debug.log', 'a') as f:
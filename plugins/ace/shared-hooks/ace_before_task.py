@@ -9,14 +9,19 @@ Supports session pinning (v1.0.11+) for pattern persistence across compaction.
 v5.4.13: Added check_auth_status() to catch 48h standby scenario.
 v5.4.18: Granular token expiration using token_expires_in (seconds).
          Warns if token expires within 2 hours before complex tasks.
+v6.5.0: Version check, auth check and search run concurrently under one
+        deadline derived from the hook timeout (run_preflight()).
 """
 
 import json
+import os
 import re
 import sys
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 
 # Add utils to path
 sys.path.insert(0, str(Path(__file__).parent / 'utils'))
@@ -50,8 +55,19 @@ def sanitize_response(obj: Any) -> Any:
         return obj
 
 from ace_cli import run_search, check_session_pinning_available, check_auth_status
+import ace_pattern_index
+import ace_prefetch
+import ace_search_cache
+import ace_swr
 from ace_context import get_context
-from ace_relevance_logger import log_search_metrics
+from ace_relevance_logger import log_search_metrics, log_preflight
+
+# UserPromptSubmit is killed at its hooks.json timeout. Keep this much of it
+# for interpreter startup and output, so a slow server still gets a message out.
+DEFAULT_HOOK_TIMEOUT_MS = 15000
+PREFLIGHT_MARGIN_MS = 2500
+SEARCH_TIMEOUT_SECS = 30
+CHECK_TIMEOUT_SECS = 5
 
 
 def build_session_title(pattern_list, pattern_count, agent_type, review_file=None):
@@ -141,6 +157,178 @@ def expand_abbreviations(prompt: str) -> str:
     return result.strip()
 
 
+def get_preflight_budget_ms() -> int:
+    """
+    Milliseconds available for the pre-flight steps.
+
+    ACE_PREFLIGHT_BUDGET_MS wins; otherwise the UserPromptSubmit timeout from
+    hooks.json minus PREFLIGHT_MARGIN_MS.
+    """
+    override = os.environ.get('ACE_PREFLIGHT_BUDGET_MS')
+    if override:
+        try:
+            return max(100, int(override))
+        except ValueError:
+            pass
+
+    timeout_ms = DEFAULT_HOOK_TIMEOUT_MS
+    try:
+        hooks_file = Path(__file__).parent.parent / 'hooks' / 'hooks.json'
+        hooks = json.loads(hooks_file.read_text())['hooks']
+        timeout_ms = int(hooks['UserPromptSubmit'][0]['hooks'][0]['timeout'])
+    except Exception:
+        pass
+    return max(1000, timeout_ms - PREFLIGHT_MARGIN_MS)
+
+
+def run_preflight(context: Dict[str, str], session_id: str, search_query: str,
+                  budget_ms: int, cache_info: Dict[str, Any] = None
+                  ) -> Tuple[bool, Optional[str], Any, Dict[str, Optional[float]]]:
+    """
+    Run the session-pinning check, auth check and pattern search concurrently.
+
+    The auth check runs alongside both other steps; the search starts as soon
+    as the pinning check answers (it decides --pin-session). Every step gets
+    the remaining budget as its CLI timeout, so all of them finish by the
+    deadline. A step still running at the deadline counts as unknown:
+    pinning off, no auth warning, search timed out. cache_info is passed
+    through to run_search() (local search-cache hit/similar/miss); near-duplicate
+    prompts are served from the cache and refreshed in the background.
+
+    ACE_SEARCH_MODE decides how the local pattern index takes part: 'local'
+    skips the server, 'fallback' (default) answers locally when the server
+    search fails. 'hybrid' gives the server HYBRID_GRACE_MS once a fast local
+    answer is in hand: remote results that make it are merged in front, else
+    the local answer is returned and a detached refresh delivers the remote
+    patterns later (ace_swr.take_update, next PreToolUse or prompt).
+    The local query is timed as steps_ms['local_search']; responses it
+    produced carry 'source': 'local' or 'hybrid'.
+
+    With ACE_SEARCH_SWR=1 a stale / near-duplicate / local / last-session
+    result (ace_swr.immediate_result) is returned without waiting for the
+    server; a detached refresh revalidates it. cache_info then gets
+    status 'stale', freshness, stale_source and stale_age_s.
+
+    Returns:
+        (use_session_pinning, auth_warning, patterns_response, steps_ms)
+        steps_ms maps step -> wall ms, None if it missed the deadline
+    """
+    deadline = time.monotonic() + budget_ms / 1000.0
+    if cache_info is None:
+        cache_info = {}
+    steps_ms: Dict[str, Optional[float]] = {'session_pinning': None, 'auth': None, 'search': None}
+
+    def remaining(cap: float) -> float:
+        return max(0.1, min(cap, deadline - time.monotonic()))
+
+    def timed(name, fn, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(**kwargs)
+        finally:
+            steps_ms[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def wait(future, default):
+        try:
+            # Small grace: the step's own CLI timeout fires at the deadline
+            return future.result(timeout=max(0.0, deadline - time.monotonic()) + 0.5)
+        except Exception:
+            return default
+
+    mode = ace_pattern_index.get_search_mode()
+
+    def local_search():
+        return timed('local_search', ace_pattern_index.search,
+                     query=search_query, org=context['org'], project=context['project'])
+
+    pool = ThreadPoolExecutor(max_workers=3)
+    try:
+        pinning_future = pool.submit(timed, 'session_pinning', check_session_pinning_available,
+                                     timeout=remaining(CHECK_TIMEOUT_SECS))
+        auth_future = pool.submit(timed, 'auth', check_auth_status, warn_threshold_hours=2.0,
+                                  timeout=remaining(CHECK_TIMEOUT_SECS))
+
+        local_response = None
+        if mode in ('local', 'hybrid'):
+            local_response = local_search()
+            if mode == 'hybrid' and steps_ms['local_search'] > ace_pattern_index.HYBRID_LOCAL_MS:
+                local_response = None  # too slow to count as a fast path
+
+        use_session_pinning = wait(pinning_future, False)
+
+        # Store session ID for PreCompact hook (recall patterns after compaction)
+        if use_session_pinning and context['project']:
+            try:
+                session_file = Path(f"/tmp/ace-session-{context['project']}.txt")
+                session_file.write_text(session_id)
+            except Exception:
+                # Non-fatal: continue without session pinning
+                use_session_pinning = False
+
+        immediate = None
+        if mode != 'local' and ace_swr.swr_enabled():
+            immediate = timed('swr_lookup', ace_swr.immediate_result,
+                              query=search_query, org=context['org'], project=context['project'],
+                              session_id=session_id, pinned=use_session_pinning)
+
+        if immediate is not None:
+            # Stale-while-revalidate: inject now, fresh results follow via
+            # the next PreToolUse or prompt
+            patterns_response, stale_source, stale_age = immediate
+            cache_info.update(status='stale', freshness='stale', stale_source=stale_source,
+                              stale_age_s=stale_age)
+            ace_swr.record_injection(session_id, search_query, patterns_response, stale_source)
+            ace_search_cache.spawn_refresh(search_query, context['org'], context['project'],
+                                           session_id if use_session_pinning else None,
+                                           swr_session=session_id)
+        elif mode == 'local':
+            patterns_response = local_response or {
+                "error": "search_failed", "message": "Local pattern index is empty. Run /ace-export-patterns."}
+        else:
+            # Call ace-cli search --stdin with optional session pinning
+            # Context passed via environment, CLI reads server config for top_k/threshold
+            # Hybrid with a fast local answer only waits out a short grace period
+            fast_local = mode == 'hybrid' and bool(ace_swr.pattern_ids(local_response))
+            search_future = pool.submit(
+                timed, 'search', run_search,
+                query=search_query,
+                org=context['org'],
+                project=context['project'],
+                session_id=session_id if use_session_pinning else None,
+                timeout=(ace_pattern_index.HYBRID_GRACE_MS / 1000.0 if fast_local
+                         else remaining(SEARCH_TIMEOUT_SECS)),
+                cache_info=cache_info,
+                allow_similar=True
+            )
+            patterns_response = wait(search_future, {
+                "error": "timeout", "message": "Search timed out. Check your connection."})
+            late = (fast_local and isinstance(patterns_response, dict) and
+                    patterns_response.get('error') == 'timeout')
+            if mode == 'hybrid':
+                patterns_response = ace_pattern_index.merge_responses(patterns_response, local_response)
+            elif mode == 'fallback' and ace_pattern_index.is_unavailable(patterns_response):
+                local_response = local_search()
+                if local_response and local_response.get('similar_patterns'):
+                    patterns_response = local_response
+            if late:
+                # Answer locally now; the remote search finishes in the
+                # background and its new patterns follow as an update
+                cache_info.update(freshness='stale', stale_source='local')
+                ace_swr.record_injection(session_id, search_query, patterns_response, 'local')
+                ace_search_cache.spawn_refresh(search_query, context['org'], context['project'],
+                                               session_id if use_session_pinning else None,
+                                               swr_session=session_id)
+            elif ace_swr.swr_enabled() and ace_swr.pattern_ids(patterns_response):
+                cache_info['freshness'] = 'fresh'
+                ace_swr.record_injection(session_id, search_query, patterns_response,
+                                         patterns_response.get('source', 'remote'))
+        auth_warning = wait(auth_future, None)
+    finally:
+        pool.shutdown(wait=False)
+
+    return use_session_pinning, auth_warning, patterns_response, dict(steps_ms)
+
+
 def check_eval_request_and_review():
     """Fire-and-forget self-eval: read eval request, inject context, parse ACE_REVIEW.
 
@@ -182,10 +370,11 @@ def check_eval_request_and_review():
     return eval_context
 
 
-def main():
+def main(event: Dict[str, Any] = None):
     try:
-        # Read hook event from stdin
-        event = json.load(sys.stdin)
+        # Read hook event from stdin (ace_hook.py passes it already parsed)
+        if event is None:
+            event = json.load(sys.stdin)
         user_prompt = event.get('prompt', '')
 
         if not user_prompt:
@@ -212,37 +401,33 @@ def main():
         # Use Claude's session_id for state file consistency (Issue #16)
         # ace_after_task.py reads event.get('session_id') — we must use the same key
         session_id = event.get('session_id', str(uuid.uuid4()))
-        use_session_pinning = check_session_pinning_available()
 
         # v6.0.0: Read agent_type natively from hook event (CC 2.1.69+)
         # agent_type identifies subagent type: "main", "refactorer", "coder", etc.
         agent_type = event.get('agent_type', 'main')
 
-        # Store session ID for PreCompact hook (recall patterns after compaction)
-        if use_session_pinning and context['project']:
-            try:
-                session_file = Path(f"/tmp/ace-session-{context['project']}.txt")
-                session_file.write_text(session_id)
-            except Exception:
-                # Non-fatal: continue without session pinning
-                use_session_pinning = False
-
-        # v5.4.18: Granular token expiration check (warn if < 2 hours)
-        # Catches 48h standby scenario AND warns before complex tasks
-        auth_warning = check_auth_status(warn_threshold_hours=2.0)
-
         # Minimal enhancement: Expand abbreviations for semantic clarity
         # (Server team: DO NOT add generic keywords - hurts embedding quality!)
         search_query = expand_abbreviations(user_prompt)
 
-        # Call ace-cli search --stdin with optional session pinning
-        # Context passed via environment, CLI reads server config for top_k/threshold
-        patterns_response = run_search(
-            query=search_query,
-            org=context['org'],
-            project=context['project'],
-            session_id=session_id if use_session_pinning else None
-        )
+        # v5.4.18: Granular token expiration check (warn if < 2 hours) runs
+        # alongside the search; v6.5.0: all steps share one deadline budget
+        budget_ms = get_preflight_budget_ms()
+        cache_info: Dict[str, Any] = {}
+        use_session_pinning, auth_warning, patterns_response, steps_ms = run_preflight(
+            context, session_id, search_query, budget_ms, cache_info)
+
+        try:
+            if not patterns_response:
+                outcome = 'search_failed'
+            elif isinstance(patterns_response, dict) and patterns_response.get('error'):
+                outcome = patterns_response['error']
+            else:
+                outcome = 'ok'
+            log_preflight(session_id=session_id, budget_ms=budget_ms, steps_ms=steps_ms,
+                          outcome=outcome, project_id=context.get('project'))
+        except Exception:
+            pass  # Non-fatal: continue without timing log
 
         # v5.3.5: Sanitize response to remove invalid Unicode surrogates
         # These can break the Claude API's JSON parser
@@ -303,7 +488,9 @@ def main():
                 domains=domains,
                 project_id=context.get('project'),
                 org_id=context.get('org'),
-                agent_type=agent_type
+                agent_type=agent_type,
+                search_cache=cache_info.get('status'),
+                search_source=patterns_response.get('source', 'remote')
             )
         except Exception:
             pass  # Non-fatal: continue without logging
@@ -360,6 +547,9 @@ def main():
             except Exception:
                 # Non-fatal: continue without domain tracking
                 pass
+            # v6.5.0: Warm the domain-shift searches PreToolUse will need
+            ace_prefetch.spawn_prefetch(domains_summary, context.get('org'),
+                                        context['project'], session_id)
 
         # Strip internal metadata fields from patterns before injection (reduce token usage)
         # These server-internal fields are stripped: 'created_at', 'updated_at', 'last_used',
@@ -375,7 +565,21 @@ def main():
 
         # Build context for Claude (JSON in XML tags - includes domain metadata)
         # v5.4.11: Include agent_type attribute for server-side pattern weighting
-        ace_context = f'<ace-patterns agent-type="{agent_type}">\n{json.dumps(patterns_response)}\n</ace-patterns>'
+        # v6.5.0: SWR marks stale injections (freshness / stale-source / age-s)
+        freshness = ''
+        if cache_info.get('freshness'):
+            freshness = f' freshness="{cache_info["freshness"]}"'
+            if cache_info['freshness'] == 'stale':
+                freshness += f' stale-source="{cache_info.get("stale_source")}"'
+                if cache_info.get('stale_age_s') is not None:
+                    freshness += f' age-s="{int(cache_info["stale_age_s"])}"'
+        ace_context = f'<ace-patterns agent-type="{agent_type}"{freshness}>\n{json.dumps(patterns_response)}\n</ace-patterns>'
+
+        # v6.5.0: Fresh patterns a previous stale injection missed
+        if ace_swr.updates_enabled():
+            update = ace_swr.take_update(session_id, 'next_prompt', context.get('project'))
+            if update:
+                ace_context = ace_context + "\n" + ace_swr.format_update(update)
 
         # Append fire-and-forget eval injection if present (from previous task's Stop hook)
         if eval_injection:
@@ -389,6 +593,10 @@ def main():
         if pattern_count > 0:
             # Build summary with domain info
             summary_lines = [f"✅ [ACE] Found {pattern_count} relevant bullets"]
+            if patterns_response.get('source') == 'local':
+                summary_lines[0] += " (local index)"
+            if cache_info.get('freshness') == 'stale':
+                summary_lines[0] += " (cached, refreshing)"
 
             # Show domain summary
             abstract_domains = domains_summary.get('abstract', [])
@@ -19,44 +19,23 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, Any, Optional
 
+sys.path.insert(0, str(Path(__file__).parent / 'utils'))
+from ace_jsonl_writer import append_record
+
 
 class ACEEventLogger:
     """Core logging utility for ACE hook events with rotation."""
 
     # v5.4.5: Add rotation to prevent unbounded log growth
+    # v6.5.0: Full segments are sealed into the gzip segment store
+    # (ace_log_store) instead of rotating .1-.2 and deleting the oldest;
+    # appends go through ace_jsonl_writer (one locked write per record)
     MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
-    MAX_BACKUP_FILES = 2  # Keep 2 rotated files
 
     def __init__(self, log_dir: str = ".claude/data/logs"):
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(parents=True, exist_ok=True)
 
-    def _rotate_if_needed(self, log_path: Path) -> None:
-        """Rotate log file if it exceeds MAX_FILE_SIZE."""
-        try:
-            if not log_path.exists():
-                return
-            if log_path.stat().st_size < self.MAX_FILE_SIZE:
-                return
-
-            # Get base name without extension
-            base_name = log_path.stem
-            ext = log_path.suffix
-
-            # Rotate existing backups
-            for i in range(self.MAX_BACKUP_FILES, 0, -1):
-                old_path = self.log_dir / f"{base_name}.{i}{ext}"
-                new_path = self.log_dir / f"{base_name}.{i+1}{ext}"
-                if i == self.MAX_BACKUP_FILES and old_path.exists():
-                    old_path.unlink()  # Delete oldest
-                elif old_path.exists():
-                    old_path.rename(new_path)
-
-            # Rotate current to .1
-            log_path.rename(self.log_dir / f"{base_name}.1{ext}")
-        except Exception:
-            pass  # Silent fail
-
     def get_log_path(self, event_type: str) -> Path:
         """Get log file path for event type."""
         filename = f"ace-{event_type.lower()}.jsonl"
@@ -98,9 +77,7 @@ class ACEEventLogger:
         log_path = self.get_log_path(event_type)
 
         try:
-            self._rotate_if_needed(log_path)
-            with open(log_path, 'a') as f:
-                f.write(json.dumps(log_entry) + '\n')
+            append_record(log_path, log_entry, max_bytes=self.MAX_FILE_SIZE)
         except Exception as e:
             print(f"[ERROR] Failed to write log: {e}", file=sys.stderr)
 
@@ -128,17 +105,14 @@ class ACEEventLogger:
         # Log to event-specific log
         event_log_path = self.get_log_path(event_type)
         try:
-            with open(event_log_path, 'a') as f:
-                f.write(json.dumps({**error_entry, "phase": "error"}) + '\n')
+            append_record(event_log_path, {**error_entry, "phase": "error"})
         except Exception as e:
             print(f"[ERROR] Failed to write event log: {e}", file=sys.stderr)
 
         # Log to errors log
         errors_log_path = self.log_dir / "ace-errors.jsonl"
         try:
-            self._rotate_if_needed(errors_log_path)
-            with open(errors_log_path, 'a') as f:
-                f.write(json.dumps(error_entry) + '\n')
+            append_record(errors_log_path, error_entry, max_bytes=self.MAX_FILE_SIZE)
         except Exception as e:
             print(f"[ERROR] Failed to write errors log: {e}", file=sys.stderr)
 
@@ -0,0 +1,781 @@
+#!/usr/bin/env python3
+"""
+ACE Hook Dispatcher - Single-process entry point for hook events.
+
+v6.5.0: Replaces the per-event bash pipelines (iconv + 3-10 `jq` forks +
+a fresh python3 that receives tool payloads through argv) with one process:
+
+    python3 ace_hook.py <EventName> [wrapper args...] < event.json
+
+stdin is read and parsed exactly once. Working-directory resolution
+(cwd / working_directory / workingDirectory, then the transcript_path
+fallback), the disabled-flag check and field extraction all happen on that
+single parse, then the event is routed to an in-process handler. Tool
+payloads never touch argv, so large Read/Bash outputs no longer hit ARG_MAX.
+
+With ACE_HOOKD=1 the event is first offered to the warm ace-hookd daemon;
+when it is down or declines, the handler runs here.
+
+Wrappers in scripts/*.sh exec this dispatcher unless ACE_LEGACY_HOOKS=1,
+which keeps the original bash path.
+
+Exit code is always 0 except where the legacy wrapper propagated the
+handler's own exit code (UserPromptSubmit, SubagentStop).
+"""
+
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent / 'utils'))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'utils'))
+
+PLUGIN_VERSION = '6.3.0'
+LOG_DIR = '.claude/data/logs'
+DOMAIN_SEARCH_TOOLS = ('Read', 'Glob', 'Grep')
+
+HANDLERS = {}
+
+
+def handler(event_name: str):
+    """Register an in-process handler: fn(event, args) -> exit code."""
+    def register(fn):
+        HANDLERS[event_name] = fn
+        return fn
+    return register
+
+
+# ── shared event helpers ─────────────────────────────────────────────────
+
+def parse_event(raw: bytes) -> dict:
+    """Decode + parse the event once. Invalid UTF-8 is dropped (like `iconv -c`)."""
+    try:
+        event = json.loads(raw.decode('utf-8', errors='ignore'))
+    except ValueError:
+        return {}
+    return event if isinstance(event, dict) else {}
+
+
+def jq_alt(obj, *keys):
+    """First value jq's `a // b` would pick: skips missing, null and false."""
+    for key in keys:
+        value = obj.get(key) if isinstance(obj, dict) else None
+        if value is not None and value is not False:
+            return value
+    return None
+
+
+def resolve_working_dir(event: dict) -> str:
+    """
+    Same resolution as the wrappers: cwd fields, then transcript_path/../..
+
+    Returns '' when the event carries no usable working directory.
+    """
+    working_dir = jq_alt(event, 'cwd', 'working_directory', 'workingDirectory')
+    if working_dir:
+        return str(working_dir)
+    transcript_path = jq_alt(event, 'transcript_path')
+    if transcript_path:
+        candidate = os.path.join(os.path.dirname(str(transcript_path)), '..', '..')
+        if os.path.isdir(candidate):
+            return os.path.realpath(candidate)
+    return ''
+
+
+def enter_working_dir(event: dict) -> str:
+    """Resolve the event's working dir and chdir into it when it exists."""
+    working_dir = resolve_working_dir(event)
+    if working_dir and os.path.isdir(working_dir):
+        try:
+            os.chdir(working_dir)
+        except OSError:
+            pass
+    return working_dir
+
+
+def is_ace_disabled(event: dict, env: dict = None) -> bool:
+    """Flag file written by SessionStart when the CLI is unusable."""
+    env = os.environ if env is None else env
+    candidates = {env.get('SESSION_ID') or 'default'}
+    if jq_alt(event, 'session_id'):
+        candidates.add(str(event['session_id']))
+    return any(os.path.exists(f'/tmp/ace-disabled-{sid}.flag') for sid in candidates)
+
+
+def cli_available(search_path: str = None) -> bool:
+    from ace_cli import CLI_CMD
+    return shutil.which(CLI_CMD, path=search_path) is not None
+
+
+def emit(payload) -> None:
+    """Write hook output (dict -> JSON) and flush so Claude Code sees it early."""
+    text = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+    sys.stdout.write(text.rstrip('\n') + '\n')
+    sys.stdout.flush()
+
+
+def utc_timestamp() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def append_jsonl(path: str, entry: dict) -> None:
+    from ace_jsonl_writer import append_record
+    try:
+        append_record(path, entry, ensure_ascii=False)
+    except OSError:
+        pass
+
+
+def log_hook_event(event_type: str, event_data, phase: str, exit_code: int = None,
+                   execution_time_ms: int = None) -> None:
+    """In-process equivalent of `python3 ace_event_logger.py --event-type ...`."""
+    try:
+        from ace_event_logger import ACEEventLogger
+        if isinstance(event_data, str):
+            event_data = json.loads(event_data)
+        ACEEventLogger(log_dir=LOG_DIR).log_event(
+            event_type=event_type,
+            event_data=event_data,
+            phase=phase,
+            metadata={
+                'plugin_version': os.getenv('ACE_PLUGIN_VERSION', PLUGIN_VERSION),
+                'claude_version': os.getenv('CLAUDE_VERSION', 'unknown'),
+                'model': os.getenv('CLAUDE_MODEL', 'unknown'),
+            },
+            execution_time_ms=execution_time_ms,
+            exit_code=exit_code,
+        )
+    except Exception:
+        pass
+
+
+def run_hook_main(module, event: dict) -> tuple:
+    """
+    Run a hook module's main(event) in-process, capturing its stdout.
+
+    Returns:
+        (exit_code, stdout_text)
+    """
+    captured = io.StringIO()
+    real_stdout = sys.stdout
+    sys.stdout = captured
+    exit_code = 0
+    try:
+        module.main(event)
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            exit_code = e.code
+        elif e.code is not None:
+            captured.write(f"{e.code}\n")
+            exit_code = 1
+    except Exception as e:
+        print(f"[ERROR] ACE hook failed: {e}", file=sys.stderr)
+        exit_code = 1
+    finally:
+        sys.stdout = real_stdout
+    return exit_code, captured.getvalue()
+
+
+# ── domain helpers (PreToolUse / CwdChanged) ─────────────────────────────
+
+def match_domain_to_path(domain: str, path: str) -> bool:
+    """
+    Word-level domain/path match (port of the wrappers' bash function).
+
+    Path segments (split on / . _ -) are compared against domain words
+    (split on -); words/segments shorter than 3 chars are skipped. Exact
+    word match or a >= 4 char common prefix counts as a match.
+    """
+    segments = path.translate(str.maketrans('/._-', '    ')).split()
+    words = domain.split('-')
+    for segment in segments:
+        if len(segment) < 3:
+            continue
+        for word in words:
+            if len(word) < 3:
+                continue
+            if segment == word:
+                return True
+            if len(os.path.commonprefix([word, segment])) >= 4:
+                return True
+    return False
+
+
+def read_json_file(path: str):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def settings_ids(settings) -> tuple:
+    """(org_id, project_id) using the wrappers' `.x // .env.ACE_X` lookups."""
+    if not isinstance(settings, dict):
+        return None, None
+    env = settings.get('env') if isinstance(settings.get('env'), dict) else {}
+    org_id = jq_alt(settings, 'orgId') or jq_alt(env, 'ACE_ORG_ID')
+    project_id = jq_alt(settings, 'projectId') or jq_alt(env, 'ACE_PROJECT_ID')
+    return org_id, project_id
+
+
+def load_domains(project_id: str, loader=read_json_file) -> list:
+    """Unique lower-cased domain names from /tmp/ace-domains-{project}.json."""
+    domains = loader(f'/tmp/ace-domains-{project_id}.json')
+    if not isinstance(domains, dict):
+        return []
+    return sorted({str(key).split(':')[0].lower() for key in domains})
+
+
+def first_matching_domain(domains: list, path: str):
+    path_lower = path.lower()
+    return next((d for d in domains if match_domain_to_path(d, path_lower)), None)
+
+
+def search_domain(query: str, domain: str, org_id: str, project_id: str,
+                  cache_info: dict = None) -> tuple:
+    """Domain-filtered search. Returns (raw_json_text, pattern_count)."""
+    from ace_cli import run_domain_search
+    from ace_prefetch import lookup
+    # v6.5.0: a prefetched domain-level result saves the inline search
+    result = lookup(query, domain, org=org_id, project=project_id, cache_info=cache_info)
+    if result is None:
+        result = run_domain_search(query, domain, org=org_id, project=project_id, cache_info=cache_info)
+    try:
+        count = json.loads(result).get('count') or 0
+    except (ValueError, AttributeError):
+        count = 0
+    return result, count if isinstance(count, int) else 0
+
+
+# ── handlers ─────────────────────────────────────────────────────────────
+
+@handler('PostToolUse')
+def handle_posttooluse(event: dict, args: list) -> int:
+    if is_ace_disabled(event) or not cli_available():
+        return 0
+
+    working_dir = enter_working_dir(event)
+    tool_name = jq_alt(event, 'tool_name')
+    tool_use_id = jq_alt(event, 'tool_use_id')
+    session_id = jq_alt(event, 'session_id')
+    if not session_id or not tool_name or not tool_use_id:
+        return 0
+
+    # Async output first — accumulation is a fire-and-forget side effect
+    emit({'async': True})
+
+    if os.environ.get('ACE_EVENT_LOGGING', '0') == '1' and '--no-log' not in args:
+        log_hook_event('PostToolUse', event, 'start')
+
+    if not working_dir:
+        print("[ACE WARN] No WORKING_DIR from hook event — using accumulator's default cwd",
+              file=sys.stderr)
+
+    from ace_tool_accumulator import append_tool
+    tool_input = jq_alt(event, 'tool_input')
+    tool_response = jq_alt(event, 'tool_response')
+    ok = append_tool(
+        session_id=str(session_id),
+        tool_name=str(tool_name),
+        tool_input=tool_input if tool_input is not None else {},
+        tool_response=tool_response if tool_response is not None else {},
+        tool_use_id=str(tool_use_id),
+        agent_id=jq_alt(event, 'agent_id') or None,
+        working_dir=working_dir or None,
+    )
+    if os.environ.get('ACE_DEBUG_HOOKS', '0') == '1':
+        with open('/tmp/ace_hook_debug.log', 'a') as f:
+            f.write(f"[PostToolUse] Appended: {tool_name} ({tool_use_id}) -> {{\"success\": {str(ok).lower()}}}\n")
+    return 0
+
+
+def deliver_swr_update(event: dict) -> bool:
+    """v6.5.0: Inject fresh patterns that a stale UserPromptSubmit injection missed."""
+    import ace_swr
+    session_id = jq_alt(event, 'session_id')
+    if not session_id or not ace_swr.get_update_path(str(session_id)).exists():
+        return False
+    _, project_id = settings_ids(read_json_file('.claude/settings.json'))
+    update = ace_swr.take_update(str(session_id), 'pretooluse', project_id)
+    if not update:
+        return False
+    emit({
+        'systemMessage': f"🔄 [ACE] Refreshed patterns: {update['count']} new since the cached injection.",
+        'hookSpecificOutput': {
+            'hookEventName': 'PreToolUse',
+            'additionalContext': ace_swr.format_update(update),
+        },
+    })
+    return True
+
+
+@handler('PreToolUse')
+def handle_pretooluse(event: dict, args: list) -> int:
+    if is_ace_disabled(event):
+        return 0
+    if (os.environ.get('ACE_SEARCH_SWR') == '1' or
+            os.environ.get('ACE_SEARCH_MODE', '').strip().lower() == 'hybrid') and \
+            deliver_swr_update(event):
+        return 0
+    if not cli_available():
+        return 0
+
+    if jq_alt(event, 'tool_name') not in DOMAIN_SEARCH_TOOLS:
+        return 0
+    file_path = jq_alt(event.get('tool_input') or {}, 'file_path', 'path', 'pattern')
+    if not file_path:
+        return 0
+    file_path = str(file_path)
+
+    org_id, project_id = settings_ids(read_json_file('.claude/settings.json'))
+    if not project_id:
+        return 0
+
+    matched = first_matching_domain(load_domains(project_id), file_path)
+    if not matched:
+        return 0
+
+    domain_file = f'/tmp/ace-domain-{project_id}.txt'
+    try:
+        with open(domain_file, 'r') as f:
+            last_domain = f.read().strip().lower()
+    except OSError:
+        last_domain = ''
+    with open(domain_file, 'w') as f:
+        f.write(matched + '\n')
+
+    # Only act on a domain SHIFT (not first time or same domain)
+    if not last_domain or matched == last_domain:
+        return 0
+
+    if not org_id:
+        emit({'systemMessage': f"💡 [ACE] Domain shift: {last_domain} → {matched}. Consider: /ace:ace-search {matched}"})
+        return 0
+
+    basename = os.path.splitext(os.path.basename(file_path))[0]
+    query = f"{matched} {basename}" if basename else matched
+    cache_info = {}
+    result, count = search_domain(query, matched, org_id, project_id, cache_info)
+
+    from ace_relevance_logger import log_domain_shift
+    log_domain_shift(
+        session_id=str(jq_alt(event, 'session_id') or 'unknown'),
+        from_domain=last_domain,
+        to_domain=matched,
+        file_path=file_path,
+        patterns_found=count,
+        search_succeeded=bool(count and result),
+        project_id=project_id,
+        search_cache=cache_info.get('status'),
+    )
+
+    if count and result:
+        emit({
+            'systemMessage': f"🔄 [ACE] Domain shift: {last_domain} → {matched}. Auto-loaded {count} patterns.",
+            'hookSpecificOutput': {
+                'hookEventName': 'PreToolUse',
+                'additionalContext': f'<ace-patterns-domain-shift domain="{matched}">\n{result.rstrip()}\n</ace-patterns-domain-shift>',
+            },
+        })
+    else:
+        emit({'systemMessage': f"💡 [ACE] Domain shift: {last_domain} → {matched}. Consider: /ace:ace-search {matched}"})
+    return 0
+
+
+# Pattern fields kept in injected context (same as ace_before_task spec-05)
+INJECTED_PATTERN_FIELDS = {'id', 'domain', 'content', 'confidence', 'helpful', 'harmful', 'section', 'evidence'}
+
+
+@handler('PostToolUseRead')
+def handle_posttooluse_read(event: dict, args: list) -> int:
+    """
+    v6.5.0: PostToolUse(Read) domain injection (ace_posttooluse_domain_inject.sh).
+
+    The search goes through run_domain_search(), so it shares the search
+    cache, prefetch and the hookd/window coalescing with the PreToolUse and
+    CwdChanged searches of the same burst instead of forking its own ace-cli.
+    """
+    if is_ace_disabled(event) or not cli_available():
+        return 0
+    file_path = jq_alt(event.get('tool_input') or {}, 'file_path')
+    if not file_path:
+        return 0
+    file_path = str(file_path)
+
+    enter_working_dir(event)
+    org_id, project_id = settings_ids(read_json_file('.claude/settings.json'))
+    if not project_id:
+        return 0
+    matched = first_matching_domain(load_domains(project_id), file_path)
+    if not matched:
+        return 0
+
+    # Any change from the last domain (PreToolUse shares the file)
+    domain_file = f'/tmp/ace-domain-{project_id}.txt'
+    try:
+        with open(domain_file, 'r') as f:
+            last_domain = f.read().strip().lower()
+    except OSError:
+        last_domain = ''
+    if matched == last_domain:
+        return 0
+    with open(domain_file, 'w') as f:
+        f.write(matched + '\n')
+
+    basename = os.path.splitext(os.path.basename(file_path))[0]
+    result, _ = search_domain(f"{matched} {basename}" if basename else matched,
+                              matched, org_id, project_id)
+    try:
+        response = json.loads(result)
+        patterns = response.get('similar_patterns')
+    except (ValueError, TypeError, AttributeError):
+        return 0
+    if not isinstance(patterns, list) or not patterns:
+        return 0
+
+    response['similar_patterns'] = [
+        {k: v for k, v in p.items() if k in INJECTED_PATTERN_FIELDS}
+        for p in patterns if isinstance(p, dict)
+    ]
+    emit({
+        'hookSpecificOutput': {
+            'hookEventName': 'PostToolUse',
+            'additionalContext': (f'<ace-patterns-domain-shift domain="{matched}">'
+                                  f'{json.dumps(response)}</ace-patterns-domain-shift>'),
+        },
+    })
+    return 0
+
+
+@handler('CwdChanged')
+def handle_cwdchanged(event: dict, args: list) -> int:
+    session_id = str(jq_alt(event, 'session_id') or '')
+    old_cwd = str(jq_alt(event, 'old_cwd') or '')
+    new_cwd = str(jq_alt(event, 'new_cwd') or '')
+
+    if is_ace_disabled(event):
+        return 0
+    if not new_cwd or old_cwd == new_cwd:
+        return 0
+    if not cli_available():
+        return 0
+
+    org_id, project_id = None, None
+    for directory in (new_cwd, old_cwd):
+        if not directory:
+            continue
+        settings = read_json_file(os.path.join(directory, '.claude/settings.json'))
+        if settings is None:
+            continue
+        if org_id is None:
+            org_id = settings_ids(settings)[0] or ''
+        project_id = settings_ids(settings)[1]
+        if project_id:
+            break
+    if not project_id:
+        return 0
+
+    matched = first_matching_domain(load_domains(project_id), new_cwd)
+    if not matched:
+        return 0
+
+    domain_file = f'/tmp/ace-domain-{project_id}.txt'
+    try:
+        with open(domain_file, 'r') as f:
+            last_domain = f.read().strip()
+    except OSError:
+        last_domain = ''
+    if matched == last_domain:
+        return 0
+    with open(domain_file, 'w') as f:
+        f.write(matched + '\n')
+
+    events_log = os.path.join(LOG_DIR, 'ace-search-events.jsonl')
+    append_jsonl(events_log, {
+        'timestamp': utc_timestamp(),
+        'event': 'domain_shift',
+        'hook': 'CwdChanged',
+        'session_id': session_id,
+        'project_id': project_id,
+        'from_domain': last_domain or 'none',
+        'to_domain': matched,
+        'old_cwd': old_cwd,
+        'new_cwd': new_cwd,
+    })
+
+    if org_id:
+        dir_basename = os.path.basename(new_cwd.rstrip('/'))
+        query = matched
+        if dir_basename and dir_basename != matched:
+            query = f"{matched} {dir_basename}"
+        cache_info = {}
+        result, count = search_domain(query, matched, org_id, project_id, cache_info)
+        if count and result:
+            append_jsonl(events_log, {
+                'timestamp': utc_timestamp(),
+                'event': 'domain_search',
+                'hook': 'CwdChanged',
+                'session_id': session_id,
+                'project_id': project_id,
+                'domain': matched,
+                'count': count,
+                'search_cache': cache_info.get('status'),
+            })
+
+    # CwdChanged output: hookEventName + optional watchPaths only
+    emit({'hookEventName': 'CwdChanged'})
+    return 0
+
+
+@handler('UserPromptSubmit')
+def handle_userpromptsubmit(event: dict, args: list) -> int:
+    enter_working_dir(event)
+    import ace_before_task
+    exit_code, output = run_hook_main(ace_before_task, event)
+    if output:
+        sys.stdout.write(output)
+        sys.stdout.flush()
+    return exit_code
+
+
+@handler('AfterTask')
+def handle_after_task(event: dict, args: list) -> int:
+    """Plain ace_after_task.py run (used by the Stop hook's background learning)."""
+    enter_working_dir(event)
+    import ace_after_task
+    exit_code, output = run_hook_main(ace_after_task, event)
+    if output:
+        sys.stdout.write(output)
+        sys.stdout.flush()
+    return exit_code
+
+
+def _parse_review(last_message: str):
+    """ACE_REVIEW: <pct> [... Nm saved] from the previous eval injection."""
+    if 'ACE_REVIEW:' not in last_message:
+        return None
+    pct = re.search(r'ACE_REVIEW:\s*([0-9]+)', last_message)
+    saved = re.search(r'[0-9]+m[0-9]*s? saved|[0-9]+s saved|[0-9]+ ?min', last_message)
+    return {
+        'helpful_pct': int(pct.group(1)) if pct else 0,
+        'time_saved': saved.group(0).replace(' saved', '') if saved else '',
+    }
+
+
+def _task_relevance_metrics(relevance_file: str) -> dict:
+    """Search metrics since the last `execution` entry (the current task)."""
+    # v6.5.0: Running sums kept by ACERelevanceLogger in ace-task-state.json
+    from ace_relevance_logger import read_task_state
+    state = read_task_state(os.path.dirname(relevance_file) or '.')
+    return {
+        'patterns_injected': state['patterns_injected'],
+        'avg_relevance': state['avg_relevance'],
+        'domains': state['domains_count'],
+        'tools_executed': 0,  # an `execution` entry ends the task it reports on
+    }
+
+
+def _start_background_learning(event: dict) -> None:
+    """
+    Fork a detached child that runs ace_after_task (ACE_ASYNC_LEARNING=1).
+
+    The child inherits this process's warm imports; failures are written to
+    ~/.claude/logs/ace-background-*.log like the bash version did.
+    """
+    log_dir = Path.home() / '.claude' / 'logs'
+    log_dir.mkdir(parents=True, exist_ok=True)
+    log_file = log_dir / f"ace-background-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.log"
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    if os.fork():
+        return
+
+    try:
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        import ace_after_task
+        exit_code, output = run_hook_main(ace_after_task, event)
+        if exit_code != 0:
+            with open(log_file, 'a') as f:
+                f.write(f"[ERROR] Background learning failed with exit code {exit_code}\n")
+                f.write(output)
+    finally:
+        os._exit(0)
+
+
+def _save_transcript_copy(event: dict, prefix: str) -> None:
+    transcript_path = jq_alt(event, 'transcript_path')
+    if transcript_path and os.path.isfile(transcript_path):
+        target = os.path.join(LOG_DIR, f"{prefix}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+        try:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            shutil.copyfile(transcript_path, target)
+        except OSError:
+            print("[WARN] Failed to save chat transcript", file=sys.stderr)
+
+
+@handler('Stop')
+def handle_stop(event: dict, args: list) -> int:
+    # Skip continuation stops (CC fires multiple Stops per session with subagents)
+    if jq_alt(event, 'stop_hook_active') is True:
+        emit({'continue': True, 'systemMessage': '[ACE] Skipped continuation stop'})
+        return 0
+    if is_ace_disabled(event) or not cli_available():
+        return 0
+
+    enable_log = '--no-log' not in args
+    global_config = Path(os.environ.get('XDG_CONFIG_HOME') or Path.home() / '.config') / 'ace' / 'config.json'
+    if not global_config.is_file():
+        return 0  # No global config - skip learning capture gracefully
+
+    enter_working_dir(event)
+    event_logging = os.environ.get('ACE_EVENT_LOGGING', '0') == '1'
+    if event_logging and enable_log:
+        log_hook_event('Stop', event, 'start')
+
+    start_time = time.time()
+    event = dict(event, hook_event_name='Stop')
+
+    eval_request_file = os.path.join(LOG_DIR, 'ace-eval-request.json')
+    review_file = os.path.join(LOG_DIR, 'ace-review-result.json')
+    relevance_file = os.path.join(LOG_DIR, 'ace-relevance.jsonl')
+
+    review = _parse_review(str(jq_alt(event, 'last_assistant_message') or ''))
+    if review is not None:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        with open(review_file, 'w') as f:
+            json.dump(review, f)
+
+    if os.environ.get('ACE_ASYNC_LEARNING', '1') == '1':
+        _start_background_learning(event)
+        result = '{"continue": true, "systemMessage": "✅ [ACE] Learning started in background"}'
+        exit_code = 0
+    else:
+        import ace_after_task
+        exit_code, result = run_hook_main(ace_after_task, event)
+    execution_time_ms = int((time.time() - start_time) * 1000)
+
+    if event_logging and enable_log:
+        log_hook_event('Stop', result, 'end', exit_code=exit_code, execution_time_ms=execution_time_ms)
+    if event_logging and '--chat' in args:
+        _save_transcript_copy(event, 'ace-chat')
+    if '--notify' in args and exit_code == 0:
+        print("✅ ACE learning captured", file=sys.stderr)
+
+    # Write eval request for next UserPromptSubmit (fire-and-forget)
+    if os.path.isfile(relevance_file):
+        metrics = _task_relevance_metrics(relevance_file)
+        if metrics.get('patterns_injected', 0) > 0:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            with open(eval_request_file, 'w') as f:
+                json.dump(dict(metrics, success=True, timestamp=utc_timestamp()), f)
+
+    if os.path.isfile(review_file):
+        review = read_json_file(review_file) or {}
+        message = f"✅ [ACE] {review.get('helpful_pct') or 0}% helpful"
+        if review.get('time_saved'):
+            message += f" | ~{review['time_saved']} saved"
+        message += " | Learning in background"
+        emit({'continue': True, 'systemMessage': message})
+    elif result:
+        emit(result)
+    return exit_code
+
+
+@handler('SubagentStop')
+def handle_subagent_stop(event: dict, args: list) -> int:
+    if is_ace_disabled(event) or not cli_available():
+        return 0
+
+    enable_log = '--no-log' not in args
+    enter_working_dir(event)
+
+    # Record subagent completion for parent-child attribution tracking.
+    # ace_after_task.py looks the spawn registry up to resolve parent_agent_id;
+    # if the registry write fails the legacy spawn log is imported instead.
+    child_agent_id = jq_alt(event, 'agent_id')
+    child_session_id = jq_alt(event, 'session_id')
+    if child_agent_id and child_session_id:
+        from ace_tool_accumulator import register_spawn
+        if not register_spawn(str(child_agent_id), str(child_session_id), 'main'):
+            append_jsonl(os.path.join(LOG_DIR, 'ace-spawn-log.jsonl'), {
+                'timestamp': utc_timestamp(),
+                'event': 'subagent_done',
+                'session_id': child_session_id,
+                'child_agent_id': child_agent_id,
+                'parent_agent_id': 'main',
+            })
+
+    if enable_log:
+        log_hook_event('SubagentStop', event, 'start')
+
+    start_time = time.time()
+    event = dict(event, hook_event_name='SubagentStop')
+    import ace_after_task
+    exit_code, result = run_hook_main(ace_after_task, event)
+    execution_time_ms = int((time.time() - start_time) * 1000)
+
+    if enable_log:
+        log_hook_event('SubagentStop', result, 'end', exit_code=exit_code, execution_time_ms=execution_time_ms)
+    if os.environ.get('ACE_EVENT_LOGGING', '0') == '1' and '--chat' in args:
+        _save_transcript_copy(event, f"ace-subagent-{jq_alt(event, 'subagent_type') or 'unknown'}")
+    if '--notify' in args and exit_code == 0:
+        print(f"✅ ACE learning captured from {jq_alt(event, 'subagent_type') or 'Task'} agent", file=sys.stderr)
+
+    if result:
+        emit(result)
+    return exit_code
+
+
+# ── entry point ──────────────────────────────────────────────────────────
+
+def dispatch(event_name: str, raw: bytes, args: list = None) -> int:
+    """Parse once and route to the registered handler. Never raises."""
+    fn = HANDLERS.get(event_name)
+    if fn is None:
+        return 0
+    from ace_jsonl_writer import buffering
+    try:
+        # Log records are written once per file when the handler returns
+        with buffering():
+            return fn(parse_event(raw), list(args or []))
+    except Exception as e:
+        print(f"[ERROR] ACE hook failed: {event_name}: {e}", file=sys.stderr)
+        return 0
+
+
+def main() -> int:
+    if len(sys.argv) < 2:
+        print("Usage: ace_hook.py <EventName> [args...]", file=sys.stderr)
+        return 0
+
+    event_name, args = sys.argv[1], sys.argv[2:]
+    raw = sys.stdin.buffer.read()
+
+    if os.environ.get('ACE_HOOKD', '0') == '1':
+        from ace_hookd_client import request, spawn_daemon, DAEMON_DOWN
+        reply = request(event_name, raw, args=args)
+        if reply == DAEMON_DOWN and os.environ.get('ACE_HOOKD_AUTOSTART', '1') == '1':
+            spawn_daemon()
+        elif reply is not None and reply != DAEMON_DOWN:
+            exit_code, payload = reply
+            sys.stdout.buffer.write(payload)
+            sys.stdout.flush()
+            return exit_code
+
+    return dispatch(event_name, raw, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,661 @@
+#!/usr/bin/env python3
+"""
+ACE Hook Daemon (ace-hookd) - Warm, per-user hook server.
+
+Opt-in (ACE_HOOKD=1). Every hook event otherwise forks bash, several jq
+processes and a fresh python3 that re-imports ace_cli / ace_context /
+ace_relevance_logger and re-opens SQLite. With PreToolUse and PostToolUse
+firing on every tool call that start-up cost dominates hook latency.
+
+The daemon keeps, for its whole lifetime:
+- Warm imports of the hook modules (forked handlers inherit them)
+- One open ace-tools.db connection per project
+- Parsed .claude/settings.json contexts and /tmp/ace-domains-*.json caches
+  (re-read only when the file's mtime/size changes)
+
+Wrappers talk to it through ace_hookd_client.py (scripts/lib/ace_hookd.sh)
+and fall back to the regular hook path whenever the daemon is down or
+declines an event.
+
+Wire protocol (one request per connection):
+    request:  <header JSON>\\n<raw hook event bytes>
+              header = {"v": 2, "event": ..., "args": [...], "cwd": ..., "env": {...},
+                        "length": <event byte count>}
+    response: {"status": "ok", "exit_code": N}\\n<stdout bytes>
+              {"status": "pass"}\\n   (caller falls back to the legacy path)
+
+Handlers:
+    PostToolUse       inline  - accumulator append over the warm connection
+                      (forked when the client's ACE_ACCUMULATOR_* differ)
+    PreToolUse        inline  - domain tracking; real domain shifts are forked
+    SearchBatch       held for ACE_SEARCH_COALESCE_MS, then every request that
+                      arrived in the window (per org/project/env) is answered
+                      by one forked ace_cli.run_search_batch(); the reply body
+                      is a JSON list of raw search results
+    every other event registered in ace_hook.HANDLERS runs forked (the child
+    inherits the warm imports and runs ace_hook.dispatch()); unknown events
+    get "pass".
+
+Inline handlers run under the client's forwarded env (restored afterwards);
+forked children apply it for good.
+
+Usage:
+    python3 ace_hookd.py serve     # run in foreground
+    python3 ace_hookd.py start     # start detached (no-op if running)
+    python3 ace_hookd.py stop
+    python3 ace_hookd.py status
+"""
+
+import argparse
+import importlib
+import io
+import json
+import os
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent / 'utils'))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'utils'))
+
+from ace_hookd_client import (
+    PROTOCOL_VERSION, FORWARDED_ENV_PREFIXES, FORWARDED_ENV_KEYS,
+    get_socket_dir, get_socket_path, request, spawn_daemon,
+)
+from ace_hook import (
+    DOMAIN_SEARCH_TOOLS, cli_available, first_matching_domain, is_ace_disabled,
+    jq_alt, load_domains, parse_event, resolve_working_dir,
+    settings_ids,
+)
+import ace_hook
+
+DEFAULT_IDLE_SECS = 1800
+READ_TIMEOUT_SECS = 5.0
+SEARCH_COALESCE_MS = int(os.environ.get('ACE_SEARCH_COALESCE_MS', '20'))
+SEARCH_BATCH_MAX = 16
+
+# Warm modules that read these env vars once, at import time. A client whose
+# values differ from the daemon's (per-project .claude/settings.json env) is
+# served by a forked child that re-imports the module under its env.
+IMPORT_TIME_ENV = {
+    'ace_tool_accumulator': ('ACE_ACCUMULATOR_', 'ACE_SPAWN_REGISTRY_'),
+}
+
+
+def _log_debug(message: str) -> None:
+    if os.environ.get('ACE_DEBUG_HOOKS') == '1':
+        try:
+            with open('/tmp/ace_hook_debug.log', 'a') as f:
+                f.write(f"[ace-hookd] {message}\n")
+        except Exception:
+            pass
+
+
+class FileCache:
+    """JSON file cache invalidated by (mtime_ns, size)."""
+
+    def __init__(self):
+        self._entries = {}
+
+    def load(self, path: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._entries.pop(path, None)
+            return None
+        cached = self._entries.get(path)
+        if cached and cached[0] == (st.st_mtime_ns, st.st_size):
+            return cached[1]
+        try:
+            with open(path, 'r') as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            value = None
+        self._entries[path] = ((st.st_mtime_ns, st.st_size), value)
+        return value
+
+
+class HookDaemon:
+    """
+    Single-threaded select loop; slow handlers run in forked children.
+
+    Requests are read without blocking: each connection buffers until its
+    header and `length` body bytes arrived, so a stalled client only holds
+    its own slot (dropped after READ_TIMEOUT_SECS), never the loop.
+    """
+
+    def __init__(self, socket_path: str, idle_secs: int = DEFAULT_IDLE_SECS):
+        self.socket_path = socket_path
+        self.pid_path = socket_path[:-len('.sock')] + '.pid'
+        self.idle_secs = idle_secs
+        self.files = FileCache()
+        self.connections = {}
+        self.inline_handlers = {
+            'Ping': self.handle_ping,
+            'PostToolUse': self.handle_posttooluse,
+            'PreToolUse': self.handle_pretooluse,
+        }
+        self.base_env = dict(os.environ)
+        self.reading = {}  # conn -> [buffer, read deadline]
+        self.pending_searches = []  # [(conn, header, request)] within the window
+        self.search_deadline = None
+        self._running = False
+
+    # ── lifecycle ────────────────────────────────────────────────────────
+
+    def warm_imports(self) -> None:
+        """Import hook modules once so every forked handler starts warm."""
+        for module_name in ('ace_tool_accumulator', 'ace_cli', 'ace_context', 'ace_relevance_logger',
+                            'ace_event_logger', 'ace_before_task', 'ace_after_task'):
+            try:
+                __import__(module_name)
+            except Exception as e:
+                _log_debug(f"warm import of {module_name} failed: {e}")
+
+    def serve(self) -> int:
+        socket_dir = os.path.dirname(self.socket_path)
+        os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+        os.chmod(socket_dir, 0o700)
+
+        if request('Ping', b'', socket_path=self.socket_path, timeout=1.0) not in (None, 'down'):
+            return 0  # Another daemon already owns this socket
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+        self.warm_imports()
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        server.listen(64)
+        with open(self.pid_path, 'w') as f:
+            f.write(str(os.getpid()))
+
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # auto-reap forked handlers
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        # Self-pipe so a stop signal wakes select() immediately
+        wake_r, wake_w = os.pipe()
+        os.set_blocking(wake_w, False)
+        signal.set_wakeup_fd(wake_w)
+
+        self._running = True
+        last_activity = time.monotonic()
+        try:
+            while self._running:
+                wait = min(60, self.idle_secs)
+                deadlines = [d for _, d in self.reading.values()]
+                if self.search_deadline is not None:
+                    deadlines.append(self.search_deadline)
+                if deadlines:
+                    wait = max(0.0, min(wait, min(deadlines) - time.monotonic()))
+                try:
+                    ready, _, _ = select.select([server, wake_r, *self.reading], [], [], wait)
+                except InterruptedError:
+                    continue
+                now = time.monotonic()
+                if self.search_deadline is not None and now >= self.search_deadline:
+                    self._flush_searches()
+                self._expire_reads(now)
+                if wake_r in ready:
+                    os.read(wake_r, 512)
+                    continue
+                if not ready:
+                    if not self.reading and now - last_activity >= self.idle_secs:
+                        break
+                    continue
+                last_activity = now
+                for conn in ready:
+                    if conn is server:
+                        self._accept(server)
+                    elif conn in self.reading:
+                        self._read_ready(conn)
+        finally:
+            self._flush_searches()
+            for conn in list(self.reading):
+                conn.close()
+            signal.set_wakeup_fd(-1)
+            server.close()
+            for path in (self.socket_path, self.pid_path):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            for db in self.connections.values():
+                try:
+                    db[1].close()
+                except Exception:
+                    pass
+        return 0
+
+    def _stop(self, signum, frame) -> None:
+        self._running = False
+
+    # ── connection handling ──────────────────────────────────────────────
+
+    def _accept(self, server: socket.socket) -> None:
+        try:
+            conn, _ = server.accept()
+        except OSError:
+            return
+        conn.setblocking(False)
+        self.reading[conn] = [bytearray(), time.monotonic() + READ_TIMEOUT_SECS]
+
+    def _expire_reads(self, now: float) -> None:
+        for conn, (_, deadline) in list(self.reading.items()):
+            if now >= deadline:
+                _log_debug("dropping a client that stalled mid-request")
+                del self.reading[conn]
+                conn.close()
+
+    def _read_ready(self, conn: socket.socket) -> None:
+        """Buffer what the client sent; dispatch once the request is complete."""
+        buffer = self.reading[conn][0]
+        try:
+            chunk = conn.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            chunk = None
+        if chunk:
+            buffer += chunk
+        request_frame = _complete_request(buffer, eof=not chunk)
+        if request_frame is None:
+            if chunk:
+                return
+            del self.reading[conn]  # closed before a full request
+            conn.close()
+            return
+        del self.reading[conn]
+        conn.setblocking(True)
+        try:
+            self.handle_request(conn, *request_frame)
+        except Exception as e:
+            _log_debug(f"connection error: {e}")
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def handle_request(self, conn: socket.socket, header: dict, body: bytes) -> None:
+        event_name = header.get('event')
+        if header.get('v') != PROTOCOL_VERSION:
+            event_name = None
+
+        if event_name == 'SearchBatch':
+            self._queue_search(conn, header, body)
+            return
+
+        env = header.get('env') or {}
+        if event_name in self.inline_handlers and not self._stale_modules(env):
+            self._apply_env(env)
+            try:
+                result = self._run_inline(event_name, header, body)
+                if result is not None:
+                    exit_code, output, after = result
+                    self._reply(conn, exit_code, output)
+                    if after:
+                        try:
+                            after()
+                        except Exception as e:
+                            _log_debug(f"{event_name} deferred work failed: {e}")
+                    return
+            finally:
+                os.environ.clear()
+                os.environ.update(self.base_env)
+
+        # Slow path (or inline handler declined): full handler in a warm child
+        if event_name in ace_hook.HANDLERS:
+            self._run_forked(conn, header, body)
+            return
+
+        self._reply_pass(conn)
+
+    def _reply(self, conn: socket.socket, exit_code: int, output: bytes) -> None:
+        try:
+            conn.settimeout(None)
+            header = json.dumps({'status': 'ok', 'exit_code': exit_code}).encode('utf-8')
+            conn.sendall(header + b'\n' + (output or b''))
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def _reply_pass(self, conn: socket.socket) -> None:
+        try:
+            conn.sendall(b'{"status": "pass"}\n')
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def _run_inline(self, event_name: str, header: dict, body: bytes):
+        cwd = header.get('cwd')
+        try:
+            if cwd:
+                os.chdir(cwd)
+            return self.inline_handlers[event_name](header, body)
+        except Exception as e:
+            _log_debug(f"{event_name} inline handler failed: {e}")
+            return None
+
+    def _run_forked(self, conn: socket.socket, header: dict, body: bytes) -> None:
+        # Warm the parent's settings cache so every child inherits it parsed
+        try:
+            from ace_context import get_context
+            get_context(header.get('cwd'))
+        except Exception:
+            pass
+
+        pid = os.fork()
+        if pid:
+            conn.close()
+            return
+
+        # Child: become the one-shot hook process, then exit without cleanup
+        exit_code = 0
+        stdout = io.StringIO()
+        try:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)  # handlers use subprocess.run
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.set_wakeup_fd(-1)
+            self._apply_env(header.get('env') or {})
+            self._reload_stale_modules(header.get('env') or {})
+            if header.get('cwd'):
+                os.chdir(header['cwd'])
+            sys.stdout = stdout
+            try:
+                exit_code = ace_hook.dispatch(header['event'], body, header.get('args') or [])
+            except Exception:
+                traceback.print_exc()
+            sys.stdout = sys.__stdout__
+            self._reply(conn, exit_code, stdout.getvalue().encode('utf-8'))
+        finally:
+            os._exit(0)
+
+    # ── search coalescing ────────────────────────────────────────────────
+
+    def _queue_search(self, conn: socket.socket, header: dict, body: bytes) -> None:
+        try:
+            search = json.loads(body)
+            queries = search['queries']
+        except (ValueError, KeyError, TypeError):
+            self._reply_pass(conn)
+            return
+        if not isinstance(queries, list) or not queries:
+            self._reply_pass(conn)
+            return
+        self.pending_searches.append((conn, header, search))
+        if self.search_deadline is None:
+            self.search_deadline = time.monotonic() + SEARCH_COALESCE_MS / 1000.0
+        if sum(len(s['queries']) for _, _, s in self.pending_searches) >= SEARCH_BATCH_MAX:
+            self._flush_searches()
+
+    def _flush_searches(self) -> None:
+        """Answer every queued SearchBatch, one forked batch per org/project/env."""
+        pending, self.pending_searches = self.pending_searches, []
+        self.search_deadline = None
+        groups = {}
+        for conn, header, search in pending:
+            key = (search.get('org'), search.get('project'),
+                   json.dumps(header.get('env') or {}, sort_keys=True))
+            groups.setdefault(key, []).append((conn, header, search))
+        for (org, project, _), members in groups.items():
+            _log_debug(f"SearchBatch: {len(members)} request(s) coalesced for {project}")
+            self._run_search_batch(org, project, members)
+
+    def _run_search_batch(self, org: str, project: str, members: list) -> None:
+        pid = os.fork()
+        if pid:
+            for conn, _, _ in members:
+                conn.close()
+            return
+
+        try:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.set_wakeup_fd(-1)
+            header = members[0][1]
+            self._apply_env(header.get('env') or {})
+            if header.get('cwd'):
+                os.chdir(header['cwd'])
+            queries = [q for _, _, search in members for q in search['queries']]
+            timeout = max(float(search.get('timeout') or 4.0) for _, _, search in members)
+            try:
+                from ace_cli import run_search_batch
+                texts = run_search_batch(queries, org, project, timeout=timeout, coalesce=False)
+            except Exception:
+                traceback.print_exc()
+                texts = [''] * len(queries)
+            offset = 0
+            for conn, _, search in members:
+                count = len(search['queries'])
+                self._reply(conn, 0, json.dumps(texts[offset:offset + count]).encode('utf-8'))
+                offset += count
+        finally:
+            os._exit(0)
+
+    def _stale_modules(self, env: dict) -> list:
+        """Loaded IMPORT_TIME_ENV modules whose import-time env differs from env's."""
+        stale = []
+        for module_name, prefixes in IMPORT_TIME_ENV.items():
+            if module_name not in sys.modules:
+                continue
+            ours = {k: v for k, v in self.base_env.items() if k.startswith(prefixes)}
+            theirs = {k: v for k, v in env.items() if k.startswith(prefixes)}
+            if ours != theirs:
+                stale.append(module_name)
+        return stale
+
+    def _reload_stale_modules(self, env: dict) -> None:
+        """In a forked child, after _apply_env(): re-read import-time settings."""
+        for module_name in self._stale_modules(env):
+            try:
+                importlib.reload(sys.modules[module_name])
+            except Exception as e:
+                _log_debug(f"reload of {module_name} failed: {e}")
+
+    @staticmethod
+    def _apply_env(env: dict) -> None:
+        for key in list(os.environ):
+            if (key.startswith(FORWARDED_ENV_PREFIXES) or key in FORWARDED_ENV_KEYS) and key not in env:
+                del os.environ[key]
+        os.environ.update(env)
+
+    # ── inline handlers ──────────────────────────────────────────────────
+    # Return (exit_code, stdout_bytes, deferred_callable), or None to run the
+    # full ace_hook handler in a forked child instead.
+
+    def handle_ping(self, header: dict, body: bytes):
+        return 0, json.dumps({'pid': os.getpid()}).encode('utf-8'), None
+
+    @staticmethod
+    def _skip(event: dict, env: dict) -> bool:
+        return is_ace_disabled(event, env) or not cli_available(env.get('PATH'))
+
+    def handle_posttooluse(self, header: dict, body: bytes):
+        env = header.get('env') or {}
+        if env.get('ACE_EVENT_LOGGING') == '1' and '--no-log' not in (header.get('args') or []):
+            return None  # Debug event logging: full handler
+
+        event = parse_event(body)
+        if self._skip(event, env):
+            return 0, b'', None
+        session_id = jq_alt(event, 'session_id')
+        tool_name = jq_alt(event, 'tool_name')
+        tool_use_id = jq_alt(event, 'tool_use_id')
+        if not session_id or not tool_name or not tool_use_id:
+            return 0, b'', None
+
+        working_dir = resolve_working_dir(event)
+        tool_input = jq_alt(event, 'tool_input')
+        tool_response = jq_alt(event, 'tool_response')
+
+        def append():
+            from ace_tool_accumulator import append_tool
+            conn = self._get_db(working_dir)
+            ok = append_tool(
+                session_id=str(session_id),
+                tool_name=str(tool_name),
+                tool_input=tool_input if tool_input is not None else {},
+                tool_response=tool_response if tool_response is not None else {},
+                tool_use_id=str(tool_use_id),
+                agent_id=jq_alt(event, 'agent_id') or None,
+                working_dir=working_dir or None,
+                conn=conn,
+            )
+            if not ok:
+                self._drop_db(working_dir)
+
+        return 0, b'{"async": true}\n', append
+
+    def handle_pretooluse(self, header: dict, body: bytes):
+        event = parse_event(body)
+        env = header.get('env') or {}
+        if self._skip(event, env):
+            return 0, b'', None
+        if env.get('ACE_SEARCH_SWR') == '1' and jq_alt(event, 'session_id'):
+            from ace_swr import get_update_path
+            if get_update_path(str(jq_alt(event, 'session_id'))).exists():
+                return None  # Pending stale-while-revalidate update: full handler injects it
+        if jq_alt(event, 'tool_name') not in DOMAIN_SEARCH_TOOLS:
+            return 0, b'', None
+        file_path = jq_alt(event.get('tool_input') or {}, 'file_path', 'path', 'pattern')
+        if not file_path:
+            return 0, b'', None
+
+        _, project_id = settings_ids(self.files.load(os.path.abspath('.claude/settings.json')))
+        if not project_id:
+            return 0, b'', None
+
+        matched = first_matching_domain(load_domains(project_id, loader=self.files.load), str(file_path))
+        if not matched:
+            return 0, b'', None
+
+        domain_file = f'/tmp/ace-domain-{project_id}.txt'
+        try:
+            with open(domain_file, 'r') as f:
+                last_domain = f.read().strip().lower()
+        except OSError:
+            last_domain = ''
+
+        if last_domain and matched != last_domain:
+            # Real domain shift: search + injection run in the full handler
+            # (which also records the new domain)
+            return None
+
+        with open(domain_file, 'w') as f:
+            f.write(matched + '\n')
+        return 0, b'', None
+
+    # ── warm SQLite connections ──────────────────────────────────────────
+
+    def _get_db(self, working_dir: str):
+        from ace_tool_accumulator import get_db_path, init_db
+        db_path = os.path.abspath(str(get_db_path(working_dir or None)))
+        cached = self.connections.get(db_path)
+        try:
+            st = os.stat(db_path)
+            identity = (st.st_dev, st.st_ino)
+        except OSError:
+            identity = None
+
+        if cached and identity and cached[0] == identity:
+            return cached[1]
+        if cached:
+            self._drop_db(working_dir)
+
+        conn = init_db(Path(db_path))
+        st = os.stat(db_path)
+        self.connections[db_path] = ((st.st_dev, st.st_ino), conn)
+        return conn
+
+    def _drop_db(self, working_dir: str) -> None:
+        from ace_tool_accumulator import get_db_path
+        db_path = os.path.abspath(str(get_db_path(working_dir or None)))
+        cached = self.connections.pop(db_path, None)
+        if cached:
+            try:
+                cached[1].close()
+            except Exception:
+                pass
+
+
+def _complete_request(buffer: bytearray, eof: bool = False):
+    """(header, body) once the header line and its `length` body bytes arrived, else None."""
+    newline = buffer.find(b'\n')
+    if newline < 0:
+        return ({}, b'') if eof and buffer else None
+    try:
+        header = json.loads(bytes(buffer[:newline]))
+    except ValueError:
+        return {}, b''
+    if not isinstance(header, dict):
+        return {}, b''
+    length = header.get('length')
+    body = bytes(buffer[newline + 1:])
+    if isinstance(length, int):
+        if len(body) < length:
+            return None
+        return header, body[:length]
+    return (header, body) if eof else None
+
+
+def _read_pid(socket_path: str):
+    try:
+        with open(socket_path[:-len('.sock')] + '.pid') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ACE hook daemon')
+    parser.add_argument('command', choices=['serve', 'start', 'stop', 'status'])
+    parser.add_argument('--socket', help='Socket path (default: per-user, per-plugin-root)')
+    args = parser.parse_args()
+
+    socket_path = args.socket or get_socket_path()
+
+    if args.command == 'serve':
+        idle_secs = int(os.environ.get('ACE_HOOKD_IDLE_SECS', DEFAULT_IDLE_SECS))
+        sys.exit(HookDaemon(socket_path, idle_secs=idle_secs).serve())
+
+    if args.command == 'start':
+        if request('Ping', b'', socket_path=socket_path, timeout=1.0) in (None, 'down'):
+            spawn_daemon()
+            for _ in range(40):
+                time.sleep(0.05)
+                if os.path.exists(socket_path):
+                    break
+        sys.exit(0)
+
+    if args.command == 'stop':
+        pid = _read_pid(socket_path)
+        if pid:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        sys.exit(0)
+
+    reply = request('Ping', b'', socket_path=socket_path, timeout=1.0)
+    running = reply not in (None, 'down')
+    print(json.dumps({
+        'running': running,
+        'socket': socket_path,
+        'socket_dir': get_socket_dir(),
+        'pid': _read_pid(socket_path) if running else None,
+    }, indent=2))
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
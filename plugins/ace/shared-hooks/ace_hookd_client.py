@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+ACE Hook Daemon Client - Thin stdlib-only client for ace-hookd.
+
+Forwards one raw hook event to the warm daemon (ace_hookd.py) over its
+per-user Unix socket and relays the handler's stdout + exit code.
+
+Deliberately imports nothing beyond the stdlib so interpreter start-up
+stays in the low milliseconds. All heavy lifting happens in the daemon.
+
+Exit codes:
+    <handler exit code>  Daemon handled the event (stdout already relayed)
+    75 (EX_TEMPFAIL)     Daemon down, unreachable or declined the event -
+                         caller must fall back to the regular hook path
+
+Usage:
+    echo "$INPUT_JSON" | python3 ace_hookd_client.py PostToolUse
+"""
+
+import hashlib
+import json
+import os
+import socket
+import sys
+
+PROTOCOL_VERSION = 2
+EXIT_FALLBACK = 75
+DAEMON_DOWN = 'down'
+
+# Env forwarded to the daemon so forked handlers see the hook's environment
+FORWARDED_ENV_PREFIXES = ('ACE_', 'CLAUDE_', 'XDG_')
+FORWARDED_ENV_KEYS = ('PATH', 'HOME')
+
+
+def get_plugin_root() -> str:
+    """Plugin root this client (and therefore its daemon) belongs to."""
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_socket_dir() -> str:
+    """Per-user socket directory (created 0700 by the daemon)."""
+    override = os.environ.get('ACE_HOOKD_DIR')
+    if override:
+        return override
+    base = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+    return os.path.join(base, f'ace-hookd-{os.getuid()}')
+
+
+def get_socket_path(plugin_root: str = None) -> str:
+    """
+    Socket path for a given plugin root.
+
+    Keyed by plugin root so a plugin update (new cache dir) never talks to
+    a daemon still running the previous version's code.
+    """
+    root = plugin_root or get_plugin_root()
+    digest = hashlib.sha1(root.encode('utf-8')).hexdigest()[:10]
+    return os.path.join(get_socket_dir(), f'hookd-{digest}.sock')
+
+
+def _forwarded_env() -> dict:
+    return {
+        k: v for k, v in os.environ.items()
+        if k.startswith(FORWARDED_ENV_PREFIXES) or k in FORWARDED_ENV_KEYS
+    }
+
+
+def request(event_name: str, body: bytes, args: list = None,
+            socket_path: str = None, timeout: float = None):
+    """
+    Send one event to the daemon.
+
+    Returns:
+        (exit_code, stdout_bytes) when the daemon handled the event,
+        None when the daemon declined or the exchange failed,
+        DAEMON_DOWN when nothing is listening on the socket.
+    """
+    path = socket_path or get_socket_path()
+    header = {
+        'v': PROTOCOL_VERSION,
+        'event': event_name,
+        'args': list(args or []),
+        'cwd': os.getcwd(),
+        'env': _forwarded_env(),
+        'length': len(body),
+    }
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(float(os.environ.get('ACE_HOOKD_CONNECT_TIMEOUT', '0.25')))
+        try:
+            sock.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return DAEMON_DOWN
+        sock.settimeout(timeout)
+        sock.sendall(json.dumps(header).encode('utf-8') + b'\n' + body)
+        sock.shutdown(socket.SHUT_WR)
+
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    except OSError:
+        return None
+    finally:
+        sock.close()
+
+    raw = b''.join(chunks)
+    head, sep, payload = raw.partition(b'\n')
+    if not sep:
+        return None
+    try:
+        reply = json.loads(head)
+    except ValueError:
+        return None
+    if reply.get('status') != 'ok':
+        return None
+    return int(reply.get('exit_code', 0)), payload
+
+
+def spawn_daemon() -> None:
+    """Start the daemon detached (best-effort, never blocks the hook)."""
+    import subprocess
+
+    daemon = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ace_hookd.py')
+    if not os.path.isfile(daemon):
+        return
+    try:
+        subprocess.Popen(
+            [sys.executable, daemon, 'serve'],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+            close_fds=True,
+        )
+    except OSError:
+        pass
+
+
+def main() -> int:
+    if len(sys.argv) < 2:
+        return EXIT_FALLBACK
+
+    event_name = sys.argv[1]
+    body = sys.stdin.buffer.read()
+
+    result = request(event_name, body, args=sys.argv[2:])
+    if result == DAEMON_DOWN:
+        if os.environ.get('ACE_HOOKD_AUTOSTART', '1') == '1':
+            spawn_daemon()
+        return EXIT_FALLBACK
+    if result is None:
+        return EXIT_FALLBACK
+
+    exit_code, payload = result
+    if payload:
+        sys.stdout.buffer.write(payload)
+        sys.stdout.buffer.flush()
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
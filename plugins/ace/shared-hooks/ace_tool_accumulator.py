@@ -6,8 +6,11 @@ v5.3.0: PostToolUse Accumulation Architecture
 
 This module provides GROUND TRUTH tool execution data by:
 1. PostToolUse hook calls `append_tool()` after EVERY tool call
-2. Stop hook calls `get_session_tools()` to build trajectory
+2. Stop hook calls `get_session_trajectory()` to build trajectory
+   (v6.5.0: summaries are precomputed by `append_tool()`)
 3. Stop hook calls `clear_session()` to cleanup after processing
+4. SubagentStop calls `register_spawn()` / `get_spawn_parent()` to resolve
+   parent_agent_id (v6.5.0: spawn_registry table, was ace-spawn-log.jsonl)
 
 Per ACE Research Paper (arXiv:2510.04618v1):
 - Page 5: "Generator produces reasoning trajectories"
@@ -18,11 +21,62 @@ This replaces unreliable transcript parsing with direct tool data from Claude Co
 """
 
 import sqlite3
+import fcntl
+import hashlib
 import json
+import os
+import random
+import re
+import struct
 import sys
+import time
 import argparse
+import zlib
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
+
+sys.path.insert(0, str(Path(__file__).parent / 'utils'))
+from ace_tool_summary import project_tool_payload, summarize_tool
+
+# v6.5.0: Versioned schema (PRAGMA user_version). Bump SCHEMA_VERSION and
+# append to MIGRATIONS for every schema change; init_db() only touches the
+# schema when the file's user_version is behind.
+SCHEMA_VERSION = 6
+
+# Lock handling: parallel subagents write PostToolUse rows concurrently.
+BUSY_TIMEOUT_MS = int(os.environ.get('ACE_ACCUMULATOR_BUSY_TIMEOUT_MS', '5000'))
+LOCK_RETRIES = int(os.environ.get('ACE_ACCUMULATOR_LOCK_RETRIES', '5'))
+LOCK_RETRY_BASE_SECS = 0.02
+
+# Payload capture (v6.5.0): rows keep a per-tool projection of input/response
+# (see ace_tool_summary.INPUT_FIELDS / RESPONSE_FIELDS), string fields capped
+# at FIELD_CAP_CHARS, plus the full response's sha256 and byte length. Full
+# payloads are only kept (zlib, tool_payloads table) when KEEP_PAYLOADS is on.
+PROJECTION_ENABLED = os.environ.get('ACE_ACCUMULATOR_PROJECTION', '1') == '1'
+FIELD_CAP_CHARS = int(os.environ.get('ACE_ACCUMULATOR_FIELD_CAP', '2000'))
+KEEP_PAYLOADS = os.environ.get('ACE_ACCUMULATOR_KEEP_PAYLOADS', '0') == '1'
+MAX_PAYLOAD_BYTES = int(os.environ.get('ACE_ACCUMULATOR_MAX_PAYLOAD_BYTES', str(1024 * 1024)))
+
+# Retention (v6.5.0): rows of sessions that never reached Stop are purged by
+# prune_db() (SessionEnd) once older than MAX_AGE_HOURS, or oldest-first while
+# the database holds more than MAX_DB_MB of live pages. 0 disables a limit.
+# The size cap only takes stale sessions (no row for ACTIVE_SESSION_MINUTES),
+# never the calling session: live trajectories are not truncated before Stop.
+MAX_AGE_HOURS = float(os.environ.get('ACE_ACCUMULATOR_MAX_AGE_HOURS', '24'))
+MAX_DB_MB = float(os.environ.get('ACE_ACCUMULATOR_MAX_DB_MB', '64'))
+ACTIVE_SESSION_MINUTES = float(os.environ.get('ACE_ACCUMULATOR_ACTIVE_MINUTES', '60'))
+PRUNE_BATCH_ROWS = int(os.environ.get('ACE_ACCUMULATOR_PRUNE_BATCH', '500'))
+# Databases created before auto_vacuum=INCREMENTAL need one full VACUUM to
+# switch. Hooks never run it: SessionEnd's prune starts vacuum_db() detached
+# (CLI: vacuum, or prune --vacuum to run it inline).
+VACUUM_LOCK_SUFFIX = '.vacuum.lock'
+
+# Spawn registry rows (child agent -> parent) are kept this long by prune_db()
+SPAWN_MAX_AGE_HOURS = float(os.environ.get('ACE_SPAWN_REGISTRY_MAX_AGE_HOURS', '168'))
+
+# 'sqlite': one committed INSERT per call. 'spool': append to a per-session
+# spool file, bulk-inserted by the next reader (see ingest_spool()).
+ACCUMULATOR_MODE = os.environ.get('ACE_ACCUMULATOR_MODE', 'sqlite')
 
 
 def get_db_path(working_dir: str = None) -> Path:
@@ -32,14 +86,65 @@ def get_db_path(working_dir: str = None) -> Path:
     return Path('.claude/data/logs/ace-tools.db')
 
 
-def init_db(db_path: Path = None) -> sqlite3.Connection:
-    """Initialize SQLite database for tool accumulation."""
-    if db_path is None:
-        db_path = get_db_path()
+def _serialize(value) -> str:
+    return json.dumps(value) if isinstance(value, dict) else str(value)
+
+
+def _stored_value(text):
+    """Inverse of _serialize() for rows already in the database."""
+    if not text:
+        return {}
+    try:
+        value = json.loads(text)
+    except (TypeError, ValueError):
+        return text
+    return value if isinstance(value, dict) else text
+
+
+def _prepare_payload(tool_name: str, tool_input, tool_response) -> dict:
+    """Summaries, hash/length and the (projected) columns stored for one call."""
+    full_input = _serialize(tool_input)
+    full_response = _serialize(tool_response)
+    response_bytes = full_response.encode('utf-8', 'replace')
+
+    # On failure the summary columns stay NULL and Stop decodes the row instead
+    try:
+        summaries = summarize_tool(tool_name, tool_input, tool_response)
+    except Exception:
+        summaries = (None, None, None, None)
+
+    if PROJECTION_ENABLED:
+        projected_input, projected_response = project_tool_payload(
+            tool_name, tool_input, tool_response, FIELD_CAP_CHARS)
+        stored_input, stored_response = _serialize(projected_input), _serialize(projected_response)
+    else:
+        stored_input, stored_response = full_input, full_response
+
+    return {
+        'tool_input': stored_input,
+        'tool_response': stored_response,
+        'response_sha256': hashlib.sha256(response_bytes).hexdigest(),
+        'response_bytes': len(response_bytes),
+        'summaries': summaries,
+        'full_input': full_input,
+        'full_response': response_bytes,
+    }
+
+
+def _store_full_payload(conn: sqlite3.Connection, tool_id: int, prepared: dict) -> None:
+    """Keep the unprojected payload, zlib-compressed, when retention is on."""
+    if not (KEEP_PAYLOADS and PROJECTION_ENABLED) or prepared.get('full_input') is None:
+        return
+    full_input = prepared['full_input'].encode('utf-8', 'replace')
+    if len(full_input) + prepared['response_bytes'] > MAX_PAYLOAD_BYTES:
+        return
+    conn.execute('INSERT OR REPLACE INTO tool_payloads (tool_id, tool_input, tool_response) '
+                 'VALUES (?, ?, ?)',
+                 (tool_id, zlib.compress(full_input), zlib.compress(prepared['full_response'])))
 
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(db_path))
 
+def _migrate_v1(conn: sqlite3.Connection) -> None:
+    """Baseline schema (v5.3.0 table + v6.0.0 agent_id column)."""
     conn.execute('''
         CREATE TABLE IF NOT EXISTS tool_uses (
             id INTEGER PRIMARY KEY,
@@ -53,20 +158,340 @@ def init_db(db_path: Path = None) -> sqlite3.Connection:
             UNIQUE(tool_use_id)
         )
     ''')
-    # v6.0.0: Add agent_id column if upgrading from older schema
-    try:
+    # Pre-versioning databases may predate agent_id
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(tool_uses)')}
+    if 'agent_id' not in columns:
         conn.execute('ALTER TABLE tool_uses ADD COLUMN agent_id TEXT')
-        conn.commit()
-    except sqlite3.OperationalError:
-        pass  # Column already exists
     conn.execute('CREATE INDEX IF NOT EXISTS idx_session ON tool_uses(session_id)')
-    conn.commit()
+
+
+def _migrate_v2(conn: sqlite3.Connection) -> None:
+    """v6.5.0: Trajectory summaries precomputed at PostToolUse time."""
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(tool_uses)')}
+    for column, column_type in (('action_summary', 'TEXT'), ('result_summary', 'TEXT'),
+                                ('is_error', 'INTEGER'), ('is_state_changing', 'INTEGER')):
+        if column not in columns:
+            conn.execute(f'ALTER TABLE tool_uses ADD COLUMN {column} {column_type}')
+
+
+def _migrate_v3(conn: sqlite3.Connection) -> None:
+    """
+    v6.5.0: Projected payloads + hash/length.
+
+    Schema only: rows written with full payloads (response_sha256 IS NULL)
+    are compacted later by prune_db() / vacuum_db(), outside the write lock
+    every PostToolUse needs.
+    """
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(tool_uses)')}
+    for column, column_type in (('response_sha256', 'TEXT'), ('response_bytes', 'INTEGER')):
+        if column not in columns:
+            conn.execute(f'ALTER TABLE tool_uses ADD COLUMN {column} {column_type}')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tool_payloads (
+            tool_id INTEGER PRIMARY KEY,
+            tool_input BLOB,
+            tool_response BLOB
+        )
+    ''')
+
+
+def _migrate_v4(conn: sqlite3.Connection) -> None:
+    """v6.5.0: Retention purges by age, oldest first."""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_timestamp ON tool_uses(timestamp)')
+
+
+def _migrate_v5(conn: sqlite3.Connection) -> None:
+    """v6.5.0: Per-agent trajectory reads/clears (SubagentStop)."""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_session_agent ON tool_uses(session_id, agent_id, id)')
+
+
+def _migrate_v6(conn: sqlite3.Connection) -> None:
+    """v6.5.0: Spawn registry (parent_agent_id lookup by primary key)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS spawn_registry (
+            child_agent_id TEXT PRIMARY KEY,
+            parent_agent_id TEXT,
+            session_id TEXT,
+            created_at TEXT,
+            updated_at TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_spawn_updated ON spawn_registry(updated_at)')
+
+
+# (version, migration) pairs, applied in order inside one write transaction
+MIGRATIONS = [
+    (1, _migrate_v1),
+    (2, _migrate_v2),
+    (3, _migrate_v3),
+    (4, _migrate_v4),
+    (5, _migrate_v5),
+    (6, _migrate_v6),
+]
+
+
+def _is_lock_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def with_lock_retry(operation, retries: int = None):
+    """
+    Run operation() and retry on "database is locked" with jittered backoff.
+
+    busy_timeout already waits inside SQLite; this covers the cases it
+    cannot (lock upgrades that would deadlock, WAL recovery on open).
+    """
+    retries = LOCK_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            if attempt >= retries or not _is_lock_error(e):
+                raise
+            time.sleep(random.uniform(0, LOCK_RETRY_BASE_SECS * (2 ** attempt)))
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """Bring the schema up to SCHEMA_VERSION (no-op when already current)."""
+    if conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+        return
+
+    # Only takes effect before the first table exists (new databases); older
+    # files are switched by vacuum_db(), run detached from SessionEnd
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+
+    # WAL is persistent per database file, so it only needs setting once
+    if os.environ.get('ACE_ACCUMULATOR_WAL', '1') == '1':
+        conn.execute('PRAGMA journal_mode=WAL')
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Re-check under the write lock: another process may have migrated
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for target, migration in MIGRATIONS:
+            if version < target:
+                migration(conn)
+                version = target
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def init_db(db_path: Path = None) -> sqlite3.Connection:
+    """
+    Open the accumulator database, migrating the schema only when needed.
+
+    Every connection gets synchronous=NORMAL (safe under WAL) and a
+    busy_timeout so concurrent writers wait instead of failing.
+    """
+    if db_path is None:
+        db_path = get_db_path()
+
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    try:
+        with_lock_retry(lambda: _migrate(conn))
+    except Exception:
+        conn.close()
+        raise
     return conn
 
 
+def _insert_prepared(conn: sqlite3.Connection, session_id: str, tool_name: str,
+                     tool_use_id: str, agent_id: str, prepared: dict,
+                     timestamp: str = None) -> None:
+    """Insert one prepared row (no commit). Duplicate tool_use_ids are skipped."""
+    try:
+        cursor = conn.execute('''
+            INSERT INTO tool_uses
+            (session_id, tool_name, tool_input, tool_response, tool_use_id, agent_id,
+             action_summary, result_summary, is_error, is_state_changing,
+             response_sha256, response_bytes, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, datetime('now')))
+        ''', (
+            session_id,
+            tool_name,
+            prepared['tool_input'],
+            prepared['tool_response'],
+            tool_use_id,
+            agent_id or None,
+            *prepared['summaries'],
+            prepared['response_sha256'],
+            prepared['response_bytes'],
+            timestamp
+        ))
+        _store_full_payload(conn, cursor.lastrowid, prepared)
+    except sqlite3.IntegrityError:
+        pass  # Duplicate tool_use_id — normal for hook retries and spool replays
+
+
+# =============================================================================
+# Spool mode (v6.5.0, ACE_ACCUMULATOR_MODE=spool)
+# =============================================================================
+# append_tool() does one O_APPEND write of a length-prefixed JSON record to
+# .claude/data/logs/ace-spool/<session>.spool instead of a SQLite commit.
+# Readers (get_session_tools & co.) bulk-insert pending spools first, in one
+# transaction. Ingest renames the spool to <session>.<pid>.ingest before
+# reading; a crash leaves that file behind and the next ingest replays it
+# (tool_use_id UNIQUE makes replays idempotent). A torn trailing record from
+# a crashed writer is dropped.
+
+SPOOL_HEADER = struct.Struct('>I')
+
+
+def get_spool_dir(working_dir: str = None) -> Path:
+    return get_db_path(working_dir).parent / 'ace-spool'
+
+
+def _spool_name(session_id: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', session_id or 'unknown')
+
+
+def _spool_append(spool_path: Path, record: dict) -> None:
+    body = json.dumps(record).encode('utf-8', 'replace')
+    data = SPOOL_HEADER.pack(len(body)) + body
+    spool_path.parent.mkdir(parents=True, exist_ok=True)
+    while True:
+        fd = os.open(str(spool_path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            # Shared lock: ingest takes LOCK_EX to rename the file away. If it
+            # did so while we waited, our fd points at the renamed file.
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            try:
+                current = os.stat(str(spool_path))
+            except FileNotFoundError:
+                current = None
+            opened = os.fstat(fd)
+            if current is None or (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino):
+                continue
+            if os.write(fd, data) != len(data):
+                raise OSError('short write to spool')
+            return
+        finally:
+            os.close(fd)
+
+
+def _read_spool_records(path: Path) -> list:
+    """Parse complete records; stop at a torn tail, skip undecodable bodies."""
+    data = path.read_bytes()
+    records, offset = [], 0
+    while offset + SPOOL_HEADER.size <= len(data):
+        (length,) = SPOOL_HEADER.unpack_from(data, offset)
+        start = offset + SPOOL_HEADER.size
+        if start + length > len(data):
+            break
+        try:
+            records.append(json.loads(data[start:start + length]))
+        except (TypeError, ValueError):
+            pass
+        offset = start + length
+    return records
+
+
+def _claim_spool(spool_path: Path) -> None:
+    """Atomically move a live spool aside as <name>.<pid>.ingest."""
+    try:
+        fd = os.open(str(spool_path), os.O_RDONLY)
+    except FileNotFoundError:
+        return
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        claimed = spool_path.with_name(f'{spool_path.stem}.{os.getpid()}.ingest')
+        try:
+            os.rename(str(spool_path), str(claimed))
+        except FileNotFoundError:
+            pass  # Another reader claimed it first
+    finally:
+        os.close(fd)
+
+
+def ingest_spool(session_id: str = None, working_dir: str = None,
+                 conn: sqlite3.Connection = None) -> int:
+    """
+    Bulk-insert pending spool records into SQLite (one transaction).
+
+    Args:
+        session_id: Only ingest this session's spool (default: all sessions)
+        working_dir: Project working directory (optional)
+        conn: Already-open connection to reuse; left open when provided
+
+    Returns:
+        Number of records read from spools (duplicates included)
+    """
+    spool_dir = get_spool_dir(working_dir)
+    if not spool_dir.is_dir():
+        return 0
+
+    pattern = f'{_spool_name(session_id)}' if session_id else '*'
+    for spool_path in spool_dir.glob(f'{pattern}.spool'):
+        _claim_spool(spool_path)
+
+    # Includes .ingest files left by a crashed ingest. Another reader may
+    # commit and unlink any of them while we list: skip those, it has them.
+    listed = []
+    for path in spool_dir.glob(f'{pattern}.*.ingest'):
+        try:
+            listed.append((path.stat().st_mtime_ns, path))
+        except FileNotFoundError:
+            continue
+    claimed, records = [], []
+    for _, path in sorted(listed):
+        try:
+            records.extend(_read_spool_records(path))
+        except FileNotFoundError:
+            continue
+        claimed.append(path)
+    if not claimed:
+        return 0
+
+    owns_conn = conn is None
+    if owns_conn:
+        conn = init_db(get_db_path(working_dir))
+    try:
+        def bulk_insert():
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for record in records:
+                    prepared = dict(record['prepared'])
+                    prepared['summaries'] = tuple(prepared['summaries'])
+                    if prepared.get('full_response') is not None:
+                        prepared['full_response'] = prepared['full_response'].encode('utf-8', 'replace')
+                    _insert_prepared(conn, record['session_id'], record['tool_name'],
+                                     record['tool_use_id'], record.get('agent_id'),
+                                     prepared, record.get('timestamp'))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+        with_lock_retry(bulk_insert)
+    finally:
+        if owns_conn:
+            conn.close()
+
+    # Only after the commit: a crash before here replays the same files
+    for path in claimed:
+        path.unlink(missing_ok=True)
+    return len(records)
+
+
+def _ingest_quietly(session_id: str, working_dir: str = None) -> None:
+    try:
+        ingest_spool(session_id, working_dir)
+    except Exception as e:
+        if os.environ.get('ACE_DEBUG_HOOKS') == '1':
+            with open('/tmp/ace_hook_debug.log', 'a') as f:
+                f.write(f"ingest_spool error: {e}\n")
+
+
 def append_tool(session_id: str, tool_name: str, tool_input: dict,
                 tool_response: dict, tool_use_id: str, agent_id: str = None,
-                working_dir: str = None) -> bool:
+                working_dir: str = None, conn: sqlite3.Connection = None) -> bool:
     """
     Append tool use to accumulator (called by PostToolUse hook).
 
@@ -78,34 +503,50 @@ def append_tool(session_id: str, tool_name: str, tool_input: dict,
         tool_use_id: Unique tool use ID from Claude Code
         agent_id: Agent ID for per-agent trajectory (CC 2.1.69+, optional)
         working_dir: Project working directory (optional)
+        conn: Already-open connection to reuse (ace-hookd keeps one warm);
+              left open for the caller when provided. Unused in spool mode.
 
     Returns:
         True if appended successfully, False otherwise
     """
     try:
-        db_path = get_db_path(working_dir)
-        conn = init_db(db_path)
+        # PostToolUse is async, so summarising and projecting here keeps
+        # Stop off the payloads and the database small
+        prepared = _prepare_payload(tool_name, tool_input, tool_response)
+
+        if ACCUMULATOR_MODE == 'spool':
+            spooled = dict(prepared)
+            spooled['full_response'] = (prepared['full_response'].decode('utf-8', 'replace')
+                                        if KEEP_PAYLOADS else None)
+            if not KEEP_PAYLOADS:
+                spooled['full_input'] = None
+            _spool_append(get_spool_dir(working_dir) / f'{_spool_name(session_id)}.spool', {
+                'session_id': session_id,
+                'tool_name': tool_name,
+                'tool_use_id': tool_use_id,
+                'agent_id': agent_id or None,
+                'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+                'prepared': spooled,
+            })
+            return True
+
+        owns_conn = conn is None
+        if owns_conn:
+            conn = init_db(get_db_path(working_dir))
+
+        def insert():
+            _insert_prepared(conn, session_id, tool_name, tool_use_id, agent_id, prepared)
+            conn.commit()
 
         try:
-            conn.execute('''
-                INSERT INTO tool_uses
-                (session_id, tool_name, tool_input, tool_response, tool_use_id, agent_id, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, datetime('now'))
-            ''', (
-                session_id,
-                tool_name,
-                json.dumps(tool_input) if isinstance(tool_input, dict) else str(tool_input),
-                json.dumps(tool_response) if isinstance(tool_response, dict) else str(tool_response),
-                tool_use_id,
-                agent_id or None
-            ))
-        except sqlite3.IntegrityError:
-            pass  # Duplicate tool_use_id — normal for hook retries
-        conn.commit()
-        conn.close()
+            with_lock_retry(insert)
+        except Exception:
+            conn.rollback()
+            raise
+        if owns_conn:
+            conn.close()
         return True
     except Exception as e:
-        import os
         if os.environ.get('ACE_DEBUG_HOOKS') == '1':
             with open('/tmp/ace_hook_debug.log', 'a') as f:
                 f.write(f"append_tool error: {e}\n")
@@ -123,6 +564,7 @@ def get_session_tools(session_id: str, working_dir: str = None) -> list:
     Returns:
         List of tuples: (tool_name, tool_input_json, tool_response_json, tool_use_id, agent_id)
     """
+    _ingest_quietly(session_id, working_dir)
     try:
         db_path = get_db_path(working_dir)
         if not db_path.exists():
@@ -139,13 +581,135 @@ def get_session_tools(session_id: str, working_dir: str = None) -> list:
         conn.close()
         return tools
     except Exception as e:
-        import os
         if os.environ.get('ACE_DEBUG_HOOKS') == '1':
             with open('/tmp/ace_hook_debug.log', 'a') as f:
                 f.write(f"get_session_tools error: {e}\n")
         return []
 
 
+def get_session_trajectory(session_id: str, working_dir: str = None, agent_id: str = None) -> list:
+    """
+    Get the session's trajectory rows without decoding payloads (Stop hook).
+
+    tool_input/tool_response are only selected where the Stop hook still
+    needs them: rows without precomputed summaries (written before v6.5.0)
+    and `git commit` Bash calls (commit SHA detection).
+
+    Args:
+        session_id: Claude Code session ID
+        working_dir: Project working directory (optional)
+        agent_id: Only this subagent's rows (SubagentStop); default all rows
+
+    Returns:
+        List of tuples: (tool_name, tool_input_json, tool_response_json, tool_use_id,
+        agent_id, is_error, is_state_changing, action_summary, result_summary)
+    """
+    _ingest_quietly(session_id, working_dir)
+    try:
+        db_path = get_db_path(working_dir)
+        if not db_path.exists():
+            return []
+
+        conn = init_db(db_path)
+        where, params = 'session_id = ?', (session_id,)
+        if agent_id:
+            where, params = 'session_id = ? AND agent_id = ?', (session_id, agent_id)
+        cursor = conn.execute(f'''
+            SELECT tool_name,
+                   CASE WHEN action_summary IS NULL
+                          OR (tool_name = 'Bash' AND tool_input LIKE '%git commit%')
+                        THEN tool_input END,
+                   CASE WHEN action_summary IS NULL
+                          OR (tool_name = 'Bash' AND tool_input LIKE '%git commit%')
+                        THEN tool_response END,
+                   tool_use_id, agent_id, is_error, is_state_changing,
+                   action_summary, result_summary
+            FROM tool_uses
+            WHERE {where}
+            ORDER BY id
+        ''', params)
+        tools = cursor.fetchall()
+        conn.close()
+        return tools
+    except Exception as e:
+        if os.environ.get('ACE_DEBUG_HOOKS') == '1':
+            with open('/tmp/ace_hook_debug.log', 'a') as f:
+                f.write(f"get_session_trajectory error: {e}\n")
+        return []
+
+
+def get_agent_tools(session_id: str, agent_id: str = None, working_dir: str = None) -> list:
+    """
+    Get one agent's tools via idx_session_agent (O(agent rows)).
+
+    Args:
+        session_id: Claude Code session ID
+        agent_id: Subagent ID; None selects the main agent's rows
+        working_dir: Project working directory (optional)
+
+    Returns:
+        List of tuples: (tool_name, tool_input_json, tool_response_json, tool_use_id, agent_id)
+    """
+    _ingest_quietly(session_id, working_dir)
+    try:
+        db_path = get_db_path(working_dir)
+        if not db_path.exists():
+            return []
+
+        conn = init_db(db_path)
+        cursor = conn.execute('''
+            SELECT tool_name, tool_input, tool_response, tool_use_id, agent_id
+            FROM tool_uses
+            WHERE session_id = ? AND agent_id IS ?
+            ORDER BY id
+        ''', (session_id, agent_id or None))
+        tools = cursor.fetchall()
+        conn.close()
+        return tools
+    except Exception as e:
+        if os.environ.get('ACE_DEBUG_HOOKS') == '1':
+            with open('/tmp/ace_hook_debug.log', 'a') as f:
+                f.write(f"get_agent_tools error: {e}\n")
+        return []
+
+
+def get_tool_payload(tool_use_id: str, working_dir: str = None) -> tuple:
+    """
+    Get the full (unprojected) payload of one tool call, if it was retained.
+
+    Only available with ACE_ACCUMULATOR_KEEP_PAYLOADS=1 and for payloads
+    under ACE_ACCUMULATOR_MAX_PAYLOAD_BYTES.
+
+    Args:
+        tool_use_id: Tool use ID from Claude Code
+        working_dir: Project working directory (optional)
+
+    Returns:
+        (tool_input_json, tool_response_json) or None
+    """
+    _ingest_quietly(None, working_dir)
+    try:
+        db_path = get_db_path(working_dir)
+        if not db_path.exists():
+            return None
+
+        conn = init_db(db_path)
+        row = conn.execute('''
+            SELECT p.tool_input, p.tool_response
+            FROM tool_payloads p JOIN tool_uses t ON t.id = p.tool_id
+            WHERE t.tool_use_id = ?
+        ''', (tool_use_id,)).fetchone()
+        conn.close()
+        if row is None:
+            return None
+        return tuple(zlib.decompress(blob).decode('utf-8', 'replace') for blob in row)
+    except Exception as e:
+        if os.environ.get('ACE_DEBUG_HOOKS') == '1':
+            with open('/tmp/ace_hook_debug.log', 'a') as f:
+                f.write(f"get_tool_payload error: {e}\n")
+        return None
+
+
 def clear_session(session_id: str, working_dir: str = None) -> bool:
     """
     Clear tools after Stop hook processes them.
@@ -157,24 +721,79 @@ def clear_session(session_id: str, working_dir: str = None) -> bool:
     Returns:
         True if cleared successfully, False otherwise
     """
+    # Pending spool records would otherwise resurface after the clear
+    _ingest_quietly(session_id, working_dir)
     try:
         db_path = get_db_path(working_dir)
         if not db_path.exists():
             return True
 
         conn = init_db(db_path)
-        conn.execute('DELETE FROM tool_uses WHERE session_id = ?', (session_id,))
-        conn.commit()
-        conn.close()
+
+        def delete():
+            conn.execute('''
+                DELETE FROM tool_payloads
+                WHERE tool_id IN (SELECT id FROM tool_uses WHERE session_id = ?)
+            ''', (session_id,))
+            conn.execute('DELETE FROM tool_uses WHERE session_id = ?', (session_id,))
+            conn.commit()
+
+        try:
+            with_lock_retry(delete)
+        finally:
+            conn.close()
         return True
     except Exception as e:
-        import os
         if os.environ.get('ACE_DEBUG_HOOKS') == '1':
             with open('/tmp/ace_hook_debug.log', 'a') as f:
                 f.write(f"clear_session error: {e}\n")
         return False
 
 
+def clear_agent(session_id: str, agent_id: str = None, working_dir: str = None) -> bool:
+    """
+    Clear one agent's tools after SubagentStop processes them.
+
+    Leaves the main agent's and other subagents' rows in place, so the
+    main-agent Stop no longer sees rows a subagent already learned from.
+
+    Args:
+        session_id: Claude Code session ID
+        agent_id: Subagent ID; None clears the main agent's rows
+        working_dir: Project working directory (optional)
+
+    Returns:
+        True if cleared successfully, False otherwise
+    """
+    _ingest_quietly(session_id, working_dir)
+    try:
+        db_path = get_db_path(working_dir)
+        if not db_path.exists():
+            return True
+
+        conn = init_db(db_path)
+        params = (session_id, agent_id or None)
+
+        def delete():
+            conn.execute('''
+                DELETE FROM tool_payloads WHERE tool_id IN
+                    (SELECT id FROM tool_uses WHERE session_id = ? AND agent_id IS ?)
+            ''', params)
+            conn.execute('DELETE FROM tool_uses WHERE session_id = ? AND agent_id IS ?', params)
+            conn.commit()
+
+        try:
+            with_lock_retry(delete)
+        finally:
+            conn.close()
+        return True
+    except Exception as e:
+        if os.environ.get('ACE_DEBUG_HOOKS') == '1':
+            with open('/tmp/ace_hook_debug.log', 'a') as f:
+                f.write(f"clear_agent error: {e}\n")
+        return False
+
+
 def get_session_stats(session_id: str, working_dir: str = None) -> dict:
     """
     Get statistics for a session (for debugging).
@@ -202,6 +821,462 @@ def get_session_stats(session_id: str, working_dir: str = None) -> dict:
     }
 
 
+# =============================================================================
+# Spawn registry (v6.5.0)
+# =============================================================================
+# SubagentStop used to append {event: "subagent_done", child_agent_id,
+# parent_agent_id} to .claude/data/logs/ace-spawn-log.jsonl and read the whole
+# (never rotated) file back to resolve parent_agent_id. Rows now live in the
+# spawn_registry table, keyed by child_agent_id. An existing spawn log is
+# imported once by the first lookup and renamed to *.imported; if a registry
+# write fails the hook falls back to appending to the log, which the next
+# lookup imports.
+
+SPAWN_LOG_NAME = 'ace-spawn-log.jsonl'
+
+
+def get_spawn_log_path(working_dir: str = None) -> Path:
+    return get_db_path(working_dir).with_name(SPAWN_LOG_NAME)
+
+
+def _upsert_spawn(conn: sqlite3.Connection, child_agent_id: str, parent_agent_id: str,
+                  session_id: str, timestamp: str = None) -> None:
+    conn.execute('''
+        INSERT INTO spawn_registry
+        (child_agent_id, parent_agent_id, session_id, created_at, updated_at)
+        VALUES (?, ?, ?, COALESCE(?, datetime('now')), COALESCE(?, datetime('now')))
+        ON CONFLICT(child_agent_id) DO UPDATE SET
+            parent_agent_id = excluded.parent_agent_id,
+            session_id = excluded.session_id,
+            updated_at = excluded.updated_at
+    ''', (child_agent_id, parent_agent_id, session_id, timestamp, timestamp))
+
+
+def register_spawn(child_agent_id: str, session_id: str, parent_agent_id: str = 'main',
+                   working_dir: str = None) -> bool:
+    """
+    Record which agent spawned a subagent (SubagentStop, before ace_after_task).
+
+    Args:
+        child_agent_id: The stopping subagent's agent_id
+        session_id: Claude Code session ID
+        parent_agent_id: Spawning agent ('main' for the main agent)
+        working_dir: Project working directory (optional)
+
+    Returns:
+        True if recorded, False otherwise
+    """
+    if not child_agent_id:
+        return False
+    try:
+        conn = init_db(get_db_path(working_dir))
+
+        def upsert():
+            _upsert_spawn(conn, child_agent_id, parent_agent_id, session_id)
+            conn.commit()
+
+        try:
+            with_lock_retry(upsert)
+        finally:
+            conn.close()
+        return True
+    except Exception as e:
+        if os.environ.get('ACE_DEBUG_HOOKS') == '1':
+            with open('/tmp/ace_hook_debug.log', 'a') as f:
+                f.write(f"register_spawn error: {e}\n")
+        return False
+
+
+def _sqlite_timestamp(value) -> str:
+    """ISO-8601 spawn-log timestamps in datetime('now') format (UTC)."""
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def import_spawn_log(working_dir: str = None) -> int:
+    """
+    One-time import of the JSONL spawn log into spawn_registry.
+
+    Later entries win, as with the old reverse scan. The log is then moved to
+    ace-spawn-log.jsonl.imported (appended to, if one exists), so lookups
+    stop paying for it.
+
+    Returns:
+        Number of subagent_done entries imported
+    """
+    log_path = get_spawn_log_path(working_dir)
+    # Claim first: a concurrent importer gets nothing, and a writer falling
+    # back to the log starts a fresh file
+    claimed = log_path.with_name(f'{log_path.name}.{os.getpid()}.importing')
+    try:
+        os.replace(log_path, claimed)
+    except FileNotFoundError:
+        return 0
+
+    entries = []
+    with open(claimed, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if (isinstance(entry, dict) and entry.get('event') == 'subagent_done'
+                    and entry.get('child_agent_id')):
+                entries.append(entry)
+
+    def insert(conn):
+        for entry in entries:
+            _upsert_spawn(conn, str(entry['child_agent_id']), entry.get('parent_agent_id'),
+                          entry.get('session_id'), _sqlite_timestamp(entry.get('timestamp')))
+        conn.commit()
+
+    done_path = log_path  # on failure the entries go back for the next lookup
+    try:
+        conn = init_db(get_db_path(working_dir))
+        try:
+            with_lock_retry(lambda: insert(conn))
+        finally:
+            conn.close()
+        done_path = log_path.with_name(log_path.name + '.imported')
+    finally:
+        with open(claimed, 'rb') as src, open(done_path, 'ab') as dst:
+            dst.write(src.read())
+        claimed.unlink()
+    return len(entries)
+
+
+def get_spawn_parent(child_agent_id: str, working_dir: str = None) -> str:
+    """
+    parent_agent_id recorded for a subagent, or None.
+
+    Args:
+        child_agent_id: Subagent ID
+        working_dir: Project working directory (optional)
+    """
+    if not child_agent_id:
+        return None
+    try:
+        if get_spawn_log_path(working_dir).exists():
+            import_spawn_log(working_dir)
+        db_path = get_db_path(working_dir)
+        if not db_path.exists():
+            return None
+        conn = init_db(db_path)
+        try:
+            row = conn.execute('SELECT parent_agent_id FROM spawn_registry WHERE child_agent_id = ?',
+                               (child_agent_id,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+    except Exception as e:
+        if os.environ.get('ACE_DEBUG_HOOKS') == '1':
+            with open('/tmp/ace_hook_debug.log', 'a') as f:
+                f.write(f"get_spawn_parent error: {e}\n")
+        return None
+
+
+def _delete_rows(conn: sqlite3.Connection, where: str, params: tuple, limit: int) -> int:
+    """Delete up to `limit` oldest rows matching `where` (and their payloads)."""
+    ids = [row[0] for row in conn.execute(
+        f'SELECT id FROM tool_uses WHERE {where} ORDER BY id LIMIT ?', (*params, limit))]
+    if not ids:
+        return 0
+    placeholders = ','.join('?' * len(ids))
+    conn.execute(f'DELETE FROM tool_payloads WHERE tool_id IN ({placeholders})', ids)
+    conn.execute(f'DELETE FROM tool_uses WHERE id IN ({placeholders})', ids)
+    conn.commit()
+    return len(ids)
+
+
+def _compact_rows(conn: sqlite3.Connection, batch_rows: int, out_of_time=None) -> int:
+    """
+    Project rows written with full payloads (pre-v3), one commit per batch.
+
+    Summaries are filled first, while the full payload is still there.
+    Returns the number of rows compacted; stops early when out_of_time().
+    """
+    compacted = 0
+    last_id = 0
+    while not (out_of_time and out_of_time()):
+        rows = conn.execute(
+            'SELECT id, tool_name, tool_input, tool_response FROM tool_uses '
+            'WHERE id > ? AND response_sha256 IS NULL ORDER BY id LIMIT ?',
+            (last_id, batch_rows)).fetchall()
+        if not rows:
+            break
+        for tool_id, tool_name, tool_input, tool_response in rows:
+            prepared = _prepare_payload(tool_name, _stored_value(tool_input),
+                                        _stored_value(tool_response))
+            conn.execute('''
+                UPDATE tool_uses SET tool_input = ?, tool_response = ?,
+                    response_sha256 = ?, response_bytes = ?,
+                    action_summary = COALESCE(action_summary, ?),
+                    result_summary = COALESCE(result_summary, ?),
+                    is_error = COALESCE(is_error, ?),
+                    is_state_changing = COALESCE(is_state_changing, ?)
+                WHERE id = ?
+            ''', (prepared['tool_input'], prepared['tool_response'],
+                  prepared['response_sha256'], prepared['response_bytes'],
+                  *prepared['summaries'], tool_id))
+            _store_full_payload(conn, tool_id, prepared)
+        conn.commit()
+        compacted += len(rows)
+        last_id = rows[-1][0]
+    return compacted
+
+
+def _stale_sessions(conn: sqlite3.Connection, exclude_session: str = None) -> list:
+    """Sessions with no row in the last ACTIVE_SESSION_MINUTES, least recently active first."""
+    rows = conn.execute('''
+        SELECT session_id FROM tool_uses GROUP BY session_id
+        HAVING MAX(timestamp) IS NULL OR MAX(timestamp) < datetime('now', ?)
+        ORDER BY MAX(timestamp)
+    ''', (f'-{ACTIVE_SESSION_MINUTES * 60:.0f} seconds',)).fetchall()
+    return [row[0] for row in rows if row[0] != exclude_session]
+
+
+def _live_bytes(conn: sqlite3.Connection) -> int:
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+    freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    return (page_count - freelist) * page_size
+
+
+def prune_db(working_dir: str = None, max_age_hours: float = None, max_db_mb: float = None,
+             deadline_secs: float = 2.0, batch_rows: int = None, vacuum: bool = False,
+             schedule_vacuum: bool = False, session_id: str = None) -> dict:
+    """
+    Purge orphaned rows (sessions that never reached Stop) within a time budget.
+
+    Deletes in batches of `batch_rows`, one commit each, compacts rows left
+    with full payloads by older versions the same way, releases freed pages
+    with `PRAGMA incremental_vacuum` as it goes, and stops at the deadline
+    (SessionEnd has 3s). Leftover spool files older than the age limit are
+    removed too. Never migrates a database: a stale schema is left to the
+    next PostToolUse. Never runs a full VACUUM unless `vacuum`.
+
+    Args:
+        working_dir: Project working directory (optional)
+        max_age_hours: Purge rows older than this (default ACE_ACCUMULATOR_MAX_AGE_HOURS)
+        max_db_mb: Purge stale sessions' rows, least recently active session
+            first, while live data exceeds this (default ACE_ACCUMULATOR_MAX_DB_MB)
+        deadline_secs: Time budget for the whole call
+        batch_rows: Rows per delete transaction (default ACE_ACCUMULATOR_PRUNE_BATCH)
+        vacuum: Then run vacuum_db() inline (no deadline)
+        schedule_vacuum: Start vacuum_db() detached when the file still needs
+            the one-time VACUUM to auto_vacuum=INCREMENTAL (SessionEnd)
+        session_id: The calling session, never trimmed by the size cap
+
+    Returns:
+        Dict with deleted_rows, compacted_rows, deleted_spawns (spawn registry
+        rows older than ACE_SPAWN_REGISTRY_MAX_AGE_HOURS), reclaimed_pages,
+        complete (False if the deadline hit)
+    """
+    started = time.monotonic()
+    max_age_hours = MAX_AGE_HOURS if max_age_hours is None else max_age_hours
+    max_db_mb = MAX_DB_MB if max_db_mb is None else max_db_mb
+    batch_rows = batch_rows or PRUNE_BATCH_ROWS
+    result = {'deleted_rows': 0, 'compacted_rows': 0, 'deleted_spawns': 0,
+              'reclaimed_pages': 0, 'complete': True}
+
+    def out_of_time():
+        if time.monotonic() - started >= deadline_secs:
+            result['complete'] = False
+            return True
+        return False
+
+    spool_dir = get_spool_dir(working_dir)
+    if max_age_hours > 0 and spool_dir.is_dir():
+        cutoff = time.time() - max_age_hours * 3600
+        for path in spool_dir.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+    db_path = get_db_path(working_dir)
+    if not db_path.exists():
+        return result
+
+    # Short busy_timeout: a busy database just means "prune next time"
+    conn = sqlite3.connect(str(db_path), timeout=0.5)
+    try:
+        conn.execute('PRAGMA busy_timeout = 500')
+        if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            result['complete'] = False
+            return result
+
+        if max_age_hours > 0:
+            where = "timestamp IS NULL OR timestamp < datetime('now', ?)"
+            params = (f'-{max_age_hours * 3600:.0f} seconds',)
+            while not out_of_time():
+                deleted = _delete_rows(conn, where, params, batch_rows)
+                result['deleted_rows'] += deleted
+                if deleted < batch_rows:
+                    break
+
+        result['compacted_rows'] += _compact_rows(conn, batch_rows, out_of_time)
+
+        if SPAWN_MAX_AGE_HOURS > 0 and not out_of_time():
+            cursor = conn.execute("DELETE FROM spawn_registry WHERE updated_at < datetime('now', ?)",
+                                  (f'-{SPAWN_MAX_AGE_HOURS * 3600:.0f} seconds',))
+            conn.commit()
+            result['deleted_spawns'] = cursor.rowcount
+
+        if max_db_mb > 0 and _live_bytes(conn) > max_db_mb * 1024 * 1024:
+            for stale in _stale_sessions(conn, session_id):
+                while _live_bytes(conn) > max_db_mb * 1024 * 1024 and not out_of_time():
+                    deleted = _delete_rows(conn, 'session_id = ?', (stale,), batch_rows)
+                    result['deleted_rows'] += deleted
+                    if deleted < batch_rows:
+                        break
+                if out_of_time() or _live_bytes(conn) <= max_db_mb * 1024 * 1024:
+                    break
+
+        auto_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+        if auto_vacuum == 2:
+            free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if free_pages:
+                conn.executescript('PRAGMA incremental_vacuum;')  # execute() stops after one page
+                result['reclaimed_pages'] += free_pages - conn.execute('PRAGMA freelist_count').fetchone()[0]
+        elif schedule_vacuum and not vacuum:
+            spawn_vacuum(working_dir)
+    except sqlite3.OperationalError as e:
+        if not _is_lock_error(e):
+            raise
+        result['complete'] = False
+    finally:
+        conn.close()
+
+    if vacuum:
+        vacuumed = vacuum_db(working_dir, batch_rows)
+        result['compacted_rows'] += vacuumed['compacted_rows']
+        result['reclaimed_pages'] += vacuumed['reclaimed_pages']
+    return result
+
+
+def vacuum_db(working_dir: str = None, batch_rows: int = None) -> dict:
+    """
+    Compact every pre-v3 row, then VACUUM into auto_vacuum=INCREMENTAL.
+
+    Unbounded, so never called from a hook: SessionEnd starts it detached
+    (spawn_vacuum()), or run `vacuum` / `prune --vacuum` by hand. Compaction
+    commits per batch so writers interleave; only the final VACUUM holds the
+    database exclusively. One run per database at a time (flock); a second
+    caller returns skipped=True.
+
+    Returns:
+        Dict with compacted_rows, reclaimed_pages, auto_vacuum, skipped
+    """
+    result = {'compacted_rows': 0, 'reclaimed_pages': 0, 'auto_vacuum': None, 'skipped': False}
+    db_path = get_db_path(working_dir)
+    if not db_path.exists():
+        return result
+
+    with open(str(db_path) + VACUUM_LOCK_SUFFIX, 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            result['skipped'] = True
+            return result
+
+        conn = init_db(db_path)
+        try:
+            result['compacted_rows'] = _compact_rows(conn, batch_rows or PRUNE_BATCH_ROWS)
+            before = conn.execute('PRAGMA page_count').fetchone()[0]
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+                conn.executescript('PRAGMA incremental_vacuum;')
+            else:
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                conn.execute('VACUUM')
+            result['reclaimed_pages'] = before - conn.execute('PRAGMA page_count').fetchone()[0]
+            result['auto_vacuum'] = {0: 'none', 1: 'full', 2: 'incremental'}.get(
+                conn.execute('PRAGMA auto_vacuum').fetchone()[0], 'unknown')
+        finally:
+            conn.close()
+    return result
+
+
+def spawn_vacuum(working_dir: str = None) -> None:
+    """Run `vacuum` in a detached process (best-effort, never blocks the hook)."""
+    import subprocess
+
+    command = [sys.executable, os.path.abspath(__file__), 'vacuum']
+    if working_dir:
+        command += ['--working-dir', str(working_dir)]
+    try:
+        subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, start_new_session=True, close_fds=True)
+    except OSError:
+        pass
+
+
+def get_db_stats(working_dir: str = None) -> dict:
+    """
+    Database-wide statistics (for `stats` without --session-id and debugging).
+
+    Args:
+        working_dir: Project working directory (optional)
+
+    Returns:
+        Dict with db_bytes, wal_bytes, page/freelist counts, reclaimable_bytes,
+        auto_vacuum, total_rows, sessions (rows/oldest/newest each), spool_files,
+        spawn_registry_rows
+    """
+    db_path = get_db_path(working_dir)
+    spool_dir = get_spool_dir(working_dir)
+    stats = {
+        'db_path': str(db_path),
+        'db_bytes': 0,
+        'wal_bytes': 0,
+        'total_rows': 0,
+        'sessions': [],
+        'spool_files': len(list(spool_dir.iterdir())) if spool_dir.is_dir() else 0,
+    }
+    if not db_path.exists():
+        return stats
+
+    wal_path = db_path.with_name(db_path.name + '-wal')
+    stats['db_bytes'] = db_path.stat().st_size
+    stats['wal_bytes'] = wal_path.stat().st_size if wal_path.exists() else 0
+
+    conn = init_db(db_path)
+    try:
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        stats.update({
+            'page_size': page_size,
+            'page_count': conn.execute('PRAGMA page_count').fetchone()[0],
+            'reclaimable_pages': freelist,
+            'reclaimable_bytes': freelist * page_size,
+            'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}.get(
+                conn.execute('PRAGMA auto_vacuum').fetchone()[0], 'unknown'),
+            'schema_version': conn.execute('PRAGMA user_version').fetchone()[0],
+        })
+        stats['spawn_registry_rows'] = conn.execute('SELECT COUNT(*) FROM spawn_registry').fetchone()[0]
+        rows = conn.execute('''
+            SELECT session_id, COUNT(*), MIN(timestamp), MAX(timestamp)
+            FROM tool_uses GROUP BY session_id ORDER BY MIN(id)
+        ''').fetchall()
+    finally:
+        conn.close()
+
+    stats['sessions'] = [
+        {'session_id': sid, 'rows': count, 'oldest': oldest, 'newest': newest}
+        for sid, count, oldest, newest in rows
+    ]
+    stats['total_rows'] = sum(count for _, count, _, _ in rows)
+    return stats
+
+
 def main():
     """CLI interface for ace_tool_accumulator."""
     parser = argparse.ArgumentParser(description='ACE Tool Accumulator')
@@ -220,18 +1295,57 @@ def main():
     # get command
     get_parser = subparsers.add_parser('get', help='Get session tools')
     get_parser.add_argument('--session-id', required=True, help='Session ID')
+    get_parser.add_argument('--agent-id', help='Only this subagent\'s tools')
     get_parser.add_argument('--working-dir', help='Working directory')
 
     # clear command
     clear_parser = subparsers.add_parser('clear', help='Clear session tools')
     clear_parser.add_argument('--session-id', required=True, help='Session ID')
+    clear_parser.add_argument('--agent-id', help='Only clear this subagent\'s tools')
     clear_parser.add_argument('--working-dir', help='Working directory')
 
     # stats command
-    stats_parser = subparsers.add_parser('stats', help='Get session statistics')
-    stats_parser.add_argument('--session-id', required=True, help='Session ID')
+    stats_parser = subparsers.add_parser('stats', help='Get session (or database-wide) statistics')
+    stats_parser.add_argument('--session-id', help='Session ID (omit for database-wide stats)')
     stats_parser.add_argument('--working-dir', help='Working directory')
 
+    # prune command (SessionEnd retention)
+    prune_parser = subparsers.add_parser('prune', help='Purge orphaned rows by age/size')
+    prune_parser.add_argument('--working-dir', help='Working directory')
+    prune_parser.add_argument('--max-age-hours', type=float, help='Override ACE_ACCUMULATOR_MAX_AGE_HOURS')
+    prune_parser.add_argument('--max-db-mb', type=float, help='Override ACE_ACCUMULATOR_MAX_DB_MB')
+    prune_parser.add_argument('--deadline', type=float, default=2.0, help='Time budget in seconds')
+    prune_parser.add_argument('--session-id', help='Calling session (kept by the size cap)')
+    prune_parser.add_argument('--vacuum', action='store_true',
+                              help='Then compact and VACUUM inline (see the vacuum command)')
+    prune_parser.add_argument('--schedule-vacuum', action='store_true',
+                              help='Start the vacuum command detached if the database needs it')
+
+    # vacuum command (detached from SessionEnd, or by hand)
+    vacuum_parser = subparsers.add_parser(
+        'vacuum', help='Compact pre-v3 rows and VACUUM into auto_vacuum=INCREMENTAL')
+    vacuum_parser.add_argument('--working-dir', help='Working directory')
+
+    # spawn registry commands (SubagentStop parent_agent_id resolution)
+    spawn_parser = subparsers.add_parser('register-spawn', help='Record a subagent\'s parent agent')
+    spawn_parser.add_argument('--child-agent-id', required=True, help='Subagent ID')
+    spawn_parser.add_argument('--session-id', required=True, help='Session ID')
+    spawn_parser.add_argument('--parent-agent-id', default='main', help='Parent agent ID')
+    spawn_parser.add_argument('--working-dir', help='Working directory')
+
+    parent_parser = subparsers.add_parser('spawn-parent', help='Look up a subagent\'s parent agent')
+    parent_parser.add_argument('--child-agent-id', required=True, help='Subagent ID')
+    parent_parser.add_argument('--working-dir', help='Working directory')
+
+    import_parser = subparsers.add_parser('import-spawn-log',
+                                          help='Import ace-spawn-log.jsonl into the spawn registry')
+    import_parser.add_argument('--working-dir', help='Working directory')
+
+    # ingest command (spool mode compactor)
+    ingest_parser = subparsers.add_parser('ingest', help='Bulk-insert pending spool files')
+    ingest_parser.add_argument('--session-id', help='Session ID (default: all sessions)')
+    ingest_parser.add_argument('--working-dir', help='Working directory')
+
     args = parser.parse_args()
 
     if args.command == 'append':
@@ -257,7 +1371,10 @@ def main():
         sys.exit(0 if success else 1)
 
     elif args.command == 'get':
-        tools = get_session_tools(args.session_id, args.working_dir)
+        if args.agent_id:
+            tools = get_agent_tools(args.session_id, args.agent_id, args.working_dir)
+        else:
+            tools = get_session_tools(args.session_id, args.working_dir)
         result = []
         for tool_name, tool_input, tool_response, tool_use_id, agent_id in tools:
             result.append({
@@ -270,12 +1387,61 @@ def main():
         print(json.dumps(result, indent=2))
 
     elif args.command == 'clear':
-        success = clear_session(args.session_id, args.working_dir)
+        if args.agent_id:
+            success = clear_agent(args.session_id, args.agent_id, args.working_dir)
+        else:
+            success = clear_session(args.session_id, args.working_dir)
         print(json.dumps({'success': success}))
         sys.exit(0 if success else 1)
 
+    elif args.command == 'register-spawn':
+        success = register_spawn(args.child_agent_id, args.session_id, args.parent_agent_id,
+                                 args.working_dir)
+        print(json.dumps({'success': success}))
+        sys.exit(0 if success else 1)
+
+    elif args.command == 'spawn-parent':
+        print(json.dumps({'parent_agent_id': get_spawn_parent(args.child_agent_id, args.working_dir)}))
+
+    elif args.command == 'import-spawn-log':
+        try:
+            count = import_spawn_log(args.working_dir)
+        except Exception as e:
+            print(json.dumps({'success': False, 'error': str(e)}))
+            sys.exit(1)
+        print(json.dumps({'success': True, 'entries': count}))
+
+    elif args.command == 'ingest':
+        try:
+            count = ingest_spool(args.session_id, args.working_dir)
+        except Exception as e:
+            print(json.dumps({'success': False, 'error': str(e)}))
+            sys.exit(1)
+        print(json.dumps({'success': True, 'records': count}))
+
+    elif args.command == 'prune':
+        try:
+            result = prune_db(args.working_dir, args.max_age_hours, args.max_db_mb,
+                              deadline_secs=args.deadline, vacuum=args.vacuum,
+                              schedule_vacuum=args.schedule_vacuum, session_id=args.session_id)
+        except Exception as e:
+            print(json.dumps({'success': False, 'error': str(e)}))
+            sys.exit(1)
+        print(json.dumps(dict(result, success=True)))
+
+    elif args.command == 'vacuum':
+        try:
+            result = vacuum_db(args.working_dir)
+        except Exception as e:
+            print(json.dumps({'success': False, 'error': str(e)}))
+            sys.exit(1)
+        print(json.dumps(dict(result, success=True)))
+
     elif args.command == 'stats':
-        stats = get_session_stats(args.session_id, args.working_dir)
+        if args.session_id:
+            stats = get_session_stats(args.session_id, args.working_dir)
+        else:
+            stats = get_db_stats(args.working_dir)
         print(json.dumps(stats, indent=2))
 
     else:
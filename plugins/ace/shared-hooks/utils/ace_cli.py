@@ -4,14 +4,60 @@
 import subprocess
 import json
 import os
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+
+import ace_cli_cache
+import ace_jsonl_writer
+import ace_cli_worker
+import ace_pattern_index
+import ace_search_cache
 
 
 # v6.0.0: Legacy CLI removed, ace-cli is the only supported command
 CLI_CMD = 'ace-cli'
 
+# v6.5.0: Upper bound on one-shot ace-cli processes a search batch starts at once
+MAX_PARALLEL_SEARCHES = 4
+
+
+def _run_cli(args: List[str], input: bytes = None, timeout: float = 30,
+             org: str = None, project: str = None,
+             text: bool = False) -> subprocess.CompletedProcess:
+    """
+    Run `ace-cli <args>` once, via the CLI worker when ACE_CLI_WORKER=1.
+
+    v6.5.0: Every call site goes through here so the worker (see
+    ace_cli_worker.py) can serve them all from one process. Falls back to a
+    one-shot subprocess when the worker is disabled or unavailable;
+    TimeoutExpired / FileNotFoundError surface exactly as before.
+    """
+    env_overrides = {}
+    if org:
+        env_overrides['ACE_ORG_ID'] = org
+    if project:
+        env_overrides['ACE_PROJECT_ID'] = project
+
+    if ace_cli_worker.worker_enabled():
+        try:
+            result = ace_cli_worker.run_cli(args, input, timeout, env_overrides)
+            if text:
+                result.stdout = result.stdout.decode('utf-8', errors='replace')
+                result.stderr = result.stderr.decode('utf-8', errors='replace')
+            return result
+        except ace_cli_worker.WorkerUnavailable:
+            pass  # one-shot fallback below
+
+    return subprocess.run(
+        [CLI_CMD, *args],
+        input=input,
+        capture_output=True,
+        text=text,
+        timeout=timeout,
+        env=dict(os.environ, **env_overrides)
+    )
+
 
 def _log_cli_error(location: str, returncode: int, stdout_sample: str, stderr_sample: str,
                     query: str = None, project_id: str = None, extra: dict = None) -> None:
@@ -34,15 +80,14 @@ def _log_cli_error(location: str, returncode: int, stdout_sample: str, stderr_sa
         }
         if extra:
             entry.update(extra)
-        log_path = Path('.claude/data/logs/ace-relevance.jsonl')
-        log_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(log_path, 'a') as f:
-            f.write(json.dumps(entry) + '\n')
+        ace_jsonl_writer.append_record('.claude/data/logs/ace-relevance.jsonl', entry)
     except Exception:
         pass  # Logging must not fail the caller
 
 
-def run_search(query: str, org: str = None, project: str = None, session_id: str = None) -> Optional[Dict[str, Any]]:
+def run_search(query: str, org: str = None, project: str = None, session_id: str = None,
+               timeout: float = 30, cache_info: Dict[str, str] = None,
+               allow_similar: bool = False) -> Optional[Dict[str, Any]]:
     """
     Call ace-cli search --stdin with optional session pinning
 
@@ -51,6 +96,11 @@ def run_search(query: str, org: str = None, project: str = None, session_id: str
         org: Organization ID (optional, passed via environment)
         project: Project ID (optional, passed via environment)
         session_id: Session ID to pin results to (optional, requires ace-cli v1.0.11+)
+        timeout: Seconds before giving up (UserPromptSubmit passes its remaining budget)
+        cache_info: Optional dict; receives 'status' = 'hit' | 'similar' | 'miss' | 'off'
+            (and 'similarity' on a near-duplicate hit)
+        allow_similar: On an exact-key miss, serve a cached near-duplicate query
+            and refresh it in the background (UserPromptSubmit only)
 
     Returns:
         Parsed JSON response or None on failure
@@ -74,27 +124,45 @@ def run_search(query: str, org: str = None, project: str = None, session_id: str
     v5.4.21 Changes:
         Returns {"error": "not_authenticated", "message": "..."} on auth failure
         instead of None, enabling better error messages to users.
+
+    v6.5.0: Successful responses are served from the local search cache
+    (ace_search_cache.py) until their TTL or the next playbook-changing learn,
+    and their patterns keep the local FTS index warm (ace_pattern_index.py).
     """
-    try:
-        # Build environment with context
-        env = os.environ.copy()
-        if org:
-            env['ACE_ORG_ID'] = org
-        if project:
-            env['ACE_PROJECT_ID'] = project
+    pinned = bool(session_id)
+    cached = ace_search_cache.get(query, org, project, pinned=pinned)
+    if cached is None and allow_similar:
+        similar = ace_search_cache.get_similar(query, org, project, pinned=pinned)
+        if similar is not None:
+            try:
+                response = json.loads(similar[0])
+            except json.JSONDecodeError:
+                response = None
+            if isinstance(response, dict):
+                # Served now; the exact query (and its session pin) lands in the cache later
+                ace_search_cache.spawn_refresh(query, org, project, session_id)
+                if cache_info is not None:
+                    cache_info['status'] = 'similar'
+                    cache_info['similarity'] = similar[1]
+                return response
+    if cache_info is not None:
+        cache_info['status'] = ('hit' if cached is not None else
+                                'miss' if ace_search_cache.cache_enabled() else 'off')
+    if cached is not None:
+        try:
+            return json.loads(cached)
+        except json.JSONDecodeError:
+            pass
 
+    try:
         # Build command with optional session pinning
-        cmd = [CLI_CMD, 'search', '--stdin', '--json']
+        # (_run_cli passes org/project as ACE_ORG_ID / ACE_PROJECT_ID)
+        args = ['search', '--stdin', '--json']
         if session_id:
-            cmd.extend(['--pin-session', session_id])
-
-        result = subprocess.run(
-            cmd,
-            input=query.encode('utf-8'),
-            capture_output=True,
-            timeout=30,
-            env=env
-        )
+            args.extend(['--pin-session', session_id])
+
+        result = _run_cli(args, input=query.encode('utf-8'), timeout=timeout,
+                          org=org, project=project)
 
         if result.returncode != 0:
             # v5.4.21: Check if failure is due to auth
@@ -120,7 +188,12 @@ def run_search(query: str, org: str = None, project: str = None, session_id: str
             return None
 
         try:
-            return json.loads(result.stdout)
+            response = json.loads(result.stdout)
+            if isinstance(response, dict) and not response.get('error'):
+                ace_search_cache.put(query, result.stdout.decode('utf-8', errors='replace'),
+                                     org, project, pinned=pinned)
+                ace_pattern_index.upsert_patterns(response.get('similar_patterns'), org, project)
+            return response
         except json.JSONDecodeError as _je:
             # v6.4.2: Previously silent — now visible in telemetry.
             _stdout_txt = result.stdout.decode('utf-8', errors='replace') if result.stdout else ''
@@ -150,6 +223,153 @@ def run_search(query: str, org: str = None, project: str = None, session_id: str
         return {"error": "cli_not_found", "message": "ace-cli not found. Run: npm install -g @ace-sdk/cli"}
 
 
+def run_domain_search(query: str, domain: str, org: str = None, project: str = None,
+                      timeout: float = 4.0, cache_info: Dict[str, str] = None) -> str:
+    """
+    Domain-filtered search used by PreToolUse / CwdChanged domain shifts.
+
+    Mirrors `echo "$QUERY" | ace-cli search --stdin --json --allowed-domains D`
+    from the bash wrappers: returns the raw (UTF-8 sanitised) JSON text, or ''
+    on any failure. Callers decide how to render it.
+
+    Args:
+        query: Search query text (domain + file/dir basename)
+        domain: Domain passed to --allowed-domains
+        org: Organization ID (passed via environment)
+        project: Project ID (passed via environment)
+        timeout: Seconds before giving up (PreToolUse hook budget is 5s)
+        cache_info: Optional dict; receives 'status' = 'hit' | 'miss' | 'off'
+
+    v6.5.0: Shares the local search cache with run_search(), keyed on domain,
+    and goes through run_search_batch() so concurrent hooks share one call.
+    """
+    return run_search_batch([{'query': query, 'allowed_domains': domain}], org, project,
+                            timeout=timeout,
+                            cache_infos=[cache_info] if cache_info is not None else None)[0]
+
+
+def run_search_batch(queries: List[Dict[str, Any]], org: str = None, project: str = None,
+                     timeout: float = 4.0, cache_infos: List[Dict[str, str]] = None,
+                     coalesce: bool = True) -> List[str]:
+    """
+    Several searches for one org/project, answered with as few CLI calls as possible.
+
+    Args:
+        queries: [{'query': ..., 'allowed_domains': ... or None}, ...]
+        org: Organization ID (passed via environment)
+        project: Project ID (passed via environment)
+        timeout: Seconds before giving up on the whole batch
+        cache_infos: Optional list of dicts parallel to queries; each receives
+            'status' = 'hit' | 'miss' | 'off'
+        coalesce: Offer the misses to ace-hookd's coalescing window first
+            (the daemon itself passes False)
+
+    Returns:
+        Raw JSON text per query, in order ('' on failure), like run_domain_search()
+
+    v6.5.0: A burst of hooks (UserPromptSubmit, a PreToolUse domain shift, a
+    CwdChanged search) used to start one ace-cli each. Cache hits are served
+    first and identical queries share one search. The remaining searches go,
+    in order of preference, to:
+    - ace-hookd (ACE_HOOKD=1), which holds SearchBatch requests from every
+      process for ACE_SEARCH_COALESCE_MS and runs them as one batch
+    - the CLI worker's search_batch method (ACE_CLI_WORKER=1), one round-trip
+    - parallel one-shot ace-cli processes
+    """
+    results = [''] * len(queries)
+    misses: Dict[tuple, List[int]] = {}
+    for index, item in enumerate(queries):
+        query = item.get('query') or ''
+        domains = item.get('allowed_domains') or None
+        cached = ace_search_cache.get(query, org, project, allowed_domains=domains)
+        if cache_infos is not None:
+            cache_infos[index]['status'] = ('hit' if cached is not None else
+                                            'miss' if ace_search_cache.cache_enabled() else 'off')
+        if cached is not None:
+            results[index] = cached
+        else:
+            misses.setdefault((query, domains), []).append(index)
+    if not misses:
+        return results
+
+    keys = list(misses)
+    texts = _coalesce_searches(keys, org, project, timeout) if coalesce else None
+    if texts is None:
+        texts = _execute_searches(keys, org, project, timeout)
+    for key, text in zip(keys, texts):
+        for index in misses[key]:
+            results[index] = text
+    return results
+
+
+def _coalesce_searches(keys: List[tuple], org: str, project: str,
+                       timeout: float) -> Optional[List[str]]:
+    """Hand the searches to ace-hookd's coalescing window; None if it can't take them."""
+    if (os.environ.get('ACE_HOOKD', '0') != '1'
+            or int(os.environ.get('ACE_SEARCH_COALESCE_MS', '20')) <= 0):
+        return None
+    try:
+        from ace_hookd_client import request
+    except ImportError:
+        return None
+    body = json.dumps({'org': org, 'project': project, 'timeout': timeout,
+                       'queries': [{'query': q, 'allowed_domains': d} for q, d in keys]})
+    reply = request('SearchBatch', body.encode('utf-8'), timeout=timeout + 1)
+    if not isinstance(reply, tuple):
+        return None
+    try:
+        texts = json.loads(reply[1])
+    except ValueError:
+        return None
+    if not isinstance(texts, list) or len(texts) != len(keys):
+        return None
+    return [t if isinstance(t, str) else '' for t in texts]
+
+
+def _execute_searches(keys: List[tuple], org: str, project: str, timeout: float) -> List[str]:
+    """Run (query, allowed_domains) searches now; cache and index what succeeds."""
+    completed: List[Optional[subprocess.CompletedProcess]] = [None] * len(keys)
+    queries = [{'query': q, 'allowed_domains': d} for q, d in keys]
+    env_overrides = {k: v for k, v in (('ACE_ORG_ID', org), ('ACE_PROJECT_ID', project)) if v}
+    if ace_cli_worker.worker_enabled():
+        try:
+            completed = ace_cli_worker.search_batch(queries, timeout, env_overrides)
+        except (ace_cli_worker.WorkerUnavailable, subprocess.TimeoutExpired, OSError):
+            pass  # one-shot fallback below
+
+    if None in completed:
+        def one_shot(key: tuple) -> Optional[subprocess.CompletedProcess]:
+            argv, stdin = ace_cli_worker.search_argv(*key)
+            try:
+                return subprocess.run([CLI_CMD, *argv], input=stdin.encode('utf-8'),
+                                      capture_output=True, timeout=timeout,
+                                      env=dict(os.environ, **env_overrides))
+            except (subprocess.TimeoutExpired, OSError):
+                return None
+
+        if len(keys) == 1:
+            completed = [one_shot(keys[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(keys), MAX_PARALLEL_SEARCHES)) as pool:
+                completed = list(pool.map(one_shot, keys))
+
+    texts = []
+    for (query, domains), result in zip(keys, completed):
+        # errors='ignore' matches the wrappers' `iconv -c` sanitisation
+        text = (result.stdout.decode('utf-8', errors='ignore')
+                if result is not None and result.stdout else '')
+        if result is not None and result.returncode == 0 and text:
+            try:
+                response = json.loads(text)
+                if isinstance(response, dict):
+                    ace_search_cache.put(query, text, org, project, allowed_domains=domains)
+                    ace_pattern_index.upsert_patterns(response.get('similar_patterns'), org, project)
+            except json.JSONDecodeError:
+                pass
+        texts.append(text)
+    return texts
+
+
 def recall_session(session_id: str, org: str = None, project: str = None) -> Optional[Dict[str, Any]]:
     """
     Recall pinned patterns from session storage (v1.0.11+)
@@ -178,18 +398,11 @@ def recall_session(session_id: str, org: str = None, project: str = None) -> Opt
         }
     """
     try:
-        # Build environment with context
-        env = os.environ.copy()
-        if org:
-            env['ACE_ORG_ID'] = org
-        if project:
-            env['ACE_PROJECT_ID'] = project
-
-        result = subprocess.run(
-            [CLI_CMD, 'cache', 'recall', '--session', session_id, '--json'],
-            capture_output=True,
+        result = _run_cli(
+            ['cache', 'recall', '--session', session_id, '--json'],
             timeout=5,  # Fast recall, should be <10ms
-            env=env
+            org=org,
+            project=project
         )
 
         if result.returncode != 0:
@@ -202,7 +415,7 @@ def recall_session(session_id: str, org: str = None, project: str = None) -> Opt
         return None
 
 
-def check_auth_status(warn_threshold_hours: float = 2.0) -> Optional[str]:
+def check_auth_status(warn_threshold_hours: float = 2.0, timeout: float = 5) -> Optional[str]:
     """
     Check ACE authentication status - WARNING UX v5.4.21
 
@@ -219,6 +432,7 @@ def check_auth_status(warn_threshold_hours: float = 2.0) -> Optional[str]:
     Args:
         warn_threshold_hours: Only used for idle detection (default: 2)
                               Ignored for active users (sliding window handles it)
+        timeout: Seconds to wait for `ace-cli whoami` on a cache miss
 
     Returns:
         Warning message string if auth issues detected, None if OK
@@ -234,27 +448,29 @@ def check_auth_status(warn_threshold_hours: float = 2.0) -> Optional[str]:
         - Check last_used_at for idle detection
         - Only warn for: hard cap, idle+expiring, or actual expiration
 
+    v6.5.0: The whoami payload is cached in $XDG_CACHE_HOME/ace/ (see
+    ace_cli_cache.py); a hit skips the ace-cli spawn entirely.
+
     Note:
         Non-blocking - returns None on any error to avoid breaking workflow.
         ace-cli auto-refreshes tokens via SDK Core's ensureValidToken().
     """
     try:
-        result = subprocess.run(
-            [CLI_CMD, 'whoami', '--json'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-
-        # v5.4.21 FIX: Parse stdout regardless of returncode
-        # The CLI returns valid JSON even with exit code 1 when not authenticated
-        # Example: returncode=1, stdout='{"authenticated":false,"message":"Not logged in"}'
-        data = None
-        if result.stdout:
-            try:
-                data = json.loads(result.stdout)
-            except json.JSONDecodeError:
-                pass
+        result = None
+        data = ace_cli_cache.get_cached_whoami()
+        if data is None:
+            result = _run_cli(['whoami', '--json'], timeout=timeout, text=True)
+
+            # v5.4.21 FIX: Parse stdout regardless of returncode
+            # The CLI returns valid JSON even with exit code 1 when not authenticated
+            # Example: returncode=1, stdout='{"authenticated":false,"message":"Not logged in"}'
+            if result.stdout:
+                try:
+                    data = json.loads(result.stdout)
+                except json.JSONDecodeError:
+                    pass
+            if isinstance(data, dict):
+                ace_cli_cache.store_whoami(data)
 
         if data:
             if not data.get('authenticated', False):
@@ -309,7 +525,7 @@ def check_auth_status(warn_threshold_hours: float = 2.0) -> Optional[str]:
                 if 'expired' in token_status.lower():
                     return "⚠️ [ACE] Session expired. Run /ace-login to re-authenticate."
 
-        elif result.returncode != 0:
+        elif result is not None and result.returncode != 0:
             # CLI failed and no valid JSON - check stderr for auth errors
             stderr = result.stderr or ''
             if '401' in stderr or 'unauthorized' in stderr.lower() or 'expired' in stderr.lower():
@@ -341,17 +557,13 @@ def ensure_authenticated() -> tuple:
         or utility functions to fail fast with a clear message.
     """
     try:
-        result = subprocess.run(
-            [CLI_CMD, 'whoami', '--json'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
+        result = _run_cli(['whoami', '--json'], timeout=5, text=True)
 
         # Parse stdout regardless of returncode (CLI returns JSON even on error)
         if result.stdout:
             try:
                 data = json.loads(result.stdout)
+                ace_cli_cache.store_whoami(data)
                 if data.get('authenticated', False):
                     return (True, None)
                 else:
@@ -369,10 +581,13 @@ def ensure_authenticated() -> tuple:
         return (False, "❌ [ACE] ace-cli not found. Run: npm install -g @ace-sdk/cli")
 
 
-def check_session_pinning_available() -> bool:
+def check_session_pinning_available(timeout: float = 5) -> bool:
     """
     Check if ace-cli CLI supports session pinning (v1.0.11+)
 
+    Args:
+        timeout: Seconds to wait for `ace-cli --version` on a cache miss
+
     Returns:
         True if session pinning available, False otherwise
 
@@ -383,18 +598,22 @@ def check_session_pinning_available() -> bool:
         else:
             # Gracefully degrade
             run_search(query)
+
+    v6.5.0: Answered from $XDG_CACHE_HOME/ace/cli-version.json while the
+    ace-cli binary is unchanged (see ace_cli_cache.py).
     """
     try:
-        result = subprocess.run(
-            [CLI_CMD, '--version'],
-            capture_output=True,
-            timeout=5
-        )
+        cached = ace_cli_cache.get_cached_version()
+        if cached:
+            return bool(cached['features'].get('session_pinning', False))
+
+        result = _run_cli(['--version'], timeout=timeout)
 
         if result.returncode != 0:
             return False
 
         version_str = result.stdout.decode('utf-8').strip()
+        ace_cli_cache.store_version(version_str)
 
         # Parse version (e.g., "1.0.11" -> [1, 0, 11])
         parts = version_str.split('.')
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+ACE CLI Cache - ace-cli version and auth status shared across hooks.
+
+v6.5.0: UserPromptSubmit used to spawn `ace-cli --version` and
+`ace-cli whoami --json` on every prompt, and SessionStart repeated both.
+Results now live in $XDG_CACHE_HOME/ace/ (default ~/.cache/ace/):
+
+    cli-version.json  {"binary": {"path", "mtime", "size"}, "version", "features"}
+    cli-whoami.json   {"binary": ..., "config": {"mtime", "size"},
+                       "fetched_at", "expires_at", "data": {whoami payload}}
+
+Both files are keyed on the resolved ace-cli binary (path + mtime + size), so
+an upgrade invalidates them. The whoami entry is also keyed on
+~/.config/ace/config.json, which /ace-login and `ace-cli logout` rewrite, and
+expires after ACE_CLI_CACHE_AUTH_TTL seconds or earlier when the token nears
+expiry. Writes are atomic (temp file + rename). scripts/lib/ace_cli_cache.sh
+reads and writes the same files from bash.
+
+ACE_CLI_CACHE=0 disables the cache.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+CLI_CMD = 'ace-cli'
+VERSION_FILE = 'cli-version.json'
+WHOAMI_FILE = 'cli-whoami.json'
+
+AUTH_TTL_SECS = int(os.environ.get('ACE_CLI_CACHE_AUTH_TTL', '600'))
+UNAUTH_TTL_SECS = 60
+# Stop serving a cached whoami this long before the token expires, so the
+# expiry warnings in check_auth_status() (2h threshold) still see live data.
+EXPIRY_MARGIN_SECS = 2 * 3600
+
+# Session pinning needs ace-cli v1.0.11+
+SESSION_PINNING_MIN = (1, 0, 11)
+
+
+def cache_enabled() -> bool:
+    return os.environ.get('ACE_CLI_CACHE', '1') != '0'
+
+
+def get_cache_dir() -> Path:
+    base = os.environ.get('XDG_CACHE_HOME') or str(Path.home() / '.cache')
+    return Path(base) / 'ace'
+
+
+def get_config_path() -> Path:
+    base = os.environ.get('XDG_CONFIG_HOME') or str(Path.home() / '.config')
+    return Path(base) / 'ace' / 'config.json'
+
+
+def _file_fingerprint(path: str) -> Optional[Dict[str, int]]:
+    # Whole seconds so bash (`stat -L -c %Y`) computes the same key
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return {'mtime': int(st.st_mtime), 'size': st.st_size}
+
+
+def binary_fingerprint() -> Optional[Dict[str, Any]]:
+    """ace-cli as found on PATH (symlinks followed for mtime/size), or None."""
+    path = shutil.which(CLI_CMD)
+    if not path:
+        return None
+    fingerprint = _file_fingerprint(path)
+    if fingerprint is None:
+        return None
+    return {'path': path, **fingerprint}
+
+
+def config_fingerprint() -> Dict[str, int]:
+    return _file_fingerprint(str(get_config_path())) or {'mtime': 0, 'size': 0}
+
+
+def _read(name: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(get_cache_dir() / name, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        return entry if isinstance(entry, dict) else None
+    except (OSError, ValueError):
+        return None
+
+
+def _write(name: str, entry: Dict[str, Any]) -> None:
+    cache_dir = get_cache_dir()
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, prefix=f'.{name}.')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp, cache_dir / name)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        pass  # Cache is best-effort
+
+
+def parse_version(version_str: str) -> Optional[tuple]:
+    parts = (version_str or '').strip().split('.')
+    if len(parts) < 3:
+        return None
+    try:
+        return tuple(int(p) for p in parts[:3])
+    except ValueError:
+        return None
+
+
+def get_cached_version() -> Optional[Dict[str, Any]]:
+    """{'version': '1.0.11', 'features': {...}} if the binary is unchanged."""
+    if not cache_enabled():
+        return None
+    entry = _read(VERSION_FILE)
+    binary = binary_fingerprint()
+    if not entry or binary is None or entry.get('binary') != binary:
+        return None
+    return {'version': entry.get('version'), 'features': entry.get('features') or {}}
+
+
+def store_version(version_str: str) -> None:
+    binary = binary_fingerprint()
+    if not cache_enabled() or binary is None:
+        return
+    version = parse_version(version_str)
+    _write(VERSION_FILE, {
+        'binary': binary,
+        'version': version_str.strip(),
+        'features': {'session_pinning': bool(version and version >= SESSION_PINNING_MIN)},
+    })
+
+
+def _whoami_ttl(data: Dict[str, Any]) -> int:
+    if not data.get('authenticated', False):
+        return min(UNAUTH_TTL_SECS, AUTH_TTL_SECS)
+    expires_in = data.get('token_expires_in')
+    if isinstance(expires_in, (int, float)):
+        return int(max(0, min(AUTH_TTL_SECS, expires_in - EXPIRY_MARGIN_SECS)))
+    return AUTH_TTL_SECS
+
+
+def get_cached_whoami() -> Optional[Dict[str, Any]]:
+    """
+    Cached `whoami --json` payload, or None on a miss.
+
+    token_expires_in is aged by the time since the payload was fetched.
+    """
+    if not cache_enabled():
+        return None
+    entry = _read(WHOAMI_FILE)
+    if not entry or entry.get('expires_at', 0) <= time.time():
+        return None
+    if entry.get('binary') != binary_fingerprint() or entry.get('config') != config_fingerprint():
+        return None
+    data = dict(entry.get('data') or {})
+    if isinstance(data.get('token_expires_in'), (int, float)):
+        data['token_expires_in'] -= int(time.time() - entry.get('fetched_at', time.time()))
+    return data
+
+
+def store_whoami(data: Dict[str, Any]) -> None:
+    binary = binary_fingerprint()
+    if not cache_enabled() or binary is None or not isinstance(data, dict):
+        return
+    ttl = _whoami_ttl(data)
+    if ttl <= 0:
+        return
+    now = int(time.time())
+    _write(WHOAMI_FILE, {
+        'binary': binary,
+        'config': config_fingerprint(),
+        'fetched_at': now,
+        'expires_at': now + ttl,
+        'data': data,
+    })
+
+
+def invalidate(auth_only: bool = False) -> None:
+    names = [WHOAMI_FILE] if auth_only else [WHOAMI_FILE, VERSION_FILE]
+    for name in names:
+        try:
+            (get_cache_dir() / name).unlink()
+        except OSError:
+            pass
+
+
+def main():
+    """CLI: ace_cli_cache.py invalidate [--auth-only] | show"""
+    args = sys.argv[1:]
+    if args[:1] == ['invalidate']:
+        invalidate(auth_only='--auth-only' in args)
+    elif args[:1] == ['show']:
+        print(json.dumps({'version': get_cached_version(), 'whoami': get_cached_whoami()}, indent=2))
+    else:
+        print(main.__doc__, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+ACE CLI Worker - one long-lived ace-cli child instead of a process per call.
+
+v6.5.0 (opt-in, ACE_CLI_WORKER=1): ace_cli.py sends its CLI invocations to a
+worker speaking line-delimited JSON-RPC 2.0 over stdio, so a UserPromptSubmit
+that needs `--version`, `whoami` and `search` pays process startup once. That
+only holds for a worker that serves the calls itself (a CLI stdio server); the
+bundled stand-in still starts a one-shot ace-cli per exec. The worker belongs
+to the hook process: ace-hookd runs each prompt in a forked child that exits,
+so nothing stays warm across prompts.
+
+Protocol (one JSON object per line, responses may arrive out of order):
+
+    -> {"jsonrpc": "2.0", "id": 1, "method": "hello", "params": {}}
+    <- {"jsonrpc": "2.0", "id": 1, "result": {"protocol": 1}}
+    -> {"jsonrpc": "2.0", "id": 2, "method": "exec",
+        "params": {"argv": ["search", "--stdin", "--json"], "stdin": "...",
+                   "env": {"ACE_PROJECT_ID": "prj_..."}, "timeout": 30}}
+    <- {"jsonrpc": "2.0", "id": 2,
+        "result": {"returncode": 0, "stdout": "...", "stderr": ""}}
+    <- {"jsonrpc": "2.0", "id": 3, "error": {"code": -32001, "message": "..."}}
+    -> {"jsonrpc": "2.0", "id": 4, "method": "search_batch",
+        "params": {"queries": [{"query": "...", "allowed_domains": "auth"}, ...],
+                   "env": {...}, "timeout": 4}}
+    <- {"jsonrpc": "2.0", "id": 4,
+        "result": {"results": [{"returncode": 0, "stdout": "...", "stderr": ""}, ...]}}
+
+`search_batch` answers several searches in one round-trip (results in query
+order); a worker that can query the backend once for all of them should.
+
+ACE_CLI_WORKER_CMD selects the worker (e.g. a Node ace-cli build with a stdio
+server). The default is the stand-in below (`python3 ace_cli_worker.py`): it
+runs each exec (and each search of a batch) as a one-shot ace-cli,
+concurrently, and answers `--version` from memory until the binary changes.
+`python3 ace_cli_worker.py --local` answers searches from the local pattern
+index (ace_pattern_index.py) instead, with no ace-cli or server involved.
+
+The client multiplexes concurrent calls by id, enforces per-request timeouts,
+respawns a crashed worker (up to MAX_RESPAWNS) and raises WorkerUnavailable
+so callers fall back to subprocess.run.
+"""
+
+import atexit
+import itertools
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+
+PROTOCOL_VERSION = 1
+ERROR_NOT_FOUND = -32001
+ERROR_TIMEOUT = -32002
+ERROR_INTERNAL = -32603
+
+START_TIMEOUT_SECS = float(os.environ.get('ACE_CLI_WORKER_START_TIMEOUT', '3'))
+MAX_RESPAWNS = 3
+
+CLI_CMD = 'ace-cli'
+
+
+class WorkerUnavailable(Exception):
+    """Worker could not be started (or crashed): use the one-shot path."""
+
+
+def worker_enabled() -> bool:
+    return os.environ.get('ACE_CLI_WORKER', '0') == '1'
+
+
+def get_worker_cmd() -> List[str]:
+    custom = os.environ.get('ACE_CLI_WORKER_CMD')
+    if custom:
+        return shlex.split(custom)
+    return [sys.executable, os.path.abspath(__file__)]
+
+
+class CliWorker:
+    """Client side of one worker child; safe to share between threads."""
+
+    def __init__(self, cmd: List[str]):
+        self.cmd = cmd
+        self.proc: Optional[subprocess.Popen] = None
+        self.owner_pid = None
+        self.respawns = 0
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, list] = {}  # id -> [threading.Event, response]
+        self._eof = True  # reader saw the worker's stdout close (or never started)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+
+    def _alive(self) -> bool:
+        # _eof catches an exited worker before poll() has reaped it
+        return (self.proc is not None and not self._eof and self.proc.poll() is None
+                and self.owner_pid == os.getpid())
+
+    def _start(self) -> None:
+        if self.owner_pid == os.getpid():
+            if self.respawns >= MAX_RESPAWNS:
+                raise WorkerUnavailable('worker keeps crashing')
+            self.respawns += 1
+        try:
+            self.proc = subprocess.Popen(
+                self.cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL, bufsize=0)
+        except OSError as e:
+            self.proc = None
+            raise WorkerUnavailable(str(e))
+        self.owner_pid = os.getpid()
+        self._eof = False
+        threading.Thread(target=self._read_loop, args=(self.proc,), daemon=True).start()
+
+        try:
+            hello = self._call_started('hello', {}, START_TIMEOUT_SECS)
+        except subprocess.TimeoutExpired:
+            hello = None
+        if not isinstance(hello, dict) or hello.get('protocol') != PROTOCOL_VERSION:
+            self.close()
+            raise WorkerUnavailable(f'unsupported worker protocol: {hello!r}')
+
+    def _read_loop(self, proc: subprocess.Popen) -> None:
+        for line in proc.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            with self._lock:
+                slot = self._pending.pop(message.get('id'), None)
+            if slot:
+                slot[1] = message
+                slot[0].set()
+
+        # EOF: the worker exited; fail everything still waiting on it
+        with self._lock:
+            if proc is self.proc:
+                self._eof = True
+            orphans = list(self._pending.values())
+            self._pending.clear()
+        for slot in orphans:
+            slot[0].set()
+
+    def _call_started(self, method: str, params: dict, timeout: float) -> Any:
+        request_id = next(self._ids)
+        slot = [threading.Event(), None]
+        with self._lock:
+            if self._eof:
+                raise WorkerUnavailable('worker exited')
+            self._pending[request_id] = slot
+        line = json.dumps({'jsonrpc': '2.0', 'id': request_id,
+                           'method': method, 'params': params}) + '\n'
+        try:
+            with self._write_lock:
+                self.proc.stdin.write(line.encode('utf-8'))
+        except (OSError, ValueError):
+            with self._lock:
+                self._pending.pop(request_id, None)
+            raise WorkerUnavailable('worker stdin closed')
+
+        if not slot[0].wait(timeout):
+            with self._lock:
+                self._pending.pop(request_id, None)
+            raise subprocess.TimeoutExpired(method, timeout)
+
+        response = slot[1]
+        if response is None:
+            raise WorkerUnavailable('worker exited mid-request')
+        if 'error' in response:
+            error = response['error'] or {}
+            if error.get('code') == ERROR_NOT_FOUND:
+                raise FileNotFoundError(error.get('message', CLI_CMD))
+            if error.get('code') == ERROR_TIMEOUT:
+                raise subprocess.TimeoutExpired(method, timeout)
+            raise WorkerUnavailable(error.get('message', 'worker error'))
+        return response.get('result')
+
+    def call(self, method: str, params: dict, timeout: float) -> Any:
+        with self._start_lock:
+            if not self._alive():
+                self._start()
+        return self._call_started(method, params, timeout)
+
+    def close(self) -> None:
+        proc, self.proc = self.proc, None
+        if proc is None or self.owner_pid != os.getpid():
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=1)
+        except Exception:
+            proc.kill()
+
+
+_worker: Optional[CliWorker] = None
+_worker_lock = threading.Lock()
+
+
+def search_argv(query: str, allowed_domains: str = None) -> tuple:
+    """(argv, stdin) for one `ace-cli search`, as the bash wrappers ran it."""
+    if allowed_domains:
+        return ['search', '--stdin', '--json', '--allowed-domains', allowed_domains], query + '\n'
+    return ['search', '--stdin', '--json'], query
+
+
+def get_worker() -> CliWorker:
+    """Process-wide worker (a forked child gets its own, never the parent's)."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or (_worker.owner_pid not in (None, os.getpid())):
+            _worker = CliWorker(get_worker_cmd())
+        return _worker
+
+
+@atexit.register
+def _close_worker() -> None:
+    if _worker is not None:
+        _worker.close()
+
+
+def run_cli(argv: List[str], stdin: bytes = None, timeout: float = 30,
+            env: Dict[str, str] = None) -> subprocess.CompletedProcess:
+    """
+    Run `ace-cli <argv>` through the worker, shaped like subprocess.run().
+
+    Args:
+        argv: Arguments after the ace-cli command
+        stdin: Bytes for the CLI's stdin
+        timeout: Per-request timeout in seconds
+        env: Environment overrides for this call (e.g. ACE_PROJECT_ID)
+
+    Raises:
+        subprocess.TimeoutExpired, FileNotFoundError (as subprocess.run would),
+        WorkerUnavailable when the caller should fall back to one-shot
+    """
+    params = {'argv': argv, 'timeout': timeout, 'env': env or {},
+              'stdin': stdin.decode('utf-8', 'replace') if stdin else ''}
+    # Grace on top of the CLI timeout so the worker reports it first
+    result = get_worker().call('exec', params, timeout + 1)
+    return subprocess.CompletedProcess(
+        [CLI_CMD, *argv], result.get('returncode', 1),
+        (result.get('stdout') or '').encode('utf-8'),
+        (result.get('stderr') or '').encode('utf-8'))
+
+
+def search_batch(queries: List[Dict[str, Any]], timeout: float = 30,
+                 env: Dict[str, str] = None) -> List[subprocess.CompletedProcess]:
+    """
+    Run several searches in one worker round-trip, shaped like run_cli().
+
+    Args:
+        queries: [{'query': ..., 'allowed_domains': ... or None}, ...]
+        timeout: Timeout for the whole batch in seconds
+        env: Environment overrides for every search (e.g. ACE_PROJECT_ID)
+
+    Raises:
+        subprocess.TimeoutExpired, FileNotFoundError,
+        WorkerUnavailable (also when the worker predates search_batch)
+    """
+    params = {'queries': [{'query': q.get('query') or '',
+                           'allowed_domains': q.get('allowed_domains') or None}
+                          for q in queries],
+              'timeout': timeout, 'env': env or {}}
+    result = get_worker().call('search_batch', params, timeout + 1)
+    results = (result or {}).get('results')
+    if not isinstance(results, list) or len(results) != len(queries):
+        raise WorkerUnavailable('malformed search_batch result')
+    completed = []
+    for query, item in zip(queries, results):
+        item = item if isinstance(item, dict) else {}
+        completed.append(subprocess.CompletedProcess(
+            [CLI_CMD, *search_argv(query.get('query') or '', query.get('allowed_domains'))[0]],
+            item.get('returncode', 1),
+            (item.get('stdout') or '').encode('utf-8'),
+            (item.get('stderr') or '').encode('utf-8')))
+    return completed
+
+
+# =============================================================================
+# Stand-in worker (default ACE_CLI_WORKER_CMD)
+# =============================================================================
+
+def _version_key() -> Optional[tuple]:
+    path = shutil.which(CLI_CMD)
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.realpath(path), stat.st_mtime_ns)
+
+
+def _local_search(argv: List[str], stdin: str, env: Dict[str, str]) -> dict:
+    """Answer `search` argv from the local pattern index (--local stand-in)."""
+    import ace_pattern_index
+    domains = argv[argv.index('--allowed-domains') + 1] if '--allowed-domains' in argv else None
+    response = ace_pattern_index.search(stdin.strip(), env.get('ACE_ORG_ID'),
+                                        env.get('ACE_PROJECT_ID'))
+    if response is None:
+        return {'returncode': 1, 'stdout': '', 'stderr': 'local pattern index unavailable'}
+    if domains:
+        allowed = {d.strip().lower() for d in domains.split(',')}
+        response['similar_patterns'] = [p for p in response['similar_patterns']
+                                        if str(p.get('domain', '')).lower() in allowed]
+        response['count'] = len(response['similar_patterns'])
+    return {'returncode': 0, 'stdout': json.dumps(response), 'stderr': ''}
+
+
+def serve_stdio(local: bool = False) -> None:
+    """Answer requests from stdin until EOF, each exec on its own thread."""
+    out_lock = threading.Lock()
+    version_cache: Dict[tuple, dict] = {}
+
+    def reply(message: dict) -> None:
+        data = (json.dumps(message) + '\n').encode('utf-8')
+        with out_lock:
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+
+    def run_one(params: dict) -> dict:
+        """One CLI call's result dict; raises FileNotFoundError / TimeoutExpired."""
+        argv = list(params.get('argv') or [])
+        env = dict(os.environ, **(params.get('env') or {}))
+        if local and argv[:1] == ['search']:
+            return _local_search(argv, params.get('stdin') or '', env)
+        key = _version_key() if argv == ['--version'] else None
+        if key and key in version_cache:
+            return version_cache[key]
+        completed = subprocess.run(
+            [CLI_CMD, *argv], input=(params.get('stdin') or '').encode('utf-8'),
+            capture_output=True, timeout=params.get('timeout') or 30, env=env)
+        result = {
+            'returncode': completed.returncode,
+            'stdout': completed.stdout.decode('utf-8', 'replace'),
+            'stderr': completed.stderr.decode('utf-8', 'replace'),
+        }
+        if key and completed.returncode == 0:
+            version_cache[key] = result
+        return result
+
+    def execute(request_id: Any, params: dict) -> None:
+        try:
+            result = run_one(params)
+        except FileNotFoundError as e:
+            reply({'jsonrpc': '2.0', 'id': request_id,
+                   'error': {'code': ERROR_NOT_FOUND, 'message': str(e)}})
+            return
+        except subprocess.TimeoutExpired:
+            reply({'jsonrpc': '2.0', 'id': request_id,
+                   'error': {'code': ERROR_TIMEOUT, 'message': 'timeout'}})
+            return
+        reply({'jsonrpc': '2.0', 'id': request_id, 'result': result})
+
+    def execute_batch(request_id: Any, params: dict) -> None:
+        queries = params.get('queries') or []
+        results: List[Optional[dict]] = [None] * len(queries)
+
+        def search(index: int, query: dict) -> None:
+            argv, stdin = search_argv(query.get('query') or '', query.get('allowed_domains'))
+            try:
+                results[index] = run_one({'argv': argv, 'stdin': stdin, 'env': params.get('env'),
+                                          'timeout': params.get('timeout')})
+            except FileNotFoundError as e:
+                results[index] = {'returncode': 127, 'stdout': '', 'stderr': str(e)}
+            except subprocess.TimeoutExpired:
+                results[index] = {'returncode': -1, 'stdout': '', 'stderr': 'timeout'}
+
+        threads = [threading.Thread(target=search, args=item, daemon=True)
+                   for item in enumerate(queries)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        reply({'jsonrpc': '2.0', 'id': request_id, 'result': {'results': results}})
+
+    for line in sys.stdin.buffer:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            continue
+        request_id, method = request.get('id'), request.get('method')
+        if method == 'hello':
+            reply({'jsonrpc': '2.0', 'id': request_id, 'result': {'protocol': PROTOCOL_VERSION}})
+        elif method in ('exec', 'search_batch'):
+            threading.Thread(target=execute if method == 'exec' else execute_batch,
+                             args=(request_id, request.get('params') or {}),
+                             daemon=True).start()
+        else:
+            reply({'jsonrpc': '2.0', 'id': request_id,
+                   'error': {'code': ERROR_INTERNAL, 'message': f'unknown method {method}'}})
+
+
+if __name__ == '__main__':
+    serve_stdio(local='--local' in sys.argv[1:])
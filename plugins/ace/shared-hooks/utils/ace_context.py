@@ -6,21 +6,29 @@ import os
 from pathlib import Path
 from typing import Optional, Dict
 
+# Parsed settings keyed by absolute path -> (mtime_ns, size, context).
+# Only matters in long-lived processes (ace-hookd); one-shot hooks parse once anyway.
+_CONTEXT_CACHE: Dict[str, tuple] = {}
 
-def get_context() -> Optional[Dict[str, str]]:
+
+def get_context(working_dir: str = None) -> Optional[Dict[str, str]]:
     """
     Read orgId and projectId from .claude/settings.json
 
     Falls back to environment variables if file not found.
+    Parsed results are cached per file and re-read when its mtime/size changes.
 
     Supports two formats:
     1. Direct: {"orgId": "...", "projectId": "..."}
     2. Env wrapper: {"env": {"ACE_ORG_ID": "...", "ACE_PROJECT_ID": "..."}}
 
+    Args:
+        working_dir: Project directory (default: current directory)
+
     Returns:
         Dict with 'org' and 'project' keys, or None if not found
     """
-    settings_file = Path('.claude/settings.json')
+    settings_file = Path(working_dir or '.') / '.claude/settings.json'
 
     # Try reading from file first
     if not settings_file.exists():
@@ -36,6 +44,23 @@ def get_context() -> Optional[Dict[str, str]]:
 
         return None
 
+    try:
+        cache_key = str(settings_file.resolve())
+        st = settings_file.stat()
+        cached = _CONTEXT_CACHE.get(cache_key)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return dict(cached[2]) if cached[2] else None
+
+        context = _parse_settings(settings_file)
+        _CONTEXT_CACHE[cache_key] = (st.st_mtime_ns, st.st_size, context)
+        return dict(context) if context else None
+
+    except (json.JSONDecodeError, IOError):
+        return None
+
+
+def _parse_settings(settings_file: Path) -> Optional[Dict[str, str]]:
+    """Parse orgId/projectId out of a settings.json file."""
     try:
         settings = json.loads(settings_file.read_text())
 
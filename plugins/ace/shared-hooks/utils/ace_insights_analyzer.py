@@ -11,11 +11,17 @@ Functions:
     get_top_patterns()      - Find most-used pattern IDs
     calculate_trends()      - Compare current vs previous period
     format_insights_report() - Human-readable report string
+    collect_task_data_for_evaluation() - /ace-insights: one streaming pass
+                                         over the --hours window (v6.5.0)
+    EventTable              - Parse-once columnar view every function accepts
 """
 
+from array import array
+from bisect import bisect_left
 from collections import defaultdict
 from datetime import datetime, timezone, timedelta
-from typing import Any, Dict, List, Optional
+from math import inf, isnan, nan
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
 
 def _format_duration(seconds: int) -> str:
@@ -47,8 +53,102 @@ def _parse_timestamp(ts_str: str) -> datetime:
     return datetime.fromisoformat(ts_str).astimezone(timezone.utc)
 
 
+def _epoch_seconds(ts: Any) -> float:
+    """Epoch seconds of an entry timestamp; NaN when missing or invalid."""
+    if not ts:
+        return nan
+    try:
+        return _parse_timestamp(ts).timestamp()
+    except (ValueError, TypeError, AttributeError):
+        return nan
+
+
+def _format_epoch(seconds: float) -> str:
+    """Inverse of _epoch_seconds, in the "...Z" form the reports use."""
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _elapsed(start: float, end: float) -> float:
+    """end - start, rounded to the microsecond resolution of the log timestamps."""
+    return round(end - start, 6)
+
+
+class EventTable:
+    """
+    Parse-once columnar view of relevance log entries (v6.5.0).
+
+    Every analyzer used to re-parse each ISO timestamp itself: dedup parsed
+    each execution and every execution it walked back over, then sorting,
+    clustering, duration and pattern windows parsed the same strings again.
+    An EventTable parses each timestamp once, in one pass over the entries:
+
+        times     epoch seconds (array of doubles; NaN = missing or invalid)
+        events    interned event-name codes (event_names[code] -> name)
+        sessions  interned session_id codes (session_names[code] -> id)
+        rows      the payload dicts themselves, by reference
+
+    All analyzer functions accept an EventTable wherever they take a list of
+    entries. Iterating a table yields its rows, so list-based callers keep
+    working; build one with EventTable(entries) and pass it to each of them.
+    The deduplicated task order is derived once per table and reused.
+    """
+
+    __slots__ = ("rows", "times", "events", "sessions", "event_names",
+                 "session_names", "_event_codes", "_session_codes", "_derived")
+
+    def __init__(self, entries: Iterable[Dict[str, Any]] = ()):
+        self.rows: List[Dict[str, Any]] = []
+        self.times = array("d")
+        self.events = array("l")
+        self.sessions = array("l")
+        self.event_names: List[Any] = []
+        self.session_names: List[Any] = []
+        self._event_codes: Dict[Any, int] = {}
+        self._session_codes: Dict[Any, int] = {}
+        self._derived: Dict[str, Any] = {}  # cleared by append()
+        for entry in entries:
+            self.append(entry)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.rows)
+
+    def append(self, entry: Dict[str, Any], epoch: Optional[float] = None) -> float:
+        """Add one entry (epoch: its already-parsed time). Returns the epoch."""
+        if epoch is None:
+            epoch = _epoch_seconds(entry.get("timestamp"))
+        if self._derived:
+            self._derived.clear()
+        self.rows.append(entry)
+        self.times.append(epoch)
+        self.events.append(_intern(self._event_codes, self.event_names, entry.get("event")))
+        # "" is what deduplication has always compared missing session_ids as
+        self.sessions.append(_intern(self._session_codes, self.session_names,
+                                     entry.get("session_id", "")))
+        return epoch
+
+    def event_code(self, name: Any) -> int:
+        """Code of an event name, -1 when no row has it."""
+        return self._event_codes.get(name, -1)
+
+
+def _intern(codes: Dict[Any, int], names: List[Any], value: Any) -> int:
+    code = codes.get(value)
+    if code is None:
+        code = codes[value] = len(names)
+        names.append(value)
+    return code
+
+
+def as_event_table(entries: Iterable[Dict[str, Any]]) -> EventTable:
+    """The table itself, or a new EventTable built from a list of entries."""
+    return entries if isinstance(entries, EventTable) else EventTable(entries)
+
+
 def deduplicate_events(
-    entries: List[Dict[str, Any]], window_seconds: int = 30
+    entries: Iterable[Dict[str, Any]], window_seconds: int = 30
 ) -> tuple:
     """
     Remove near-duplicate execution events.
@@ -62,59 +162,61 @@ def deduplicate_events(
     if not entries:
         return [], 0
 
+    table = as_event_table(entries)
+    kept, dup_count = _dedup_rows(table, window_seconds)
+    return [table.rows[i] for i in kept], dup_count
+
+
+def _dedup_rows(table: EventTable, window_seconds: int = 30) -> tuple:
+    """
+    deduplicate_events() on row indices.
+
+    Returns:
+        Tuple of (kept row indices in timestamp-string order, duplicate_count)
+    """
+    rows, times = table.rows, table.times
+    events, sessions = table.events, table.sessions
+    execution = table.event_code("execution")
+
     # Sort by timestamp first
-    sorted_entries = sorted(entries, key=lambda e: e.get("timestamp", ""))
+    order = sorted(range(len(rows)), key=lambda i: rows[i].get("timestamp", ""))
 
-    cleaned: List[Dict[str, Any]] = []
+    kept: List[int] = []
+    # Kept executions per session: the only rows the backward walk compares
+    session_executions: Dict[int, List[int]] = defaultdict(list)
     dup_count = 0
 
-    for entry in sorted_entries:
-        if entry.get("event") != "execution":
-            cleaned.append(entry)
+    for i in order:
+        if events[i] != execution:
+            kept.append(i)
             continue
 
         # Check if this is a duplicate of a recent execution
         is_dup = False
-        sid = entry.get("session_id", "")
-        tools = entry.get("tools_executed", -1)
-        ts_str = entry.get("timestamp", "")
-
-        if ts_str:
-            try:
-                ts = _parse_timestamp(ts_str)
-            except (ValueError, TypeError):
-                cleaned.append(entry)
-                continue
+        previous = session_executions[sessions[i]]
+        ts = times[i]
 
-            # Walk backwards through cleaned to find recent executions
-            for prev in reversed(cleaned):
-                if prev.get("event") != "execution":
-                    continue
-                if prev.get("session_id", "") != sid:
-                    continue
-                prev_ts_str = prev.get("timestamp", "")
-                if not prev_ts_str:
-                    continue
-                try:
-                    prev_ts = _parse_timestamp(prev_ts_str)
-                except (ValueError, TypeError):
+        if not isnan(ts):
+            tools = rows[i].get("tools_executed", -1)
+            for j in reversed(previous):
+                if isnan(times[j]):
                     continue
-                gap = abs((ts - prev_ts).total_seconds())
-                if gap > window_seconds:
+                if abs(_elapsed(times[j], ts)) > window_seconds:
                     break  # Too far apart, stop checking
-                if prev.get("tools_executed", -2) == tools:
+                if rows[j].get("tools_executed", -2) == tools:
                     is_dup = True
                     break
 
         if is_dup:
             dup_count += 1
         else:
-            cleaned.append(entry)
+            kept.append(i)
+            previous.append(i)
 
-    return cleaned, dup_count
+    return kept, dup_count
 
 
-def extract_pattern_names(entries: List[Dict[str, Any]]) -> Dict[str, str]:
+def extract_pattern_names(entries: Iterable[Dict[str, Any]]) -> Dict[str, str]:
     """
     Build mapping: pattern_id -> "domain / section" from search events.
 
@@ -140,7 +242,7 @@ def extract_pattern_names(entries: List[Dict[str, Any]]) -> Dict[str, str]:
 
 
 def split_into_tasks(
-    entries: List[Dict[str, Any]], gap_minutes: int = 30
+    entries: Iterable[Dict[str, Any]], gap_minutes: int = 30
 ) -> dict:
     """
     Split events into logical tasks based on time gaps.
@@ -159,10 +261,11 @@ def split_into_tasks(
             "duplicates_removed": 0,
         }
 
-    # Step 1: Deduplicate
-    cleaned, dup_count = deduplicate_events(entries)
+    # Step 1: Deduplicate, Step 2: Sort by timestamp
+    table = as_event_table(entries)
+    order, dup_count, pattern_names = _task_rows(table)
 
-    if not cleaned:
+    if not order:
         return {
             "tasks": [],
             "total_tasks": 0,
@@ -170,31 +273,68 @@ def split_into_tasks(
             "duplicates_removed": dup_count,
         }
 
-    # Step 2: Sort by timestamp
-    def _ts_key(e):
-        ts = e.get("timestamp", "")
-        try:
-            return _parse_timestamp(ts) if ts else datetime.min.replace(tzinfo=timezone.utc)
-        except (ValueError, TypeError):
-            return datetime.min.replace(tzinfo=timezone.utc)
+    tasks, search_only_count = _build_tasks(table, order, pattern_names, gap_minutes)
+    return {
+        "tasks": tasks,
+        "total_tasks": len(tasks) + search_only_count,
+        "search_only_count": search_only_count,
+        "duplicates_removed": dup_count,
+    }
+
+
+def _task_rows(table: EventTable) -> tuple:
+    """
+    Deduplicated row indices in time order (stable; untimed rows first),
+    cached on the table.
+
+    Returns:
+        Tuple of (order, duplicate_count, pattern names from the kept searches)
+    """
+    if "task_rows" not in table._derived:
+        kept, dup_count = _dedup_rows(table)
+        times = table.times
+        order = sorted(kept, key=lambda i: -inf if isnan(times[i]) else times[i])
+        table._derived["task_rows"] = (
+            order, dup_count, extract_pattern_names(table.rows[i] for i in kept))
+    return table._derived["task_rows"]
+
+
+def _build_tasks(
+    table: EventTable,
+    order: List[int],
+    pattern_names: Dict[str, str],
+    gap_minutes: int = 30,
+) -> tuple:
+    """
+    Cluster deduplicated, time-sorted rows (indices into table) into tasks.
+
+    Returns:
+        Tuple of (tasks, search_only_count)
+    """
+    if not order:
+        return [], 0
 
-    sorted_entries = sorted(cleaned, key=_ts_key)
+    rows, times, events = table.rows, table.times, table.events
+    search = table.event_code("search")
+    execution = table.event_code("execution")
 
     # Step 3: Walk entries, split into clusters by time gap
+    # (-inf - -inf is NaN, never > gap: untimed rows share the first cluster)
     gap_seconds = gap_minutes * 60
-    clusters: List[List[Dict[str, Any]]] = []
-    current_cluster: List[Dict[str, Any]] = [sorted_entries[0]]
+    clusters: List[List[int]] = []
+    current_cluster: List[int] = [order[0]]
+    prev_ts = -inf if isnan(times[order[0]]) else times[order[0]]
 
-    for i in range(1, len(sorted_entries)):
-        prev_ts = _ts_key(sorted_entries[i - 1])
-        curr_ts = _ts_key(sorted_entries[i])
-        gap = (curr_ts - prev_ts).total_seconds()
+    for i in order[1:]:
+        curr_ts = -inf if isnan(times[i]) else times[i]
+        gap = _elapsed(prev_ts, curr_ts)
+        prev_ts = curr_ts
 
         if gap > gap_seconds:
             clusters.append(current_cluster)
-            current_cluster = [sorted_entries[i]]
+            current_cluster = [i]
         else:
-            current_cluster.append(sorted_entries[i])
+            current_cluster.append(i)
 
     clusters.append(current_cluster)
 
@@ -203,12 +343,9 @@ def split_into_tasks(
     search_only_count = 0
     task_id = 0
 
-    # Build pattern names once
-    pattern_names = extract_pattern_names(cleaned)
-
     for cluster in clusters:
-        searches = [e for e in cluster if e.get("event") == "search"]
-        executions = [e for e in cluster if e.get("event") == "execution"]
+        searches = [rows[i] for i in cluster if events[i] == search]
+        executions = [rows[i] for i in cluster if events[i] == execution]
 
         has_execution = len(executions) > 0
 
@@ -255,30 +392,22 @@ def split_into_tasks(
 
         # Agent type: first non-main
         agent_type = "main"
-        for e in cluster:
-            at = e.get("agent_type")
+        for i in cluster:
+            at = rows[i].get("agent_type")
             if at and at != "main":
                 agent_type = at
                 break
         if agent_type == "main":
-            for e in cluster:
-                at = e.get("agent_type")
+            for i in cluster:
+                at = rows[i].get("agent_type")
                 if at:
                     agent_type = at
                     break
 
         # Duration from first to last event
-        timestamps = []
-        for e in cluster:
-            ts = e.get("timestamp")
-            if ts:
-                try:
-                    timestamps.append(_parse_timestamp(ts))
-                except (ValueError, TypeError):
-                    pass
-        timestamps.sort()
-        duration = int((timestamps[-1] - timestamps[0]).total_seconds()) if len(timestamps) >= 2 else 0
-        start_time = timestamps[0].isoformat().replace("+00:00", "Z") if timestamps else None
+        timestamps = sorted(times[i] for i in cluster if not isnan(times[i]))
+        duration = int(_elapsed(timestamps[0], timestamps[-1])) if len(timestamps) >= 2 else 0
+        start_time = _format_epoch(timestamps[0]) if timestamps else None
 
         # Average confidence from searches
         confidences = [s.get("avg_confidence", 0) for s in searches if s.get("avg_confidence")]
@@ -302,17 +431,12 @@ def split_into_tasks(
             "executions": len(executions),
         })
 
-    return {
-        "tasks": tasks,
-        "total_tasks": len(tasks) + search_only_count,
-        "search_only_count": search_only_count,
-        "duplicates_removed": dup_count,
-    }
+    return tasks, search_only_count
 
 
 
 def extract_task_data_for_evaluation(
-    entries: List[Dict[str, Any]],
+    entries: Iterable[Dict[str, Any]],
     hours: int = 24,
 ) -> dict:
     """
@@ -322,88 +446,180 @@ def extract_task_data_for_evaluation(
     how helpful ACE patterns were during each task.
 
     Args:
-        entries: List of JSONL log entries (dicts).
+        entries: JSONL log entries (dicts); any iterable, consumed once,
+                 or an EventTable (its parsed times are reused).
         hours: Time window label included in metadata.
 
     Returns:
         Dict with metadata, tasks (each enriched with pattern_details),
         search_only_count, top_patterns, and trends.
     """
-    generated_at = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    accumulator = TaskDataAccumulator(hours=hours)
+    if isinstance(entries, EventTable):
+        accumulator.add_table(entries)
+    else:
+        for entry in entries:
+            accumulator.add(entry)
+    return accumulator.result()
+
+
+def iter_relevance_events(
+    log_dir: str = ".claude/data/logs",
+    since: Optional[datetime] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield ace-relevance entries (sealed segments, then the active file).
+
+    With since, segments and lines older than the window are skipped before
+    any JSON decode (ace_log_store.read_entries). Entries without a valid
+    timestamp are always yielded, as the unwindowed reader did.
+    """
+    from ace_log_store import read_entries
+    return read_entries(log_dir, "ace-relevance", since=since, keep_untimed=True)
+
+
+def collect_task_data_for_evaluation(
+    log_dir: str = ".claude/data/logs",
+    hours: int = 24,
+    reference_time: Optional[datetime] = None,
+) -> dict:
+    """
+    Streaming front-end for /ace-insights (v6.5.0).
+
+    Reads the last 2 * hours once: the current window feeds tasks and top
+    patterns, and both windows feed the trends (current vs previous `hours`).
+    Peak memory is the current window's entries, not the log size.
+    """
+    now = reference_time or datetime.now(timezone.utc)
+    task_since = now - timedelta(hours=hours)
+    accumulator = TaskDataAccumulator(hours=hours, task_since=task_since,
+                                      trend_hours=hours, reference_time=now)
+    for entry in iter_relevance_events(log_dir, since=task_since - timedelta(hours=hours)):
+        accumulator.add(entry)
+    return accumulator.result()
+
+
+class TaskDataAccumulator:
+    """
+    Single pass behind extract_task_data_for_evaluation() (v6.5.0).
+
+    add() parses the entry's timestamp once and feeds every aggregator with
+    it: trend counters, pattern names and usage, and the task window, an
+    EventTable. Only task-window entries are kept, so they are deduplicated
+    and sorted exactly once in result(). Entries older than task_since only
+    count toward the previous trend period.
+    """
+
+    def __init__(
+        self,
+        hours: int = 24,
+        task_since: Optional[datetime] = None,
+        trend_hours: int = 24,
+        reference_time: Optional[datetime] = None,
+    ):
+        self.hours = hours
+        self.task_since = task_since.timestamp() if task_since is not None else None
+        self.current_start, self.previous_start = _trend_bounds(
+            trend_hours, trend_hours, reference_time)
+        self.periods = {"current": _new_trend_period(), "previous": _new_trend_period()}
+        self.table = EventTable()
+        self.pattern_names: Dict[str, str] = {}
+        self.pattern_usage: Dict[str, Dict[str, Any]] = defaultdict(
+            lambda: {"usage_count": 0, "session_ids": set()}
+        )
+
+    def add(self, entry: Dict[str, Any], epoch: Optional[float] = None) -> None:
+        """Feed one entry (epoch: its already-parsed time, e.g. from an EventTable)."""
+        if epoch is None:
+            epoch = _epoch_seconds(entry.get("timestamp"))
+        _add_to_trend_periods(self.periods, entry, epoch, self.current_start, self.previous_start)
+        # Untimed (NaN) entries stay in the task window, as without one
+        if self.task_since is not None and epoch < self.task_since:
+            return
+        self.table.append(entry, epoch)
+        self._count_patterns(entry)
+
+    def add_table(self, table: EventTable) -> None:
+        """
+        Feed a whole EventTable without re-appending its rows: an unbounded,
+        empty accumulator keeps the table itself as its window.
+        """
+        if self.task_since is not None or len(self.table):
+            for entry, epoch in zip(table.rows, table.times):
+                self.add(entry, epoch)
+            return
+        self.table = table
+        for entry, epoch in zip(table.rows, table.times):
+            _add_to_trend_periods(self.periods, entry, epoch, self.current_start, self.previous_start)
+            self._count_patterns(entry)
+
+    def _count_patterns(self, entry: Dict[str, Any]) -> None:
+        _count_pattern_usage(self.pattern_usage, entry)
+        if entry.get("event") == "search":
+            for pat in entry.get("top_patterns", []):
+                pid = pat.get("id")
+                if pid and pid not in self.pattern_names:
+                    self.pattern_names[pid] = (
+                        f"{pat.get('domain', 'unknown')} / {pat.get('section', 'unknown')}")
+
+    def result(self) -> dict:
+        generated_at = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        table = self.table
+        order, dup_count, task_pattern_names = _task_rows(table)
+        tasks, search_only_count = _build_tasks(table, order, task_pattern_names)
+        _attach_pattern_details(tasks, table, order, self.pattern_names)
 
-    if not entries:
         return {
             "metadata": {
                 "generated_at": generated_at,
-                "hours": hours,
-                "total_entries": 0,
-                "duplicates_removed": 0,
+                "hours": self.hours,
+                "total_entries": len(table),
+                "duplicates_removed": dup_count,
             },
-            "tasks": [],
-            "search_only_count": 0,
-            "top_patterns": [],
-            "trends": calculate_trends(entries),
+            "tasks": tasks,
+            "search_only_count": search_only_count,
+            "top_patterns": (_top_patterns_from_usage(self.pattern_usage, self.pattern_names, 10)
+                             if self.pattern_usage else []),
+            "trends": _trends_from_periods(self.periods),
         }
 
-    # Step 1: Get tasks from split_into_tasks
-    task_data = split_into_tasks(entries)
-    tasks = task_data["tasks"]
-    dup_count = task_data["duplicates_removed"]
-
-    # Step 2: Deduplicate + sort entries (same logic as split_into_tasks)
-    cleaned, _ = deduplicate_events(entries)
-
-    def _ts_key(e):
-        ts = e.get("timestamp", "")
-        try:
-            return _parse_timestamp(ts) if ts else datetime.min.replace(tzinfo=timezone.utc)
-        except (ValueError, TypeError):
-            return datetime.min.replace(tzinfo=timezone.utc)
-
-    sorted_entries = sorted(cleaned, key=_ts_key)
 
-    # Step 3: Build pattern name mapping
-    pattern_names = extract_pattern_names(entries)
+def _attach_pattern_details(
+    tasks: List[Dict[str, Any]],
+    table: EventTable,
+    order: List[int],
+    pattern_names: Dict[str, str],
+) -> None:
+    """Set each task's pattern_details from the searches within its time span (+-1 min)."""
+    search = table.event_code("search")
+    search_times: List[float] = []
+    searches: List[Dict[str, Any]] = []
+    for i in order:
+        if table.events[i] != search or isnan(table.times[i]):
+            continue
+        search_times.append(table.times[i])
+        searches.append(table.rows[i])
 
-    # Step 4: For each task, find search events in time window and extract pattern_details
     for task in tasks:
         start_str = task.get("start_time")
         duration = task.get("duration_seconds", 0)
 
-        if not start_str:
-            task["pattern_details"] = []
-            continue
-
-        try:
-            task_start = _parse_timestamp(start_str)
-        except (ValueError, TypeError):
+        task_start = _epoch_seconds(start_str)
+        if isnan(task_start):
             task["pattern_details"] = []
             continue
 
-        task_end = task_start + timedelta(seconds=max(duration, 0))
-
-        # Collect search events within this task's time window
-        # Use a generous window: from task_start to task_end
-        # (search events precede or overlap with executions)
-        task_searches = []
-        for e in sorted_entries:
-            if e.get("event") != "search":
-                continue
-            ts_str = e.get("timestamp", "")
-            if not ts_str:
-                continue
-            try:
-                ets = _parse_timestamp(ts_str)
-            except (ValueError, TypeError):
-                continue
-            # Include search events within [start - 1min buffer, end + 1min buffer]
-            if task_start - timedelta(minutes=1) <= ets <= task_end + timedelta(minutes=1):
-                task_searches.append(e)
+        # Search events precede or overlap with executions: use a generous window
+        # (offsets from task_start are compared at microsecond resolution)
+        window_end = max(duration, 0) + 60
 
-        # Step 5: Extract and deduplicate pattern details by ID
+        # Extract and deduplicate pattern details by ID
         seen_patterns: Dict[str, Dict[str, Any]] = {}
-        for s in task_searches:
-            for pat in s.get("top_patterns", []):
+        i = bisect_left(search_times, task_start - 61)
+        while i < len(searches) and _elapsed(task_start, search_times[i]) < -60:
+            i += 1
+        while i < len(searches) and _elapsed(task_start, search_times[i]) <= window_end:
+            for pat in searches[i].get("top_patterns", []):
                 pid = pat.get("id")
                 if not pid:
                     continue
@@ -418,22 +634,10 @@ def extract_task_data_for_evaluation(
                         "helpful_votes": pat.get("helpful", 0),
                         "harmful_votes": pat.get("harmful", 0),
                     }
+            i += 1
 
         task["pattern_details"] = list(seen_patterns.values())
 
-    return {
-        "metadata": {
-            "generated_at": generated_at,
-            "hours": hours,
-            "total_entries": len(entries),
-            "duplicates_removed": dup_count,
-        },
-        "tasks": tasks,
-        "search_only_count": task_data["search_only_count"],
-        "top_patterns": get_top_patterns(entries),
-        "trends": calculate_trends(entries),
-    }
-
 
 _AGENT_PALETTE = ["#58a6ff", "#bc8cff", "#3fb950", "#f59e0b", "#e879f9", "#22d3ee", "#f97316"]
 
@@ -831,12 +1035,12 @@ def compute_ace_engagement(tasks: List[Dict]) -> dict:
     }
 
 
-def analyze_sessions(entries: List[Dict[str, Any]], hours: int = 24) -> dict:
+def analyze_sessions(entries: Iterable[Dict[str, Any]], hours: int = 24) -> dict:
     """
     Group log entries by session_id and return per-session summaries.
 
     Args:
-        entries: List of JSONL log entries (dicts)
+        entries: List of JSONL log entries (dicts) or an EventTable
         hours: Time window in hours (unused for grouping, entries are pre-filtered)
 
     Returns:
@@ -845,30 +1049,24 @@ def analyze_sessions(entries: List[Dict[str, Any]], hours: int = 24) -> dict:
     if not entries:
         return {"sessions": [], "total_sessions": 0, "active_sessions": 0}
 
-    # Group entries by session_id
-    sessions_map: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-    for entry in entries:
+    # Group row indices by session_id
+    table = as_event_table(entries)
+    rows, times = table.rows, table.times
+    sessions_map: Dict[str, List[int]] = defaultdict(list)
+    for i, entry in enumerate(rows):
         sid = entry.get("session_id", "unknown")
-        sessions_map[sid].append(entry)
+        sessions_map[sid].append(i)
 
     sessions = []
     active_count = 0
 
-    for sid, events in sessions_map.items():
-        # Parse timestamps for duration
-        timestamps = []
-        for e in events:
-            ts = e.get("timestamp")
-            if ts:
-                try:
-                    timestamps.append(_parse_timestamp(ts))
-                except (ValueError, TypeError):
-                    pass
-
-        timestamps.sort()
-        start_time = timestamps[0].isoformat().replace("+00:00", "Z") if timestamps else None
-        end_time = timestamps[-1].isoformat().replace("+00:00", "Z") if timestamps else None
-        duration = int((timestamps[-1] - timestamps[0]).total_seconds()) if len(timestamps) >= 2 else 0
+    for sid, indices in sessions_map.items():
+        events = [rows[i] for i in indices]
+        # Parsed timestamps for duration
+        timestamps = sorted(times[i] for i in indices if not isnan(times[i]))
+        start_time = _format_epoch(timestamps[0]) if timestamps else None
+        end_time = _format_epoch(timestamps[-1]) if timestamps else None
+        duration = int(_elapsed(timestamps[0], timestamps[-1])) if len(timestamps) >= 2 else 0
 
         # Collect search metrics
         searches = [e for e in events if e.get("event") == "search"]
@@ -954,7 +1152,7 @@ def analyze_sessions(entries: List[Dict[str, Any]], hours: int = 24) -> dict:
     }
 
 
-def calculate_helpfulness(entries: List[Dict[str, Any]]) -> dict:
+def calculate_helpfulness(entries: Iterable[Dict[str, Any]]) -> dict:
     """
     Correlate patterns with task success.
 
@@ -1013,32 +1211,39 @@ def calculate_helpfulness(entries: List[Dict[str, Any]]) -> dict:
     }
 
 
-def get_top_patterns(entries: List[Dict[str, Any]], limit: int = 10) -> list:
+def get_top_patterns(entries: Iterable[Dict[str, Any]], limit: int = 10) -> list:
     """
     Find most-used pattern IDs across all execution events.
 
     Returns:
         List of dicts with pattern_id, pattern_name, usage_count, sessions
     """
-    executions = [e for e in entries if e.get("event") == "execution"]
-
     pattern_usage: Dict[str, Dict[str, Any]] = defaultdict(
         lambda: {"usage_count": 0, "session_ids": set()}
     )
-
-    for ex in executions:
-        sid = ex.get("session_id", "unknown")
-        for pid in ex.get("pattern_ids", []):
-            if pid:
-                pattern_usage[pid]["usage_count"] += 1
-                pattern_usage[pid]["session_ids"].add(sid)
+    for entry in entries:
+        _count_pattern_usage(pattern_usage, entry)
 
     if not pattern_usage:
         return []
 
     # Build pattern name mapping from search events
-    names = extract_pattern_names(entries)
+    return _top_patterns_from_usage(pattern_usage, extract_pattern_names(entries), limit)
 
+
+def _count_pattern_usage(pattern_usage: Dict[str, Dict[str, Any]], entry: Dict[str, Any]) -> None:
+    if entry.get("event") != "execution":
+        return
+    sid = entry.get("session_id", "unknown")
+    for pid in entry.get("pattern_ids", []):
+        if pid:
+            pattern_usage[pid]["usage_count"] += 1
+            pattern_usage[pid]["session_ids"].add(sid)
+
+
+def _top_patterns_from_usage(
+    pattern_usage: Dict[str, Dict[str, Any]], names: Dict[str, str], limit: int
+) -> list:
     result = [
         {
             "pattern_id": pid,
@@ -1054,7 +1259,7 @@ def get_top_patterns(entries: List[Dict[str, Any]], limit: int = 10) -> list:
 
 
 def calculate_trends(
-    entries: List[Dict[str, Any]],
+    entries: Iterable[Dict[str, Any]],
     current_hours: int = 24,
     previous_hours: int = 24,
     reference_time: Optional[datetime] = None,
@@ -1068,49 +1273,76 @@ def calculate_trends(
     Returns:
         Dict with current_period, previous_period, changes
     """
+    current_start, previous_start = _trend_bounds(current_hours, previous_hours, reference_time)
+    periods = {"current": _new_trend_period(), "previous": _new_trend_period()}
+    if isinstance(entries, EventTable):
+        for entry, epoch in zip(entries.rows, entries.times):
+            _add_to_trend_periods(periods, entry, epoch, current_start, previous_start)
+    else:
+        for entry in entries:
+            _add_to_trend_periods(periods, entry, _epoch_seconds(entry.get("timestamp")),
+                                  current_start, previous_start)
+    return _trends_from_periods(periods)
+
+
+def _trend_bounds(current_hours: int, previous_hours: int,
+                  reference_time: Optional[datetime] = None) -> tuple:
+    """Epoch seconds where the current and previous periods start."""
     now = reference_time or datetime.now(timezone.utc)
     current_start = now - timedelta(hours=current_hours)
-    previous_start = current_start - timedelta(hours=previous_hours)
+    return current_start.timestamp(), (current_start - timedelta(hours=previous_hours)).timestamp()
 
-    current_entries = []
-    previous_entries = []
-
-    for entry in entries:
-        ts_str = entry.get("timestamp")
-        if not ts_str:
-            continue
-        try:
-            ts = _parse_timestamp(ts_str)
-        except (ValueError, TypeError):
-            continue
 
-        if ts >= current_start:
-            current_entries.append(entry)
-        elif ts >= previous_start:
-            previous_entries.append(entry)
+def _new_trend_period() -> Dict[str, int]:
+    return {"entries": 0, "searches": 0, "tasks": 0, "successes": 0, "patterns_injected": 0}
 
-    def _period_stats(period_entries):
-        searches = [e for e in period_entries if e.get("event") == "search"]
-        executions = [e for e in period_entries if e.get("event") == "execution"]
-        success_count = sum(1 for e in executions if e.get("success"))
-        success_rate = (success_count / len(executions) * 100) if executions else 0.0
-        patterns_injected = sum(e.get("patterns_injected", 0) for e in searches)
 
+def _add_to_trend_periods(
+    periods: Dict[str, Dict[str, int]],
+    entry: Dict[str, Any],
+    epoch: float,
+    current_start: float,
+    previous_start: float,
+) -> None:
+    """Count one entry (epoch: its parsed time) into the current or previous period, or neither."""
+    if epoch >= current_start:
+        period = periods["current"]
+    elif epoch >= previous_start:
+        period = periods["previous"]
+    else:
+        return  # older, or NaN (missing/invalid timestamp)
+
+    period["entries"] += 1
+    event = entry.get("event")
+    if event == "search":
+        period["searches"] += 1
+        period["patterns_injected"] += entry.get("patterns_injected", 0)
+    elif event == "execution":
+        period["tasks"] += 1
+        if entry.get("success"):
+            period["successes"] += 1
+
+
+def _trends_from_periods(periods: Dict[str, Dict[str, int]]) -> dict:
+    def _period_stats(period):
+        tasks = period["tasks"]
+        success_rate = (period["successes"] / tasks * 100) if tasks else 0.0
         return {
-            "searches": len(searches),
-            "tasks": len(executions),
+            "searches": period["searches"],
+            "tasks": tasks,
             "success_rate": round(success_rate, 1),
-            "patterns_injected": patterns_injected,
+            "patterns_injected": period["patterns_injected"],
         }
 
-    current = _period_stats(current_entries)
-    previous = _period_stats(previous_entries)
+    current = _period_stats(periods["current"])
+    previous = _period_stats(periods["previous"])
+    no_entries = not periods["current"]["entries"] and not periods["previous"]["entries"]
 
     def _calc_change(curr_val, prev_val, is_rate=False):
         if is_rate:
             # For rates (percentage points), 0% is valid data
             # Only N/A if both periods had no tasks (both 0)
-            if not previous_entries and not current_entries:
+            if no_entries:
                 return "N/A"
             diff = curr_val - prev_val
             sign = "+" if diff >= 0 else ""
@@ -1273,10 +1505,11 @@ def _format_insights_html_v2(
     helpfulness: dict,
     top_patterns: list,
     trends: dict,
-    raw_entries: List[Dict[str, Any]],
+    raw_entries: Iterable[Dict[str, Any]],
     hours: int = 24,
 ) -> str:
     """Render the v2 task-based HTML layout."""
+    raw_entries = as_event_table(raw_entries)
     task_data = split_into_tasks(raw_entries)
     pattern_names = extract_pattern_names(raw_entries)
     tasks = task_data["tasks"]
@@ -1643,7 +1876,7 @@ def format_insights_html(
     top_patterns: list,
     trends: dict,
     hours: int = 24,
-    raw_entries: Optional[List[Dict[str, Any]]] = None,
+    raw_entries: Optional[Iterable[Dict[str, Any]]] = None,
 ) -> str:
     """
     Format analysis data into a shareable interactive HTML report.
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+ACE JSONL Writer - Multi-process-safe appends for the ACE logs.
+
+v6.5.0: ace-relevance.jsonl and the hook logs are written by several processes
+at once (hook dispatcher, forked background learning, parallel subagents,
+legacy bash wrappers). Each used to reopen the file and write through a
+buffered text stream, so a record larger than PIPE_BUF could be split across
+write() calls and interleave with another process's record. A rotation could
+also race a writer that still held the old file open.
+
+append_record() emits each batch as a single write() on an O_APPEND
+descriptor while holding flock(LOCK_EX) on the log. After taking the lock it
+checks that the descriptor is still the file at `path`. If ace_log_store
+rotated it into the store in the meantime, it reopens. The rotation takes the
+same lock before the segment is compressed, so a write is never lost to it.
+The append itself only ever renames a full segment; compression runs in a
+detached process.
+
+Inside a buffering() scope (ace_hook.dispatch opens one per hook event),
+records are held in memory and flushed when the scope closes, one locked
+write per file. Writes that need the lock for more than the append (`locked`
+callbacks such as the relevance snapshot) bypass the buffer. They flush that
+file's pending records first, in the same write, so order is kept. Forked
+children never flush their parent's buffer.
+
+Bash call sites use the CLI (scripts/lib/ace_jsonl.sh):
+
+    jq -nc '...' | python3 ace_jsonl_writer.py append .claude/data/logs/ace-relevance.jsonl
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from ace_log_store import seal_if_needed
+
+REOPEN_ATTEMPTS = 3
+
+# path -> [max_bytes, [encoded records]]; owned by the process that opened the scope
+_buffers: Dict[str, list] = {}
+_buffer_owner: Optional[int] = None
+_buffer_depth = 0
+_buffer_lock = threading.Lock()  # search workers log from threads
+
+
+def encode_record(entry: Dict[str, Any], ensure_ascii: bool = True) -> bytes:
+    """One JSONL line (compact JSON + newline) as UTF-8 bytes."""
+    return (json.dumps(entry, ensure_ascii=ensure_ascii, default=str) + '\n').encode('utf-8')
+
+
+def _is_current(fd: int, path: Path) -> bool:
+    try:
+        st = path.stat()
+    except OSError:
+        return False
+    opened = os.fstat(fd)
+    return (opened.st_dev, opened.st_ino) == (st.st_dev, st.st_ino)
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def append_bytes(path, data: bytes, max_bytes: int = None,
+                 locked: Callable[[], None] = None) -> None:
+    """
+    Append pre-encoded JSONL data with one write() under the log's lock.
+
+    max_bytes rotates the active segment first (ace_log_store) once it is that
+    large. locked runs after the write, still holding the lock. Raises OSError.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if max_bytes:
+        try:
+            seal_if_needed(path, max_bytes)
+        except Exception:
+            pass  # Sealing is best effort; the append is not
+    for attempt in range(REOPEN_ATTEMPTS):
+        fd = os.open(str(path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if not _is_current(fd, path) and attempt < REOPEN_ATTEMPTS - 1:
+                continue  # sealed while we waited for the lock
+            _write_all(fd, data)
+            if locked is not None:
+                locked()
+            return
+        finally:
+            os.close(fd)
+
+
+def _buffering_active() -> bool:
+    return _buffer_depth > 0 and _buffer_owner == os.getpid()
+
+
+def _take_pending(path: Path) -> bytes:
+    if not _buffering_active():
+        return b''
+    with _buffer_lock:
+        pending = _buffers.pop(str(path), None)
+    return b''.join(pending[1]) if pending else b''
+
+
+def append_record(path, entry: Dict[str, Any], max_bytes: int = None,
+                  locked: Callable[[], None] = None, ensure_ascii: bool = True) -> None:
+    """Append one record (buffered inside a buffering() scope unless `locked` is set)."""
+    data = encode_record(entry, ensure_ascii=ensure_ascii)
+    path = Path(path)
+    if locked is None and _buffering_active():
+        with _buffer_lock:
+            pending = _buffers.setdefault(str(path), [max_bytes, []])
+            pending[0] = pending[0] or max_bytes
+            pending[1].append(data)
+        return
+    append_bytes(path, _take_pending(path) + data, max_bytes, locked)
+
+
+def flush() -> None:
+    """Write every buffered record now, one locked write per file."""
+    if _buffer_owner != os.getpid():
+        _buffers.clear()  # a forked child's copy of its parent's buffer
+        return
+    while True:
+        with _buffer_lock:
+            if not _buffers:
+                return
+            path, (max_bytes, records) = _buffers.popitem()
+        try:
+            append_bytes(path, b''.join(records), max_bytes)
+        except OSError:
+            pass  # Logging must not fail the hook
+
+
+@contextmanager
+def buffering():
+    """Hold records in memory until the outermost scope exits (e.g. end of a hook)."""
+    global _buffer_owner, _buffer_depth
+    if _buffer_owner != os.getpid():
+        _buffers.clear()
+        _buffer_owner, _buffer_depth = os.getpid(), 0
+    _buffer_depth += 1
+    try:
+        yield
+    finally:
+        _buffer_depth -= 1
+        if _buffer_depth == 0:
+            flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Append JSONL records with one locked write')
+    sub = parser.add_subparsers(dest='command')
+    append_parser = sub.add_parser('append', help='Append the JSON lines read from stdin')
+    append_parser.add_argument('path')
+    append_parser.add_argument('--max-bytes', type=int, default=0,
+                               help='Rotate the active segment first once it is this large')
+
+    args = parser.parse_args()
+    if args.command != 'append':
+        parser.print_help()
+        sys.exit(1)
+
+    entries = []
+    for line in sys.stdin.buffer:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(entry, dict):
+            entries.append(entry)
+    if not entries:
+        return
+
+    path = Path(args.path)
+    if path.name == 'ace-relevance.jsonl':
+        # Same path as the Python hooks: rotation limit + current-task snapshot
+        from ace_relevance_logger import ACERelevanceLogger
+        logger = ACERelevanceLogger(str(path.parent))
+        for entry in entries:
+            logger._write_log(entry)
+        return
+    append_bytes(path, b''.join(encode_record(e, ensure_ascii=False) for e in entries),
+                 args.max_bytes)
+
+
+if __name__ == '__main__':
+    main()
@@ -18,13 +18,15 @@ Usage:
 """
 
 import argparse
-import json
 import sys
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from collections import defaultdict
 
+sys.path.insert(0, str(Path(__file__).parent))
+from ace_log_store import read_entries
+
 
 class ACELogAnalyzer:
     """Analyze ACE hook logs."""
@@ -32,22 +34,9 @@ class ACELogAnalyzer:
     def __init__(self, log_dir: str = ".claude/data/logs"):
         self.log_dir = Path(log_dir)
 
-    def read_log(self, event_type: str) -> List[Dict[str, Any]]:
-        """Read all entries from an event log."""
-        log_path = self.log_dir / f"ace-{event_type.lower()}.jsonl"
-
-        if not log_path.exists():
-            return []
-
-        entries = []
-        with open(log_path, 'r') as f:
-            for line in f:
-                try:
-                    entries.append(json.loads(line))
-                except json.JSONDecodeError:
-                    continue
-
-        return entries
+    def read_log(self, event_type: str, hours: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Read entries from an event log, sealed segments included (v6.5.0)."""
+        return list(read_entries(self.log_dir, f"ace-{event_type.lower()}", hours=hours))
 
     def filter_by_time(
         self,
@@ -108,20 +97,7 @@ class ACELogAnalyzer:
 
     def find_errors(self, hours: Optional[int] = None) -> List[Dict[str, Any]]:
         """Find all errors across all logs."""
-        errors_log = self.log_dir / "ace-errors.jsonl"
-
-        if not errors_log.exists():
-            return []
-
-        errors = []
-        with open(errors_log, 'r') as f:
-            for line in f:
-                try:
-                    errors.append(json.loads(line))
-                except json.JSONDecodeError:
-                    continue
-
-        return self.filter_by_time(errors, hours)
+        return list(read_entries(self.log_dir, "ace-errors", hours=hours))
 
     def print_table(self, entries: List[Dict[str, Any]], fields: List[str]):
         """Print entries as a formatted table."""
@@ -225,8 +201,7 @@ def main():
         print("[ERROR] --event-type required (or use --errors)")
         sys.exit(1)
 
-    entries = analyzer.read_log(args.event_type)
-    entries = analyzer.filter_by_time(entries, args.hours)
+    entries = analyzer.read_log(args.event_type, hours=args.hours)
 
     if args.last:
         entries = entries[-args.last:]
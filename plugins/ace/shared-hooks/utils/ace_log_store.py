@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+ACE Log Store - Segmented, compressed history for the JSONL logs.
+
+v6.5.0: ace-relevance.jsonl and the ace-<event>.jsonl hook logs used to
+rotate by renaming to .1/.2/.3 and deleting the oldest, and SessionStart
+moved the relevance log to .prev, so history was silently dropped and
+readers only ever saw the current file.
+
+The live file (.claude/data/logs/<name>.jsonl) is now the active segment.
+Writers keep appending to it exactly as before. Once it reaches the writer's
+size limit, or its first entry is older than SEGMENT_MAX_AGE_HOURS, rotate()
+renames it into the store as a plain segment, and compact() later gzips it and
+records it in the manifest:
+
+    .claude/data/logs/segments/<name>.<seq:06d>.jsonl        (rotated, pending)
+    .claude/data/logs/segments/<name>.<seq:06d>.jsonl.gz
+    .claude/data/logs/segments/<name>.manifest.json
+        {"segments": [{"file", "seq", "min_ts", "max_ts", "lines", "untimed",
+                       "events": {event: count}, "sessions": [...],
+                       "bytes", "sealed_at"}]}
+
+The appending hook only pays for the rename; compression and manifest stats
+run in a detached `compact` process, at SessionStart (seal) and at SessionEnd.
+The active segment's start time is cached in segments/.<name>.<inode>.start
+(its mtime), so the age check is one stat() per append.
+
+read_entries() opens only the segments whose [min_ts, max_ts] overlaps the
+requested window, any pending plain segments, then the active file. Legacy
+.N.jsonl backups and .prev files are adopted as segments by the first
+rotation. Rotation and compaction are serialized by segments/.<name>.lock and
+skipped, not waited for, while another process holds it. Sealed segments are
+kept unless ACE_LOG_RETENTION_DAYS is set.
+"""
+
+import argparse
+import fcntl
+import gzip
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+SEGMENT_DIR = 'segments'
+SEGMENT_MAX_AGE_HOURS = float(os.environ.get('ACE_LOG_SEGMENT_MAX_AGE_HOURS', '24'))
+RETENTION_DAYS = float(os.environ.get('ACE_LOG_RETENTION_DAYS', '0'))
+
+# Raw-line timestamp prefix, compared as a string before any JSON decode.
+# Writers mix UTC offsets and naive local times, so the prefilter only rejects
+# lines outside the window by more than the widest UTC offset.
+TIMESTAMP_PREFIX_RE = re.compile(rb'"timestamp":\s*"(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)')
+PREFIX_SLACK = timedelta(hours=14)
+PREFIX_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# Pre-v6.5.0 rotation (<name>.1.jsonl ...) and SessionStart archive (<name>.prev.jsonl)
+LEGACY_SUFFIX_RE = re.compile(r'^\.(\d+|prev)\.jsonl$')
+
+
+def get_segment_dir(log_dir) -> Path:
+    return Path(log_dir) / SEGMENT_DIR
+
+
+def get_manifest_path(log_dir, name: str) -> Path:
+    return get_segment_dir(log_dir) / f'{name}.manifest.json'
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """
+    ISO-8601 timestamp as an aware UTC datetime, or None.
+
+    Naive timestamps are local time (writers use datetime.now().isoformat()),
+    the same reading as ace_insights_analyzer._parse_timestamp().
+    """
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except ValueError:
+        return None
+    return parsed.astimezone(timezone.utc)
+
+
+def load_manifest(log_dir, name: str) -> Dict[str, Any]:
+    try:
+        with open(get_manifest_path(log_dir, name)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'segments': []}
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('segments'), list):
+        return {'segments': []}
+    return manifest
+
+
+def _save_manifest(log_dir, name: str, manifest: Dict[str, Any]) -> None:
+    path = get_manifest_path(log_dir, name)
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f'.{name}.manifest-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, path)
+
+
+def _first_timestamp(path: Path) -> Optional[datetime]:
+    try:
+        with open(path, 'rb') as f:
+            entry = json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+    return parse_timestamp(entry.get('timestamp')) if isinstance(entry, dict) else None
+
+
+def _started_at(log_path: Path, st: os.stat_result) -> Optional[datetime]:
+    """Start time of the active segment, read from its first entry once per inode."""
+    name = log_path.name[:-len('.jsonl')]
+    marker = get_segment_dir(log_path.parent) / f'.{name}.{st.st_ino}.start'
+    try:
+        return datetime.fromtimestamp(marker.stat().st_mtime, timezone.utc)
+    except OSError:
+        pass
+    started = _first_timestamp(log_path)
+    if started is not None:
+        try:
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            marker.touch()
+            os.utime(marker, (started.timestamp(), started.timestamp()))
+        except OSError:
+            pass
+    return started
+
+
+def seal_if_needed(log_path, max_bytes: int, max_age_hours: float = None) -> Optional[Path]:
+    """
+    Rotate the active segment if it reached max_bytes or its first entry is too old.
+
+    Only renames it (rotate()) and leaves compression to a detached `compact`.
+    Returns the rotated plain segment, or None.
+    """
+    log_path = Path(log_path)
+    try:
+        st = log_path.stat()
+    except OSError:
+        return None
+    if not st.st_size:
+        return None
+    max_age_hours = SEGMENT_MAX_AGE_HOURS if max_age_hours is None else max_age_hours
+    if st.st_size < max_bytes:
+        if max_age_hours <= 0:
+            return None
+        started = _started_at(log_path, st)
+        if started is None or datetime.now(timezone.utc) - started < timedelta(hours=max_age_hours):
+            return None
+    rotated = rotate(log_path)
+    if rotated is not None:
+        spawn_compact(log_path.parent, log_path.name[:-len('.jsonl')])
+    return rotated
+
+
+def spawn_compact(log_dir, name: str) -> None:
+    """Run `compact` in a detached process (best-effort, never blocks the writer)."""
+    command = [sys.executable, os.path.abspath(__file__), '--log-dir', str(log_dir),
+               'compact', '--name', name]
+    try:
+        subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, start_new_session=True, close_fds=True)
+    except OSError:
+        pass
+
+
+def _segment_stats(path: Path) -> Dict[str, Any]:
+    lines, untimed, events, sessions = 0, 0, {}, set()
+    min_ts = max_ts = None
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(entry, dict):
+                continue
+            lines += 1
+            event = entry.get('event') or entry.get('event_type') or 'unknown'
+            events[str(event)] = events.get(str(event), 0) + 1
+            if entry.get('session_id'):
+                sessions.add(str(entry['session_id']))
+            ts = parse_timestamp(entry.get('timestamp'))
+            if ts is None:
+                untimed += 1
+            else:
+                min_ts = ts if min_ts is None or ts < min_ts else min_ts
+                max_ts = ts if max_ts is None or ts > max_ts else max_ts
+    return {
+        'min_ts': min_ts.isoformat() if min_ts else None,
+        'max_ts': max_ts.isoformat() if max_ts else None,
+        'lines': lines,
+        'untimed': untimed,
+        'events': events,
+        'sessions': sorted(sessions),
+    }
+
+
+def _plain_seq(name: str, path: Path) -> int:
+    return int(path.name[len(name) + 1:].split('.')[0])
+
+
+def _pending(log_dir, name: str) -> List[Path]:
+    """Rotated plain segments not compressed yet, oldest first."""
+    return sorted(get_segment_dir(log_dir).glob(f'{name}.[0-9]*.jsonl'))
+
+
+def _compress(log_dir: Path, name: str, seq: int, plain: Path) -> Dict[str, Any]:
+    """gzip one plain segment into the store and return its manifest record."""
+    stats = _segment_stats(plain)
+    target = get_segment_dir(log_dir) / f'{name}.{seq:06d}.jsonl.gz'
+    fd, tmp = tempfile.mkstemp(dir=str(target.parent), prefix=f'.{name}.seal-')
+    with open(plain, 'rb') as src, os.fdopen(fd, 'wb') as raw, \
+            gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0) as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp, target)
+    plain.unlink()
+    return dict(stats, file=target.name, seq=seq, bytes=target.stat().st_size,
+                sealed_at=datetime.now(timezone.utc).isoformat())
+
+
+@contextmanager
+def _store_lock(log_dir, name: str) -> Iterator[bool]:
+    """segments/.<name>.lock without waiting; yields whether it was taken."""
+    segment_dir = get_segment_dir(log_dir)
+    segment_dir.mkdir(parents=True, exist_ok=True)
+    with open(segment_dir / f'.{name}.lock', 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        yield True
+
+
+def _rotate_locked(log_path: Path) -> Optional[Path]:
+    log_dir, name = log_path.parent, log_path.name[:-len('.jsonl')]
+    segment_dir = get_segment_dir(log_dir)
+    # Next seq after every plain and compressed segment on disk
+    seq = max([_plain_seq(name, p) for p in segment_dir.glob(f'{name}.[0-9]*.jsonl*')], default=0)
+    # Legacy backups (oldest first) go before the active file
+    legacy = [p for p in log_dir.glob(f'{name}.*.jsonl')
+              if LEGACY_SUFFIX_RE.match(p.name[len(name):])]
+    legacy.sort(key=lambda p: (_first_timestamp(p) or datetime.min.replace(tzinfo=timezone.utc),
+                               p.name))
+    for path in legacy:
+        seq += 1
+        os.replace(path, segment_dir / f'{name}.{seq:06d}.jsonl')
+
+    try:
+        active_size = log_path.stat().st_size
+    except OSError:
+        active_size = 0
+    if not active_size:
+        return None
+    seq += 1
+    claimed = segment_dir / f'{name}.{seq:06d}.jsonl'
+    os.replace(log_path, claimed)
+    for marker in segment_dir.glob(f'.{name}.*.start'):
+        try:
+            marker.unlink()
+        except OSError:
+            pass
+    # Wait out a writer holding the log's lock (ACERelevanceLogger)
+    with open(claimed, 'rb') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+    return claimed
+
+
+def _compact_locked(log_dir: Path, name: str) -> Optional[Dict[str, Any]]:
+    manifest = load_manifest(log_dir, name)
+    known = {s.get('file') for s in manifest['segments']}
+    record = None
+    for plain in _pending(log_dir, name):
+        if f'{plain.name}.gz' in known:
+            plain.unlink()  # compressed before an interruption
+            continue
+        if plain.stat().st_size == 0:
+            plain.unlink()
+            continue
+        record = _compress(log_dir, name, _plain_seq(name, plain), plain)
+        manifest['segments'].append(record)
+
+    if RETENTION_DAYS > 0:
+        _drop_expired(log_dir, manifest, RETENTION_DAYS)
+    manifest['segments'].sort(key=lambda s: s.get('seq', 0))
+    _save_manifest(log_dir, name, manifest)
+    return record
+
+
+def rotate(log_path) -> Optional[Path]:
+    """
+    Rename the active segment into the store as a plain segment (no compression).
+
+    Returns the plain segment, or None if the log was empty or another process
+    holds the store lock.
+    """
+    log_path = Path(log_path)
+    with _store_lock(log_path.parent, log_path.name[:-len('.jsonl')]) as acquired:
+        return _rotate_locked(log_path) if acquired else None
+
+
+def compact(log_dir, name: str) -> Optional[Dict[str, Any]]:
+    """
+    gzip every pending plain segment and add its manifest record.
+
+    Returns the newest record, or None if nothing was pending or another
+    process holds the store lock.
+    """
+    log_dir = Path(log_dir)
+    with _store_lock(log_dir, name) as acquired:
+        return _compact_locked(log_dir, name) if acquired else None
+
+
+def seal(log_path) -> Optional[Dict[str, Any]]:
+    """
+    Rotate the active segment and compact it (SessionStart, CLI).
+
+    Returns the newest segment's manifest record, or None if there was nothing
+    to seal or another process holds the store lock.
+    """
+    log_path = Path(log_path)
+    log_dir, name = log_path.parent, log_path.name[:-len('.jsonl')]
+    with _store_lock(log_dir, name) as acquired:
+        if not acquired:
+            return None
+        _rotate_locked(log_path)
+        return _compact_locked(log_dir, name)
+
+
+def _drop_expired(log_dir: Path, manifest: Dict[str, Any], retention_days: float) -> None:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    kept = []
+    for segment in manifest['segments']:
+        max_ts = parse_timestamp(segment.get('max_ts'))
+        if max_ts is not None and max_ts < cutoff:
+            try:
+                (get_segment_dir(log_dir) / segment['file']).unlink()
+            except OSError:
+                pass
+            continue
+        kept.append(segment)
+    manifest['segments'] = kept
+
+
+def segments_overlapping(log_dir, name: str, since: datetime = None,
+                         until: datetime = None, keep_untimed: bool = False) -> List[Path]:
+    """
+    Segment files (oldest first) that may hold entries in [since, until],
+    plus, with keep_untimed, those holding entries without a timestamp.
+    Pending plain segments are always included.
+    """
+    segments = load_manifest(log_dir, name)['segments']
+    known = {s.get('file') for s in segments}
+    # Pending plain segments have no stats yet, so they always overlap
+    found = [(_plain_seq(name, p), p) for p in _pending(log_dir, name) if f'{p.name}.gz' not in known]
+    for segment in segments:
+        path = get_segment_dir(log_dir) / segment['file']
+        if keep_untimed and segment.get('untimed'):
+            found.append((segment.get('seq', 0), path))
+            continue
+        min_ts, max_ts = parse_timestamp(segment.get('min_ts')), parse_timestamp(segment.get('max_ts'))
+        if since is not None and max_ts is not None and max_ts < since:
+            continue
+        if until is not None and min_ts is not None and min_ts > until:
+            continue
+        found.append((segment.get('seq', 0), path))
+    return [path for _, path in sorted(found, key=lambda f: f[0])]
+
+
+def _read_lines(path: Path) -> Iterator[bytes]:
+    opener = gzip.open if path.suffix == '.gz' else open
+    try:
+        f = opener(path, 'rb')
+    except FileNotFoundError:
+        if path.suffix == '.jsonl' and path.parent.name == SEGMENT_DIR:
+            yield from _read_lines(path.with_name(f'{path.name}.gz'))  # compacted meanwhile
+        return
+    except OSError:
+        return
+    try:
+        with f:
+            yield from f
+    except (OSError, EOFError):
+        return
+
+
+def read_entries(log_dir, name: str, hours: float = None, since: datetime = None,
+                 until: datetime = None, keep_untimed: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Log entries in write order, across segments and the active file.
+
+    With hours / since / until, only overlapping segments are opened and
+    entries outside the window are skipped, as are entries without a valid
+    timestamp unless keep_untimed. Lines whose timestamp prefix is clearly
+    outside the window are never decoded.
+    """
+    if hours:
+        since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    windowed = since is not None or until is not None
+    low = (since - PREFIX_SLACK).strftime(PREFIX_FORMAT).encode() if since is not None else None
+    high = (until + PREFIX_SLACK).strftime(PREFIX_FORMAT).encode() if until is not None else None
+    paths = (segments_overlapping(log_dir, name, since, until, keep_untimed) +
+             [Path(log_dir) / f'{name}.jsonl'])
+    for path in paths:
+        for line in _read_lines(path):
+            if windowed:
+                match = TIMESTAMP_PREFIX_RE.search(line, 0, 80)
+                if match and ((low is not None and match.group(1) < low) or
+                              (high is not None and match.group(1) > high)):
+                    continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(entry, dict):
+                continue
+            if windowed:
+                ts = parse_timestamp(entry.get('timestamp'))
+                if ts is None:
+                    if not keep_untimed:
+                        continue
+                elif (since is not None and ts < since) or (until is not None and ts > until):
+                    continue
+            yield entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ACE segmented log store')
+    parser.add_argument('--log-dir', default='.claude/data/logs')
+    sub = parser.add_subparsers(dest='command')
+
+    seal_parser = sub.add_parser('seal', help='Seal the active segment (and adopt legacy backups)')
+    seal_parser.add_argument('--name', required=True, help='Log name, e.g. ace-relevance')
+
+    compact_parser = sub.add_parser('compact', help='Compress rotated segments into the manifest')
+    compact_parser.add_argument('--name', help='Log name (default: every log with pending segments)')
+
+    list_parser = sub.add_parser('list', help='Print the manifest')
+    list_parser.add_argument('--name', required=True)
+
+    read_parser = sub.add_parser('read', help='Print entries as JSONL')
+    read_parser.add_argument('--name', required=True)
+    read_parser.add_argument('--hours', type=float, help='Only the last N hours')
+
+    args = parser.parse_args()
+    if args.command == 'seal':
+        record = seal(Path(args.log_dir) / f'{args.name}.jsonl')
+        print(json.dumps({'sealed': record}))
+    elif args.command == 'compact':
+        names = ([args.name] if args.name else
+                 sorted({p.name.rsplit('.', 2)[0] for p in get_segment_dir(args.log_dir).glob('*.[0-9]*.jsonl')}))
+        records = {name: compact(args.log_dir, name) for name in names}
+        print(json.dumps({'compacted': records}))
+    elif args.command == 'list':
+        print(json.dumps(load_manifest(args.log_dir, args.name), indent=2))
+    elif args.command == 'read':
+        for entry in read_entries(args.log_dir, args.name, hours=args.hours):
+            sys.stdout.write(json.dumps(entry) + '\n')
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
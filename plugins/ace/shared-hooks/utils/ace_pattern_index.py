@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+ACE Pattern Index - local SQLite FTS5 mirror of the playbook.
+
+v6.5.0: When `ace-cli search` timed out or the server was unreachable,
+UserPromptSubmit could only report "Search failed". The plugin now keeps a
+local copy of the patterns in $XDG_CACHE_HOME/ace/pattern-index.db:
+
+- seeded from /ace-export-patterns output (`ace_pattern_index.py seed FILE`)
+- kept warm from every successful search response (upsert_patterns())
+
+It is searched with FTS5 BM25 over content, domain and section, re-ranked by
+confidence / helpful / harmful and a domain match (search()). Terms found in
+more than COMMON_TERM_RATIO of a seeded project's patterns are left out of the
+MATCH expression: their posting lists dominate query time on large playbooks
+and add little to BM25.
+
+ACE_SEARCH_MODE picks how UserPromptSubmit uses it:
+
+- remote   - server only (the index is still kept warm)
+- local    - index only, no server round trip
+- hybrid   - local answer kept if it comes back within HYBRID_LOCAL_MS;
+             the server then gets HYBRID_GRACE_MS. Remote results that make
+             it are merged in front, later ones arrive as an update
+             (ace_swr.take_update) after the local answer is injected
+- fallback - server first, local answer when it fails or times out (default)
+
+ACE_PATTERN_INDEX=0 disables the index entirely. Every function fails
+silently: callers just see no local results.
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterable
+
+from ace_cli_cache import get_cache_dir
+
+SCHEMA_VERSION = 1
+DB_NAME = 'pattern-index.db'
+BUSY_TIMEOUT_MS = 1000
+
+MODES = ('remote', 'local', 'hybrid', 'fallback')
+DEFAULT_MODE = 'fallback'
+HYBRID_LOCAL_MS = 20
+HYBRID_GRACE_MS = int(os.environ.get('ACE_HYBRID_GRACE_MS', '250'))
+LOCAL_LIMIT = 10
+CANDIDATES = 50  # BM25 candidates re-ranked by confidence / helpful / harmful
+MAX_TERMS = 16
+COMMON_TERM_RATIO = 0.05
+COMMON_TERM_MIN_PATTERNS = 1000  # smaller playbooks are fast with every term
+DOMAIN_BOOST = 1.5
+
+# bm25() column weights: content, domain, section
+BM25_WEIGHTS = (1.0, 2.0, 0.5)
+
+# Errors a local answer can stand in for (not_authenticated must reach the user)
+UNAVAILABLE_ERRORS = ('timeout', 'cli_not_found', 'search_failed')
+
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'for', 'from',
+    'how', 'i', 'in', 'is', 'it', 'me', 'my', 'of', 'on', 'or', 'please', 'so',
+    'that', 'the', 'this', 'to', 'we', 'what', 'with', 'you',
+))
+
+
+def index_enabled() -> bool:
+    return os.environ.get('ACE_PATTERN_INDEX', '1') != '0'
+
+
+def get_search_mode() -> str:
+    mode = os.environ.get('ACE_SEARCH_MODE', DEFAULT_MODE).strip().lower()
+    return mode if mode in MODES else DEFAULT_MODE
+
+
+def get_db_path() -> Path:
+    return get_cache_dir() / DB_NAME
+
+
+def _migrate_v1(conn: sqlite3.Connection) -> None:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS patterns (
+            rowid INTEGER PRIMARY KEY,
+            id TEXT NOT NULL,
+            org TEXT NOT NULL DEFAULT '',
+            project TEXT NOT NULL DEFAULT '',
+            content TEXT,
+            domain TEXT,
+            section TEXT,
+            confidence REAL,
+            helpful INTEGER,
+            harmful INTEGER,
+            data TEXT,
+            updated_at REAL,
+            UNIQUE (project, org, id)
+        )
+    ''')
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS patterns_fts USING fts5(
+            content, domain, section,
+            content='patterns', content_rowid='rowid'
+        )
+    ''')
+    # Per-project document-frequency stopwords, recomputed by seed_from_export()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS common_terms (
+            org TEXT NOT NULL DEFAULT '',
+            project TEXT NOT NULL DEFAULT '',
+            term TEXT NOT NULL,
+            PRIMARY KEY (project, org, term)
+        )
+    ''')
+    # External-content FTS: triggers keep the index in step with the table
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS patterns_ai AFTER INSERT ON patterns BEGIN
+            INSERT INTO patterns_fts(rowid, content, domain, section)
+            VALUES (new.rowid, new.content, new.domain, new.section);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS patterns_ad AFTER DELETE ON patterns BEGIN
+            INSERT INTO patterns_fts(patterns_fts, rowid, content, domain, section)
+            VALUES ('delete', old.rowid, old.content, old.domain, old.section);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS patterns_au AFTER UPDATE ON patterns BEGIN
+            INSERT INTO patterns_fts(patterns_fts, rowid, content, domain, section)
+            VALUES ('delete', old.rowid, old.content, old.domain, old.section);
+            INSERT INTO patterns_fts(rowid, content, domain, section)
+            VALUES (new.rowid, new.content, new.domain, new.section);
+        END
+    ''')
+
+
+MIGRATIONS = [
+    (1, _migrate_v1),
+]
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """Bring the schema up to SCHEMA_VERSION (no-op when already current)."""
+    if conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+        return
+
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for target, migration in MIGRATIONS:
+            if version < target:
+                migration(conn)
+                version = target
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def open_db(db_path: Path = None) -> sqlite3.Connection:
+    if db_path is None:
+        db_path = get_db_path()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    try:
+        _migrate(conn)
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+def _row(pattern: Dict[str, Any], org: str, project: str, now: float,
+         section: str = None) -> Optional[tuple]:
+    pattern_id = pattern.get('id')
+    if not pattern_id or not pattern.get('content'):
+        return None
+    if section and not pattern.get('section'):
+        pattern = dict(pattern, section=section)
+    return (pattern_id, org or '', project or '', pattern.get('content'),
+            pattern.get('domain') or '', pattern.get('section') or '',
+            float(pattern.get('confidence') or 0), int(pattern.get('helpful') or 0),
+            int(pattern.get('harmful') or 0), json.dumps(pattern), now)
+
+
+_UPSERT = '''
+    INSERT INTO patterns (id, org, project, content, domain, section,
+                          confidence, helpful, harmful, data, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (project, org, id) DO UPDATE SET
+        content = excluded.content, domain = excluded.domain, section = excluded.section,
+        confidence = excluded.confidence, helpful = excluded.helpful,
+        harmful = excluded.harmful, data = excluded.data, updated_at = excluded.updated_at
+'''
+
+
+def upsert_patterns(patterns: Iterable[Dict[str, Any]], org: str = None,
+                    project: str = None) -> int:
+    """Insert or refresh patterns from a search response. Returns rows written."""
+    if not index_enabled() or not patterns:
+        return 0
+    now = time.time()
+    rows = [r for r in (_row(p, org, project, now) for p in patterns if isinstance(p, dict)) if r]
+    if not rows:
+        return 0
+    try:
+        conn = open_db()
+        try:
+            conn.executemany(_UPSERT, rows)
+            conn.commit()
+            return len(rows)
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return 0
+
+
+def _terms(text: str) -> List[str]:
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def _common_terms(rows: List[tuple]) -> List[str]:
+    if len(rows) < COMMON_TERM_MIN_PATTERNS:
+        return []
+    df: Dict[str, int] = {}
+    for row in rows:
+        for term in set(_terms(row[3]) + _terms(row[4]) + _terms(row[5])):
+            df[term] = df.get(term, 0) + 1
+    cutoff = len(rows) * COMMON_TERM_RATIO
+    return [term for term, count in df.items() if count > cutoff]
+
+
+def seed_from_export(export: Dict[str, Any], org: str = None, project: str = None) -> int:
+    """
+    Replace a project's patterns with an `ace-cli export` playbook.
+
+    Export shape: {"playbook": {section: [pattern, ...], ...}}. Patterns that
+    are no longer in the playbook are dropped, and the project's common terms
+    are recomputed.
+    """
+    if not index_enabled():
+        return 0
+    playbook = export.get('playbook', export) if isinstance(export, dict) else {}
+    now = time.time()
+    rows = []
+    for section, patterns in playbook.items():
+        if isinstance(patterns, list):
+            rows.extend(r for r in (_row(p, org, project, now, section)
+                                    for p in patterns if isinstance(p, dict)) if r)
+    try:
+        conn = open_db()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM patterns WHERE project = ? AND org = ?',
+                         (project or '', org or ''))
+            conn.execute('DELETE FROM common_terms WHERE project = ? AND org = ?',
+                         (project or '', org or ''))
+            conn.executemany(_UPSERT, rows)
+            conn.executemany('INSERT INTO common_terms (org, project, term) VALUES (?, ?, ?)',
+                             [(org or '', project or '', t) for t in _common_terms(rows)])
+            conn.commit()
+            return len(rows)
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return 0
+
+
+def query_terms(query: str) -> List[str]:
+    terms = []
+    for term in _terms(query):
+        if len(term) > 1 and term not in STOPWORDS and term not in terms:
+            terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+def _match_expression(terms: List[str]) -> str:
+    return ' OR '.join(f'"{t}"' for t in terms)
+
+
+def _score(rank: float, data: Dict[str, Any], terms: set) -> float:
+    """Lower is better, like bm25(): BM25 scaled by the ranking features."""
+    weight = (0.5 + float(data.get('confidence') or 0)) \
+        * (1 + math.log1p(max(0, int(data.get('helpful') or 0)))) \
+        / (1 + math.log1p(max(0, int(data.get('harmful') or 0))))
+    if terms & set(_terms(data.get('domain'))):
+        weight *= DOMAIN_BOOST
+    return rank * weight
+
+
+def search(query: str, org: str = None, project: str = None,
+           limit: int = LOCAL_LIMIT) -> Optional[Dict[str, Any]]:
+    """
+    Local search in the ace-cli response shape, or None when unavailable.
+
+    BM25 picks the CANDIDATES best text matches on the query's uncommon
+    terms; those are re-ranked by confidence / helpful / harmful and whether
+    their domain is named in the query.
+    """
+    if not index_enabled():
+        return None
+    terms = query_terms(query)
+    if not terms:
+        return {'similar_patterns': [], 'count': 0, 'source': 'local'}
+    db_path = get_db_path()
+    if not db_path.exists():
+        return None
+    try:
+        conn = open_db(db_path)
+        try:
+            common = {row[0] for row in conn.execute(
+                f'SELECT term FROM common_terms WHERE project = ? AND org = ? '
+                f'AND term IN ({", ".join("?" * len(terms))})',
+                (project or '', org or '', *terms))}
+            match_terms = [t for t in terms if t not in common] or terms
+            rows = conn.execute(f'''
+                SELECT p.data, bm25(patterns_fts, {", ".join(map(str, BM25_WEIGHTS))}) AS rank
+                FROM patterns_fts JOIN patterns p ON p.rowid = patterns_fts.rowid
+                WHERE patterns_fts MATCH ? AND p.project = ? AND p.org = ?
+                ORDER BY rank LIMIT ?
+            ''', (_match_expression(match_terms), project or '', org or '', CANDIDATES)).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+    candidates = []
+    for data, rank in rows:
+        try:
+            candidates.append((json.loads(data), rank))
+        except ValueError:
+            continue
+    term_set = set(terms)
+    candidates.sort(key=lambda c: _score(c[1], c[0], term_set))
+    patterns = [data for data, _ in candidates[:limit]]
+    return {'similar_patterns': patterns, 'count': len(patterns), 'source': 'local'}
+
+
+def is_unavailable(response: Any) -> bool:
+    """True when a remote search produced nothing a local answer shouldn't replace."""
+    if not response:
+        return True
+    return isinstance(response, dict) and response.get('error') in UNAVAILABLE_ERRORS
+
+
+def merge_responses(remote: Any, local: Optional[Dict[str, Any]]) -> Any:
+    """Hybrid: remote patterns first, then local ones the server didn't return."""
+    if not local or not local.get('similar_patterns'):
+        return remote
+    if is_unavailable(remote):
+        return local
+    if not isinstance(remote, dict) or remote.get('error'):
+        return remote
+    patterns = list(remote.get('similar_patterns') or [])
+    seen = {p.get('id') for p in patterns if isinstance(p, dict)}
+    patterns.extend(p for p in local['similar_patterns'] if p.get('id') not in seen)
+    return dict(remote, similar_patterns=patterns, count=len(patterns), source='hybrid')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ACE local pattern index')
+    sub = parser.add_subparsers(dest='command', required=True)
+    seed_parser = sub.add_parser('seed', help='Replace a project\'s patterns from an export file')
+    seed_parser.add_argument('file')
+    seed_parser.add_argument('--org', default='')
+    seed_parser.add_argument('--project', required=True)
+    search_parser = sub.add_parser('search', help='Query the local index')
+    search_parser.add_argument('query')
+    search_parser.add_argument('--org', default='')
+    search_parser.add_argument('--project', required=True)
+    search_parser.add_argument('--limit', type=int, default=LOCAL_LIMIT)
+    args = parser.parse_args()
+
+    if args.command == 'seed':
+        with open(args.file, 'r', encoding='utf-8') as f:
+            count = seed_from_export(json.load(f), args.org, args.project)
+        print(f"Indexed {count} patterns for {args.project}")
+    elif args.command == 'search':
+        print(json.dumps(search(args.query, args.org, args.project, args.limit), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+ACE Domain Prefetch - warm the per-domain search cache ahead of domain shifts.
+
+v6.5.0 (opt-in, ACE_PREFETCH=1): PreToolUse and CwdChanged domain-shift
+searches run inline in a 5s hook budget. When the server is slow the hook is
+killed and the file is read without its patterns. Right after ace_before_task
+writes /tmp/ace-domains-{project}.json, spawn_prefetch() starts a detached
+worker that searches the top ACE_PREFETCH_DOMAINS domains (by pattern count)
+whose domain-level cache entry is cold, ACE_PREFETCH_CONCURRENCY at a time.
+
+A domain shift then asks lookup() first: the exact cached query, else the
+prefetched `<domain>` entry for that domain (cache status 'prefetch'). Only
+when neither exists does it search inline.
+
+The worker records its pid in /tmp/ace-prefetch-{session}.pid; SessionEnd
+kills its process group and removes the file, and the worker stops between
+batches once the file is gone. Each run logs a 'prefetch' event to
+ace-relevance.jsonl; `python3 ace_prefetch.py report` prints how many domain
+searches were answered by prefetched entries.
+
+Usage:
+    python3 ace_prefetch.py run < params.json     # the detached worker
+    python3 ace_prefetch.py report [--log ...]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+import ace_search_cache
+
+TOP_N = int(os.environ.get('ACE_PREFETCH_DOMAINS', '5'))
+CONCURRENCY = max(1, int(os.environ.get('ACE_PREFETCH_CONCURRENCY', '2')))
+SEARCH_TIMEOUT_SECS = 10.0
+
+DEFAULT_LOGS = ('.claude/data/logs/ace-relevance.jsonl', '.claude/data/logs/ace-search-events.jsonl')
+
+
+def prefetch_enabled() -> bool:
+    return os.environ.get('ACE_PREFETCH', '0') == '1' and TOP_N > 0
+
+
+def get_pid_path(session_id: str) -> Path:
+    return Path(f'/tmp/ace-prefetch-{session_id}.pid')
+
+
+def top_domains(domains_summary: Dict[str, Any], limit: int = None) -> List[str]:
+    """Domain names as PreToolUse matches them (see ace_hook.load_domains), busiest first."""
+    counts: Dict[str, float] = {}
+    for key, value in (domains_summary or {}).items():
+        name = str(key).split(':')[0].lower()
+        if not name:
+            continue
+        count = value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+        counts[name] = counts.get(name, 0) + count
+    return sorted(counts, key=lambda name: (-counts[name], name))[:TOP_N if limit is None else limit]
+
+
+def _running(session_id: str) -> bool:
+    try:
+        pid = int(get_pid_path(session_id).read_text().strip())
+        os.kill(pid, 0)
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def spawn_prefetch(domains_summary: Dict[str, Any], org: str = None, project: str = None,
+                   session_id: str = None) -> List[str]:
+    """
+    Start the detached prefetch worker for the cold top domains.
+
+    Returns the domains handed to the worker ([] when disabled, all warm, or a
+    prefetch for this session is still running).
+    """
+    if not prefetch_enabled() or not project or not session_id:
+        return []
+    if not ace_search_cache.cache_enabled():
+        return []  # nowhere to keep the results
+    cold = [d for d in top_domains(domains_summary)
+            if ace_search_cache.get(d, org, project, allowed_domains=d) is None]
+    if not cold or _running(session_id):
+        return []
+    try:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), 'run'],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True)
+        proc.stdin.write(json.dumps({'domains': cold, 'org': org, 'project': project,
+                                     'session_id': session_id}).encode('utf-8'))
+        proc.stdin.close()
+    except OSError:
+        return []
+    return cold
+
+
+def run_prefetch(domains: List[str], org: str = None, project: str = None,
+                 session_id: str = None) -> Dict[str, Any]:
+    """Warm the cache for domains, CONCURRENCY searches at a time, until cancelled."""
+    import ace_cli
+
+    pid_path = get_pid_path(session_id)
+    own_pid = str(os.getpid())
+    try:
+        pid_path.write_text(own_pid)
+    except OSError:
+        pass
+
+    def cancelled() -> bool:
+        try:
+            return pid_path.read_text().strip() != own_pid
+        except OSError:
+            return True
+
+    start = time.perf_counter()
+    stats = {'requested': len(domains), 'warmed': 0, 'failed': 0, 'cancelled': False}
+    try:
+        for offset in range(0, len(domains), CONCURRENCY):
+            if cancelled():
+                stats['cancelled'] = True
+                break
+            chunk = domains[offset:offset + CONCURRENCY]
+            texts = ace_cli.run_search_batch([{'query': d, 'allowed_domains': d} for d in chunk],
+                                             org, project, timeout=SEARCH_TIMEOUT_SECS,
+                                             coalesce=False)
+            for domain, text in zip(chunk, texts):
+                if ace_search_cache.get(domain, org, project, allowed_domains=domain) is not None:
+                    stats['warmed'] += 1
+                elif not text:
+                    stats['failed'] += 1
+    finally:
+        if not cancelled():
+            try:
+                pid_path.unlink()
+            except OSError:
+                pass
+
+    stats['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    try:
+        from ace_relevance_logger import log_prefetch
+        log_prefetch(session_id=session_id, project_id=project, domains=domains, **stats)
+    except Exception:
+        pass
+    return stats
+
+
+def lookup(query: str, domain: str, org: str = None, project: str = None,
+           cache_info: Dict[str, str] = None) -> Optional[str]:
+    """
+    Prefetched domain-level result for a domain-shift search, or None.
+
+    None also when the exact query is cached (run_domain_search() serves it)
+    or nothing was prefetched; the caller then searches as before.
+    """
+    if query == domain or ace_search_cache.get(query, org, project, allowed_domains=domain) is not None:
+        return None
+    cached = ace_search_cache.get(domain, org, project, allowed_domains=domain)
+    if cached is None:
+        return None
+    if cache_info is not None:
+        cache_info['status'] = 'prefetch'
+    return cached
+
+
+def hit_rate(log_paths: List[Path]) -> Dict[str, Any]:
+    """Share of domain-shift searches (PreToolUse, CwdChanged) answered without the server."""
+    statuses: Dict[str, int] = {}
+    runs = {'runs': 0, 'warmed': 0, 'cancelled': 0}
+    for path in log_paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            continue
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(entry, dict):
+                continue
+            if entry.get('event') == 'prefetch':
+                runs['runs'] += 1
+                runs['warmed'] += entry.get('warmed') or 0
+                runs['cancelled'] += bool(entry.get('cancelled'))
+            elif entry.get('event') in ('domain_shift', 'domain_search') and entry.get('search_cache'):
+                statuses[entry['search_cache']] = statuses.get(entry['search_cache'], 0) + 1
+
+    searches = sum(statuses.values())
+    return dict(runs, searches=searches, prefetch=statuses.get('prefetch', 0),
+                hit=statuses.get('hit', 0), miss=statuses.get('miss', 0),
+                prefetch_hit_rate=round(statuses.get('prefetch', 0) / searches, 3) if searches else None,
+                local_rate=round((statuses.get('prefetch', 0) + statuses.get('hit', 0)) / searches, 3)
+                if searches else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ACE domain prefetch')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('run', help='Prefetch domains from stdin params (detached worker)')
+    report_parser = sub.add_parser('report', help='Prefetch hit rate from the hook logs')
+    report_parser.add_argument('--log', action='append', help='Log file (repeatable)')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        params = json.load(sys.stdin)
+        run_prefetch(params.get('domains') or [], org=params.get('org'),
+                     project=params.get('project'), session_id=params.get('session_id'))
+    elif args.command == 'report':
+        stats = hit_rate([Path(p) for p in (args.log or DEFAULT_LOGS)])
+        for key, value in stats.items():
+            print(f"{key:>18}: {'-' if value is None else value}")
+
+
+if __name__ == '__main__':
+    main()
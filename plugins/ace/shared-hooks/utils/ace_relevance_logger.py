@@ -6,59 +6,168 @@ Logs pattern search and injection metrics to measure how relevant
 injected patterns are to actual tasks.
 
 Output: .claude/data/logs/ace-relevance.jsonl
+
+v6.5.0: Every search / domain_shift / execution entry also updates
+.claude/data/logs/ace-task-state.json, running sums for the current task
+(events since the last `execution` entry, which resets them). The statusline
+and the Stop hook read that instead of decoding the whole log:
+
+    {"task_started", "updated", "searches", "patterns_injected",
+     "confidence_sum", "avg_relevance", "domains", "domains_count",
+     "domain_shifts"}
 """
 
 import json
 import os
+import sys
+import tempfile
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
+from ace_jsonl_writer import append_record
+
+
+TASK_STATE_FILE = "ace-task-state.json"
+TASK_EVENTS = ('search', 'domain_shift', 'execution')
+
+
+def new_task_state(started: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        'task_started': started,
+        'updated': started,
+        'searches': 0,
+        'patterns_injected': 0,
+        'confidence_sum': 0.0,
+        'avg_relevance': 0,
+        'domains': [],
+        'domains_count': 0,
+        'domain_shifts': 0,
+    }
+
+
+def fold_task_event(state: Dict[str, Any], entry: Dict[str, Any]) -> bool:
+    """Apply one log entry to a task state; False if it doesn't affect it."""
+    event = entry.get('event')
+    if event not in TASK_EVENTS:
+        return False
+    if event == 'execution':
+        state.clear()
+        state.update(new_task_state(entry.get('timestamp')))
+        return True
+
+    if event == 'search':
+        state['searches'] += 1
+        state['patterns_injected'] += entry.get('patterns_injected', 0) or 0
+        state['confidence_sum'] = round(state['confidence_sum'] + (entry.get('avg_confidence', 0) or 0), 6)
+        domains = set(state['domains'])
+        domains.update(d for d in entry.get('domains') or [] if isinstance(d, str))
+        state['domains'] = sorted(domains)
+    else:
+        state['domain_shifts'] += 1
+    state['avg_relevance'] = (int(state['confidence_sum'] / state['searches'] * 100)
+                              if state['searches'] else 0)
+    state['domains_count'] = len(state['domains'])
+    state['updated'] = entry.get('timestamp')
+    return True
+
+
+def task_state_from_log(log_path: Path) -> Dict[str, Any]:
+    """Rebuild the current-task state by replaying a relevance log."""
+    state = new_task_state()
+    try:
+        with open(log_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict):
+                    fold_task_event(state, entry)
+    except OSError:
+        pass
+    return state
+
+
+def _load_task_state(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or set(new_task_state()) - set(state):
+        return None
+    return state
+
+
+def _save_task_state(path: Path, state: Dict[str, Any]) -> None:
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix='.ace-task-state-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def read_task_state(log_dir: str = ".claude/data/logs") -> Dict[str, Any]:
+    """
+    Current-task sums from ace-task-state.json.
+
+    Rebuilt from ace-relevance.jsonl (and saved) when the snapshot is
+    missing or unreadable, e.g. for logs written before v6.5.0.
+    """
+    log_dir = Path(log_dir)
+    path = log_dir / TASK_STATE_FILE
+    state = _load_task_state(path)
+    if state is None:
+        log_path = log_dir / "ace-relevance.jsonl"
+        state = task_state_from_log(log_path)
+        if log_path.exists():
+            _save_task_state(path, state)
+    return state
+
 
 class ACERelevanceLogger:
     """Logger for pattern relevance metrics with rotation."""
 
     # v5.4.5: Add rotation to prevent unbounded log growth
+    # v6.5.0: Full segments are sealed into the gzip segment store
+    # (ace_log_store) instead of rotating .1-.3 and deleting the oldest
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-    MAX_BACKUP_FILES = 3  # Keep 3 rotated files
 
     def __init__(self, log_dir: str = ".claude/data/logs"):
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(parents=True, exist_ok=True)
         self.log_path = self.log_dir / "ace-relevance.jsonl"
-
-    def _rotate_if_needed(self) -> None:
-        """Rotate log file if it exceeds MAX_FILE_SIZE."""
-        try:
-            if not self.log_path.exists():
-                return
-            if self.log_path.stat().st_size < self.MAX_FILE_SIZE:
-                return
-
-            # Rotate existing backups (3 -> delete, 2 -> 3, 1 -> 2)
-            for i in range(self.MAX_BACKUP_FILES, 0, -1):
-                old_path = self.log_dir / f"ace-relevance.{i}.jsonl"
-                new_path = self.log_dir / f"ace-relevance.{i+1}.jsonl"
-                if i == self.MAX_BACKUP_FILES and old_path.exists():
-                    old_path.unlink()  # Delete oldest
-                elif old_path.exists():
-                    old_path.rename(new_path)
-
-            # Rotate current to .1
-            self.log_path.rename(self.log_dir / "ace-relevance.1.jsonl")
-        except Exception:
-            pass  # Silent fail
+        self.task_state_path = self.log_dir / TASK_STATE_FILE
 
     def _write_log(self, entry: Dict[str, Any]) -> None:
-        """Write a log entry to the JSONL file with rotation."""
+        """Append a log entry (one locked write, sealing a full segment first)."""
         try:
-            self._rotate_if_needed()
-            with open(self.log_path, 'a') as f:
-                f.write(json.dumps(entry, default=str) + '\n')
+            locked = None
+            if entry.get('event') in TASK_EVENTS:
+                # v6.5.0: Update the snapshot while still holding the log's
+                # lock so concurrent hooks don't lose updates
+                locked = lambda: self._update_task_state(entry)
+            append_record(self.log_path, entry, max_bytes=self.MAX_FILE_SIZE, locked=locked)
         except Exception as e:
             # Silent fail - don't break hooks for logging
             pass
 
+    def _update_task_state(self, entry: Dict[str, Any]) -> None:
+        """Fold an entry into ace-task-state.json (atomic replace)."""
+        state = _load_task_state(self.task_state_path)
+        if state is None:
+            # No snapshot yet: replay the log, which already holds this entry
+            state = task_state_from_log(self.log_path)
+        else:
+            fold_task_event(state, entry)
+        _save_task_state(self.task_state_path, state)
+
     def log_search_metrics(
         self,
         hook: str,
@@ -70,12 +179,16 @@ class ACERelevanceLogger:
         domains: List[str],
         project_id: Optional[str] = None,
         org_id: Optional[str] = None,
-        agent_type: Optional[str] = None
+        agent_type: Optional[str] = None,
+        search_cache: Optional[str] = None,
+        search_source: Optional[str] = None
     ) -> None:
         """
         Log pattern search and injection metrics.
 
         Called from UserPromptSubmit and PreToolUse hooks after pattern search.
+        search_cache is the local cache outcome ('hit' / 'similar' / 'stale' / 'miss' / 'off').
+        search_source says who answered: 'remote', 'local' or 'hybrid'.
         """
         # Calculate metrics
         avg_confidence = 0.0
@@ -113,6 +226,10 @@ class ACERelevanceLogger:
             'domains': domains[:10],  # Limit to 10 domains
             'top_patterns': top_patterns
         }
+        if search_cache:
+            entry['search_cache'] = search_cache
+        if search_source:
+            entry['search_source'] = search_source
 
         self._write_log(entry)
 
@@ -124,7 +241,8 @@ class ACERelevanceLogger:
         file_path: str,
         patterns_found: int,
         search_succeeded: bool,
-        project_id: Optional[str] = None
+        project_id: Optional[str] = None,
+        search_cache: Optional[str] = None
     ) -> None:
         """
         Log domain shift detection and auto-search metrics.
@@ -143,6 +261,126 @@ class ACERelevanceLogger:
             'patterns_found': patterns_found,
             'search_succeeded': search_succeeded
         }
+        if search_cache:
+            entry['search_cache'] = search_cache
+
+        self._write_log(entry)
+
+    def log_preflight(
+        self,
+        session_id: str,
+        budget_ms: int,
+        steps_ms: Dict[str, Optional[float]],
+        outcome: str,
+        project_id: Optional[str] = None
+    ) -> None:
+        """
+        Log where the UserPromptSubmit pre-flight budget went.
+
+        steps_ms maps step name to wall time; None means the step was still
+        running at the deadline.
+        """
+        entry = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'event': 'preflight',
+            'hook': 'UserPromptSubmit',
+            'session_id': session_id,
+            'project_id': project_id,
+            'budget_ms': budget_ms,
+            'steps_ms': steps_ms,
+            'outcome': outcome
+        }
+
+        self._write_log(entry)
+
+    def log_swr_refresh(
+        self,
+        session_id: str,
+        stale_source: Optional[str],
+        overlap: float,
+        new_patterns: int,
+        refresh_ms: float,
+        succeeded: bool,
+        superseded: bool = False,
+        project_id: Optional[str] = None
+    ) -> None:
+        """
+        Log a stale-while-revalidate background refresh.
+
+        overlap is the Jaccard of stale vs fresh pattern ids; new_patterns
+        counts fresh top patterns the stale injection missed. superseded means
+        a newer prompt was injected before the refresh finished.
+        """
+        entry = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'event': 'swr_refresh',
+            'session_id': session_id,
+            'project_id': project_id,
+            'stale_source': stale_source,
+            'overlap': overlap,
+            'new_patterns': new_patterns,
+            'differs': new_patterns > 0,
+            'refresh_ms': refresh_ms,
+            'succeeded': succeeded,
+            'superseded': superseded
+        }
+
+        self._write_log(entry)
+
+    def log_swr_update(
+        self,
+        session_id: str,
+        channel: str,
+        patterns: int,
+        age_s: float,
+        project_id: Optional[str] = None
+    ) -> None:
+        """
+        Log delivery of fresh patterns a stale injection missed.
+
+        channel is 'pretooluse' or 'next_prompt'.
+        """
+        entry = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'event': 'swr_update',
+            'session_id': session_id,
+            'project_id': project_id,
+            'channel': channel,
+            'patterns': patterns,
+            'age_s': age_s
+        }
+
+        self._write_log(entry)
+
+    def log_prefetch(
+        self,
+        session_id: str,
+        domains: List[str],
+        requested: int,
+        warmed: int,
+        failed: int,
+        cancelled: bool,
+        elapsed_ms: float,
+        project_id: Optional[str] = None
+    ) -> None:
+        """
+        Log one speculative domain prefetch run (ace_prefetch.py).
+
+        Pair with the search_cache field of domain_shift events ('prefetch')
+        for the hit rate.
+        """
+        entry = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'event': 'prefetch',
+            'session_id': session_id,
+            'project_id': project_id,
+            'domains': domains,
+            'requested': requested,
+            'warmed': warmed,
+            'failed': failed,
+            'cancelled': cancelled,
+            'elapsed_ms': elapsed_ms
+        }
 
         self._write_log(entry)
 
@@ -262,6 +500,26 @@ def log_domain_shift(**kwargs) -> None:
     get_relevance_logger().log_domain_shift(**kwargs)
 
 
+def log_preflight(**kwargs) -> None:
+    """Convenience function to log pre-flight timings."""
+    get_relevance_logger().log_preflight(**kwargs)
+
+
+def log_swr_refresh(**kwargs) -> None:
+    """Convenience function to log stale-while-revalidate refreshes."""
+    get_relevance_logger().log_swr_refresh(**kwargs)
+
+
+def log_swr_update(**kwargs) -> None:
+    """Convenience function to log stale-while-revalidate updates."""
+    get_relevance_logger().log_swr_update(**kwargs)
+
+
+def log_prefetch(**kwargs) -> None:
+    """Convenience function to log domain prefetch runs."""
+    get_relevance_logger().log_prefetch(**kwargs)
+
+
 def log_compact_event(**kwargs) -> None:
     """Convenience function to log compact events."""
     get_relevance_logger().log_compact_event(**kwargs)
@@ -295,6 +553,11 @@ def log_hook_error(
 
 
 if __name__ == '__main__':
+    if sys.argv[1:2] == ['task-state']:
+        # Statusline / Stop fallback when ace-task-state.json doesn't exist yet
+        print(json.dumps(read_task_state(sys.argv[2] if len(sys.argv) > 2 else ".claude/data/logs")))
+        sys.exit(0)
+
     # Test logging
     logger = ACERelevanceLogger()
 
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+ACE Search Cache - local LRU of `ace-cli search` responses.
+
+v6.5.0: Resubmitted or re-phrased prompts and repeated domain shifts used to
+go to the server every time. run_search() / run_domain_search() now consult
+$XDG_CACHE_HOME/ace/search-cache.db first.
+
+Entries are keyed on the normalised query (lower-case, collapsed whitespace),
+org, project, --allowed-domains and whether the search pinned a session.
+They expire after ACE_SEARCH_CACHE_TTL seconds (900). Least-recently-used
+entries are evicted once the cache holds more than
+ACE_SEARCH_CACHE_MAX_ENTRIES (500) or ACE_SEARCH_CACHE_MAX_MB (16). A
+successful learn that changed the playbook drops every entry of its project
+(invalidate_project()).
+
+Near-duplicate reuse (schema v2): each entry also stores a MinHash signature
+of the query's word set. When UserPromptSubmit misses the exact key,
+get_similar() serves the most similar cached query in the same scope, if its
+estimated Jaccard similarity is at least ACE_SEARCH_SIMILARITY (0.75; "fix
+the test" vs "fix the failing test"). A detached `refresh` process then runs
+the real search (spawn_refresh()). Queries under MIN_TOKENS words are never
+matched. `python3 ace_search_cache.py eval` replays ace-relevance.jsonl to
+compare hit rate against pattern overlap per threshold.
+
+get_with_age() also returns expired entries (up to a caller-supplied age)
+for stale-while-revalidate injection (ace_swr.py); the refresh process then
+reports its result to ace_swr.
+
+ACE_SEARCH_CACHE=0 disables the cache. Every function fails silently: the
+caller just goes to the server.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import struct
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+from ace_cli_cache import get_cache_dir
+
+SCHEMA_VERSION = 2
+DB_NAME = 'search-cache.db'
+BUSY_TIMEOUT_MS = 1000
+
+TTL_SECS = int(os.environ.get('ACE_SEARCH_CACHE_TTL', '900'))
+MAX_ENTRIES = int(os.environ.get('ACE_SEARCH_CACHE_MAX_ENTRIES', '500'))
+MAX_BYTES = int(float(os.environ.get('ACE_SEARCH_CACHE_MAX_MB', '16')) * 1024 * 1024)
+
+SIMILARITY = float(os.environ.get('ACE_SEARCH_SIMILARITY', '0.75'))
+MIN_TOKENS = 3
+SIMILAR_SCAN_LIMIT = 200  # most recently used candidates per lookup
+
+# MinHash: NUM_PERMS universal hashes (a*x + b) mod a Mersenne prime, fixed seed
+# so signatures are comparable across processes
+NUM_PERMS = 32
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5ACE)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERMS)]
+_SIGNATURE = struct.Struct(f'>{NUM_PERMS}I')
+
+
+def cache_enabled() -> bool:
+    return os.environ.get('ACE_SEARCH_CACHE', '1') != '0'
+
+
+def get_db_path() -> Path:
+    return get_cache_dir() / DB_NAME
+
+
+def normalize_query(query: str) -> str:
+    return ' '.join((query or '').lower().split())
+
+
+def query_tokens(query: str) -> set:
+    return set(re.findall(r'[a-z0-9_]+', normalize_query(query)))
+
+
+def signature(query: str) -> Optional[bytes]:
+    """MinHash signature of the query's word set (None below MIN_TOKENS words)."""
+    tokens = query_tokens(query)
+    if len(tokens) < MIN_TOKENS:
+        return None
+    hashes = [int.from_bytes(hashlib.blake2b(t.encode('utf-8'), digest_size=8).digest(), 'big')
+              for t in tokens]
+    return _SIGNATURE.pack(*(min((a * h + b) % _PRIME for h in hashes) & 0xFFFFFFFF
+                             for a, b in _PERMS))
+
+
+def similarity(sig_a: bytes, sig_b: bytes) -> float:
+    """Estimated Jaccard similarity: fraction of matching MinHash slots."""
+    if not sig_a or not sig_b or len(sig_a) != len(sig_b):
+        return 0.0
+    a, b = _SIGNATURE.unpack(sig_a), _SIGNATURE.unpack(sig_b)
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERMS
+
+
+def make_key(query: str, org: str = None, project: str = None,
+             allowed_domains: str = None, pinned: bool = False) -> str:
+    parts = [normalize_query(query), org or '', project or '', allowed_domains or '', bool(pinned)]
+    return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+
+
+def _migrate_v1(conn: sqlite3.Connection) -> None:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS search_cache (
+            key TEXT PRIMARY KEY,
+            org TEXT,
+            project TEXT,
+            query TEXT,
+            allowed_domains TEXT,
+            pinned INTEGER,
+            response TEXT,
+            bytes INTEGER,
+            created_at REAL,
+            last_used REAL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_last_used ON search_cache(last_used)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_project ON search_cache(project)')
+
+
+def _migrate_v2(conn: sqlite3.Connection) -> None:
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(search_cache)')}
+    if 'signature' not in columns:
+        conn.execute('ALTER TABLE search_cache ADD COLUMN signature BLOB')
+
+
+MIGRATIONS = [
+    (1, _migrate_v1),
+    (2, _migrate_v2),
+]
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """Bring the schema up to SCHEMA_VERSION (no-op when already current)."""
+    if conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+        return
+
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for target, migration in MIGRATIONS:
+            if version < target:
+                migration(conn)
+                version = target
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def open_db(db_path: Path = None) -> sqlite3.Connection:
+    if db_path is None:
+        db_path = get_db_path()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    try:
+        _migrate(conn)
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+def get(query: str, org: str = None, project: str = None,
+        allowed_domains: str = None, pinned: bool = False) -> Optional[str]:
+    """Cached raw response text, or None on a miss (or when disabled)."""
+    entry = get_with_age(query, org, project, allowed_domains, pinned, max_age=TTL_SECS)
+    return entry[0] if entry is not None else None
+
+
+def get_with_age(query: str, org: str = None, project: str = None,
+                 allowed_domains: str = None, pinned: bool = False,
+                 max_age: float = None) -> Optional[Tuple[str, float]]:
+    """(response, age_secs) for entries up to max_age old, expired ones included."""
+    if not cache_enabled():
+        return None
+    key = make_key(query, org, project, allowed_domains, pinned)
+    try:
+        conn = open_db()
+        try:
+            now = time.time()
+            row = conn.execute('SELECT response, created_at FROM search_cache WHERE key = ? AND created_at > ?',
+                               (key, now - (TTL_SECS if max_age is None else max_age))).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE search_cache SET last_used = ? WHERE key = ?', (now, key))
+            conn.commit()
+            return row[0], round(now - row[1], 1)
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+
+def _evict(conn: sqlite3.Connection) -> int:
+    """Drop least-recently-used entries until both bounds hold."""
+    count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM search_cache').fetchone()
+    evicted = 0
+    for key, size in conn.execute('SELECT key, bytes FROM search_cache ORDER BY last_used').fetchall():
+        if count <= MAX_ENTRIES and total <= MAX_BYTES:
+            break
+        conn.execute('DELETE FROM search_cache WHERE key = ?', (key,))
+        count -= 1
+        total -= size or 0
+        evicted += 1
+    return evicted
+
+
+def put(query: str, response: str, org: str = None, project: str = None,
+        allowed_domains: str = None, pinned: bool = False) -> None:
+    """Store a successful raw response (callers only pass valid JSON)."""
+    if not cache_enabled() or not response:
+        return
+    key = make_key(query, org, project, allowed_domains, pinned)
+    try:
+        conn = open_db()
+        try:
+            now = time.time()
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('''
+                INSERT OR REPLACE INTO search_cache
+                    (key, org, project, query, allowed_domains, pinned, response, bytes,
+                     created_at, last_used, signature)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (key, org, project, normalize_query(query), allowed_domains, int(bool(pinned)),
+                  response, len(response.encode('utf-8')), now, now, signature(query)))
+            _evict(conn)
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        pass
+
+
+def get_similar(query: str, org: str = None, project: str = None,
+                allowed_domains: str = None, pinned: bool = False,
+                threshold: float = None) -> Optional[Tuple[str, float, str]]:
+    """
+    Best near-duplicate in the same scope: (response, similarity, cached_query).
+
+    Only fresh entries of the same org/project/domains/pinning are compared,
+    most recently used first, at most SIMILAR_SCAN_LIMIT of them.
+    """
+    if not cache_enabled():
+        return None
+    threshold = SIMILARITY if threshold is None else threshold
+    if threshold <= 0 or threshold > 1:
+        return None
+    sig = signature(query)
+    if sig is None:
+        return None
+    try:
+        conn = open_db()
+        try:
+            rows = conn.execute('''
+                SELECT key, query, response, signature FROM search_cache
+                WHERE org IS ? AND project IS ? AND allowed_domains IS ? AND pinned = ?
+                  AND created_at > ? AND signature IS NOT NULL
+                ORDER BY last_used DESC LIMIT ?
+            ''', (org, project, allowed_domains, int(bool(pinned)),
+                  time.time() - TTL_SECS, SIMILAR_SCAN_LIMIT)).fetchall()
+            best = max(((similarity(sig, row[3]), row) for row in rows),
+                       key=lambda pair: pair[0], default=(0.0, None))
+            if best[1] is None or best[0] < threshold:
+                return None
+            key, cached_query, response, _ = best[1]
+            conn.execute('UPDATE search_cache SET last_used = ? WHERE key = ?', (time.time(), key))
+            conn.commit()
+            return response, best[0], cached_query
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+
+def spawn_refresh(query: str, org: str = None, project: str = None,
+                  session_id: str = None, swr_session: str = None) -> None:
+    """
+    Run the real search in a detached process; it stores the fresh result.
+
+    With swr_session, the process also reports the result to ace_swr
+    (stale-while-revalidate) for that session.
+    """
+    try:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), 'refresh'],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True)
+        proc.stdin.write(json.dumps({'query': query, 'org': org, 'project': project,
+                                     'session_id': session_id,
+                                     'swr_session': swr_session}).encode('utf-8'))
+        proc.stdin.close()
+    except OSError:
+        pass
+
+
+def invalidate_project(project: str) -> int:
+    """Drop all entries of a project (after a learn changed its playbook)."""
+    if not project:
+        return 0
+    db_path = get_db_path()
+    if not db_path.exists():
+        return 0
+    try:
+        conn = open_db(db_path)
+        try:
+            deleted = conn.execute('DELETE FROM search_cache WHERE project = ?', (project,)).rowcount
+            conn.commit()
+            return deleted
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return 0
+
+
+def learn_changed_playbook(stats: Dict[str, Any]) -> bool:
+    """True if learning_statistics report created/updated/merged/pruned patterns."""
+    if not isinstance(stats, dict):
+        return False
+    return any((stats.get(k) or 0) > 0 for k in
+               ('patterns_created', 'patterns_updated', 'patterns_merged', 'patterns_pruned'))
+
+
+# =============================================================================
+# CLI: refresh (background worker) and eval (offline threshold evaluation)
+# =============================================================================
+
+def evaluate(log_path: Path, thresholds: List[float]) -> List[Dict[str, Any]]:
+    """
+    Replay UserPromptSubmit searches from ace-relevance.jsonl in order.
+
+    For each search, find the most similar earlier query of the same project.
+    A "hit" at threshold t means that query's similarity is >= t. Overlap is
+    the Jaccard of the two searches' top pattern ids: how much of what was
+    actually injected the reused result would have matched.
+    """
+    history: List[Tuple[Optional[str], bytes, set]] = []
+    samples: List[Tuple[float, float]] = []  # (best similarity, overlap)
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('event') != 'search' or entry.get('hook') != 'UserPromptSubmit':
+                continue
+            query = entry.get('search_query') or entry.get('user_prompt') or ''
+            sig = signature(query)
+            if sig is None:
+                continue
+            ids = {p.get('id') for p in entry.get('top_patterns') or [] if p.get('id')}
+            project = entry.get('project_id')
+            best, overlap = 0.0, 0.0
+            for prev_project, prev_sig, prev_ids in history[-SIMILAR_SCAN_LIMIT:]:
+                if prev_project != project:
+                    continue
+                score = similarity(sig, prev_sig)
+                if score > best:
+                    union = ids | prev_ids
+                    best, overlap = score, (len(ids & prev_ids) / len(union) if union else 1.0)
+            samples.append((best, overlap))
+            history.append((project, sig, ids))
+
+    report = []
+    for t in thresholds:
+        hits = [overlap for score, overlap in samples if score >= t]
+        report.append({
+            'threshold': t,
+            'searches': len(samples),
+            'hit_rate': round(len(hits) / len(samples), 3) if samples else 0.0,
+            'mean_overlap': round(sum(hits) / len(hits), 3) if hits else None,
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ACE local search cache')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('refresh', help='Run one search from stdin params and cache it')
+    eval_parser = sub.add_parser('eval', help='Replay ace-relevance.jsonl against thresholds')
+    eval_parser.add_argument('--log', default='.claude/data/logs/ace-relevance.jsonl')
+    eval_parser.add_argument('--thresholds', default='0.5,0.6,0.7,0.75,0.8,0.9,1.0')
+    args = parser.parse_args()
+
+    if args.command == 'refresh':
+        import ace_cli
+        params = json.load(sys.stdin)
+        start = time.perf_counter()
+        response = ace_cli.run_search(params['query'], org=params.get('org'),
+                                      project=params.get('project'),
+                                      session_id=params.get('session_id'))
+        if params.get('swr_session'):
+            import ace_swr
+            ace_swr.record_fresh(params['swr_session'], params['query'], response,
+                                 round((time.perf_counter() - start) * 1000, 1),
+                                 project_id=params.get('project'))
+    elif args.command == 'eval':
+        thresholds = [float(t) for t in args.thresholds.split(',')]
+        print(f"{'threshold':>10}{'searches':>10}{'hit rate':>10}{'overlap':>10}")
+        for row in evaluate(Path(args.log), thresholds):
+            overlap = '-' if row['mean_overlap'] is None else f"{row['mean_overlap']:.3f}"
+            print(f"{row['threshold']:>10.2f}{row['searches']:>10}{row['hit_rate']:>10.3f}{overlap:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+ACE Stale-While-Revalidate - instant UserPromptSubmit injection.
+
+v6.5.0: With ACE_SEARCH_SWR=1, UserPromptSubmit no longer waits for the
+server when it already has something to show. immediate_result() takes the
+first available of:
+
+- cache   - the prompt's exact search-cache entry, even past its TTL
+            (up to ACE_SWR_MAX_AGE seconds)
+- similar - a near-duplicate cached prompt (ace_search_cache.get_similar)
+- local   - the local pattern index (ace_pattern_index.search)
+- session - this session's last injection
+
+That result is injected with freshness="stale" on the <ace-patterns> tag,
+and a detached refresh (ace_search_cache.py refresh) runs the real search.
+record_fresh() compares the fresh top MATERIAL_TOP_N against what was
+injected. Patterns that were missing are kept as a pending update. The next
+PreToolUse delivers it as additionalContext, or else the next prompt does
+(take_update()).
+
+State lives in .claude/data/logs/ace-swr-<session>.json (replaced
+atomically); a pending update is a separate ace-swr-<session>-update.json, so
+PreToolUse only needs an exists() check and claims it with a rename. Every refresh logs an 'swr_refresh' event
+to ace-relevance.jsonl (overlap, new patterns, refresh time); every delivery
+logs 'swr_update'. Together they show how often stale results differed from
+fresh ones.
+"""
+
+import json
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+import ace_pattern_index
+import ace_search_cache
+
+STATE_DIR = Path('.claude/data/logs')
+MAX_STALE_SECS = int(os.environ.get('ACE_SWR_MAX_AGE', '86400'))
+MATERIAL_TOP_N = 5
+
+# Fields an update injects (the rest is server bookkeeping)
+UPDATE_FIELDS = ('id', 'domain', 'content', 'confidence', 'helpful', 'harmful', 'section')
+
+
+def swr_enabled() -> bool:
+    return os.environ.get('ACE_SEARCH_SWR', '0') == '1'
+
+
+def updates_enabled() -> bool:
+    """Pending updates come from SWR refreshes and from hybrid mode's late remote results."""
+    return swr_enabled() or ace_pattern_index.get_search_mode() == 'hybrid'
+
+
+def _safe(session_id: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', session_id or 'unknown')
+
+
+def get_state_path(session_id: str) -> Path:
+    return STATE_DIR / f'ace-swr-{_safe(session_id)}.json'
+
+
+def get_update_path(session_id: str) -> Path:
+    return STATE_DIR / f'ace-swr-{_safe(session_id)}-update.json'
+
+
+def load_state(session_id: str) -> Dict[str, Any]:
+    try:
+        with open(get_state_path(session_id), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix='.ace-swr-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def pattern_ids(response: Any) -> List[str]:
+    if not isinstance(response, dict):
+        return []
+    return [p.get('id') for p in response.get('similar_patterns') or []
+            if isinstance(p, dict) and p.get('id')]
+
+
+def _parse(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def immediate_result(query: str, org: str = None, project: str = None,
+                     session_id: str = None, pinned: bool = False
+                     ) -> Optional[Tuple[Dict[str, Any], str, Optional[float]]]:
+    """
+    (response, source, age_secs) to inject without waiting, or None.
+
+    None also when the exact cache entry is still fresh: run_search() serves
+    that itself and there is nothing to revalidate.
+    """
+    if ace_search_cache.get(query, org, project, pinned=pinned) is not None:
+        return None
+
+    stale = ace_search_cache.get_with_age(query, org, project, pinned=pinned,
+                                          max_age=MAX_STALE_SECS)
+    if stale is not None and pattern_ids(_parse(stale[0])):
+        return _parse(stale[0]), 'cache', stale[1]
+    similar = ace_search_cache.get_similar(query, org, project, pinned=pinned)
+    if similar is not None and pattern_ids(_parse(similar[0])):
+        return _parse(similar[0]), 'similar', None
+
+    local = ace_pattern_index.search(query, org, project)
+    if pattern_ids(local):
+        return local, 'local', None
+
+    last = load_state(session_id).get('injected') or {}
+    if pattern_ids(last.get('response')):
+        return last['response'], 'session', round(time.time() - last.get('at', time.time()), 1)
+    return None
+
+
+def record_injection(session_id: str, query: str, response: Dict[str, Any],
+                     source: str) -> None:
+    """Remember what this prompt injected (any undelivered update is kept)."""
+    state = load_state(session_id)
+    state['injected'] = {'query': query, 'source': source, 'at': time.time(),
+                         'response': response}
+    _write_json(get_state_path(session_id), state)
+
+
+def record_fresh(session_id: str, query: str, response: Any, refresh_ms: float,
+                 project_id: str = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Compare a background refresh with what was injected for the same query.
+
+    Returns the fresh top patterns the stale injection missed (also stored as
+    the session's pending update), or None.
+    """
+    state = load_state(session_id)
+    injected = state.get('injected') or {}
+    superseded = injected.get('query') != query
+    fresh_ids = pattern_ids(response)
+    stale_ids = pattern_ids(injected.get('response')) if not superseded else []
+    union = set(fresh_ids) | set(stale_ids)
+    overlap = round(len(set(fresh_ids) & set(stale_ids)) / len(union), 3) if union else 1.0
+    new_patterns = []
+    if fresh_ids and not superseded:
+        new_patterns = [{k: p[k] for k in UPDATE_FIELDS if k in p}
+                        for p in response['similar_patterns'][:MATERIAL_TOP_N]
+                        if p.get('id') not in stale_ids]
+        # The fresh set becomes the session's last injection
+        state['injected'] = dict(injected, response=response, source='fresh', at=time.time())
+        _write_json(get_state_path(session_id), state)
+        if new_patterns:
+            _write_json(get_update_path(session_id),
+                        {'query': query, 'at': time.time(), 'patterns': new_patterns})
+
+    try:
+        from ace_relevance_logger import log_swr_refresh
+        log_swr_refresh(session_id=session_id, stale_source=injected.get('source'),
+                        overlap=overlap, new_patterns=len(new_patterns),
+                        refresh_ms=refresh_ms, succeeded=bool(fresh_ids),
+                        superseded=superseded, project_id=project_id)
+    except Exception:
+        pass
+    return new_patterns or None
+
+
+def take_update(session_id: str, channel: str,
+                project_id: str = None) -> Optional[Dict[str, Any]]:
+    """Claim the pending update, as a search-shaped response, or None."""
+    path = get_update_path(session_id)
+    claimed = path.with_name(f'.{path.name}.{os.getpid()}')
+    try:
+        os.replace(path, claimed)  # only one hook wins the update
+    except OSError:
+        return None
+    try:
+        with open(claimed, 'r', encoding='utf-8') as f:
+            pending = json.load(f)
+    except (OSError, ValueError):
+        pending = None
+    finally:
+        try:
+            claimed.unlink()
+        except OSError:
+            pass
+    if not isinstance(pending, dict) or not pending.get('patterns'):
+        return None
+
+    try:
+        from ace_relevance_logger import log_swr_update
+        log_swr_update(session_id=session_id, channel=channel,
+                       patterns=len(pending['patterns']),
+                       age_s=round(time.time() - pending.get('at', time.time()), 1),
+                       project_id=project_id)
+    except Exception:
+        pass
+    return {'similar_patterns': pending['patterns'], 'count': len(pending['patterns'])}
+
+
+def format_update(update: Dict[str, Any]) -> str:
+    return (f'<ace-patterns freshness="fresh" update="true">\n'
+            f'{json.dumps(update)}\n</ace-patterns>')
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+ACE Tool Summaries - trajectory step text for accumulated tool calls.
+
+v6.5.0: Shared by PostToolUse (ace_tool_accumulator.append_tool precomputes
+the summaries at insert time) and Stop (ace_after_task, for rows written
+before the summary columns existed and for per-agent transcripts), plus the
+per-tool projection that decides which payload fields ace-tools.db keeps.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Tuple
+
+# Tool name substrings that count as "meaningful work" (quality gate + metrics)
+STATE_CHANGING_TOOLS = ['Edit', 'Write', 'Bash', 'mcp__', 'NotebookEdit']
+
+
+def decode_payload(value: Any) -> Any:
+    """Return the payload as the Stop hook sees it after a JSON round trip."""
+    if isinstance(value, dict):
+        return value
+    if not value:
+        return {}
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return {}
+
+
+def is_state_changing(tool_name: str) -> bool:
+    return any(t in (tool_name or '') for t in STATE_CHANGING_TOOLS)
+
+
+def is_error_response(tool_response: Any) -> bool:
+    """An `error` or `stderr` field marks the call as failed."""
+    if not isinstance(tool_response, dict):
+        return False
+    return bool(tool_response.get('error') or tool_response.get('stderr'))
+
+
+def summarize_tool_action(tool_name: str, tool_input: dict) -> str:
+    """
+    Create human-readable action summary for tool call.
+
+    Per ACE Research Paper Page 19: Trajectory should show what tool did.
+    """
+    if tool_name == 'Edit':
+        file_path = tool_input.get('file_path', 'unknown file')
+        return f"Edited {Path(file_path).name}"
+
+    elif tool_name == 'Write':
+        file_path = tool_input.get('file_path', 'unknown file')
+        return f"Wrote {Path(file_path).name}"
+
+    elif tool_name == 'Read':
+        file_path = tool_input.get('file_path', 'unknown file')
+        return f"Read {Path(file_path).name}"
+
+    elif tool_name == 'Bash':
+        command = tool_input.get('command', tool_input.get('description', ''))
+        if len(command) > 60:
+            command = command[:60] + '...'
+        return f"Ran: {command}"
+
+    elif tool_name == 'Grep':
+        pattern = tool_input.get('pattern', '')
+        return f"Searched for: {pattern}"
+
+    elif tool_name == 'Glob':
+        pattern = tool_input.get('pattern', '')
+        return f"Found files matching: {pattern}"
+
+    elif tool_name == 'Task':
+        description = tool_input.get('description', tool_input.get('prompt', ''))
+        if len(description) > 60:
+            description = description[:60] + '...'
+        return f"Spawned task: {description}"
+
+    elif tool_name == 'TodoWrite':
+        return "Updated todo list"
+
+    elif tool_name.startswith('mcp__'):
+        # MCP tool call
+        return f"Called MCP: {tool_name}"
+
+    else:
+        return f"{tool_name}"
+
+
+def summarize_tool_response(tool_name: str, tool_response: dict) -> str:
+    """
+    Create human-readable result summary for tool response.
+
+    Per ACE Research Paper Page 19: Trajectory should show execution feedback.
+    """
+    if isinstance(tool_response, str):
+        if len(tool_response) > 100:
+            return tool_response[:100] + '...'
+        return tool_response
+
+    # Handle error responses
+    if tool_response.get('error'):
+        return f"Error: {tool_response.get('error', 'Unknown error')[:100]}"
+
+    if tool_response.get('stderr'):
+        return f"Stderr: {tool_response.get('stderr', '')[:100]}"
+
+    # Handle success responses
+    if tool_name in ['Edit', 'Write']:
+        success = tool_response.get('success', False)
+        return "Success" if success else "Failed"
+
+    elif tool_name == 'Read':
+        content = tool_response.get('content', '')
+        lines = content.count('\n') + 1 if content else 0
+        return f"Read {lines} lines"
+
+    elif tool_name == 'Bash':
+        stdout = tool_response.get('stdout', '')
+        exit_code = tool_response.get('exit_code', tool_response.get('exitCode', 0))
+        if exit_code != 0:
+            return f"Exit code {exit_code}"
+        if stdout:
+            first_line = stdout.split('\n')[0]
+            if len(first_line) > 60:
+                first_line = first_line[:60] + '...'
+            return first_line or "Success"
+        return "Success"
+
+    elif tool_name in ['Grep', 'Glob']:
+        # Files found
+        files = tool_response.get('files', [])
+        if isinstance(files, list):
+            return f"Found {len(files)} files"
+        return str(tool_response)[:100]
+
+    elif tool_name == 'Task':
+        return "Task completed"
+
+    else:
+        # Generic response summary
+        response_str = str(tool_response)
+        if len(response_str) > 100:
+            return response_str[:100] + '...'
+        return response_str
+
+
+def summarize_tool(tool_name: str, tool_input: Any, tool_response: Any) -> Tuple[str, str, bool, bool]:
+    """
+    Precompute everything the Stop hook needs from one tool call.
+
+    Returns:
+        (action_summary, result_summary, is_error, is_state_changing)
+    """
+    tool_input = decode_payload(tool_input)
+    tool_response = decode_payload(tool_response)
+    if not isinstance(tool_input, dict):
+        tool_input = {}
+    return (
+        summarize_tool_action(tool_name, tool_input),
+        summarize_tool_response(tool_name, tool_response),
+        is_error_response(tool_response),
+        is_state_changing(tool_name),
+    )
+
+
+# v6.5.0: Per-tool projection policy for what ace-tools.db keeps of each call.
+# Summaries are computed from the full payload before projecting, so only the
+# fields later readers use are kept (action text, detect_commits_in_session).
+# Tools not listed keep every top-level field, capped.
+INPUT_FIELDS = {
+    'Edit': ('file_path', 'replace_all'),
+    'MultiEdit': ('file_path',),
+    'Write': ('file_path',),
+    'NotebookEdit': ('notebook_path', 'cell_id', 'edit_mode'),
+    'Read': ('file_path', 'offset', 'limit'),
+    'Bash': ('command', 'description', 'run_in_background'),
+    'Grep': ('pattern', 'path', 'glob', 'type', 'output_mode'),
+    'Glob': ('pattern', 'path'),
+    'Task': ('description', 'prompt', 'subagent_type'),
+    'TodoWrite': (),
+}
+
+RESPONSE_FIELDS = {
+    'Edit': ('success', 'error', 'filePath'),
+    'MultiEdit': ('success', 'error', 'filePath'),
+    'Write': ('success', 'error', 'filePath', 'type'),
+    'NotebookEdit': ('success', 'error'),
+    'Read': ('error', 'numLines'),
+    'Bash': ('stdout', 'stderr', 'exit_code', 'exitCode', 'interrupted', 'error'),
+    'Grep': ('numFiles', 'error'),
+    'Glob': ('numFiles', 'error'),
+    'Task': ('status', 'error'),
+    'TodoWrite': (),
+}
+
+
+def _cap(value: Any, max_chars: int) -> Any:
+    """Truncate strings; nested values over the cap become truncated JSON text."""
+    if isinstance(value, str):
+        return value[:max_chars]
+    if isinstance(value, (dict, list)):
+        text = json.dumps(value, default=str)
+        return value if len(text) <= max_chars else text[:max_chars]
+    return value
+
+
+def _project(payload: Any, fields: Any, max_chars: int) -> Any:
+    if not isinstance(payload, dict):
+        return _cap(payload if isinstance(payload, str) else str(payload), max_chars)
+    keys = payload.keys() if fields is None else [k for k in fields if k in payload]
+    return {k: _cap(payload[k], max_chars) for k in keys}
+
+
+def project_tool_payload(tool_name: str, tool_input: Any, tool_response: Any,
+                         max_chars: int = 2000) -> Tuple[Any, Any]:
+    """
+    Reduce a tool call to the fields the trajectory pipeline reads.
+
+    Args:
+        max_chars: Cap for each kept string field (Bash stdout, prompts, ...)
+
+    Returns:
+        (projected_input, projected_response)
+    """
+    return (
+        _project(tool_input, INPUT_FIELDS.get(tool_name), max_chars),
+        _project(tool_response, RESPONSE_FIELDS.get(tool_name), max_chars),
+    )
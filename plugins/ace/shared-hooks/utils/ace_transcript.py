@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+ACE Transcript Reading - Claude Code session transcripts without full decodes.
+
+v6.5.0: Session transcripts grow to hundreds of MB in long sessions, and the
+Stop hook only needs the last real user prompt. iter_lines_reverse() seeks
+from EOF in CHUNK_SIZE blocks and yields raw lines last-to-first, so
+find_last_user_prompt() decodes only lines that look like user messages,
+and only until it finds a text prompt. Memory stays O(chunk + longest line).
+
+SubagentStop fires every time an agent stops, and re-decoding its whole
+per-agent transcript each time made long-running agents quadratic.
+scan_agent_tools() resumes from a checkpoint instead:
+
+    $XDG_CACHE_HOME/ace/transcript-checkpoints/<sha1(path)>.json
+        {"path", "dev", "ino", "offset", "fingerprint": [length, sha1],
+         "tool_uses": {id: [name, input_json]}, "tool_results": {id: json},
+         "order": [id, ...]}
+
+It mmaps the file and scans from the saved byte offset, decoding only lines
+that contain "tool_use" / "tool_result". Only complete lines advance the
+offset. An unterminated last line is still parsed for the current call, but
+it is never checkpointed. A checkpoint is dropped (full re-parse) when the
+file's inode changed, it shrank below the offset, or its first bytes no
+longer match the fingerprint (rotated or rewritten in place).
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterator, Optional, Dict, Any
+
+CHUNK_SIZE = 64 * 1024
+PROMPT_MAX_CHARS = 2000
+
+# Cheap pre-filter before json.loads (CC writes compact JSON, but allow spaces)
+USER_ROLE_RE = re.compile(rb'"role"\s*:\s*"user"')
+TOOL_MARKERS = (b'"tool_use"', b'"tool_result"')
+
+CHECKPOINT_DIR = 'transcript-checkpoints'
+FINGERPRINT_BYTES = 4096
+CHECKPOINT_MAX_AGE_SECS = 7 * 86400
+
+
+def iter_lines_reverse(path, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Non-empty lines of a file as bytes, last line first."""
+    with open(path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        pending = []  # pieces of a line longer than one chunk, last piece first
+        while position > 0:
+            size = min(chunk_size, position)
+            position -= size
+            f.seek(position)
+            parts = f.read(size).split(b'\n')
+            if len(parts) == 1:
+                pending.append(parts[0])
+                continue
+            line = parts[-1] + b''.join(reversed(pending))
+            if line.strip():
+                yield line
+            for part in reversed(parts[1:-1]):
+                if part.strip():
+                    yield part
+            pending = [parts[0]]
+        line = b''.join(reversed(pending))
+        if line.strip():
+            yield line
+
+
+def prompt_text(message: dict) -> Optional[str]:
+    """A user message's prompt text, or None (tool results, empty or too short)."""
+    content = message.get('content', '')
+    if isinstance(content, list):
+        # tool_result messages have role=user but are not user prompts
+        if any(isinstance(b, dict) and b.get('type') == 'tool_result' for b in content):
+            return None
+        text = '\n'.join(b.get('text', '') for b in content
+                         if isinstance(b, dict) and b.get('type') == 'text')
+        return text[:PROMPT_MAX_CHARS] if text.strip() else None
+    if isinstance(content, str) and len(content.strip()) > 10:
+        return content[:PROMPT_MAX_CHARS]
+    return None
+
+
+def find_last_user_prompt(transcript_path) -> Optional[str]:
+    """Text of the last real user prompt in a transcript, or None."""
+    for line in iter_lines_reverse(Path(transcript_path).expanduser()):
+        if not USER_ROLE_RE.search(line):
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        message = entry.get('message') if isinstance(entry, dict) else None
+        if isinstance(message, dict) and message.get('role') == 'user':
+            text = prompt_text(message)
+            if text is not None:
+                return text
+    return None
+
+
+# =============================================================================
+# Checkpointed per-agent transcript scanning
+# =============================================================================
+
+def get_checkpoint_dir() -> Path:
+    base = os.environ.get('XDG_CACHE_HOME') or str(Path.home() / '.cache')
+    return Path(base) / 'ace' / CHECKPOINT_DIR
+
+
+def get_checkpoint_path(transcript_path) -> Path:
+    key = hashlib.sha1(os.path.realpath(str(transcript_path)).encode('utf-8')).hexdigest()
+    return get_checkpoint_dir() / f'{key}.json'
+
+
+def _empty_state() -> Dict[str, Any]:
+    return {'tool_uses': {}, 'tool_results': {}, 'order': []}
+
+
+def _fingerprint(mm, length: int) -> list:
+    return [length, hashlib.sha1(mm[:length]).hexdigest()]
+
+
+def _load_checkpoint(transcript_path, st: os.stat_result, mm) -> Optional[Dict[str, Any]]:
+    try:
+        with open(get_checkpoint_path(transcript_path), 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(checkpoint, dict):
+        return None
+    offset = checkpoint.get('offset')
+    fingerprint = checkpoint.get('fingerprint') or [0, '']
+    if ((checkpoint.get('dev'), checkpoint.get('ino')) != (st.st_dev, st.st_ino)
+            or not isinstance(offset, int) or not 0 <= offset <= st.st_size
+            or fingerprint[0] > st.st_size or _fingerprint(mm, fingerprint[0]) != fingerprint):
+        return None
+    return checkpoint
+
+
+def _save_checkpoint(transcript_path, st: os.stat_result, mm, offset: int,
+                     state: Dict[str, Any], fresh: bool) -> None:
+    directory = get_checkpoint_dir()
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        if fresh:
+            _prune_checkpoints(directory)
+        fd, tmp = tempfile.mkstemp(dir=str(directory), prefix='.ckpt-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(dict(state, path=str(transcript_path), dev=st.st_dev, ino=st.st_ino,
+                           offset=offset,
+                           fingerprint=_fingerprint(mm, min(FINGERPRINT_BYTES, offset))), f)
+        os.replace(tmp, get_checkpoint_path(transcript_path))
+    except OSError:
+        pass
+
+
+def _prune_checkpoints(directory: Path) -> None:
+    cutoff = time.time() - CHECKPOINT_MAX_AGE_SECS
+    try:
+        for path in directory.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                continue
+    except OSError:
+        pass
+
+
+def _tool_response_json(block: dict) -> str:
+    content = block.get('content', '')
+    if isinstance(content, list):
+        parts = []
+        for c in content:
+            if isinstance(c, dict) and c.get('type') == 'text':
+                parts.append(c.get('text', ''))
+            elif isinstance(c, str):
+                parts.append(c)
+        payload = {'content': '\n'.join(parts)}
+        if block.get('is_error'):
+            payload['error'] = payload.get('content', '')
+    elif isinstance(content, str):
+        payload = {'content': content}
+        if block.get('is_error'):
+            payload['error'] = content
+    else:
+        payload = content
+    try:
+        return json.dumps(payload)
+    except (TypeError, ValueError):
+        return '{}'
+
+
+def apply_transcript_line(line: bytes, state: Dict[str, Any]) -> None:
+    """Fold one transcript line's tool_use / tool_result blocks into state."""
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return
+    message = entry.get('message') if isinstance(entry, dict) else None
+    content = message.get('content') if isinstance(message, dict) else None
+    if not isinstance(content, list):
+        return
+
+    for block in content:
+        if not isinstance(block, dict):
+            continue
+        btype = block.get('type')
+        if btype == 'tool_use':
+            tu_id = block.get('id') or ''
+            try:
+                tinput_json = json.dumps(block.get('input', {}))
+            except (TypeError, ValueError):
+                tinput_json = '{}'
+            if tu_id and tu_id not in state['tool_uses']:
+                state['tool_uses'][tu_id] = [block.get('name', ''), tinput_json]
+                state['order'].append(tu_id)
+        elif btype == 'tool_result':
+            tu_id = block.get('tool_use_id') or ''
+            if tu_id:
+                state['tool_results'][tu_id] = _tool_response_json(block)
+
+
+def _has_tool_marker(mm, start: int, end: int) -> bool:
+    return any(mm.find(marker, start, end) != -1 for marker in TOOL_MARKERS)
+
+
+def scan_agent_tools(transcript_path) -> Dict[str, Any]:
+    """
+    tool_use / tool_result state of a per-agent transcript, resumed from its checkpoint.
+
+    Returns {'tool_uses': {id: [name, input_json]}, 'tool_results': {id: json},
+    'order': [id, ...]}. Raises OSError if the transcript cannot be read.
+    """
+    path = Path(transcript_path).expanduser()
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        if st.st_size == 0:
+            return _empty_state()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            checkpoint = _load_checkpoint(path, st, mm)
+            state = ({k: checkpoint[k] for k in ('tool_uses', 'tool_results', 'order')}
+                     if checkpoint else _empty_state())
+            start = position = checkpoint['offset'] if checkpoint else 0
+            size = len(mm)
+            while position < size:
+                newline = mm.find(b'\n', position)
+                if newline == -1:
+                    break
+                if _has_tool_marker(mm, position, newline):
+                    apply_transcript_line(mm[position:newline], state)
+                position = newline + 1
+
+            if position != start or checkpoint is None:
+                _save_checkpoint(path, st, mm, position, state, fresh=checkpoint is None)
+
+            if position < size and _has_tool_marker(mm, position, size):
+                # Unterminated last line (still being written): this call only
+                state = {'tool_uses': dict(state['tool_uses']),
+                         'tool_results': dict(state['tool_results']),
+                         'order': list(state['order'])}
+                apply_transcript_line(mm[position:size], state)
+    return state
@@ -269,14 +269,14 @@ def detect_commits_in_session(tools: List) -> List[str]:
     correlating patterns with specific changes.
 
     Args:
-        tools: List of tuples (tool_name, tool_input, tool_response, tool_use_id)
+        tools: List of tuples (tool_name, tool_input, tool_response, tool_use_id, ...)
 
     Returns:
         List of commit SHAs detected from git commit commands
     """
     commits = []
 
-    for tool_name, tool_input_json, tool_response_json, _ in tools:
+    for tool_name, tool_input_json, tool_response_json, *_ in tools:
         if tool_name != 'Bash':
             continue
 
@@ -0,0 +1,10 @@
+"""Keep ace-cli cache and error-log writes out of ~/.cache/ace and the repo."""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cli_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    # _log_cli_error appends to .claude/data/logs under the cwd
+    monkeypatch.chdir(tmp_path)
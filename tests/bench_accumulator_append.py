@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Accumulator Append Benchmark - appends/sec for sqlite vs spool mode.
+
+Calls append_tool() N times per mode the way one-shot PostToolUse hooks do
+(fresh connection per call in sqlite mode), then times the bulk ingest that
+spool mode defers to the first reader.
+
+Usage:
+    python3 tests/bench_accumulator_append.py [--appends 500] [--dir /path/on/slow/disk]
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SHARED_HOOKS = Path(__file__).resolve().parent.parent / "plugins" / "ace" / "shared-hooks"
+sys.path.insert(0, str(SHARED_HOOKS))
+sys.path.insert(0, str(SHARED_HOOKS / "utils"))
+
+import ace_tool_accumulator  # noqa: E402
+
+
+def run_mode(mode: str, appends: int, base_dir: str) -> tuple:
+    work = tempfile.mkdtemp(prefix=f"ace-bench-{mode}-", dir=base_dir)
+    try:
+        ace_tool_accumulator.ACCUMULATOR_MODE = mode
+        start = time.perf_counter()
+        for i in range(appends):
+            ace_tool_accumulator.append_tool(
+                "bench", "Bash", {"command": f"echo {i}"}, {"stdout": f"{i}\n" * 50},
+                f"t{i}", working_dir=work)
+        append_secs = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows = ace_tool_accumulator.get_session_tools("bench", work)
+        read_secs = time.perf_counter() - start
+        assert len(rows) == appends, f"{mode}: expected {appends} rows, got {len(rows)}"
+        return appends / append_secs, read_secs * 1000
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark accumulator ingestion modes")
+    parser.add_argument("--appends", type=int, default=500)
+    parser.add_argument("--dir", default=None, help="Where to create the test databases")
+    args = parser.parse_args()
+
+    print(f"{'mode':<8}{'appends/sec':>14}{'first read (ms)':>18}")
+    for mode in ("sqlite", "spool"):
+        rate, read_ms = run_mode(mode, args.appends, args.dir)
+        print(f"{mode:<8}{rate:>14.0f}{read_ms:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+ACE CLI Worker Benchmark - UserPromptSubmit CLI cost, one-shot vs worker.
+
+Times the before_task CLI sequence (--version, whoami --json, search) with a
+fake ace-cli that pays a Node-like startup delay per process. One-shot mode
+starts three processes per prompt; worker mode (ACE_CLI_WORKER=1) points
+ACE_CLI_WORKER_CMD at a fake stdio server that pays the startup once. No such
+server ships yet: the bundled stand-in worker runs a one-shot ace-cli per
+call, so it measures like one-shot mode.
+
+Each prompt runs in a fresh python3 (like a one-shot hook); --hookd keeps
+one process for all prompts. ace-hookd itself forks a child per prompt, so
+that mode is an upper bound, not what the daemon does today.
+
+Usage:
+    python3 tests/bench_ace_cli_worker.py [--prompts 10] [--startup-ms 150] [--hookd]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+UTILS = Path(__file__).resolve().parent.parent / "plugins" / "ace" / "shared-hooks" / "utils"
+
+FAKE_CLI = """#!{python}
+import sys, time
+time.sleep({startup})
+if sys.argv[1:] == ['--version']:
+    print('1.0.11')
+elif sys.argv[1:2] == ['whoami']:
+    print('{{"authenticated": true}}')
+else:
+    sys.stdin.read()
+    print('{{"count": 1, "similar_patterns": []}}')
+"""
+
+FAKE_SERVER = """import json, sys, time
+time.sleep({startup})
+for line in sys.stdin:
+    req = json.loads(line)
+    argv = (req.get('params') or {{}}).get('argv') or []
+    if req['method'] == 'hello':
+        result = {{'protocol': 1}}
+    elif argv == ['--version']:
+        result = {{'returncode': 0, 'stdout': '1.0.11\\n', 'stderr': ''}}
+    elif argv[:1] == ['whoami']:
+        result = {{'returncode': 0, 'stdout': '{{"authenticated": true}}', 'stderr': ''}}
+    else:
+        result = {{'returncode': 0, 'stdout': '{{"count": 1, "similar_patterns": []}}', 'stderr': ''}}
+    sys.stdout.write(json.dumps({{'jsonrpc': '2.0', 'id': req['id'], 'result': result}}) + '\\n')
+    sys.stdout.flush()
+"""
+
+PROMPT = f"""
+import sys, time
+sys.path.insert(0, {str(UTILS)!r})
+import ace_cli
+for _ in range(int(sys.argv[1])):
+    start = time.perf_counter()
+    assert ace_cli.check_session_pinning_available()
+    ace_cli.check_auth_status()
+    assert ace_cli.run_search('auth flow', project='prj_bench')['count'] == 1
+    print((time.perf_counter() - start) * 1000)
+"""
+
+
+def run_prompts(env: dict, prompts: int, hookd: bool) -> list:
+    if hookd:
+        out = subprocess.run([sys.executable, "-c", PROMPT, str(prompts)], env=env,
+                             capture_output=True, text=True, check=True).stdout
+        return [float(x) for x in out.split()]
+    samples = []
+    for _ in range(prompts):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", PROMPT, "1"], env=env,
+                       capture_output=True, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ace-cli one-shot vs worker")
+    parser.add_argument("--prompts", type=int, default=10)
+    parser.add_argument("--startup-ms", type=int, default=150)
+    parser.add_argument("--hookd", action="store_true", help="One process for all prompts")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="ace-bench-worker-"))
+    try:
+        startup = args.startup_ms / 1000
+        bin_dir = work / "bin"
+        bin_dir.mkdir()
+        (bin_dir / "ace-cli").write_text(FAKE_CLI.format(python=sys.executable, startup=startup))
+        (bin_dir / "ace-cli").chmod(0o755)
+        (work / "server.py").write_text(FAKE_SERVER.format(startup=startup))
+
+        base_env = dict(os.environ, PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+        modes = {
+            "one-shot": dict(base_env, ACE_CLI_WORKER="0"),
+            "worker": dict(base_env, ACE_CLI_WORKER="1",
+                           ACE_CLI_WORKER_CMD=f"{sys.executable} {work / 'server.py'}"),
+        }
+        print(f"{'mode':<10}{'median/prompt (ms)':>20}")
+        medians = {}
+        for mode, env in modes.items():
+            medians[mode] = statistics.median(run_prompts(env, args.prompts, args.hookd))
+            print(f"{mode:<10}{medians[mode]:>20.1f}")
+        print(f"speedup {medians['one-shot'] / medians['worker']:.1f}x")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Hook Dispatch Benchmark - wall time per hook event, legacy vs dispatcher.
+
+Runs each wrapper N times with a fake ace-cli on PATH, once on the legacy
+bash path (ACE_LEGACY_HOOKS=1: iconv + jq forks + python3 via argv) and once
+through the single-process dispatcher (ace_hook.py). Optionally adds a third
+column for the warm daemon (--hookd, ACE_HOOKD=1).
+
+Usage:
+    python3 tests/bench_hook_dispatch.py [--runs 30] [--hookd]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS = REPO_ROOT / "plugins" / "ace" / "scripts"
+SHARED_HOOKS = REPO_ROOT / "plugins" / "ace" / "shared-hooks"
+
+FAKE_CLI = """#!/bin/sh
+cat >/dev/null
+echo '{"count": 1, "similar_patterns": [{"id": "p1", "content": "x"}]}'
+"""
+
+
+def build_events(project_dir: Path, project_id: str) -> dict:
+    """One representative event per hot-path hook."""
+    return {
+        "PostToolUse": ("ace_posttooluse_wrapper.sh", ["--log"], lambda i: {
+            "session_id": "bench", "tool_name": "Bash", "tool_use_id": f"t{uuid.uuid4().hex}",
+            "tool_input": {"command": "ls -la"},
+            "tool_response": {"stdout": "file\n" * 200},
+            "cwd": str(project_dir),
+        }),
+        "PreToolUse": ("ace_pretooluse_wrapper.sh", [], lambda i: {
+            "session_id": "bench", "tool_name": "Read",
+            "tool_input": {"file_path": f"src/auth/file{i}.py"},
+            "cwd": str(project_dir),
+        }),
+        "CwdChanged": ("ace_cwdchanged_wrapper.sh", [], lambda i: {
+            "session_id": "bench", "old_cwd": str(project_dir),
+            "new_cwd": str(project_dir / "src" / "auth"), "cwd": str(project_dir),
+        }),
+    }
+
+
+def time_runs(script: str, args: list, make_event, env: dict, cwd: Path, runs: int) -> list:
+    samples = []
+    for i in range(runs):
+        body = json.dumps(make_event(i))
+        start = time.perf_counter()
+        subprocess.run(["bash", str(SCRIPTS / script), *args], input=body,
+                       capture_output=True, text=True, env=env, cwd=cwd, timeout=30)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hook dispatch wall time")
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--hookd", action="store_true", help="Also measure the warm daemon")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="ace-bench-"))
+    project_id = f"prj_bench_{uuid.uuid4().hex[:8]}"
+    domains_file = Path(f"/tmp/ace-domains-{project_id}.json")
+    domain_file = Path(f"/tmp/ace-domain-{project_id}.txt")
+    daemon = None
+    try:
+        bin_dir = work / "bin"
+        bin_dir.mkdir()
+        (bin_dir / "ace-cli").write_text(FAKE_CLI)
+        (bin_dir / "ace-cli").chmod(0o755)
+        project_dir = work / "project"
+        (project_dir / ".claude").mkdir(parents=True)
+        (project_dir / ".claude/settings.json").write_text(
+            json.dumps({"orgId": "org_bench", "projectId": project_id}))
+        (project_dir / "src" / "auth").mkdir(parents=True)
+        domains_file.write_text(json.dumps({"auth-system:core": 1}))
+
+        base_env = dict(os.environ, PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+                        ACE_HOOKD_AUTOSTART="0", ACE_HOOKD_DIR=str(work / "hookd"))
+        modes = {
+            "legacy": dict(base_env, ACE_LEGACY_HOOKS="1"),
+            "dispatcher": dict(base_env, ACE_LEGACY_HOOKS="0"),
+        }
+        if args.hookd:
+            modes["hookd"] = dict(base_env, ACE_LEGACY_HOOKS="0", ACE_HOOKD="1")
+            daemon = subprocess.Popen([sys.executable, str(SHARED_HOOKS / "ace_hookd.py"), "serve"],
+                                      env=modes["hookd"], stdout=subprocess.DEVNULL,
+                                      stderr=subprocess.DEVNULL)
+            time.sleep(1.0)
+
+        print(f"{'event':<14}" + "".join(f"{m + ' (ms)':>20}" for m in modes) + f"{'speedup':>10}")
+        for event_name, (script, script_args, make_event) in build_events(project_dir, project_id).items():
+            medians = {}
+            for mode, env in modes.items():
+                domain_file.write_text("auth-system\n")
+                samples = time_runs(script, script_args, make_event, env, project_dir, args.runs)
+                medians[mode] = statistics.median(samples)
+            speedup = medians["legacy"] / min(v for k, v in medians.items() if k != "legacy")
+            print(f"{event_name:<14}" + "".join(f"{medians[m]:>20.1f}" for m in modes) + f"{speedup:>9.1f}x")
+    finally:
+        if daemon:
+            daemon.terminate()
+            daemon.wait(timeout=5)
+        domains_file.unlink(missing_ok=True)
+        domain_file.unlink(missing_ok=True)
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
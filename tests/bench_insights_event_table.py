@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Insights EventTable Benchmark - full /ace-insights extraction over a synthetic log.
+
+Generates N relevance events (searches, executions with near-duplicates,
+domain shifts) spread over 2 * --hours across many sessions, then runs the
+whole extraction: extract_task_data_for_evaluation() plus the report
+analyzers (sessions, helpfulness, top patterns, trends, task split).
+
+    lists     each analyzer gets the entry list and parses timestamps itself
+    table     one EventTable is built (timed) and passed to every analyzer
+    baseline  the analyzer at a git revision (--baseline), e.g. the commit
+              before EventTable, on the same entry list
+
+Usage:
+    python3 tests/bench_insights_event_table.py [--events 1000000] [--hours 24] [--baseline REV]
+"""
+
+import argparse
+import importlib.util
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SHARED_HOOKS = REPO_ROOT / "plugins" / "ace" / "shared-hooks"
+sys.path.insert(0, str(SHARED_HOOKS))
+sys.path.insert(0, str(SHARED_HOOKS / "utils"))
+
+import ace_insights_analyzer  # noqa: E402
+from ace_insights_analyzer import EventTable  # noqa: E402
+
+ANALYZER = "plugins/ace/shared-hooks/utils/ace_insights_analyzer.py"
+NOW = datetime(2026, 10, 17, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def synthetic_log(events: int, hours: int, sessions: int = 2000, seed: int = 7) -> list:
+    """Oldest-first entries; one burst of searches and executions per session turn."""
+    rng = random.Random(seed)
+    patterns = [[{"id": f"ctx-{p}", "confidence": 0.8, "domain": f"d{p % 9}", "section": "rules"},
+                 {"id": f"ctx-{p + 1}", "confidence": 0.6, "domain": f"d{p % 7}", "section": "tips"}]
+                for p in range(200)]
+    span = 2 * hours * 3600
+    entries = []
+    while len(entries) < events:
+        sid = f"session-{rng.randrange(sessions)}"
+        t = NOW - timedelta(seconds=rng.uniform(0, span))
+        top = patterns[rng.randrange(len(patterns))]
+        entries.append({"timestamp": t.isoformat(), "event": "search", "session_id": sid,
+                        "user_prompt": "fix the flaky test", "patterns_injected": 2,
+                        "avg_confidence": 0.7, "domains": [top[0]["domain"]], "top_patterns": top})
+        for i in range(rng.randint(1, 3)):  # Stop hooks re-firing: near-duplicate executions
+            t += timedelta(seconds=rng.uniform(1, 40))
+            entries.append({"timestamp": t.isoformat().replace("+00:00", "Z"), "event": "execution",
+                            "session_id": sid, "tools_executed": 3, "success": rng.random() < 0.85,
+                            "pattern_ids": [p["id"] for p in top], "patterns_used_count": 2})
+        if rng.random() < 0.1:
+            entries.append({"timestamp": t.isoformat(), "event": "domain_shift",
+                            "session_id": sid, "to_domain": top[1]["domain"]})
+    entries = entries[:events]
+    entries.sort(key=lambda e: e["timestamp"][:19])
+    return entries
+
+
+def extract(module, source, hours: int) -> dict:
+    """Everything /ace-insights derives from one window of entries."""
+    return {
+        "task_data": module.extract_task_data_for_evaluation(source, hours=hours),
+        "sessions": module.analyze_sessions(source, hours),
+        "helpfulness": module.calculate_helpfulness(source),
+        "top_patterns": module.get_top_patterns(source),
+        "trends": module.calculate_trends(source, hours, hours, reference_time=NOW),
+        "tasks": module.split_into_tasks(source),
+    }
+
+
+def load_baseline(rev: str):
+    source = subprocess.run(["git", "show", f"{rev}:{ANALYZER}"], cwd=REPO_ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    path = Path(tempfile.mkdtemp(prefix="ace-bench-")) / "baseline_insights_analyzer.py"
+    path.write_text(source)
+    spec = importlib.util.spec_from_file_location("baseline_insights_analyzer", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def comparable(result: dict) -> dict:
+    # Wall-clock dependent; "trends" is compared at the fixed reference time
+    result["task_data"]["metadata"].pop("generated_at")
+    result["task_data"].pop("trends")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the EventTable insights extraction")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--baseline", default=None,
+                        help="Also time the analyzer at this git revision")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    entries = synthetic_log(args.events, args.hours)
+    print(f"generated {len(entries)} events in {time.perf_counter() - start:.1f}s")
+
+    runs = [("lists", lambda: extract(ace_insights_analyzer, entries, args.hours)),
+            ("table", lambda: extract(ace_insights_analyzer, EventTable(entries), args.hours))]
+    if args.baseline:
+        baseline = load_baseline(args.baseline)
+        runs.insert(0, ("baseline", lambda: extract(baseline, entries, args.hours)))
+
+    print(f"{'mode':<10}{'seconds':>10}{'events/sec':>14}{'speedup':>10}")
+    reference = first = None
+    for mode, run in runs:
+        start = time.perf_counter()
+        result = run()
+        secs = time.perf_counter() - start
+        result = comparable(result)
+        if reference is None:
+            reference, first = result, secs
+        assert result == reference, f"{mode}: results differ from {runs[0][0]}"
+        print(f"{mode:<10}{secs:>10.2f}{len(entries) / secs:>14.0f}{first / secs:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
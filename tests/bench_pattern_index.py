@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+ACE Pattern Index Benchmark - local FTS5 query latency vs playbook size.
+
+Seeds ace_pattern_index with synthetic playbooks (default 10k and 100k
+patterns, Zipf-distributed vocabulary, a few projects sharing one database)
+and times search() for prompt-like queries. Each query opens its own
+connection, like a one-shot UserPromptSubmit hook. The hybrid fast path
+only counts a local answer under HYBRID_LOCAL_MS.
+
+Usage:
+    python3 tests/bench_pattern_index.py [--sizes 10000,100000] [--queries 200]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+UTILS = Path(__file__).resolve().parent.parent / "plugins" / "ace" / "shared-hooks" / "utils"
+sys.path.insert(0, str(UTILS))
+
+DOMAINS = ["auth", "cache", "database", "api", "testing", "deploy", "frontend", "logging"]
+SECTIONS = ["strategies_and_hard_rules", "useful_code_snippets",
+            "troubleshooting_and_pitfalls", "apis_to_use"]
+PROJECTS = 4
+
+
+def vocabulary(rng: random.Random, size: int = 5000) -> list:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+
+
+class Zipf:
+    """Word sampler with P(rank r) ~ 1/r, like natural-language text."""
+
+    def __init__(self, rng: random.Random, vocab: list):
+        self.rng = rng
+        self.vocab = vocab
+        self.cum_weights = list(itertools.accumulate(1 / r for r in range(1, len(vocab) + 1)))
+
+    def words(self, count: int) -> list:
+        return self.rng.choices(self.vocab, cum_weights=self.cum_weights, k=count)
+
+    def query(self, domain: str) -> str:
+        # Prompts are mostly mid-frequency content words; the top ranks play
+        # the role of stopwords, which the index drops anyway
+        return f"how do I fix the {domain} " + " ".join(
+            self.rng.choice(self.vocab[50:2000]) for _ in range(4))
+
+
+def playbook(rng: random.Random, zipf: Zipf, size: int, project: int) -> dict:
+    sections = {s: [] for s in SECTIONS}
+    for i in range(size):
+        sections[rng.choice(SECTIONS)].append({
+            "id": f"ctx-{project}-{i:07d}",
+            "content": " ".join(zipf.words(rng.randint(12, 40))),
+            "domain": rng.choice(DOMAINS),
+            "confidence": round(rng.random(), 2),
+            "helpful": rng.randint(0, 30),
+            "harmful": rng.randint(0, 3),
+        })
+    return {"playbook": sections}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local pattern index queries")
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="ace-bench-index-"))
+    try:
+        os.environ["XDG_CACHE_HOME"] = str(work)
+        import ace_pattern_index
+
+        rng = random.Random(42)
+        zipf = Zipf(rng, vocabulary(rng))
+        print(f"{'patterns':>10}{'seed (s)':>10}{'median (ms)':>13}{'p95 (ms)':>10}"
+              f"{'max (ms)':>10}{'<20ms':>8}")
+        for size in (int(s) for s in args.sizes.split(",")):
+            db = ace_pattern_index.get_db_path()
+            if db.exists():
+                for path in db.parent.glob(db.name + "*"):
+                    path.unlink()
+
+            # The measured project holds `size` patterns; others share the file
+            start = time.perf_counter()
+            for project in range(PROJECTS):
+                ace_pattern_index.seed_from_export(
+                    playbook(rng, zipf, size if project == 0 else size // 10, project),
+                    org="org_bench", project=f"prj_{project}")
+            seed_s = time.perf_counter() - start
+
+            samples = []
+            for _ in range(args.queries):
+                query = zipf.query(rng.choice(DOMAINS))
+                start = time.perf_counter()
+                ace_pattern_index.search(query, org="org_bench", project="prj_0")
+                samples.append((time.perf_counter() - start) * 1000)
+
+            samples.sort()
+            fast = sum(s < ace_pattern_index.HYBRID_LOCAL_MS for s in samples) / len(samples)
+            print(f"{size:>10}{seed_s:>10.1f}{statistics.median(samples):>13.2f}"
+                  f"{samples[int(len(samples) * 0.95) - 1]:>10.2f}{samples[-1]:>10.2f}{fast:>8.0%}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Stop Trajectory Benchmark - trajectory build time for a large session.
+
+Fills ace-tools.db with N tool calls (default 500, ~20KB responses) and times
+build_trajectory_from_accumulated_tools() on the narrow v2 SELECT against the
+pre-v6.5.0 path (decode every tool_input/tool_response blob and summarise).
+
+Usage:
+    python3 tests/bench_stop_trajectory.py [--tools 500] [--runs 20]
+"""
+
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SHARED_HOOKS = Path(__file__).resolve().parent.parent / "plugins" / "ace" / "shared-hooks"
+sys.path.insert(0, str(SHARED_HOOKS))
+sys.path.insert(0, str(SHARED_HOOKS / "utils"))
+
+import ace_after_task  # noqa: E402
+from ace_tool_accumulator import append_tool, get_session_tools  # noqa: E402
+
+
+def legacy_build(session_id: str, working_dir: str) -> list:
+    """The pre-v6.5.0 Stop path: full SELECT + JSON decode per row."""
+    trajectory = []
+    for i, (tool_name, tool_input_json, tool_response_json, *_) in enumerate(
+            get_session_tools(session_id, working_dir), 1):
+        tool_input = ace_after_task.decode_payload(tool_input_json)
+        tool_response = ace_after_task.decode_payload(tool_response_json)
+        trajectory.append({
+            "step": i,
+            "tool": tool_name,
+            "action": ace_after_task.summarize_tool_action(tool_name, tool_input),
+            "result": ace_after_task.summarize_tool_response(tool_name, tool_response),
+        })
+    return trajectory
+
+
+def timed(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Stop-side trajectory build")
+    parser.add_argument("--tools", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="ace-bench-stop-")
+    try:
+        for i in range(args.tools):
+            append_tool("bench", "Bash", {"command": f"cat file{i}.log"},
+                        {"stdout": f"line {i}\n" * 2000}, f"t{i}", working_dir=work)
+
+        new = ace_after_task.build_trajectory_from_accumulated_tools("bench", work)[0]
+        assert new == legacy_build("bench", work), "trajectories differ"
+
+        legacy_ms = timed(lambda: legacy_build("bench", work), args.runs)
+        v2_ms = timed(lambda: ace_after_task.build_trajectory_from_accumulated_tools("bench", work),
+                      args.runs)
+        print(f"{args.tools} tools: legacy {legacy_ms:.1f} ms, v2 {v2_ms:.1f} ms "
+              f"({legacy_ms / v2_ms:.1f}x)")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+ACE Transcript Prompt Benchmark - Stop-hook prompt lookup vs transcript size.
+
+Writes synthetic session transcripts (assistant turns, tool_use blocks and
+large tool_result payloads, with the last real prompt a few turns from the
+end) and times get_user_prompt_from_transcript() against the previous
+implementation, which decoded every line before walking backwards.
+
+Usage:
+    python3 tests/bench_transcript_prompt.py [--sizes-mb 2,20,200] [--runs 5]
+"""
+
+import argparse
+import json
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SHARED_HOOKS = Path(__file__).resolve().parent.parent / "plugins" / "ace" / "shared-hooks"
+sys.path.insert(0, str(SHARED_HOOKS))
+sys.path.insert(0, str(SHARED_HOOKS / "utils"))
+
+
+def full_parse_prompt(transcript_path: str) -> str:
+    """The pre-v6.5.0 lookup: decode the whole file, then walk backwards."""
+    entries = []
+    with open(transcript_path, 'r') as f:
+        for line in f:
+            if line.strip():
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    for entry in reversed(entries):
+        message = entry.get('message', {})
+        if message.get('role') != 'user':
+            continue
+        content = message.get('content', '')
+        if isinstance(content, list):
+            if any(isinstance(b, dict) and b.get('type') == 'tool_result' for b in content):
+                continue
+            text = '\n'.join(b.get('text', '') for b in content
+                             if isinstance(b, dict) and b.get('type') == 'text')
+            if text.strip():
+                return text[:2000]
+        elif isinstance(content, str) and len(content.strip()) > 10:
+            return content[:2000]
+    return "No user prompt found"
+
+
+def turn(rng: random.Random, i: int) -> list:
+    output = " ".join(rng.choice(["def", "return", "self", "import", "value", "# comment"])
+                      for _ in range(rng.randint(50, 1500)))
+    return [
+        {"type": "assistant", "message": {"role": "assistant", "content": [
+            {"type": "text", "text": f"Looking at step {i}"},
+            {"type": "tool_use", "id": f"toolu_{i}", "name": "Read",
+             "input": {"file_path": f"/src/module_{i % 97}.py"}}]}},
+        {"type": "user", "message": {"role": "user", "content": [
+            {"type": "tool_result", "tool_use_id": f"toolu_{i}", "content": output}]}},
+    ]
+
+
+def write_transcript(path: Path, size_mb: int, rng: random.Random) -> None:
+    target = size_mb * 1024 * 1024
+    written, i = 0, 0
+    with open(path, 'w') as f:
+        while written < target:
+            if i % 200 == 0:
+                entries = [{"type": "user", "message": {"role": "user",
+                                                        "content": f"Request number {i}: fix it"}}]
+            else:
+                entries = turn(rng, i)
+            for entry in entries:
+                line = json.dumps(entry, separators=(",", ":")) + "\n"
+                f.write(line)
+                written += len(line)
+            i += 1
+        f.write(json.dumps({"type": "user", "message": {"role": "user", "content": [
+            {"type": "text", "text": "Final request: refactor the cache layer"}]}}) + "\n")
+        for entry in turn(rng, i) + turn(rng, i + 1):
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Stop-hook user prompt lookup")
+    parser.add_argument("--sizes-mb", default="2,20,200")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    from ace_after_task import get_user_prompt_from_transcript
+
+    work = Path(tempfile.mkdtemp(prefix="ace-bench-transcript-"))
+    try:
+        rng = random.Random(7)
+        print(f"{'size (MB)':>10}{'full parse (ms)':>17}{'reverse (ms)':>14}{'speedup':>9}")
+        for size_mb in (int(s) for s in args.sizes_mb.split(",")):
+            path = work / f"transcript-{size_mb}.jsonl"
+            write_transcript(path, size_mb, rng)
+
+            timings = {}
+            for name, fn in (("full", full_parse_prompt), ("reverse", get_user_prompt_from_transcript)):
+                samples, result = [], None
+                for _ in range(args.runs if name == "reverse" else max(1, args.runs // 2)):
+                    start = time.perf_counter()
+                    result = fn(str(path))
+                    samples.append((time.perf_counter() - start) * 1000)
+                assert result.startswith("Final request"), result
+                timings[name] = statistics.median(samples)
+            print(f"{size_mb:>10}{timings['full']:>17.1f}{timings['reverse']:>14.2f}"
+                  f"{timings['full'] / timings['reverse']:>8.0f}x")
+            path.unlink()
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
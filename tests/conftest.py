@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Shared fixtures for the top-level tests.
+
+fake_ace_cli installs a scripted ace-cli on PATH. Each test module keeps only
+its script body (and the env vars it needs).
+"""
+import json
+import os
+import sys
+
+import pytest
+
+# Env vars that would route ace-cli calls through a worker, daemon, cache or
+# local index instead of the fake binary
+ACE_CLI_ENV = ("ACE_CLI_WORKER", "ACE_CLI_WORKER_CMD", "ACE_HOOKD", "ACE_CLI_CACHE",
+               "ACE_SEARCH_CACHE", "ACE_SEARCH_MODE", "ACE_PATTERN_INDEX")
+
+
+class FakeAceCli:
+    """The installed fake: its binary, the project dir and the calls log it writes."""
+
+    def __init__(self, tmp_path, binary, calls):
+        self.root = tmp_path
+        self.path = binary
+        self.calls = calls
+
+    def lines(self):
+        return self.calls.read_text().splitlines() if self.calls.exists() else []
+
+    def records(self):
+        return [json.loads(line) for line in self.lines()]
+
+
+@pytest.fixture
+def fake_ace_cli(tmp_path, monkeypatch):
+    """
+    Factory: fake_ace_cli(script, env=None, calls="calls.log", settings=None, **fmt).
+
+    script is formatted with {python}, {calls} (path of the calls log) and
+    fmt. ACE_CLI_ENV is cleared, XDG_CACHE_HOME points into tmp_path, then
+    env is applied. settings writes .claude/settings.json. The test runs in
+    tmp_path.
+    """
+    def install(script, env=None, calls="calls.log", settings=None, **fmt):
+        bin_dir = tmp_path / "bin"
+        bin_dir.mkdir(exist_ok=True)
+        calls_path = tmp_path / calls
+        binary = bin_dir / "ace-cli"
+        binary.write_text(script.format(python=sys.executable, calls=str(calls_path), **fmt))
+        binary.chmod(0o755)
+        if settings is not None:
+            (tmp_path / ".claude").mkdir(exist_ok=True)
+            (tmp_path / ".claude" / "settings.json").write_text(json.dumps(settings))
+
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        for var in ACE_CLI_ENV:
+            monkeypatch.delenv(var, raising=False)
+        for var, value in (env or {}).items():
+            monkeypatch.setenv(var, value)
+        monkeypatch.chdir(tmp_path)
+        return FakeAceCli(tmp_path, binary, calls_path)
+
+    return install
@@ -0,0 +1,596 @@
+#!/usr/bin/env python3
+"""
+Tool accumulator v2: versioned schema, WAL and lock retry (v6.5.0).
+
+init_db() migrates via PRAGMA user_version and skips all DDL once current;
+parallel PostToolUse writers must never lose rows to "database is locked".
+"""
+import sqlite3
+import sys
+from multiprocessing import get_context
+from pathlib import Path
+
+import pytest
+
+SHARED_HOOKS = Path(__file__).parent.parent / 'plugins' / 'ace' / 'shared-hooks'
+sys.path.insert(0, str(SHARED_HOOKS))
+sys.path.insert(0, str(SHARED_HOOKS / 'utils'))
+
+import ace_tool_accumulator  # noqa: E402
+from ace_tool_accumulator import (  # noqa: E402
+    SCHEMA_VERSION, append_tool, get_session_tools, init_db, with_lock_retry,
+)
+
+WRITERS = 16
+ROWS_PER_WRITER = 40
+
+
+def _writer(working_dir: str, writer: int) -> int:
+    ok = 0
+    for i in range(ROWS_PER_WRITER):
+        ok += append_tool('s-concurrent', 'Bash', {'command': f'echo {i}'},
+                          {'stdout': str(i)}, f'w{writer}-t{i}',
+                          agent_id=f'agent-{writer}', working_dir=working_dir)
+    return ok
+
+
+def test_fresh_db_is_versioned_and_wal(tmp_path):
+    conn = init_db(tmp_path / 'ace-tools.db')
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+    assert conn.execute('PRAGMA busy_timeout').fetchone()[0] > 0
+    conn.close()
+
+
+def test_wal_can_be_disabled(tmp_path, monkeypatch):
+    monkeypatch.setenv('ACE_ACCUMULATOR_WAL', '0')
+    conn = init_db(tmp_path / 'ace-tools.db')
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+    conn.close()
+
+
+def test_legacy_schema_is_migrated_in_place(tmp_path):
+    db = tmp_path / 'ace-tools.db'
+    legacy = sqlite3.connect(db)
+    legacy.execute('''
+        CREATE TABLE tool_uses (
+            id INTEGER PRIMARY KEY, session_id TEXT NOT NULL, tool_name TEXT NOT NULL,
+            tool_input TEXT, tool_response TEXT, tool_use_id TEXT, timestamp TEXT,
+            UNIQUE(tool_use_id)
+        )
+    ''')
+    legacy.execute("INSERT INTO tool_uses (session_id, tool_name, tool_use_id) "
+                   "VALUES ('s-old', 'Edit', 'old-1')")
+    legacy.commit()
+    legacy.close()
+
+    conn = init_db(db)
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(tool_uses)')}
+    assert 'agent_id' in columns
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    conn.close()
+    rows = sqlite3.connect(db).execute('SELECT tool_use_id FROM tool_uses').fetchall()
+    assert rows == [('old-1',)]
+
+
+def test_current_schema_skips_ddl(tmp_path):
+    db = tmp_path / 'ace-tools.db'
+    init_db(db).close()
+
+    # Dropping the index is only noticed by a migration; a current DB must
+    # not run any DDL on open
+    conn = sqlite3.connect(db)
+    conn.execute('DROP INDEX idx_session')
+    conn.commit()
+    conn.close()
+
+    conn = init_db(db)
+    indexes = {row[1] for row in conn.execute('PRAGMA index_list(tool_uses)')}
+    assert 'idx_session' not in indexes
+    conn.close()
+
+
+def test_lock_retry_retries_only_lock_errors(monkeypatch):
+    monkeypatch.setattr(ace_tool_accumulator, 'LOCK_RETRY_BASE_SECS', 0)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise sqlite3.OperationalError('database is locked')
+        return 'ok'
+
+    assert with_lock_retry(flaky) == 'ok'
+    assert len(calls) == 3
+
+    def broken():
+        raise sqlite3.OperationalError('no such table: nope')
+
+    with pytest.raises(sqlite3.OperationalError, match='no such table'):
+        with_lock_retry(broken)
+
+
+def test_concurrent_writers_lose_no_rows(tmp_path):
+    working_dir = str(tmp_path)
+    ctx = get_context('spawn')
+    with ctx.Pool(WRITERS) as pool:
+        results = pool.starmap(_writer, [(working_dir, w) for w in range(WRITERS)])
+
+    assert results == [ROWS_PER_WRITER] * WRITERS
+    tools = get_session_tools('s-concurrent', working_dir)
+    assert len(tools) == WRITERS * ROWS_PER_WRITER
+    assert len({t[3] for t in tools}) == WRITERS * ROWS_PER_WRITER
+
+
+def test_append_precomputes_trajectory_summaries(tmp_path):
+    append_tool('s-sum', 'Bash', {'command': 'pytest -q'},
+                {'stdout': '3 passed\nok', 'stderr': 'warn'}, 'sum-1', working_dir=str(tmp_path))
+    append_tool('s-sum', 'Read', {'file_path': '/a/b/c.py'},
+                {'content': 'x\ny'}, 'sum-2', working_dir=str(tmp_path))
+
+    rows = sqlite3.connect(tmp_path / '.claude/data/logs/ace-tools.db').execute(
+        'SELECT action_summary, result_summary, is_error, is_state_changing '
+        'FROM tool_uses ORDER BY id').fetchall()
+    assert rows == [('Ran: pytest -q', 'Stderr: warn', 1, 1),
+                    ('Read c.py', 'Read 2 lines', 0, 0)]
+
+
+def test_stop_trajectory_skips_payload_decoding(tmp_path, monkeypatch):
+    import ace_after_task
+
+    for i in range(20):
+        append_tool('s-traj', 'Edit', {'file_path': f'/src/f{i}.py'}, {'success': True},
+                    f'traj-{i}', working_dir=str(tmp_path))
+
+    def fail(*_args, **_kwargs):
+        raise AssertionError('payload decoded on the Stop path')
+    monkeypatch.setattr(ace_after_task, 'decode_payload', fail)
+
+    trajectory, tools = ace_after_task.build_trajectory_from_accumulated_tools(
+        's-traj', str(tmp_path))
+    assert len(trajectory) == 20
+    assert trajectory[0] == {'step': 1, 'tool': 'Edit', 'action': 'Edited f0.py', 'result': 'Success'}
+    assert all(t[1] is None and t[2] is None for t in tools)
+    assert ace_after_task.has_substantial_work_from_accumulated(tools)
+    assert not any(ace_after_task.tool_is_error(t) for t in tools)
+
+
+def test_stop_trajectory_decodes_pre_v2_rows_and_commits(tmp_path):
+    import ace_after_task
+    from git_utils import detect_commits_in_session
+
+    working_dir = str(tmp_path)
+    append_tool('s-mixed', 'Bash', {'command': 'git commit -m fix'},
+                {'stdout': '[main abc1234] fix'}, 'mixed-1', working_dir=working_dir)
+    conn = init_db(Path(working_dir) / '.claude/data/logs/ace-tools.db')
+    conn.execute("INSERT INTO tool_uses (session_id, tool_name, tool_input, tool_response, tool_use_id) "
+                 "VALUES ('s-mixed', 'Write', '{\"file_path\": \"/x/new.py\"}', '{\"error\": \"denied\"}', 'mixed-2')")
+    conn.commit()
+    conn.close()
+
+    trajectory, tools = ace_after_task.build_trajectory_from_accumulated_tools('s-mixed', working_dir)
+    assert [s['action'] for s in trajectory] == ['Ran: git commit -m fix', 'Wrote new.py']
+    assert trajectory[1]['result'] == 'Error: denied'
+    assert [ace_after_task.tool_is_error(t) for t in tools] == [False, True]
+    assert detect_commits_in_session(tools) == ['abc1234']
+
+
+def test_payloads_are_projected_hashed_and_capped(tmp_path):
+    import hashlib
+    import json
+
+    stdout = '[main abc1234] fix\n' + 'y' * 50_000
+    response = {'stdout': stdout, 'stderr': '', 'exit_code': 0, 'noise': 'z' * 10_000}
+    append_tool('s-proj', 'Bash', {'command': 'git commit -m fix', 'env': 'x' * 10_000},
+                response, 'proj-1', working_dir=str(tmp_path))
+    append_tool('s-proj', 'Read', {'file_path': '/a.py'}, {'content': 'line\n' * 10_000},
+                'proj-2', working_dir=str(tmp_path))
+
+    rows = sqlite3.connect(tmp_path / '.claude/data/logs/ace-tools.db').execute(
+        'SELECT tool_input, tool_response, response_sha256, response_bytes, result_summary '
+        'FROM tool_uses ORDER BY id').fetchall()
+    bash_input, bash_response, sha, size, _ = rows[0]
+    assert json.loads(bash_input) == {'command': 'git commit -m fix'}
+    projected = json.loads(bash_response)
+    assert set(projected) == {'stdout', 'stderr', 'exit_code'}
+    assert len(projected['stdout']) == ace_tool_accumulator.FIELD_CAP_CHARS
+    full = json.dumps(response).encode()
+    assert (sha, size) == (hashlib.sha256(full).hexdigest(), len(full))
+
+    # Summaries come from the full payload, the row only keeps the projection
+    assert json.loads(rows[1][1]) == {}
+    assert rows[1][4] == 'Read 10001 lines'
+    assert ace_tool_accumulator.get_tool_payload('proj-2', str(tmp_path)) is None
+
+
+def test_full_payload_retention_is_compressed(tmp_path, monkeypatch):
+    import json
+
+    monkeypatch.setattr(ace_tool_accumulator, 'KEEP_PAYLOADS', True)
+    monkeypatch.setattr(ace_tool_accumulator, 'MAX_PAYLOAD_BYTES', 200_000)
+    content = {'content': 'line\n' * 10_000}
+    append_tool('s-keep', 'Read', {'file_path': '/a.py'}, content, 'keep-1', working_dir=str(tmp_path))
+    append_tool('s-keep', 'Read', {'file_path': '/b.py'}, {'content': 'x' * 300_000},
+                'keep-2', working_dir=str(tmp_path))
+
+    db = tmp_path / '.claude/data/logs/ace-tools.db'
+    stored = sqlite3.connect(db).execute(
+        'SELECT length(tool_response) FROM tool_payloads').fetchall()
+    assert len(stored) == 1 and stored[0][0] < 1000  # over-cap payload skipped, rest zlib'd
+
+    full_input, full_response = ace_tool_accumulator.get_tool_payload('keep-1', str(tmp_path))
+    assert json.loads(full_input) == {'file_path': '/a.py'}
+    assert json.loads(full_response) == content
+    assert ace_tool_accumulator.get_tool_payload('keep-2', str(tmp_path)) is None
+
+    ace_tool_accumulator.clear_session('s-keep', str(tmp_path))
+    assert sqlite3.connect(db).execute('SELECT COUNT(*) FROM tool_payloads').fetchone()[0] == 0
+
+
+def test_v2_database_is_compacted_by_prune_not_on_upgrade(tmp_path, monkeypatch):
+    import json
+
+    db = tmp_path / '.claude/data/logs/ace-tools.db'
+    monkeypatch.setattr(ace_tool_accumulator, 'SCHEMA_VERSION', 2)
+    monkeypatch.setattr(ace_tool_accumulator, 'MIGRATIONS', ace_tool_accumulator.MIGRATIONS[:2])
+    conn = init_db(db)
+    conn.execute("INSERT INTO tool_uses (session_id, tool_name, tool_input, tool_response, tool_use_id) "
+                 "VALUES ('s-up', 'Edit', ?, ?, 'up-1')",
+                 (json.dumps({'file_path': '/x.py', 'old_string': 'a' * 100_000}),
+                  json.dumps({'success': True, 'originalFile': 'b' * 100_000})))
+    conn.commit()
+    conn.close()
+    monkeypatch.undo()
+
+    # The migration only adds columns: PostToolUse never pays for compaction
+    conn = init_db(db)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    assert conn.execute('SELECT response_sha256, length(tool_input) FROM tool_uses').fetchone()[0] is None
+    conn.close()
+    assert ace_tool_accumulator.get_session_trajectory('s-up', str(tmp_path))  # still readable
+
+    result = ace_tool_accumulator.prune_db(str(tmp_path), max_age_hours=0, max_db_mb=0)
+    assert result['compacted_rows'] == 1 and result['complete']
+    conn = sqlite3.connect(db)
+    row = conn.execute('SELECT tool_input, tool_response, response_bytes, action_summary, '
+                       'result_summary FROM tool_uses').fetchone()
+    conn.close()
+    assert json.loads(row[0]) == {'file_path': '/x.py'}
+    assert json.loads(row[1]) == {'success': True}
+    assert row[2] > 100_000
+    assert row[3:] == ('Edited x.py', 'Success')
+
+
+def test_compaction_is_batched_under_the_deadline(tmp_path, monkeypatch):
+    import json
+
+    db = tmp_path / '.claude/data/logs/ace-tools.db'
+    monkeypatch.setattr(ace_tool_accumulator, 'SCHEMA_VERSION', 2)
+    monkeypatch.setattr(ace_tool_accumulator, 'MIGRATIONS', ace_tool_accumulator.MIGRATIONS[:2])
+    conn = init_db(db)
+    conn.executemany("INSERT INTO tool_uses (session_id, tool_name, tool_input, tool_response, tool_use_id) "
+                     "VALUES ('s-up', 'Read', '{}', ?, ?)",
+                     [(json.dumps({'content': 'c' * 10_000}), f'up-{i}') for i in range(10)])
+    conn.commit()
+    conn.close()
+    monkeypatch.undo()
+    init_db(db).close()
+
+    clock = iter([0, 0])  # start, first batch; then the 2s deadline has passed
+    monkeypatch.setattr(ace_tool_accumulator.time, 'monotonic', lambda: next(clock, 10))
+    result = ace_tool_accumulator.prune_db(str(tmp_path), max_age_hours=0, max_db_mb=0, batch_rows=4)
+    assert result['compacted_rows'] == 4 and not result['complete']
+
+    monkeypatch.undo()
+    assert ace_tool_accumulator.prune_db(str(tmp_path), max_age_hours=0, max_db_mb=0,
+                                         batch_rows=4)['compacted_rows'] == 6
+
+
+def _spool_mode(monkeypatch):
+    monkeypatch.setattr(ace_tool_accumulator, 'ACCUMULATOR_MODE', 'spool')
+
+
+def test_spool_mode_defers_sqlite_until_read(tmp_path, monkeypatch):
+    _spool_mode(monkeypatch)
+    working_dir = str(tmp_path)
+    for i in range(5):
+        assert append_tool('s-spool', 'Edit', {'file_path': f'/f{i}.py'}, {'success': True},
+                           f'sp-{i}', working_dir=working_dir)
+    append_tool('s-spool', 'Edit', {'file_path': '/f0.py'}, {'success': True}, 'sp-0',
+                working_dir=working_dir)  # hook retry: same tool_use_id
+
+    spool = tmp_path / '.claude/data/logs/ace-spool/s-spool.spool'
+    assert spool.exists()
+    assert not (tmp_path / '.claude/data/logs/ace-tools.db').exists()
+
+    tools = get_session_tools('s-spool', working_dir)
+    assert [t[3] for t in tools] == [f'sp-{i}' for i in range(5)]
+    assert not spool.exists()
+    assert list(spool.parent.iterdir()) == []
+
+
+def test_spool_crash_recovery_replays_partial_spool(tmp_path, monkeypatch):
+    _spool_mode(monkeypatch)
+    working_dir = str(tmp_path)
+    for i in range(3):
+        append_tool('s-crash', 'Bash', {'command': f'echo {i}'}, {'stdout': str(i)},
+                    f'cr-{i}', working_dir=working_dir)
+    spool_dir = tmp_path / '.claude/data/logs/ace-spool'
+
+    # Ingest that crashed after claiming the file (and after committing one row)
+    claimed = spool_dir / 's-crash.4242.ingest'
+    (spool_dir / 's-crash.spool').rename(claimed)
+    monkeypatch.setattr(ace_tool_accumulator, 'ACCUMULATOR_MODE', 'sqlite')
+    append_tool('s-crash', 'Bash', {'command': 'echo 0'}, {'stdout': '0'}, 'cr-0',
+                working_dir=working_dir)
+    _spool_mode(monkeypatch)
+    # Writer that died mid-record leaves a torn tail
+    with open(claimed, 'ab') as f:
+        f.write(ace_tool_accumulator.SPOOL_HEADER.pack(500) + b'{"partial')
+    append_tool('s-crash', 'Bash', {'command': 'echo 3'}, {'stdout': '3'}, 'cr-3',
+                working_dir=working_dir)
+
+    tools = get_session_tools('s-crash', working_dir)
+    assert [t[3] for t in tools] == ['cr-0', 'cr-1', 'cr-2', 'cr-3']
+    assert list(spool_dir.iterdir()) == []
+
+
+def test_spool_clear_session_discards_pending_records(tmp_path, monkeypatch):
+    _spool_mode(monkeypatch)
+    append_tool('s-clear', 'Edit', {}, {}, 'cl-1', working_dir=str(tmp_path))
+    assert ace_tool_accumulator.clear_session('s-clear', str(tmp_path))
+    assert get_session_tools('s-clear', str(tmp_path)) == []
+
+
+def _spool_writer(working_dir: str, writer: int) -> int:
+    ace_tool_accumulator.ACCUMULATOR_MODE = 'spool'
+    return _writer(working_dir, writer)
+
+
+def test_spool_concurrent_writers_and_reader_lose_no_rows(tmp_path):
+    working_dir = str(tmp_path)
+    ctx = get_context('spawn')
+    with ctx.Pool(8) as pool:
+        pending = pool.starmap_async(_spool_writer, [(working_dir, w) for w in range(8)])
+        while not pending.ready():
+            get_session_tools('s-concurrent', working_dir)  # ingest while writers append
+        assert pending.get() == [ROWS_PER_WRITER] * 8
+
+    tools = get_session_tools('s-concurrent', working_dir)
+    assert len({t[3] for t in tools}) == 8 * ROWS_PER_WRITER == len(tools)
+
+
+def _age_rows(db: Path, session_id: str, hours: int) -> None:
+    conn = sqlite3.connect(db)
+    conn.execute("UPDATE tool_uses SET timestamp = datetime('now', ?) WHERE session_id = ?",
+                 (f'-{hours} hours', session_id))
+    conn.commit()
+    conn.close()
+
+
+def test_prune_purges_orphaned_sessions_by_age(tmp_path):
+    working_dir = str(tmp_path)
+    db = tmp_path / '.claude/data/logs/ace-tools.db'
+    for i in range(30):
+        append_tool('s-orphan', 'Bash', {'command': 'x'}, {'stdout': 'y' * 1000}, f'o-{i}',
+                    working_dir=working_dir)
+    append_tool('s-live', 'Edit', {}, {}, 'live-1', working_dir=working_dir)
+    _age_rows(db, 's-orphan', 48)
+
+    result = ace_tool_accumulator.prune_db(working_dir, max_age_hours=24, max_db_mb=0,
+                                           batch_rows=7)
+    assert result['deleted_rows'] == 30 and result['complete']
+    assert get_session_tools('s-orphan', working_dir) == []
+    assert len(get_session_tools('s-live', working_dir)) == 1
+
+    stats = ace_tool_accumulator.get_db_stats(working_dir)
+    assert stats['auto_vacuum'] == 'incremental'
+    assert stats['reclaimable_pages'] == 0
+    assert stats['sessions'] == [{'session_id': 's-live', 'rows': 1,
+                                  'oldest': stats['sessions'][0]['newest'],
+                                  'newest': stats['sessions'][0]['newest']}]
+
+
+def test_prune_caps_db_size_oldest_first(tmp_path):
+    working_dir = str(tmp_path)
+    db = tmp_path / '.claude/data/logs/ace-tools.db'
+    for i in range(200):
+        append_tool(f's-{i // 50}', 'Bash', {'command': 'x'}, {'stdout': f'{i}' * 2000},
+                    f'big-{i}', working_dir=working_dir)
+    for session, hours in (('s-0', 5), ('s-1', 4), ('s-2', 3)):
+        _age_rows(db, session, hours)
+
+    result = ace_tool_accumulator.prune_db(working_dir, max_age_hours=0, max_db_mb=0.2,
+                                           batch_rows=20)
+    assert result['deleted_rows'] > 0
+    remaining = {s['session_id'] for s in ace_tool_accumulator.get_db_stats(working_dir)['sessions']}
+    assert 's-3' in remaining and 's-0' not in remaining
+
+
+def test_size_cap_never_truncates_live_sessions(tmp_path):
+    working_dir = str(tmp_path)
+    db = tmp_path / '.claude/data/logs/ace-tools.db'
+    for i in range(150):
+        append_tool(f's-{i // 50}', 'Bash', {'command': 'x'}, {'stdout': f'{i}' * 2000},
+                    f'live-{i}', working_dir=working_dir)
+    _age_rows(db, 's-0', 3)  # stale, but it is the session calling prune
+    _age_rows(db, 's-1', 2)  # stale: the only one the cap may take
+
+    result = ace_tool_accumulator.prune_db(working_dir, max_age_hours=0, max_db_mb=0.01,
+                                           session_id='s-0')
+    assert result['deleted_rows'] == 50 and result['complete']
+    rows = {s['session_id']: s['rows'] for s in ace_tool_accumulator.get_db_stats(working_dir)['sessions']}
+    assert rows == {'s-0': 50, 's-2': 50}
+
+
+def test_prune_respects_deadline(tmp_path):
+    working_dir = str(tmp_path)
+    db = tmp_path / '.claude/data/logs/ace-tools.db'
+    for i in range(20):
+        append_tool('s-slow', 'Edit', {}, {}, f'slow-{i}', working_dir=working_dir)
+    _age_rows(db, 's-slow', 48)
+
+    result = ace_tool_accumulator.prune_db(working_dir, deadline_secs=0)
+    assert result == {'deleted_rows': 0, 'compacted_rows': 0, 'deleted_spawns': 0,
+                      'reclaimed_pages': 0, 'complete': False}
+
+
+def _legacy_db(tmp_path, rows=0):
+    import json
+
+    db = tmp_path / '.claude/data/logs/ace-tools.db'
+    db.parent.mkdir(parents=True)
+    legacy = sqlite3.connect(db)
+    legacy.execute('CREATE TABLE tool_uses (id INTEGER PRIMARY KEY, session_id TEXT NOT NULL, '
+                   'tool_name TEXT NOT NULL, tool_input TEXT, tool_response TEXT, '
+                   'tool_use_id TEXT, agent_id TEXT, timestamp TEXT, UNIQUE(tool_use_id))')
+    legacy.executemany("INSERT INTO tool_uses (session_id, tool_name, tool_input, tool_response, "
+                       "tool_use_id, timestamp) VALUES ('s-old', 'Read', '{}', ?, ?, datetime('now'))",
+                       [(json.dumps({'content': 'c' * 20_000}), f'old-{i}') for i in range(rows)])
+    legacy.commit()
+    legacy.close()
+    return db
+
+
+def test_legacy_db_is_switched_to_incremental_vacuum(tmp_path):
+    db = _legacy_db(tmp_path, rows=100)
+    init_db(db).close()
+    assert ace_tool_accumulator.get_db_stats(str(tmp_path))['auto_vacuum'] == 'none'
+    size = db.stat().st_size
+
+    # The hook-side prune compacts but never runs the full VACUUM itself
+    result = ace_tool_accumulator.prune_db(str(tmp_path), max_age_hours=0, max_db_mb=0)
+    assert result['compacted_rows'] == 100
+    assert ace_tool_accumulator.get_db_stats(str(tmp_path))['auto_vacuum'] == 'none'
+
+    result = ace_tool_accumulator.vacuum_db(str(tmp_path))
+    assert result['auto_vacuum'] == 'incremental' and result['reclaimed_pages'] > 0
+    assert db.stat().st_size < size / 4
+    assert ace_tool_accumulator.vacuum_db(str(tmp_path))['compacted_rows'] == 0
+
+
+def test_sessionend_converts_legacy_db_in_a_detached_vacuum(tmp_path):
+    import json
+    import subprocess
+    import time
+
+    db = _legacy_db(tmp_path, rows=50)
+    init_db(db).close()
+    wrapper = SHARED_HOOKS.parent / 'scripts' / 'ace_sessionend_wrapper.sh'
+    proc = subprocess.run(['bash', str(wrapper)], input=json.dumps({'session_id': 's-new'}),
+                          capture_output=True, text=True, cwd=tmp_path, timeout=10)
+    assert proc.returncode == 0
+    for _ in range(100):
+        if ace_tool_accumulator.get_db_stats(str(tmp_path))['auto_vacuum'] == 'incremental':
+            break
+        time.sleep(0.05)
+    assert ace_tool_accumulator.get_db_stats(str(tmp_path))['auto_vacuum'] == 'incremental'
+
+
+def test_sessionend_wrapper_prunes_within_budget(tmp_path):
+    import json
+    import subprocess
+    import time
+
+    working_dir = str(tmp_path)
+    db = tmp_path / '.claude/data/logs/ace-tools.db'
+    for i in range(50):
+        append_tool('s-dead', 'Edit', {}, {}, f'dead-{i}', working_dir=working_dir)
+    _age_rows(db, 's-dead', 72)
+
+    wrapper = SHARED_HOOKS.parent / 'scripts' / 'ace_sessionend_wrapper.sh'
+    start = time.monotonic()
+    proc = subprocess.run(['bash', str(wrapper)], input=json.dumps({'session_id': 's-new'}),
+                          capture_output=True, text=True, cwd=tmp_path, timeout=10)
+    assert proc.returncode == 0
+    assert time.monotonic() - start < 3
+    assert ace_tool_accumulator.get_db_stats(working_dir)['total_rows'] == 0
+
+
+def _mixed_agents(working_dir: str) -> None:
+    for i, agent in enumerate([None, 'agent-a', None, 'agent-b', 'agent-a']):
+        append_tool('s-agents', 'Edit', {'file_path': f'/f{i}.py'}, {'success': True},
+                    f'ag-{i}', agent_id=agent, working_dir=working_dir)
+
+
+def test_agent_queries_use_composite_index(tmp_path):
+    _mixed_agents(str(tmp_path))
+    get_agent_tools = ace_tool_accumulator.get_agent_tools
+    assert [t[3] for t in get_agent_tools('s-agents', 'agent-a', str(tmp_path))] == ['ag-1', 'ag-4']
+    assert [t[3] for t in get_agent_tools('s-agents', None, str(tmp_path))] == ['ag-0', 'ag-2']
+
+    conn = init_db(tmp_path / '.claude/data/logs/ace-tools.db')
+    plan = conn.execute('EXPLAIN QUERY PLAN SELECT tool_name FROM tool_uses '
+                        'WHERE session_id = ? AND agent_id IS ? ORDER BY id', ('s', 'a')).fetchall()
+    conn.close()
+    assert 'idx_session_agent' in plan[0][3]
+
+
+def test_clear_agent_leaves_other_agents(tmp_path):
+    working_dir = str(tmp_path)
+    _mixed_agents(working_dir)
+    assert ace_tool_accumulator.clear_agent('s-agents', 'agent-a', working_dir)
+    assert [t[3] for t in get_session_tools('s-agents', working_dir)] == ['ag-0', 'ag-2', 'ag-3']
+
+
+def test_subagent_trajectory_reads_db_not_transcript(tmp_path, monkeypatch):
+    import ace_after_task
+
+    working_dir = str(tmp_path)
+    _mixed_agents(working_dir)
+
+    def fail(_path):
+        raise AssertionError('transcript parsed although the accumulator has agent rows')
+    monkeypatch.setattr(ace_after_task, 'parse_agent_transcript', fail)
+    transcript = tmp_path / 'agent-agent-a.jsonl'
+    transcript.write_text('{}\n')
+
+    trajectory, tools = ace_after_task.build_trajectory_from_accumulated_tools(
+        's-agents', working_dir, agent_transcript_path=str(transcript), agent_id='agent-a')
+    assert [s['action'] for s in trajectory] == ['Edited f1.py', 'Edited f4.py']
+    assert {t[4] for t in tools} == {'agent-a'}
+
+
+def test_subagent_without_rows_falls_back_to_transcript(tmp_path):
+    import json
+    import ace_after_task
+
+    transcript = tmp_path / 'agent-agent-z.jsonl'
+    transcript.write_text(json.dumps({'message': {'content': [
+        {'type': 'tool_use', 'id': 'tz1', 'name': 'Write', 'input': {'file_path': '/z.py'}},
+    ]}}) + '\n')
+    trajectory, _ = ace_after_task.build_trajectory_from_accumulated_tools(
+        's-none', str(tmp_path), agent_transcript_path=str(transcript), agent_id='agent-z')
+    assert [s['action'] for s in trajectory] == ['Wrote z.py']
+
+
+def test_spool_reader_skips_files_another_reader_unlinked(tmp_path, monkeypatch):
+    _spool_mode(monkeypatch)
+    working_dir = str(tmp_path)
+    spool_dir = tmp_path / '.claude/data/logs/ace-spool'
+    # Left by a crashed ingest, then this reader's own live spool
+    append_tool('s-race', 'Bash', {'command': 'echo 0'}, {'stdout': '0'}, 'race-0',
+                working_dir=working_dir)
+    (spool_dir / 's-race.spool').rename(spool_dir / 's-race.4242.ingest')
+    for i in (1, 2):
+        append_tool('s-race', 'Bash', {'command': f'echo {i}'}, {'stdout': str(i)},
+                    f'race-{i}', working_dir=working_dir)
+
+    # Reader B runs to completion (commit + unlink) while reader A is mid-list
+    real_read = ace_tool_accumulator._read_spool_records
+    other_reader = []
+
+    def read_then_race(path):
+        records = real_read(path)
+        if not other_reader:
+            monkeypatch.setattr(ace_tool_accumulator, '_read_spool_records', real_read)
+            other_reader.append(ace_tool_accumulator.ingest_spool('s-race', working_dir))
+        return records
+
+    monkeypatch.setattr(ace_tool_accumulator, '_read_spool_records', read_then_race)
+    assert ace_tool_accumulator.ingest_spool('s-race', working_dir) == 1
+    assert other_reader == [3]
+    tools = get_session_tools('s-race', working_dir)
+    assert [t[3] for t in tools] == ['race-0', 'race-1', 'race-2']
+    assert list(spool_dir.iterdir()) == []
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+ace_cli_cache.py / lib/ace_cli_cache.sh: ace-cli version + whoami cache (v6.5.0).
+
+A fake ace-cli on PATH logs every invocation, so the tests count how many
+processes each check really spawns.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CACHE_LIB = REPO_ROOT / "plugins" / "ace" / "scripts" / "lib" / "ace_cli_cache.sh"
+sys.path.insert(0, str(REPO_ROOT / "plugins" / "ace" / "shared-hooks" / "utils"))
+
+import ace_cli  # noqa: E402
+import ace_cli_cache  # noqa: E402
+
+FAKE_CLI = """#!/bin/sh
+echo "$*" >> "{calls}"
+case "$1" in
+  --version) echo "1.0.11" ;;
+  whoami) cat "{whoami}" ;;
+esac
+"""
+
+
+@pytest.fixture
+def cli(tmp_path, fake_ace_cli):
+    whoami = tmp_path / "whoami.json"
+    whoami.write_text(json.dumps({"authenticated": True, "token_expires_in": 48 * 3600}))
+    fake = fake_ace_cli(FAKE_CLI, env={"XDG_CONFIG_HOME": str(tmp_path / "config")},
+                        whoami=whoami)
+
+    class Cli:
+        path = fake.path
+        whoami_file = whoami
+        config = tmp_path / "config" / "ace" / "config.json"
+        env = dict(os.environ)
+        calls = staticmethod(fake.lines)
+
+    return Cli
+
+
+def run_bash(snippet, env):
+    return subprocess.run(["bash", "-c", f'set -eo pipefail; source "{CACHE_LIB}"; {snippet}'],
+                          capture_output=True, text=True, env=env, timeout=20)
+
+
+def test_version_cached_until_binary_changes(cli):
+    assert ace_cli.check_session_pinning_available() is True
+    assert ace_cli.check_session_pinning_available() is True
+    assert cli.calls() == ["--version"]
+
+    later = time.time() + 5
+    os.utime(cli.path, (later, later))  # e.g. npm install -g @ace-sdk/cli
+    assert ace_cli.check_session_pinning_available() is True
+    assert cli.calls() == ["--version", "--version"]
+
+
+def test_whoami_cached_and_invalidated_by_login(cli):
+    assert ace_cli.check_auth_status() is None
+    assert ace_cli.check_auth_status() is None
+    assert len(cli.calls()) == 1
+
+    # /ace-login rewrites ~/.config/ace/config.json
+    cli.config.parent.mkdir(parents=True)
+    cli.config.write_text(json.dumps({"auth": {"token": "new"}}))
+    cli.whoami_file.write_text(json.dumps({"authenticated": False}))
+    assert "Not authenticated" in ace_cli.check_auth_status()
+    assert len(cli.calls()) == 2
+
+
+def test_expiring_token_is_not_cached(cli):
+    cli.whoami_file.write_text(json.dumps({"authenticated": True, "token_expires_in": 1800,
+                                           "last_used_at": None}))
+    assert "expires in 30 minutes" in ace_cli.check_auth_status()
+    assert "expires in" in ace_cli.check_auth_status()
+    assert len(cli.calls()) == 2
+
+
+def test_cached_token_expiry_is_aged(cli):
+    ace_cli_cache.store_whoami({"authenticated": True, "token_expires_in": 48 * 3600})
+    path = ace_cli_cache.get_cache_dir() / ace_cli_cache.WHOAMI_FILE
+    entry = json.loads(path.read_text())
+    entry["fetched_at"] -= 100
+    path.write_text(json.dumps(entry))
+    assert ace_cli_cache.get_cached_whoami()["token_expires_in"] == 48 * 3600 - 100
+
+
+def test_cache_disabled(cli, monkeypatch):
+    monkeypatch.setenv("ACE_CLI_CACHE", "0")
+    ace_cli.check_session_pinning_available()
+    ace_cli.check_session_pinning_available()
+    assert cli.calls() == ["--version", "--version"]
+    assert not (ace_cli_cache.get_cache_dir() / ace_cli_cache.VERSION_FILE).exists()
+
+
+def test_bash_and_python_share_entries(cli):
+    env = dict(os.environ)
+    proc = run_bash("ace_cached_cli_version; ace_cached_whoami", env)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.splitlines()[0] == "1.0.11"
+    assert len(cli.calls()) == 2
+
+    # Python hits what bash wrote
+    assert ace_cli.check_session_pinning_available() is True
+    assert ace_cli.check_auth_status() is None
+    assert len(cli.calls()) == 2
+
+    # ...and bash hits again, with no temp files left behind
+    proc = run_bash("ace_cached_cli_version; ace_cached_whoami", env)
+    assert json.loads(proc.stdout.splitlines()[1])["authenticated"] is True
+    assert len(cli.calls()) == 2
+    assert sorted(p.name for p in ace_cli_cache.get_cache_dir().iterdir()) == [
+        "cli-version.json", "cli-whoami.json"]
+
+
+def test_bash_invalidate_auth_only(cli):
+    ace_cli.check_session_pinning_available()
+    ace_cli.check_auth_status()
+    proc = run_bash("ace_cli_cache_invalidate --auth-only", dict(os.environ))
+    assert proc.returncode == 0, proc.stderr
+    assert ace_cli_cache.get_cached_version() is not None
+    assert ace_cli_cache.get_cached_whoami() is None
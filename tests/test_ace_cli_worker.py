@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+ace_cli_worker.py: warm ace-cli worker behind ace_cli.py (v6.5.0, ACE_CLI_WORKER=1).
+
+Covers id multiplexing, per-request timeouts, respawn after a crash and the
+one-shot subprocess fallback, using a fake ace-cli and a scripted fake worker.
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "plugins" / "ace" / "shared-hooks" / "utils"))
+
+import ace_cli  # noqa: E402
+import ace_cli_worker  # noqa: E402
+
+FAKE_CLI = """#!/bin/sh
+case "$1" in
+  --version) echo "1.0.11" ;;
+  whoami) echo '{{"authenticated": true}}' ;;
+  *) cat >/dev/null; echo "{{\\"count\\": 1, \\"project\\": \\"$ACE_PROJECT_ID\\"}}" ;;
+esac
+"""
+
+# Scripted worker: exec argv[0] picks the behaviour; answers out of order
+FAKE_WORKER = r"""
+import json, sys, threading, time
+with open(sys.argv[1], 'a') as f:
+    f.write('start\n')
+lock = threading.Lock()
+def reply(msg):
+    with lock:
+        sys.stdout.write(json.dumps(msg) + '\n')
+        sys.stdout.flush()
+def run(req):
+    argv = req['params']['argv']
+    if argv[0] == 'hang':
+        return
+    if argv[0] == 'crash':
+        sys.stdout.flush()
+        import os; os._exit(3)
+    if argv[0] == 'sleep':
+        time.sleep(float(argv[1]))
+    reply({'jsonrpc': '2.0', 'id': req['id'],
+           'result': {'returncode': 0, 'stdout': ' '.join(argv), 'stderr': ''}})
+for line in sys.stdin:
+    req = json.loads(line)
+    if req['method'] == 'hello':
+        reply({'jsonrpc': '2.0', 'id': req['id'], 'result': {'protocol': 1}})
+    else:
+        threading.Thread(target=run, args=(req,), daemon=True).start()
+"""
+
+
+@pytest.fixture
+def cli_env(fake_ace_cli):
+    yield fake_ace_cli(FAKE_CLI, env={"ACE_CLI_WORKER": "1"}).root
+    ace_cli_worker._close_worker()
+    ace_cli_worker._worker = None
+
+
+@pytest.fixture
+def fake_worker(cli_env, monkeypatch):
+    script = cli_env / "fake_worker.py"
+    script.write_text(FAKE_WORKER)
+    starts = cli_env / "starts.log"
+    monkeypatch.setenv("ACE_CLI_WORKER_CMD", f"{sys.executable} {script} {starts}")
+    return lambda: starts.read_text().count("start") if starts.exists() else 0
+
+
+def test_standin_worker_serves_every_call_site(cli_env):
+    assert ace_cli.run_search("auth", org="org_1", project="prj_1") == {"count": 1, "project": "prj_1"}
+    assert ace_cli.check_session_pinning_available() is True
+    assert ace_cli.check_session_pinning_available() is True  # cached --version
+    assert ace_cli.ensure_authenticated() == (True, None)
+    assert ace_cli.check_auth_status() is None
+    assert ace_cli_worker._worker.respawns == 0
+
+
+def test_concurrent_requests_are_multiplexed_by_id(fake_worker):
+    worker = ace_cli_worker.get_worker()
+    results = {}
+
+    def call(i):
+        delay = str(0.05 * (8 - i))  # later requests answer first
+        results[i] = worker.call("exec", {"argv": ["sleep", delay, str(i)]}, timeout=5)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert {i: r["stdout"].split()[-1] for i, r in results.items()} == {i: str(i) for i in range(8)}
+    assert fake_worker() == 1
+
+
+def test_request_timeout_does_not_poison_worker(fake_worker):
+    with pytest.raises(subprocess.TimeoutExpired):
+        ace_cli_worker.run_cli(["hang"], timeout=0.2)
+    assert ace_cli_worker.run_cli(["echo", "ok"], timeout=5).stdout == b"echo ok"
+    assert fake_worker() == 1
+
+
+def test_crashed_worker_respawns_on_next_call(fake_worker):
+    with pytest.raises(ace_cli_worker.WorkerUnavailable):
+        ace_cli_worker.run_cli(["crash"], timeout=5)
+    assert ace_cli_worker.run_cli(["echo", "back"], timeout=5).stdout == b"echo back"
+    assert fake_worker() == 2
+
+
+def test_ace_cli_falls_back_to_one_shot_when_worker_crashes(fake_worker, monkeypatch):
+    monkeypatch.setattr(ace_cli_worker, "MAX_RESPAWNS", 0)
+    with pytest.raises(ace_cli_worker.WorkerUnavailable):
+        ace_cli_worker.run_cli(["crash"], timeout=5)
+    # Respawn budget spent: _run_cli silently runs ace-cli directly
+    assert ace_cli.run_search("q", project="prj_2") == {"count": 1, "project": "prj_2"}
+
+
+def test_unstartable_worker_falls_back(cli_env, monkeypatch):
+    monkeypatch.setenv("ACE_CLI_WORKER_CMD", str(cli_env / "no-such-worker"))
+    assert ace_cli.run_search("q", project="prj_3") == {"count": 1, "project": "prj_3"}
+
+
+def test_missing_cli_reported_through_worker(cli_env, monkeypatch):
+    monkeypatch.setenv("PATH", "/nonexistent")
+    monkeypatch.setattr(ace_cli_worker, "get_worker_cmd",
+                        lambda: [sys.executable, ace_cli_worker.__file__])
+    assert ace_cli.run_search("q")["error"] == "cli_not_found"
+    assert ace_cli_worker._worker.proc is not None  # answered by the worker, not the fallback
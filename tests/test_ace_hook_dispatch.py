@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+ace_hook.py: single-process dispatcher behind every hook wrapper (v6.5.0).
+
+Wrappers exec `python3 ace_hook.py <Event>` unless ACE_LEGACY_HOOKS=1. These
+tests drive the wrappers end-to-end with a fake ace-cli on PATH.
+"""
+import json
+import os
+import sqlite3
+import subprocess
+import uuid
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS = REPO_ROOT / "plugins" / "ace" / "scripts"
+
+FAKE_CLI = """#!/bin/sh
+# search --stdin --json --allowed-domains D -> two patterns
+cat >/dev/null
+echo '{"count": 2, "similar_patterns": [{"id": "p1", "content": "use redis"}]}'
+"""
+
+
+@pytest.fixture
+def hook_env(tmp_path):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    cli = bin_dir / "ace-cli"
+    cli.write_text(FAKE_CLI)
+    cli.chmod(0o755)
+    env = dict(os.environ, PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+               HOME=str(tmp_path / "home"), XDG_CONFIG_HOME=str(tmp_path / "config"))
+    env.pop("ACE_LEGACY_HOOKS", None)
+    env.pop("ACE_HOOKD", None)
+    return env
+
+
+def run_wrapper(name, event, env, cwd=None, *args):
+    return subprocess.run(["bash", str(SCRIPTS / name), *args],
+                          input=json.dumps(event), capture_output=True,
+                          text=True, env=env, cwd=cwd, timeout=20)
+
+
+def test_posttooluse_large_payload_is_not_dropped(hook_env, tmp_path):
+    """Payloads travel over stdin only — no ARG_MAX ceiling."""
+    big = "x" * (3 * 1024 * 1024)
+    event = {"session_id": "s1", "tool_name": "Bash", "tool_use_id": "big1",
+             "tool_input": {"command": "cat big"}, "tool_response": {"stdout": big},
+             "cwd": str(tmp_path)}
+    proc = run_wrapper("ace_posttooluse_wrapper.sh", event, hook_env, None, "--log")
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout) == {"async": True}
+
+    db = tmp_path / ".claude/data/logs/ace-tools.db"
+    row = sqlite3.connect(db).execute(
+        "SELECT tool_name, response_bytes FROM tool_uses WHERE tool_use_id='big1'").fetchone()
+    assert row[0] == "Bash" and row[1] > len(big)
+
+
+def test_posttooluse_transcript_path_fallback(hook_env, tmp_path):
+    transcript = tmp_path / ".claude" / "data" / "transcript.jsonl"
+    transcript.parent.mkdir(parents=True)
+    event = {"session_id": "s1", "tool_name": "Edit", "tool_use_id": "tp1",
+             "tool_input": {}, "tool_response": {}, "transcript_path": str(transcript)}
+    proc = run_wrapper("ace_posttooluse_wrapper.sh", event, hook_env)
+    assert proc.returncode == 0, proc.stderr
+    assert (tmp_path / ".claude/data/logs/ace-tools.db").exists()
+
+
+def test_disabled_flag_uses_event_session_id(hook_env, tmp_path):
+    session_id = f"disabled-{uuid.uuid4().hex[:8]}"
+    flag = Path(f"/tmp/ace-disabled-{session_id}.flag")
+    flag.write_text("disabled")
+    try:
+        event = {"session_id": session_id, "tool_name": "Edit", "tool_use_id": "d1",
+                 "tool_input": {}, "tool_response": {}, "cwd": str(tmp_path)}
+        proc = run_wrapper("ace_posttooluse_wrapper.sh", event, hook_env)
+        assert proc.returncode == 0
+        assert proc.stdout == ""
+        assert not (tmp_path / ".claude/data/logs/ace-tools.db").exists()
+    finally:
+        flag.unlink()
+
+
+def test_pretooluse_domain_shift_injects_patterns(hook_env, tmp_path):
+    project = f"prj_dispatch_{uuid.uuid4().hex[:8]}"
+    (tmp_path / ".claude").mkdir()
+    (tmp_path / ".claude/settings.json").write_text(
+        json.dumps({"orgId": "org_1", "projectId": project}))
+    domains_file = Path(f"/tmp/ace-domains-{project}.json")
+    domain_file = Path(f"/tmp/ace-domain-{project}.txt")
+    domains_file.write_text(json.dumps({"auth-system:core": 1, "cache-layer:core": 1}))
+    domain_file.write_text("auth-system\n")
+    try:
+        event = {"session_id": "s1", "tool_name": "Read",
+                 "tool_input": {"file_path": "src/cache/redis.py"}}
+        proc = run_wrapper("ace_pretooluse_wrapper.sh", event, hook_env, tmp_path)
+        assert proc.returncode == 0, proc.stderr
+        out = json.loads(proc.stdout)
+        assert "Auto-loaded 2 patterns" in out["systemMessage"]
+        ctx = out["hookSpecificOutput"]["additionalContext"]
+        assert ctx.startswith('<ace-patterns-domain-shift domain="cache-layer">')
+        assert domain_file.read_text().strip() == "cache-layer"
+
+        log = tmp_path / ".claude/data/logs/ace-relevance.jsonl"
+        entry = json.loads(log.read_text().splitlines()[-1])
+        assert entry["event"] == "domain_shift" and entry["patterns_found"] == 2
+    finally:
+        domains_file.unlink(missing_ok=True)
+        domain_file.unlink(missing_ok=True)
+
+
+def test_cwdchanged_logs_shift_and_outputs_event_name(hook_env, tmp_path):
+    project = f"prj_cwd_{uuid.uuid4().hex[:8]}"
+    new_cwd = tmp_path / "services" / "cache"
+    (new_cwd / ".claude").mkdir(parents=True)
+    (new_cwd / ".claude/settings.json").write_text(
+        json.dumps({"orgId": "org_1", "projectId": project}))
+    domains_file = Path(f"/tmp/ace-domains-{project}.json")
+    domain_file = Path(f"/tmp/ace-domain-{project}.txt")
+    domains_file.write_text(json.dumps({"cache-layer:core": 1}))
+    try:
+        event = {"session_id": "s1", "old_cwd": str(tmp_path), "new_cwd": str(new_cwd)}
+        proc = run_wrapper("ace_cwdchanged_wrapper.sh", event, hook_env, tmp_path)
+        assert proc.returncode == 0, proc.stderr
+        assert json.loads(proc.stdout) == {"hookEventName": "CwdChanged"}
+        log = tmp_path / ".claude/data/logs/ace-search-events.jsonl"
+        events = [json.loads(line)["event"] for line in log.read_text().splitlines()]
+        assert events == ["domain_shift", "domain_search"]
+    finally:
+        domains_file.unlink(missing_ok=True)
+        domain_file.unlink(missing_ok=True)
+
+
+def test_subagent_stop_registers_spawn_in_process(hook_env, tmp_path):
+    event = {"session_id": "sess-sub-1", "agent_id": "agent-abc", "cwd": str(tmp_path)}
+    proc = run_wrapper("ace_subagent_stop_wrapper.sh", event, hook_env, tmp_path)
+    assert proc.returncode == 0, proc.stderr
+    db = tmp_path / ".claude/data/logs/ace-tools.db"
+    row = sqlite3.connect(db).execute(
+        "SELECT parent_agent_id, session_id FROM spawn_registry WHERE child_agent_id='agent-abc'"
+    ).fetchone()
+    assert row == ("main", "sess-sub-1")
+    assert not (tmp_path / ".claude/data/logs/ace-spawn-log.jsonl").exists()
+
+
+def test_stop_review_and_eval_request(hook_env, tmp_path):
+    config = Path(hook_env["XDG_CONFIG_HOME"]) / "ace" / "config.json"
+    config.parent.mkdir(parents=True)
+    config.write_text("{}")
+    logs = tmp_path / ".claude/data/logs"
+    logs.mkdir(parents=True)
+    (logs / "ace-relevance.jsonl").write_text(json.dumps(
+        {"event": "search", "patterns_injected": 3, "avg_confidence": 0.5,
+         "domains": ["auth"]}) + "\n")
+
+    env = dict(hook_env, ACE_ASYNC_LEARNING="0")
+    event = {"session_id": "s1", "cwd": str(tmp_path),
+             "last_assistant_message": "Done. ACE_REVIEW: 80% helpful, 5m saved"}
+    proc = run_wrapper("ace_stop_wrapper.sh", event, env, tmp_path)
+    assert proc.returncode == 0, proc.stderr
+    out = json.loads(proc.stdout.strip().splitlines()[-1])
+    assert out["systemMessage"].startswith("✅ [ACE] 80% helpful | ~5m saved")
+
+    eval_request = json.loads((logs / "ace-eval-request.json").read_text())
+    assert eval_request["patterns_injected"] == 3
+    assert eval_request["avg_relevance"] == 50
+
+
+def test_legacy_hooks_env_keeps_bash_path(hook_env, tmp_path):
+    env = dict(hook_env, ACE_LEGACY_HOOKS="1")
+    event = {"session_id": "s1", "tool_name": "Edit", "tool_use_id": "l1",
+             "tool_input": {}, "tool_response": {}, "cwd": str(tmp_path)}
+    proc = run_wrapper("ace_posttooluse_wrapper.sh", event, env)
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout) == {"async": True}
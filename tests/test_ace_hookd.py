@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+ace-hookd: opt-in warm hook daemon + thin client (ACE_HOOKD=1).
+
+Spins up a real daemon on a private socket dir and drives it through the
+client, the same way the wrappers do via scripts/lib/ace_hookd.sh.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+PLUGIN_ROOT = REPO_ROOT / "plugins" / "ace"
+SHARED_HOOKS = PLUGIN_ROOT / "shared-hooks"
+CLIENT = SHARED_HOOKS / "ace_hookd_client.py"
+DAEMON = SHARED_HOOKS / "ace_hookd.py"
+POSTTOOLUSE_WRAPPER = PLUGIN_ROOT / "scripts" / "ace_posttooluse_wrapper.sh"
+
+sys.path.insert(0, str(SHARED_HOOKS))
+sys.path.insert(0, str(SHARED_HOOKS / "utils"))
+
+from ace_hook import match_domain_to_path, resolve_working_dir  # noqa: E402
+from ace_hookd_client import request  # noqa: E402
+
+FAKE_CLI = "#!/bin/sh\necho '{\"count\": 0}'\n"
+
+
+@pytest.fixture
+def hookd():
+    # Short dir: AF_UNIX paths are limited to ~108 bytes
+    sock_dir = tempfile.mkdtemp(prefix="hookd-")
+    fake_cli = Path(sock_dir) / "bin" / "ace-cli"
+    fake_cli.parent.mkdir()
+    fake_cli.write_text(FAKE_CLI)
+    fake_cli.chmod(0o755)
+    env = dict(os.environ, ACE_HOOKD_DIR=sock_dir, ACE_HOOKD_AUTOSTART="0",
+               PATH=f"{fake_cli.parent}{os.pathsep}{os.environ['PATH']}")
+    proc = subprocess.Popen([sys.executable, str(DAEMON), "serve"], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    sock = None
+    for _ in range(100):
+        socks = [p for p in os.listdir(sock_dir) if p.endswith(".sock")]
+        if socks:
+            sock = os.path.join(sock_dir, socks[0])
+            break
+        time.sleep(0.05)
+    assert sock, "daemon did not create its socket"
+    yield {"dir": sock_dir, "socket": sock, "env": env}
+    proc.terminate()
+    proc.wait(timeout=5)
+    shutil.rmtree(sock_dir, ignore_errors=True)
+
+
+def _client(event, body, env, *args):
+    return subprocess.run([sys.executable, "-S", str(CLIENT), event, *args],
+                          input=body, capture_output=True, env=env, timeout=10)
+
+
+def test_socket_is_private(hookd):
+    assert stat.S_IMODE(os.stat(hookd["dir"]).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(hookd["socket"]).st_mode) == 0o600
+
+
+def test_client_falls_back_when_daemon_down(tmp_path):
+    env = dict(os.environ, ACE_HOOKD_DIR=str(tmp_path), ACE_HOOKD_AUTOSTART="0")
+    result = _client("PostToolUse", b"{}", env)
+    assert result.returncode == 75
+    assert result.stdout == b""
+
+
+def test_unknown_event_is_passed_back(hookd):
+    assert request("PreCompact", b"{}", socket_path=hookd["socket"]) is None
+
+
+def test_posttooluse_appends_over_warm_connection(hookd, tmp_path):
+    for i in range(3):
+        event = {
+            "session_id": "s1", "tool_name": "Bash", "tool_use_id": f"t{i}",
+            "tool_input": {"command": "ls"}, "tool_response": {"stdout": "x"},
+            "cwd": str(tmp_path),
+        }
+        result = _client("PostToolUse", json.dumps(event).encode(), hookd["env"])
+        assert result.returncode == 0
+        assert json.loads(result.stdout) == {"async": True}
+
+    db = tmp_path / ".claude/data/logs/ace-tools.db"
+    for _ in range(50):  # append runs right after the reply is sent
+        if db.exists():
+            rows = sqlite3.connect(db).execute(
+                "SELECT tool_use_id FROM tool_uses ORDER BY id").fetchall()
+            if len(rows) == 3:
+                break
+        time.sleep(0.05)
+    assert [r[0] for r in rows] == ["t0", "t1", "t2"]
+
+
+def test_posttooluse_uses_the_clients_accumulator_env(hookd, tmp_path):
+    """Per-project ACE_ACCUMULATOR_* reach the append, not the daemon's own values."""
+    def bash(i, env):
+        event = {"session_id": "s1", "tool_name": "Bash", "tool_use_id": f"c{i}",
+                 "tool_input": {"command": "ls"}, "tool_response": {"stdout": "x" * 5000},
+                 "cwd": str(tmp_path)}
+        assert _client("PostToolUse", json.dumps(event).encode(), env).returncode == 0
+
+    bash(0, dict(hookd["env"], ACE_ACCUMULATOR_FIELD_CAP="100"))
+    bash(1, hookd["env"])
+    bash(2, dict(hookd["env"], ACE_ACCUMULATOR_PROJECTION="0"))
+
+    db = tmp_path / ".claude/data/logs/ace-tools.db"
+    for _ in range(50):
+        rows = (sqlite3.connect(db).execute(
+            "SELECT tool_use_id, tool_response FROM tool_uses ORDER BY id").fetchall()
+            if db.exists() else [])
+        if len(rows) == 3:
+            break
+        time.sleep(0.05)
+    stdout = {tid: json.loads(response).get("stdout", "") for tid, response in rows}
+    assert {tid: len(out) for tid, out in stdout.items()} == {"c0": 100, "c1": 2000, "c2": 5000}
+
+
+def test_stalled_client_does_not_block_others(hookd):
+    """A client that never finishes its request holds only its own connection."""
+    import socket
+    stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stalled.connect(hookd["socket"])
+    stalled.sendall(b'{"v": 2, "event": "Ping", "length": 100}\n{')
+    try:
+        start = time.monotonic()
+        reply = request("Ping", b"", socket_path=hookd["socket"], timeout=5)
+        assert reply not in (None, "down")
+        assert time.monotonic() - start < 1.0
+    finally:
+        stalled.close()
+
+
+def test_posttooluse_missing_fields_is_silent(hookd, tmp_path):
+    event = {"session_id": "s1", "cwd": str(tmp_path)}
+    result = _client("PostToolUse", json.dumps(event).encode(), hookd["env"])
+    assert result.returncode == 0
+    assert result.stdout == b""
+
+
+def test_pretooluse_tracks_domain_and_forks_on_shift(hookd, tmp_path):
+    project = f"prj_hookd_{uuid.uuid4().hex[:8]}"
+    (tmp_path / ".claude").mkdir()
+    (tmp_path / ".claude/settings.json").write_text(json.dumps({"projectId": project}))
+    domains_file = Path(f"/tmp/ace-domains-{project}.json")
+    domain_file = Path(f"/tmp/ace-domain-{project}.txt")
+    domains_file.write_text(json.dumps({"auth-system:core": 2, "cache-layer:core": 1}))
+
+    def read(path):
+        event = {"tool_name": "Read", "tool_input": {"file_path": path}}
+        return subprocess.run(
+            [sys.executable, "-S", str(CLIENT), "PreToolUse"],
+            input=json.dumps(event).encode(), capture_output=True,
+            env=hookd["env"], cwd=tmp_path, timeout=10)
+
+    try:
+        first = read("src/auth/login.py")
+        assert first.returncode == 0 and first.stdout == b""
+        assert domain_file.read_text().strip() == "auth-system"
+
+        same = read("src/auth/session.py")
+        assert same.returncode == 0
+
+        # Shift runs the full handler (no orgId -> reminder only)
+        shift = read("src/cache/redis.py")
+        assert shift.returncode == 0
+        assert "Domain shift: auth-system → cache-layer" in json.loads(shift.stdout)["systemMessage"]
+        assert domain_file.read_text().strip() == "cache-layer"
+    finally:
+        domains_file.unlink(missing_ok=True)
+        domain_file.unlink(missing_ok=True)
+
+
+def test_posttooluse_wrapper_uses_daemon(hookd, tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    env = dict(hookd["env"], ACE_HOOKD="1")
+    event = {"session_id": "s1", "tool_name": "Edit", "tool_use_id": "w1",
+             "tool_input": {}, "tool_response": {}, "cwd": str(project)}
+    result = subprocess.run(["bash", str(POSTTOOLUSE_WRAPPER), "--log"],
+                            input=json.dumps(event), capture_output=True,
+                            text=True, env=env, timeout=10)
+    assert result.returncode == 0
+    assert json.loads(result.stdout) == {"async": True}
+
+
+def test_match_domain_to_path_matches_bash_rules():
+    assert match_domain_to_path("ace-platform-system", "/ace/scripts/foo.ts")
+    assert match_domain_to_path("authentication", "src/auth/authorize.py")  # 4-char prefix
+    assert not match_domain_to_path("cache-layer", "src/auth/login.py")
+    assert not match_domain_to_path("ab-cd", "ab/cd")  # short words skipped
+
+
+def test_resolve_working_dir_prefers_cwd_then_transcript(tmp_path):
+    assert resolve_working_dir({"cwd": "/x"}) == "/x"
+    transcript = tmp_path / ".claude" / "data" / "t.jsonl"
+    transcript.parent.mkdir(parents=True)
+    assert resolve_working_dir({"transcript_path": str(transcript)}) == str(tmp_path)
+    assert resolve_working_dir({}) == ""
+
+
+def test_get_context_cache_tracks_file_changes(tmp_path):
+    from ace_context import get_context
+    settings = tmp_path / ".claude/settings.json"
+    settings.parent.mkdir()
+    settings.write_text(json.dumps({"orgId": "org_1", "projectId": "prj_1"}))
+    assert get_context(str(tmp_path)) == {"org": "org_1", "project": "prj_1"}
+
+    settings.write_text(json.dumps({"orgId": "org_1", "projectId": "prj_22"}))
+    assert get_context(str(tmp_path)) == {"org": "org_1", "project": "prj_22"}
+
+
+def test_userpromptsubmit_runs_forked_handler(hookd, tmp_path):
+    # Empty prompt: ace_before_task.main() exits 0 without output
+    result = subprocess.run(
+        [sys.executable, "-S", str(CLIENT), "UserPromptSubmit"],
+        input=json.dumps({"prompt": ""}).encode(), capture_output=True,
+        env=hookd["env"], cwd=tmp_path, timeout=10)
+    assert result.returncode == 0
+    assert result.stdout == b""
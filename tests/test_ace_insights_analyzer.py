@@ -1728,8 +1728,9 @@ class TestAceInsightsCommand:
         assert "ace_insights_analyzer" in insights_content, (
             "Bash script must import from ace_insights_analyzer module"
         )
-        assert "extract_task_data_for_evaluation" in insights_content, (
-            "Bash script must call extract_task_data_for_evaluation for Step 1 data extraction"
+        assert "collect_task_data_for_evaluation" in insights_content, (
+            "Bash script must call collect_task_data_for_evaluation (streaming front-end of "
+            "extract_task_data_for_evaluation) for Step 1 data extraction"
         )
         assert "generate_evaluated_html" in insights_content, (
             "Bash script must call generate_evaluated_html for Step 3 HTML generation"
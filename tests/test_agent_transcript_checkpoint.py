@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+parse_agent_transcript: checkpointed incremental parsing (v6.5.0).
+
+Each SubagentStop should only decode what was appended since the previous
+one, and fall back to a full parse when the transcript is replaced.
+"""
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SHARED_HOOKS = REPO_ROOT / "plugins" / "ace" / "shared-hooks"
+sys.path.insert(0, str(SHARED_HOOKS))
+sys.path.insert(0, str(SHARED_HOOKS / "utils"))
+
+import ace_transcript  # noqa: E402
+from ace_after_task import parse_agent_transcript  # noqa: E402
+
+
+def tool_use(i, name="Bash"):
+    return {"type": "assistant", "message": {"role": "assistant", "content": [
+        {"type": "tool_use", "id": f"toolu_{i}", "name": name, "input": {"command": f"echo {i}"}}]}}
+
+
+def tool_result(i, text=None):
+    return {"type": "user", "message": {"role": "user", "content": [
+        {"type": "tool_result", "tool_use_id": f"toolu_{i}", "content": text or f"out {i}"}]}}
+
+
+def chatter(i):
+    return {"type": "assistant", "message": {"role": "assistant",
+                                             "content": [{"type": "text", "text": f"thinking {i}"}]}}
+
+
+def lines(*entries):
+    return "".join(json.dumps(e) + "\n" for e in entries)
+
+
+@pytest.fixture
+def transcript(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path / "agent-abc123.jsonl"
+
+
+@pytest.fixture
+def decoded(monkeypatch):
+    calls = []  # transcript lines (bytes); the checkpoint itself is text
+    real_loads = json.loads
+    monkeypatch.setattr(ace_transcript.json, "loads", lambda s, *a, **k: (
+        calls.append(s) if isinstance(s, bytes) else None) or real_loads(s, *a, **k))
+    return calls
+
+
+def full_parse(path):
+    ace_transcript.get_checkpoint_path(path).unlink(missing_ok=True)
+    return parse_agent_transcript(str(path))
+
+
+def test_resumes_from_checkpoint(transcript, decoded):
+    transcript.write_text(lines(tool_use(1), chatter(1), tool_result(1), tool_use(2)))
+    first = parse_agent_transcript(str(transcript))
+    assert [(t[0], t[2], t[3], t[4]) for t in first] == [
+        ("Bash", json.dumps({"content": "out 1"}), "toolu_1", "abc123"),
+        ("Bash", "{}", "toolu_2", "abc123")]  # result still pending
+    assert len(decoded) == 3  # the text-only line never reaches json.loads
+
+    with open(transcript, "a") as f:
+        f.write(lines(chatter(2), tool_result(2), tool_use(3, "Read"), tool_result(3)))
+    del decoded[:]
+    second = parse_agent_transcript(str(transcript))
+    assert len(decoded) == 3  # only the appended tool lines
+    assert [t[3] for t in second] == ["toolu_1", "toolu_2", "toolu_3"]
+    assert second[1][2] == json.dumps({"content": "out 2"})
+    assert second == full_parse(transcript)
+
+
+def test_unterminated_last_line(transcript):
+    complete = lines(tool_use(1), tool_result(1))
+    partial = json.dumps(tool_use(2))
+    transcript.write_text(complete + partial[:25])
+    assert [t[3] for t in parse_agent_transcript(str(transcript))] == ["toolu_1"]
+    checkpoint = json.loads(ace_transcript.get_checkpoint_path(transcript).read_text())
+    assert checkpoint["offset"] == len(complete.encode())
+
+    # Complete JSON but no newline yet: used now, not checkpointed
+    transcript.write_text(complete + partial)
+    assert [t[3] for t in parse_agent_transcript(str(transcript))] == ["toolu_1", "toolu_2"]
+    assert json.loads(ace_transcript.get_checkpoint_path(transcript).read_text())["offset"] == \
+        len(complete.encode())
+
+    with open(transcript, "a") as f:
+        f.write("\n" + lines(tool_result(2)))
+    result = parse_agent_transcript(str(transcript))
+    assert [t[3] for t in result] == ["toolu_1", "toolu_2"] and result[1][2] != "{}"
+    assert result == full_parse(transcript)
+
+
+def test_replaced_file_is_reparsed(transcript, tmp_path):
+    transcript.write_text(lines(tool_use(1), tool_result(1)))
+    parse_agent_transcript(str(transcript))
+
+    replacement = tmp_path / "new.jsonl"
+    replacement.write_text(lines(tool_use(7), tool_result(7)))
+    os.replace(replacement, transcript)  # rotated: new inode
+    assert [t[3] for t in parse_agent_transcript(str(transcript))] == ["toolu_7"]
+
+
+@pytest.mark.parametrize("rewrite", ["shrunk", "same_size"])
+def test_rewritten_in_place_is_reparsed(transcript, rewrite):
+    transcript.write_text(lines(tool_use(1), tool_result(1), tool_use(2), tool_result(2)))
+    parse_agent_transcript(str(transcript))
+    inode = transcript.stat().st_ino
+
+    if rewrite == "shrunk":
+        new, expected = lines(tool_use(8)), ["toolu_8"]
+    else:  # same length, different first bytes: only the fingerprint notices
+        new = lines(tool_use(5), tool_result(5), tool_use(6), tool_result(6))
+        expected = ["toolu_5", "toolu_6"]
+    with open(transcript, "r+") as f:
+        f.truncate(0)
+        f.write(new)
+    assert transcript.stat().st_ino == inode
+    assert [t[3] for t in parse_agent_transcript(str(transcript))] == expected
+
+
+def test_empty_and_missing(transcript):
+    transcript.write_text("")
+    assert parse_agent_transcript(str(transcript)) == []
+    with pytest.raises(OSError):
+        parse_agent_transcript(str(transcript.with_name("missing.jsonl")))
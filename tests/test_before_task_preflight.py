@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+ace_before_task.run_preflight(): concurrent pre-flight under one deadline (v6.5.0).
+
+The version check, auth check and search share a budget derived from the
+UserPromptSubmit timeout; a slow step degrades to "unknown" instead of the
+hook being killed with no output.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SHARED_HOOKS = REPO_ROOT / "plugins" / "ace" / "shared-hooks"
+sys.path.insert(0, str(SHARED_HOOKS))
+sys.path.insert(0, str(SHARED_HOOKS / "utils"))
+
+import ace_before_task  # noqa: E402
+
+# Delays per subcommand come from FAKE_DELAY_<VERSION|WHOAMI|SEARCH> (seconds)
+FAKE_CLI = """#!{python}
+import json, os, sys, time
+cmd = sys.argv[1].lstrip('-').upper()
+time.sleep(float(os.environ.get('FAKE_DELAY_' + cmd, '0')))
+if cmd == 'VERSION':
+    print('1.0.11')
+elif cmd == 'WHOAMI':
+    print(json.dumps({{'authenticated': True}}))
+else:
+    sys.stdin.read()
+    print(json.dumps({{'count': 1, 'similar_patterns': [
+        {{'id': 'ctx-1a2b3c4d', 'content': 'use redis', 'domain': 'cache', 'confidence': 0.9}}]}}))
+"""
+
+CONTEXT = {"org": "org_t", "project": "prj_preflight"}
+
+
+@pytest.fixture
+def project(fake_ace_cli):
+    fake = fake_ace_cli(FAKE_CLI, env={"ACE_CLI_CACHE": "0"},
+                        settings={"orgId": CONTEXT["org"], "projectId": CONTEXT["project"]})
+    return fake.root, dict(os.environ)
+
+
+def run_hook(cwd, env, **delays):
+    env = dict(env, **{f"FAKE_DELAY_{k.upper()}": str(v) for k, v in delays.items()})
+    event = {"session_id": "s-pre", "prompt": "fix the cache layer"}
+    start = time.monotonic()
+    proc = subprocess.run([sys.executable, str(SHARED_HOOKS / "ace_before_task.py")],
+                          input=json.dumps(event), capture_output=True, text=True,
+                          cwd=cwd, env=env, timeout=30)
+    return proc, time.monotonic() - start
+
+
+def preflight_entries(cwd):
+    log = cwd / ".claude" / "data" / "logs" / "ace-relevance.jsonl"
+    return [e for e in map(json.loads, log.read_text().splitlines()) if e["event"] == "preflight"]
+
+
+def test_budget_from_hooks_json(monkeypatch):
+    monkeypatch.delenv("ACE_PREFLIGHT_BUDGET_MS", raising=False)
+    assert ace_before_task.get_preflight_budget_ms() == 15000 - ace_before_task.PREFLIGHT_MARGIN_MS
+    monkeypatch.setenv("ACE_PREFLIGHT_BUDGET_MS", "4000")
+    assert ace_before_task.get_preflight_budget_ms() == 4000
+
+
+def test_auth_runs_concurrently_with_search(project, monkeypatch):
+    cwd, env = project
+    monkeypatch.setenv("FAKE_DELAY_WHOAMI", "0.8")
+    monkeypatch.setenv("FAKE_DELAY_SEARCH", "0.8")
+    start = time.monotonic()
+    pinning, auth_warning, response, steps = ace_before_task.run_preflight(
+        CONTEXT, "s-pre", "cache", budget_ms=10000)
+    elapsed = time.monotonic() - start
+
+    assert pinning is True and auth_warning is None and response["count"] == 1
+    assert steps["auth"] >= 800 and steps["search"] >= 800
+    assert elapsed < (steps["auth"] + steps["search"]) / 1000  # overlapped, not summed
+
+
+def test_slow_search_emits_timeout_message_before_hook_kill(project):
+    cwd, env = project
+    env = dict(env, ACE_PREFLIGHT_BUDGET_MS="1500")
+    proc, elapsed = run_hook(cwd, env, search=20)
+
+    assert proc.returncode == 0, proc.stderr
+    assert "timed out" in json.loads(proc.stdout)["systemMessage"]
+    assert elapsed < 5
+    entry = preflight_entries(cwd)[-1]
+    assert entry["outcome"] == "timeout" and entry["budget_ms"] == 1500
+
+
+def test_patterns_emitted_when_auth_unknown(project):
+    cwd, env = project
+    env = dict(env, ACE_PREFLIGHT_BUDGET_MS="1500")
+    proc, elapsed = run_hook(cwd, env, whoami=20)
+
+    assert proc.returncode == 0, proc.stderr
+    output = json.loads(proc.stdout)
+    assert "Found 1 relevant bullets" in output["systemMessage"]
+    assert "ctx-1a2b3c4d" in output["hookSpecificOutput"]["additionalContext"]
+    assert elapsed < 5
+    entry = preflight_entries(cwd)[-1]
+    assert entry["outcome"] == "ok"
+    assert set(entry["steps_ms"]) == {"session_pinning", "auth", "search"}
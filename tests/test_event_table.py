@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+EventTable: parse-once columnar view for ace_insights_analyzer (v6.5.0).
+
+Each timestamp is parsed once when the table is built; every analyzer
+accepts the table and returns exactly what it returns for the entry list.
+"""
+import math
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "plugins" / "ace" / "shared-hooks" / "utils"))
+
+import ace_insights_analyzer  # noqa: E402
+from ace_insights_analyzer import (  # noqa: E402
+    EventTable, analyze_sessions, calculate_helpfulness, calculate_trends,
+    deduplicate_events, extract_task_data_for_evaluation, format_insights_html,
+    get_top_patterns, split_into_tasks,
+)
+
+NOW = datetime(2026, 10, 17, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def ts(minutes_ago, z=False):
+    value = (NOW - timedelta(minutes=minutes_ago)).isoformat()
+    return value.replace("+00:00", "Z") if z else value
+
+
+def entries():
+    """Three sessions over two days, with re-fired executions and bad timestamps."""
+    log = []
+    for turn in range(60):
+        sid = f"s{turn % 3}"
+        start = 2880 - turn * 47
+        pid = f"ctx-{turn % 4}"
+        log.append({"timestamp": ts(start), "event": "search", "session_id": sid,
+                    "user_prompt": f"turn {turn}", "patterns_injected": 2, "avg_confidence": 0.8,
+                    "domains": ["auth"], "top_patterns": [
+                        {"id": pid, "confidence": 0.5 + turn % 5 / 10, "domain": "auth", "section": "rules"}]})
+        for repeat in range(turn % 3 + 1):  # near-duplicates within 30s
+            log.append({"timestamp": ts(start - 2 - repeat * 0.2, z=True), "event": "execution",
+                        "session_id": sid, "tools_executed": 4, "success": turn % 5 != 0,
+                        "pattern_ids": [pid], "patterns_used_count": 1, "agent_type": "Explore"})
+    log += [{"timestamp": "not-a-time", "event": "execution", "session_id": "s1", "tools_executed": 1},
+            {"event": "domain_shift", "to_domain": "billing"},
+            {"timestamp": ts(10), "event": "domain_shift", "session_id": "s2", "to_domain": "auth"}]
+    return log
+
+
+def test_columns_and_interning():
+    log = entries()
+    table = EventTable(log)
+
+    assert len(table) == len(log) and list(table) == log
+    assert all(row is entry for row, entry in zip(table.rows, log))
+    assert table.times[0] == NOW.timestamp() - 2880 * 60
+    assert math.isnan(table.times[-3]) and math.isnan(table.times[-2])
+    assert table.event_names == ["search", "execution", "domain_shift"]
+    assert [table.event_names[c] for c in table.events[:2]] == ["search", "execution"]
+    assert table.event_code("search") == 0 and table.event_code("stop") == -1
+    assert table.session_names == ["s0", "s1", "s2", ""]  # missing session_id -> ""
+    assert table.sessions[-2] == 3
+
+
+def test_each_timestamp_is_parsed_once(monkeypatch):
+    parsed = []
+    real_parse = ace_insights_analyzer._parse_timestamp
+    monkeypatch.setattr(ace_insights_analyzer, "_parse_timestamp",
+                        lambda value: parsed.append(value) or real_parse(value))
+    table = EventTable(entries())
+    assert len(parsed) == len(table) - 1  # no timestamp, nothing to parse
+
+    parsed.clear()
+    task_data = extract_task_data_for_evaluation(table)
+    split_into_tasks(table)
+    analyze_sessions(table)
+    calculate_trends(table, reference_time=NOW)
+    # Only each task's own start_time, when matching its searches
+    assert len(parsed) == sum(1 for task in task_data["tasks"] if task["start_time"])
+
+
+def test_analyzers_accept_the_table():
+    log = entries()
+    table = EventTable(log)
+
+    assert deduplicate_events(table) == deduplicate_events(log)
+    assert deduplicate_events(table)[1] == 60
+    assert split_into_tasks(table) == split_into_tasks(log)
+    assert analyze_sessions(table) == analyze_sessions(log)
+    assert calculate_helpfulness(table) == calculate_helpfulness(log)
+    assert get_top_patterns(table) == get_top_patterns(log)
+    assert calculate_trends(table, 24, 24, NOW) == calculate_trends(log, 24, 24, NOW)
+
+    from_table = extract_task_data_for_evaluation(table)
+    from_list = extract_task_data_for_evaluation(log)
+    for result in (from_table, from_list):
+        result["metadata"].pop("generated_at")
+    assert from_table == from_list
+    assert from_table["metadata"]["total_entries"] == len(log)
+    assert len(table) == len(log)  # extraction does not add to the caller's table
+
+    html = format_insights_html({}, {}, [], {}, raw_entries=table)
+    assert html.split("Generated")[0] == format_insights_html(
+        {}, {}, [], {}, raw_entries=log).split("Generated")[0]
+
+
+def test_append_refreshes_the_task_order():
+    log = entries()
+    table = EventTable(log[:10])
+    before = split_into_tasks(table)
+    for entry in log[10:]:
+        table.append(entry)
+    assert split_into_tasks(table) == split_into_tasks(log) != before
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+/ace-insights streaming front-end (v6.5.0).
+
+collect_task_data_for_evaluation() reads the --hours window once: old lines
+are rejected on their timestamp prefix before any JSON decode, and one pass
+feeds tasks, top patterns and trends.
+"""
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "plugins" / "ace" / "shared-hooks" / "utils"))
+
+import ace_log_store  # noqa: E402
+from ace_insights_analyzer import (  # noqa: E402
+    TaskDataAccumulator, calculate_trends, collect_task_data_for_evaluation,
+    extract_task_data_for_evaluation, get_top_patterns,
+)
+from ace_log_store import seal  # noqa: E402
+
+NOW = datetime(2026, 10, 17, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def ts(hours_ago):
+    return (NOW - timedelta(hours=hours_ago)).isoformat()
+
+
+def search(hours_ago, pid="ctx-1", injected=2):
+    return {"timestamp": ts(hours_ago), "event": "search", "session_id": "s1",
+            "user_prompt": f"prompt {hours_ago}", "patterns_injected": injected,
+            "avg_confidence": 0.8, "domains": ["auth"],
+            "top_patterns": [{"id": pid, "confidence": 0.8, "domain": "auth", "section": "rules"}]}
+
+
+def execution(hours_ago, pid="ctx-1", success=True):
+    return {"timestamp": ts(hours_ago), "event": "execution", "session_id": "s1",
+            "tools_executed": 3, "success": success, "pattern_ids": [pid], "patterns_used_count": 1}
+
+
+def history():
+    """Two search + execution pairs per hour over the last 4 days, oldest first."""
+    entries = []
+    for hour in range(96, 0, -1):
+        entries += [search(hour + 0.5, f"ctx-{hour % 5}"), execution(hour + 0.45, f"ctx-{hour % 5}"),
+                    search(hour, f"ctx-{hour % 7}"), execution(hour - 0.05, f"ctx-{hour % 7}", hour % 4 != 0)]
+    return entries
+
+
+def write_log(log_dir, entries, seal_every=40):
+    log_path = log_dir / "ace-relevance.jsonl"
+    for i, entry in enumerate(entries, 1):
+        with open(log_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        if i % seal_every == 0:
+            seal(log_path)
+
+
+def strip(result):
+    result["metadata"].pop("generated_at")
+    return result
+
+
+def test_matches_windowed_batch_analysis(tmp_path):
+    entries = history()
+    write_log(tmp_path, entries)
+
+    result = strip(collect_task_data_for_evaluation(str(tmp_path), hours=6, reference_time=NOW))
+    window = [e for e in entries if e["timestamp"] >= ts(6)]
+    expected = strip(extract_task_data_for_evaluation(window, hours=6))
+    expected["trends"] = calculate_trends(entries, 6, 6, reference_time=NOW)
+
+    assert result == expected
+    assert result["metadata"]["total_entries"] == len(window)
+    assert result["trends"]["previous_period"]["searches"] == 12
+    assert result["top_patterns"] == get_top_patterns(window)
+
+
+def test_untimed_entries_are_kept(tmp_path):
+    """The unwindowed reader kept entries without a timestamp; the window does too."""
+    untimed = [{"event": "execution", "session_id": "s2", "tools_executed": 1, "success": True},
+               {"timestamp": "not-a-time", "event": "execution", "session_id": "s2",
+                "tools_executed": 2, "success": False}]
+    entries = history()
+    entries[100:100] = untimed
+    write_log(tmp_path, entries)
+
+    result = strip(collect_task_data_for_evaluation(str(tmp_path), hours=6, reference_time=NOW))
+    window = [e for e in entries if e in untimed or e["timestamp"] >= ts(6)]
+    expected = strip(extract_task_data_for_evaluation(window, hours=6))
+    expected["trends"] = calculate_trends(entries, 6, 6, reference_time=NOW)
+
+    assert result == expected
+    assert result["metadata"]["total_entries"] == len(window)
+    assert result["tasks"][0]["start_time"] is None  # the untimed executions
+
+
+def test_old_lines_are_not_decoded(tmp_path, monkeypatch):
+    write_log(tmp_path, history(), seal_every=10 ** 6)  # one active file, no manifest to skip by
+    decoded = []
+    real_loads = json.loads
+    monkeypatch.setattr(ace_log_store.json, "loads",
+                        lambda s, *a, **k: decoded.append(s) or real_loads(s, *a, **k))
+
+    result = collect_task_data_for_evaluation(str(tmp_path), hours=2, reference_time=NOW)
+    assert len(decoded) < len(history()) / 4  # 4h read window (+ prefix slack) of 96h
+    assert result["metadata"]["total_entries"] == 6
+
+
+def test_only_the_task_window_is_kept():
+    accumulator = TaskDataAccumulator(hours=1, task_since=NOW - timedelta(hours=1),
+                                      trend_hours=1, reference_time=NOW)
+    for entry in history():
+        accumulator.add(entry)
+    assert [e["timestamp"] for e in accumulator.table] == [ts(1), ts(0.95)]
+    assert accumulator.periods["previous"]["entries"] == 4
+
+
+def test_extract_consumes_a_generator_once():
+    entries = history()
+    consumed = []
+
+    def stream():
+        for entry in entries:
+            consumed.append(entry)
+            yield entry
+
+    result = strip(extract_task_data_for_evaluation(stream()))
+    assert len(consumed) == len(entries)
+    assert result == strip(extract_task_data_for_evaluation(list(entries)))
+    assert result["metadata"]["total_entries"] == len(entries)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+ace_jsonl_writer: one locked write() per record batch (v6.5.0).
+
+Many processes append to the same logs while full segments are sealed
+underneath them; every line must parse and none may be lost.
+"""
+import json
+import os
+import subprocess
+import sys
+from multiprocessing import get_context
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+PLUGIN_ROOT = REPO_ROOT / "plugins" / "ace"
+SHARED_HOOKS = PLUGIN_ROOT / "shared-hooks"
+sys.path.insert(0, str(SHARED_HOOKS))
+sys.path.insert(0, str(SHARED_HOOKS / "utils"))
+
+import ace_jsonl_writer  # noqa: E402
+import ace_log_store  # noqa: E402
+from ace_jsonl_writer import append_record, buffering  # noqa: E402
+from ace_log_store import load_manifest, read_entries  # noqa: E402
+
+WRITERS = 32
+RECORDS_PER_WRITER = 40
+PIPE_BUF = 4096
+
+
+def _writer(log_path: str, writer: int) -> None:
+    for i in range(RECORDS_PER_WRITER):
+        # Every third record is larger than PIPE_BUF
+        payload = chr(ord("a") + writer % 26) * (PIPE_BUF * 3 if i % 3 == 0 else 200)
+        append_record(log_path, {"timestamp": "2026-10-17T00:00:00+00:00",
+                                 "writer": writer, "i": i, "payload": payload},
+                      max_bytes=64 * 1024)
+
+
+def test_concurrent_writers_with_sealing(tmp_path, monkeypatch):
+    log_path = tmp_path / "ace-relevance.jsonl"
+    # Writers only rotate; compact the segments here, concurrently with them
+    monkeypatch.setattr(ace_log_store, "spawn_compact", ace_log_store.compact)
+    with get_context("fork").Pool(WRITERS) as pool:
+        pool.starmap(_writer, [(str(log_path), w) for w in range(WRITERS)])
+    ace_log_store.compact(tmp_path, "ace-relevance")
+
+    assert len(load_manifest(tmp_path, "ace-relevance")["segments"]) > 1
+    active_lines = [json.loads(line) for line in log_path.read_bytes().splitlines()]
+    seen = {}
+    for entry in read_entries(tmp_path, "ace-relevance"):
+        assert entry["payload"] == chr(ord("a") + entry["writer"] % 26) * len(entry["payload"])
+        seen.setdefault(entry["writer"], []).append(entry["i"])
+    assert active_lines  # every active-file line parses
+    assert sum(len(v) for v in seen.values()) == WRITERS * RECORDS_PER_WRITER
+    # Each writer's records stay in its own write order
+    assert all(order == list(range(RECORDS_PER_WRITER)) for order in seen.values())
+
+
+def test_buffering_flushes_once_in_order(tmp_path, monkeypatch):
+    log_path = tmp_path / "ace-relevance.jsonl"
+    other = tmp_path / "ace-search-events.jsonl"
+    writes = []
+    real_append_bytes = ace_jsonl_writer.append_bytes
+    monkeypatch.setattr(ace_jsonl_writer, "append_bytes",
+                        lambda path, data, *a, **k: writes.append(Path(path).name) or
+                        real_append_bytes(path, data, *a, **k))
+
+    with buffering():
+        append_record(log_path, {"n": 1})
+        with buffering():  # nested scopes flush with the outermost
+            append_record(other, {"n": "x"})
+        append_record(log_path, {"n": 2})
+        assert writes == [] and not log_path.exists()
+        # A locked write goes out now, after the records buffered before it
+        append_record(log_path, {"n": 3}, locked=lambda: writes.append("locked"))
+        append_record(log_path, {"n": 4})
+    assert [json.loads(line)["n"] for line in log_path.read_text().splitlines()] == [1, 2, 3, 4]
+    assert sorted(writes) == ["ace-relevance.jsonl", "ace-relevance.jsonl",
+                              "ace-search-events.jsonl", "locked"]
+
+    append_record(log_path, {"n": 5})  # no scope: written immediately
+    assert json.loads(log_path.read_text().splitlines()[-1])["n"] == 5
+
+
+def test_forked_child_does_not_flush_parent_buffer(tmp_path):
+    log_path = tmp_path / "ace-stop.jsonl"
+    with buffering():
+        append_record(log_path, {"from": "parent"})
+        pid = os.fork()
+        if pid == 0:
+            try:
+                append_record(log_path, {"from": "child"})  # not the buffer's owner
+                with buffering():
+                    append_record(log_path, {"from": "child-scope"})
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+    assert [json.loads(line)["from"] for line in log_path.read_text().splitlines()] == [
+        "child", "child-scope", "parent"]
+
+
+@pytest.mark.parametrize("writer", [True, False])
+def test_bash_helper(tmp_path, writer):
+    log_dir = tmp_path / ".claude/data/logs"
+    # Without the writer (or python3) the helper falls back to a plain append
+    env = dict(os.environ, PLUGIN_ROOT=str(PLUGIN_ROOT if writer else tmp_path / "missing"))
+    script = (f'source "{PLUGIN_ROOT}/scripts/lib/ace_jsonl.sh"; '
+              'printf \'%s\\n\' \'{"event":"domain_shift","to_domain":"auth"}\' \'{"event":"x"}\' '
+              f'| ace_append_jsonl "{log_dir}/ace-relevance.jsonl"; echo rc=$?')
+    proc = subprocess.run(["/bin/bash", "-c", script], capture_output=True, text=True,
+                          env=env, cwd=tmp_path, timeout=30)
+    assert proc.stdout.strip() == "rc=0", proc.stderr
+    lines = (log_dir / "ace-relevance.jsonl").read_text().splitlines()
+    assert [json.loads(line)["event"] for line in lines] == ["domain_shift", "x"]
+    # Through the writer, domain shifts also update the current-task snapshot
+    assert (log_dir / "ace-task-state.json").exists() == writer
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+ace_log_store: sealed, gzip-compressed log segments with a manifest (v6.5.0).
+
+Rotation used to keep three .N backups and delete the rest; sealing must
+keep every entry, and windowed reads must only open overlapping segments.
+"""
+import fcntl
+import gzip
+import json
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SHARED_HOOKS = REPO_ROOT / "plugins" / "ace" / "shared-hooks"
+sys.path.insert(0, str(SHARED_HOOKS))
+sys.path.insert(0, str(SHARED_HOOKS / "utils"))
+
+import ace_insights_analyzer  # noqa: E402
+import ace_log_store  # noqa: E402
+from ace_event_logger import ACEEventLogger  # noqa: E402
+from ace_log_analyzer import ACELogAnalyzer  # noqa: E402
+from ace_log_store import (  # noqa: E402
+    compact, load_manifest, read_entries, seal, seal_if_needed, segments_overlapping,
+)
+from ace_relevance_logger import ACERelevanceLogger  # noqa: E402
+
+NOW = datetime.now(timezone.utc)
+
+
+def ts(hours_ago):
+    return (NOW - timedelta(hours=hours_ago)).isoformat()
+
+
+@pytest.fixture(autouse=True)
+def inline_compact(monkeypatch):
+    """Compact in-process instead of in a detached `compact` process."""
+    spawned = []
+    monkeypatch.setattr(ace_log_store, "spawn_compact",
+                        lambda log_dir, name: spawned.append(name) or compact(log_dir, name))
+    return spawned
+
+
+def write(path, *entries):
+    with open(path, "a") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+
+def entry(i, hours_ago, event="search", session="s1"):
+    return {"timestamp": ts(hours_ago), "event": event, "session_id": session, "i": i}
+
+
+def test_size_seals_keep_every_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(ACERelevanceLogger, "MAX_FILE_SIZE", 2048)
+    logger = ACERelevanceLogger(str(tmp_path))
+    for i in range(200):
+        logger.log_domain_shift(session_id=f"s{i % 3}", from_domain="a", to_domain=f"d{i}",
+                                file_path="x.py", patterns_found=1, search_succeeded=True)
+
+    segments = load_manifest(tmp_path, "ace-relevance")["segments"]
+    assert len(segments) > 3  # more than the old .1-.3 backups ever kept
+    assert [s["seq"] for s in segments] == list(range(1, len(segments) + 1))
+    assert all(s["file"].endswith(".jsonl.gz") for s in segments)
+    assert segments[0]["sessions"] == ["s0", "s1", "s2"]
+    assert all(set(s["events"]) == {"domain_shift"} for s in segments)
+
+    entries = list(read_entries(tmp_path, "ace-relevance"))
+    assert [e["to_domain"] for e in entries] == [f"d{i}" for i in range(200)]
+    assert sum(s["lines"] for s in segments) + len(logger.log_path.read_text().splitlines()) == 200
+    assert not list(tmp_path.glob("ace-relevance.*.jsonl"))
+
+
+def test_age_seal(tmp_path):
+    log = tmp_path / "ace-stop.jsonl"
+    write(log, entry(1, 2))
+    assert seal_if_needed(log, 10 ** 6, max_age_hours=3) is None
+    assert seal_if_needed(log, 10 ** 6, max_age_hours=0) is None  # 0 disables
+
+    assert seal_if_needed(log, 10 ** 6, max_age_hours=1).name == "ace-stop.000001.jsonl"
+    assert not log.exists()
+    assert load_manifest(tmp_path, "ace-stop")["segments"][0]["lines"] == 1
+    assert seal_if_needed(log, 10 ** 6, max_age_hours=1) is None  # nothing left
+
+
+def test_age_check_reads_the_first_entry_once(tmp_path, monkeypatch):
+    log = tmp_path / "ace-stop.jsonl"
+    write(log, entry(1, 2))
+    reads = []
+    real_first_timestamp = ace_log_store._first_timestamp
+    monkeypatch.setattr(ace_log_store, "_first_timestamp",
+                        lambda path: reads.append(path.name) or real_first_timestamp(path))
+
+    for _ in range(5):
+        assert seal_if_needed(log, 10 ** 6, max_age_hours=3) is None
+    assert reads == ["ace-stop.jsonl"]
+    assert seal_if_needed(log, 10 ** 6, max_age_hours=1) is not None
+    # The next active file gets its own start time
+    write(log, entry(2, 0))
+    assert seal_if_needed(log, 10 ** 6, max_age_hours=1) is None
+    assert reads == ["ace-stop.jsonl", "ace-stop.jsonl"]
+
+
+def test_append_path_only_renames(tmp_path, monkeypatch, inline_compact):
+    """Compression and manifest stats are left to the detached `compact`."""
+    monkeypatch.setattr(ace_log_store, "spawn_compact",
+                        lambda log_dir, name: inline_compact.append(name))
+    monkeypatch.setattr(ace_log_store, "_segment_stats", lambda path: pytest.fail("stats in append path"))
+    log = tmp_path / "ace-relevance.jsonl"
+    write(log, entry(1, 2), entry(2, 1))
+    write(tmp_path / "ace-relevance.prev.jsonl", entry(0, 3))
+
+    rotated = seal_if_needed(log, 10)
+    assert rotated.name == "ace-relevance.000002.jsonl" and inline_compact == ["ace-relevance"]
+    assert not log.exists() and load_manifest(tmp_path, "ace-relevance")["segments"] == []
+    write(log, entry(3, 0))
+    # Pending plain segments are read before they are compacted
+    assert [e["i"] for e in read_entries(tmp_path, "ace-relevance", hours=1.5)] == [2, 3]
+    assert [e["i"] for e in read_entries(tmp_path, "ace-relevance")] == [0, 1, 2, 3]
+
+    monkeypatch.undo()
+    assert compact(tmp_path, "ace-relevance")["seq"] == 2
+    assert [s["file"] for s in load_manifest(tmp_path, "ace-relevance")["segments"]] == [
+        "ace-relevance.000001.jsonl.gz", "ace-relevance.000002.jsonl.gz"]
+    assert [e["i"] for e in read_entries(tmp_path, "ace-relevance")] == [0, 1, 2, 3]
+
+
+def test_compact_cli_finishes_every_pending_log(tmp_path):
+    for name in ("ace-relevance", "ace-stop"):
+        write(tmp_path / f"{name}.jsonl", entry(name, 1))
+        ace_log_store.rotate(tmp_path / f"{name}.jsonl")
+    proc = subprocess.run([sys.executable, ace_log_store.__file__, "--log-dir", str(tmp_path), "compact"],
+                          capture_output=True, text=True, timeout=30)
+    assert sorted(json.loads(proc.stdout)["compacted"]) == ["ace-relevance", "ace-stop"]
+    assert not list((tmp_path / "segments").glob("*.jsonl"))
+    assert [e["i"] for e in read_entries(tmp_path, "ace-stop")] == ["ace-stop"]
+
+
+def test_window_opens_only_overlapping_segments(tmp_path, monkeypatch):
+    log = tmp_path / "ace-relevance.jsonl"
+    for day in (3, 2, 1):
+        write(log, entry(day, day * 24 + 1), entry(day, day * 24))
+        seal(log)
+    write(log, entry(0, 0.5))
+
+    opened = []
+    real_read_lines = ace_log_store._read_lines
+    monkeypatch.setattr(ace_log_store, "_read_lines",
+                        lambda path: opened.append(path.name) or real_read_lines(path))
+
+    assert [e["i"] for e in read_entries(tmp_path, "ace-relevance", hours=30)] == [1, 1, 0]
+    assert opened == ["ace-relevance.000003.jsonl.gz", "ace-relevance.jsonl"]
+    assert len(segments_overlapping(tmp_path, "ace-relevance")) == 3
+    assert [e["i"] for e in read_entries(tmp_path, "ace-relevance")] == [3, 3, 2, 2, 1, 1, 0]
+
+    with gzip.open(tmp_path / "segments" / "ace-relevance.000001.jsonl.gz", "rt") as f:
+        assert json.loads(f.readline())["i"] == 3
+
+
+def test_legacy_backups_are_adopted_oldest_first(tmp_path):
+    write(tmp_path / "ace-relevance.2.jsonl", entry("old", 50))
+    write(tmp_path / "ace-relevance.1.jsonl", entry("mid", 30))
+    write(tmp_path / "ace-relevance.prev.jsonl", entry("prev", 10))
+    write(tmp_path / "ace-relevance.jsonl", entry("now", 1))
+
+    seal(tmp_path / "ace-relevance.jsonl")
+    assert [e["i"] for e in read_entries(tmp_path, "ace-relevance")] == ["old", "mid", "prev", "now"]
+    assert [s["seq"] for s in load_manifest(tmp_path, "ace-relevance")["segments"]] == [1, 2, 3, 4]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["segments"]
+
+
+def test_interrupted_seal_is_finished(tmp_path):
+    log = tmp_path / "ace-relevance.jsonl"
+    write(log, entry(1, 3))
+    seal(log)
+    # Crash after the rename, before compression
+    write(tmp_path / "segments" / "ace-relevance.000002.jsonl", entry(2, 2))
+    write(log, entry(3, 1))
+
+    record = seal(log)
+    assert record["seq"] == 3
+    assert [e["i"] for e in read_entries(tmp_path, "ace-relevance")] == [1, 2, 3]
+
+
+def test_concurrent_sealer_is_skipped(tmp_path):
+    log = tmp_path / "ace-relevance.jsonl"
+    write(log, entry(1, 1))
+    (tmp_path / "segments").mkdir()
+    with open(tmp_path / "segments" / ".ace-relevance.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        assert seal(log) is None
+    assert log.exists()
+    assert seal(log)["lines"] == 1
+
+
+def test_retention_drops_old_segments(tmp_path, monkeypatch):
+    log = tmp_path / "ace-relevance.jsonl"
+    write(log, entry("old", 24 * 10))
+    seal(log)
+    monkeypatch.setattr(ace_log_store, "RETENTION_DAYS", 7)
+    write(log, entry("new", 1))
+    seal(log)
+
+    assert [s["seq"] for s in load_manifest(tmp_path, "ace-relevance")["segments"]] == [2]
+    assert not (tmp_path / "segments" / "ace-relevance.000001.jsonl.gz").exists()
+    assert [e["i"] for e in read_entries(tmp_path, "ace-relevance")] == ["new"]
+
+
+def test_event_logger_and_analyzer(tmp_path, monkeypatch):
+    monkeypatch.setattr(ACEEventLogger, "MAX_FILE_SIZE", 512)
+    logger = ACEEventLogger(str(tmp_path))
+    for i in range(30):
+        logger.log_event("Stop", {"i": i}, exit_code=0)
+        if i % 5 == 0:
+            logger.log_error("Stop", f"boom {i}")
+    assert load_manifest(tmp_path, "ace-stop")["segments"]
+    assert load_manifest(tmp_path, "ace-errors")["segments"]
+
+    analyzer = ACELogAnalyzer(str(tmp_path))
+    assert len(analyzer.read_log("Stop")) == 36
+    assert len(analyzer.read_log("Stop", hours=1)) == 36
+    assert [e["error"] for e in analyzer.find_errors(hours=1)] == [f"boom {i}" for i in range(0, 30, 5)]
+
+    write(tmp_path / "ace-stop.jsonl", {"timestamp": ts(48), "event_type": "Stop"})
+    assert len(analyzer.read_log("Stop")) == 37
+    assert len(analyzer.read_log("Stop", hours=24)) == 36
+
+
+@pytest.mark.parametrize("value", ["2026-01-02T03:04:05Z", "2026-01-02T04:04:05+01:00"])
+def test_parse_timestamp(value):
+    assert ace_log_store.parse_timestamp(value) == datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+def test_naive_timestamp_is_local_time(tmp_path, monkeypatch):
+    """Same reading as the insights analyzer: datetime.now().isoformat() is local."""
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        parsed = ace_log_store.parse_timestamp("2026-01-02T03:04:05")
+        assert parsed == datetime(2026, 1, 2, 8, 4, 5, tzinfo=timezone.utc)
+        assert parsed == ace_insights_analyzer._parse_timestamp("2026-01-02T03:04:05")
+
+        naive_now = datetime.now().isoformat()
+        assert abs(ace_log_store.parse_timestamp(naive_now) - datetime.now(timezone.utc)) < timedelta(minutes=1)
+        write(tmp_path / "ace-relevance.jsonl", {"timestamp": naive_now, "i": "naive"},
+              {"timestamp": (datetime.now() - timedelta(hours=3)).isoformat(), "i": "old"})
+        assert [e["i"] for e in read_entries(tmp_path, "ace-relevance", hours=1)] == ["naive"]
+    finally:
+        monkeypatch.undo()
+        time.tzset()
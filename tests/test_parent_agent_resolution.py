@@ -1,9 +1,8 @@
 #!/usr/bin/env python3
 """
-parent_agent_id resolution: ace_after_task.py reads
-.claude/data/logs/ace-spawn-log.jsonl looking for an event=subagent_done
-entry whose child_agent_id matches the current agent_id, then pulls
-parent_agent_id from that entry.
+parent_agent_id resolution: ace_after_task.py looks the current agent_id up
+in the accumulator's spawn_registry table (v6.5.0; previously a reverse scan
+of .claude/data/logs/ace-spawn-log.jsonl for event=subagent_done entries).
 """
 from pathlib import Path
 
@@ -11,27 +10,26 @@ REPO_ROOT = Path(__file__).resolve().parent.parent
 AFTER = REPO_ROOT / "plugins" / "ace" / "shared-hooks" / "ace_after_task.py"
 
 
-def test_spawn_log_lookup_logic_present():
+def test_spawn_registry_lookup_logic_present():
     src = AFTER.read_text()
-    assert "ace-spawn-log.jsonl" in src, "Must read from ace-spawn-log.jsonl"
-    assert "subagent_done" in src, "Must look up subagent_done events"
-    assert "child_agent_id" in src, "Must match on child_agent_id"
+    assert "get_spawn_parent" in src, "Must resolve via the spawn registry"
     assert "parent_agent_id" in src, "Must set parent_agent_id"
+    assert "reversed(list(" not in src, "Must not scan the spawn log"
 
 
 def test_parent_resolution_gated_on_agent_id():
     """parent_agent_id lookup must only happen when we have an agent_id."""
     src = AFTER.read_text()
-    # Find the block: `if agent_id:` followed (within ~30 lines) by spawn_log read
+    # Find the block: `if agent_id:` followed (within ~10 lines) by the lookup
     lines = src.splitlines()
     found_gated_lookup = False
     for i, line in enumerate(lines):
         stripped = line.strip()
         if stripped.startswith("if agent_id:"):
-            window = "\n".join(lines[i:i + 30])
-            if "ace-spawn-log.jsonl" in window and "subagent_done" in window:
+            window = "\n".join(lines[i:i + 10])
+            if "get_spawn_parent(agent_id)" in window:
                 found_gated_lookup = True
                 break
     assert found_gated_lookup, (
-        "parent_agent_id resolution via spawn-log must be guarded by `if agent_id:`"
+        "parent_agent_id resolution via the spawn registry must be guarded by `if agent_id:`"
     )
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+ace_pattern_index.py: local FTS5 playbook mirror and ACE_SEARCH_MODE (v6.5.0).
+
+A fake ace-cli answers searches (or fails, per FAKE_SEARCH) and logs each
+call, so the tests can tell remote answers from local ones.
+"""
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SHARED_HOOKS = REPO_ROOT / "plugins" / "ace" / "shared-hooks"
+sys.path.insert(0, str(SHARED_HOOKS))
+sys.path.insert(0, str(SHARED_HOOKS / "utils"))
+
+import ace_before_task  # noqa: E402
+import ace_cli  # noqa: E402
+import ace_pattern_index  # noqa: E402
+import ace_swr  # noqa: E402
+
+FAKE_CLI = """#!{python}
+import json, os, sys, time
+with open({calls!r}, 'a') as f:
+    f.write(sys.argv[1] + '\\n')
+if sys.argv[1] == '--version':
+    print('1.0.11')
+elif sys.argv[1] == 'whoami':
+    print(json.dumps({{'authenticated': True}}))
+elif os.environ.get('FAKE_SEARCH') == 'down':
+    sys.exit(1)
+else:
+    if os.environ.get('FAKE_SEARCH') == 'slow':
+        time.sleep(5)
+    sys.stdin.read()
+    print(json.dumps({{'count': 1, 'similar_patterns': [
+        {{'id': 'ctx-remote01', 'content': 'Invalidate redis keys on deploy', 'domain': 'cache',
+          'confidence': 0.9, 'helpful': 4}}]}}))
+"""
+
+EXPORT = {"playbook": {
+    "strategies_and_hard_rules": [
+        {"id": "ctx-auth0001", "content": "Refresh JWT tokens before they expire",
+         "domain": "auth", "confidence": 0.9, "helpful": 12, "harmful": 0},
+        {"id": "ctx-auth0002", "content": "Never log JWT tokens",
+         "domain": "auth", "confidence": 0.4, "helpful": 0, "harmful": 2},
+    ],
+    "troubleshooting_and_pitfalls": [
+        {"id": "ctx-db000001", "content": "Run migrations inside a transaction",
+         "domain": "database", "confidence": 0.8, "helpful": 3},
+    ],
+}}
+
+CONTEXT = {"org": "org_t", "project": "prj_idx"}
+
+
+@pytest.fixture
+def cli(fake_ace_cli, monkeypatch):
+    monkeypatch.delenv("FAKE_SEARCH", raising=False)
+    fake = fake_ace_cli(FAKE_CLI, env={"ACE_SEARCH_CACHE": "0"})
+    return lambda: fake.lines().count("search")
+
+
+def ids(response):
+    return [p["id"] for p in response["similar_patterns"]]
+
+
+def test_seed_and_rank(cli):
+    assert ace_pattern_index.seed_from_export(EXPORT, "org_t", "prj_idx") == 3
+    result = ace_pattern_index.search("how do I refresh the JWT", "org_t", "prj_idx")
+    assert result["source"] == "local"
+    assert ids(result) == ["ctx-auth0001", "ctx-auth0002"]  # helpful outranks harmful
+    assert result["similar_patterns"][0]["section"] == "strategies_and_hard_rules"
+
+    # domain column matches too, and projects don't leak into each other
+    assert ids(ace_pattern_index.search("database", "org_t", "prj_idx")) == ["ctx-db000001"]
+    assert ace_pattern_index.search("database", "org_t", "prj_other")["count"] == 0
+
+
+def test_reseed_drops_removed_patterns(cli):
+    ace_pattern_index.seed_from_export(EXPORT, "org_t", "prj_idx")
+    ace_pattern_index.seed_from_export({"playbook": {"apis_to_use": [EXPORT["playbook"][
+        "troubleshooting_and_pitfalls"][0]]}}, "org_t", "prj_idx")
+    assert ace_pattern_index.search("JWT tokens", "org_t", "prj_idx")["count"] == 0
+
+
+def test_common_terms_left_out_of_match(cli, monkeypatch):
+    monkeypatch.setattr(ace_pattern_index, "COMMON_TERM_MIN_PATTERNS", 2)
+    monkeypatch.setattr(ace_pattern_index, "COMMON_TERM_RATIO", 0.5)
+    ace_pattern_index.seed_from_export(EXPORT, "org_t", "prj_idx")
+    # "jwt" is in 2 of 3 patterns: only "migrations" is matched
+    assert ids(ace_pattern_index.search("jwt migrations", "org_t", "prj_idx")) == ["ctx-db000001"]
+    # ...unless every term is common
+    assert ace_pattern_index.search("jwt tokens", "org_t", "prj_idx")["count"] == 2
+
+
+def test_search_responses_keep_index_warm(cli):
+    ace_cli.run_search("redis deploy", org="org_t", project="prj_idx")
+    assert ids(ace_pattern_index.search("redis", "org_t", "prj_idx")) == ["ctx-remote01"]
+
+
+def test_disabled(cli, monkeypatch):
+    monkeypatch.setenv("ACE_PATTERN_INDEX", "0")
+    ace_cli.run_search("redis deploy", org="org_t", project="prj_idx")
+    assert ace_pattern_index.search("redis", "org_t", "prj_idx") is None
+    assert not ace_pattern_index.get_db_path().exists()
+
+
+@pytest.mark.parametrize("mode, search, expect_ids, expect_source, expect_remote_calls", [
+    ("fallback", "down", ["ctx-auth0001", "ctx-auth0002"], "local", 1),
+    ("fallback", "up", ["ctx-remote01"], None, 1),
+    ("remote", "down", None, None, 1),
+    ("local", "up", ["ctx-auth0001", "ctx-auth0002"], "local", 0),
+    ("hybrid", "up", ["ctx-remote01", "ctx-auth0001", "ctx-auth0002"], "hybrid", 1),
+    ("hybrid", "down", ["ctx-auth0001", "ctx-auth0002"], "local", 1),
+])
+def test_search_modes(cli, monkeypatch, mode, search, expect_ids, expect_source, expect_remote_calls):
+    ace_pattern_index.seed_from_export(EXPORT, CONTEXT["org"], CONTEXT["project"])
+    monkeypatch.setenv("ACE_SEARCH_MODE", mode)
+    monkeypatch.setenv("FAKE_SEARCH", search)
+    _, _, response, steps = ace_before_task.run_preflight(
+        CONTEXT, "s-idx", "jwt tokens", budget_ms=10000)
+
+    if expect_ids is None:
+        assert not response
+    else:
+        assert ids(response) == expect_ids
+        assert response.get("source") == expect_source
+    assert cli() == expect_remote_calls
+    assert ("local_search" in steps) == (mode != "remote" and (mode != "fallback" or search == "down"))
+
+
+def test_hybrid_does_not_wait_for_a_slow_server(cli, monkeypatch, tmp_path):
+    """The local answer goes out after the grace period; the remote one follows as an update."""
+    monkeypatch.chdir(tmp_path)
+    ace_pattern_index.seed_from_export(EXPORT, CONTEXT["org"], CONTEXT["project"])
+    monkeypatch.setenv("ACE_SEARCH_MODE", "hybrid")
+    monkeypatch.setenv("FAKE_SEARCH", "slow")
+    monkeypatch.setattr(ace_pattern_index, "HYBRID_GRACE_MS", 100)
+    refreshes = []
+    monkeypatch.setattr(ace_before_task.ace_search_cache, "spawn_refresh",
+                        lambda query, *a, **k: refreshes.append((query, k.get("swr_session"))))
+
+    cache_info = {}
+    start = time.monotonic()
+    _, _, response, _ = ace_before_task.run_preflight(
+        CONTEXT, "s-idx", "jwt tokens", budget_ms=10000, cache_info=cache_info)
+    assert time.monotonic() - start < 2
+    assert ids(response) == ["ctx-auth0001", "ctx-auth0002"]
+    assert response["source"] == "local"
+    assert cache_info["freshness"] == "stale" and cache_info["stale_source"] == "local"
+    assert refreshes == [("jwt tokens", "s-idx")]
+
+    # What the detached refresh reports for the same prompt
+    remote = {"count": 1, "similar_patterns": [{"id": "ctx-remote01", "content": "Invalidate redis keys"}]}
+    ace_swr.record_fresh("s-idx", "jwt tokens", remote, refresh_ms=1500.0)
+    assert ace_swr.updates_enabled()
+    assert ids(ace_swr.take_update("s-idx", "pretooluse")) == ["ctx-remote01"]
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+ace_prefetch.py: speculative domain-pattern prefetch (v6.5.0).
+
+The fake ace-cli sleeps FAKE_SEARCH_SECS and logs when each search starts and
+ends, so the tests can check the concurrency bound and cancellation.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SHARED_HOOKS = REPO_ROOT / "plugins" / "ace" / "shared-hooks"
+SESSIONEND_WRAPPER = REPO_ROOT / "plugins" / "ace" / "scripts" / "ace_sessionend_wrapper.sh"
+sys.path.insert(0, str(SHARED_HOOKS))
+sys.path.insert(0, str(SHARED_HOOKS / "utils"))
+
+import ace_hook  # noqa: E402
+import ace_prefetch  # noqa: E402
+import ace_search_cache  # noqa: E402
+
+FAKE_CLI = """#!{python}
+import json, os, sys, time
+query = sys.stdin.read().strip()
+with open({calls!r}, 'a') as f:
+    f.write(json.dumps({{'query': query, 'start': time.time()}}) + '\\n')
+time.sleep(float(os.environ.get('FAKE_SEARCH_SECS', '0')))
+with open({calls!r}, 'a') as f:
+    f.write(json.dumps({{'query': query, 'end': time.time()}}) + '\\n')
+print(json.dumps({{'count': 1, 'similar_patterns': [{{'id': 'ctx-' + query, 'content': query}}]}}))
+"""
+
+SUMMARY = {"auth:core": 9, "cache": 4, "database": 7, "billing": 1}
+
+
+@pytest.fixture
+def cli(fake_ace_cli):
+    return fake_ace_cli(FAKE_CLI, env={"ACE_PREFETCH": "1"}, calls="calls.jsonl").records
+
+
+def wait_for(predicate, secs=15):
+    deadline = time.monotonic() + secs
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return predicate()
+
+
+def test_top_domains_match_pretooluse_names():
+    assert ace_prefetch.top_domains(SUMMARY, 3) == ["auth", "database", "cache"]
+    assert ace_prefetch.top_domains({"Auth:a": 1, "auth:b": 2, "x": "n/a"}) == ["auth", "x"]
+
+
+def test_prefetch_warms_cold_domains_with_bounded_concurrency(cli, monkeypatch):
+    monkeypatch.setenv("FAKE_SEARCH_SECS", "0.3")
+    monkeypatch.setenv("ACE_PREFETCH_CONCURRENCY", "2")
+    monkeypatch.setattr(ace_prefetch, "TOP_N", 3)
+    ace_search_cache.put("cache", '{"count": 0}', "o", "prj_p", allowed_domains="cache")
+    session = f"s-{uuid.uuid4().hex[:8]}"
+
+    assert ace_prefetch.spawn_prefetch(SUMMARY, "o", "prj_p", session) == ["auth", "database"]
+    assert wait_for(lambda: len(cli()) == 4 and not ace_prefetch.get_pid_path(session).exists())
+    assert wait_for(lambda: Path(".claude/data/logs/ace-relevance.jsonl").exists())
+
+    events = sorted(cli(), key=lambda c: c.get("start") or c["end"])
+    assert max(sum(1 for c in events[:i + 1] if "start" in c) -
+               sum(1 for c in events[:i + 1] if "end" in c) for i in range(len(events))) == 2
+    log = [json.loads(line) for line in
+           Path(".claude/data/logs/ace-relevance.jsonl").read_text().splitlines()]
+    assert {k: log[-1][k] for k in ("event", "requested", "warmed", "cancelled")} == {
+        "event": "prefetch", "requested": 2, "warmed": 2, "cancelled": False}
+
+    # Everything warm now: nothing to spawn
+    assert ace_prefetch.spawn_prefetch(SUMMARY, "o", "prj_p", session) == []
+
+
+def test_domain_shift_uses_prefetched_result(cli):
+    ace_search_cache.put("auth", '{"count": 1, "similar_patterns": [{"id": "ctx-pre"}]}',
+                         "o", "prj_p", allowed_domains="auth")
+    info = {}
+    text, count = ace_hook.search_domain("auth login_form", "auth", "o", "prj_p", info)
+    assert json.loads(text)["similar_patterns"][0]["id"] == "ctx-pre"
+    assert (count, info["status"], cli()) == (1, "prefetch", [])
+
+    # No prefetched entry: searched inline as before
+    text, _ = ace_hook.search_domain("billing invoices", "billing", "o", "prj_p", info)
+    assert info["status"] == "miss" and len(cli()) == 2
+
+
+def test_sessionend_cancels_running_prefetch(cli, monkeypatch):
+    monkeypatch.setenv("FAKE_SEARCH_SECS", "1")
+    monkeypatch.setenv("ACE_PREFETCH_CONCURRENCY", "1")
+    session = f"s-{uuid.uuid4().hex[:8]}"
+    pid_path = ace_prefetch.get_pid_path(session)
+    assert len(ace_prefetch.spawn_prefetch(SUMMARY, "o", "prj_p", session)) == 4
+    assert wait_for(pid_path.exists)
+    pid = int(pid_path.read_text())
+
+    subprocess.run(["bash", str(SESSIONEND_WRAPPER)], input=json.dumps({"session_id": session}),
+                   text=True, check=True, timeout=10)
+    assert not pid_path.exists()
+
+    def gone():  # the worker is our child here: reap it
+        try:
+            return os.waitpid(pid, os.WNOHANG)[0] == pid
+        except ChildProcessError:
+            return True
+    assert wait_for(gone, 5)
+    time.sleep(1.2)
+    assert len([c for c in cli() if "start" in c]) < 4
+
+
+def test_hit_rate_report(tmp_path):
+    log = tmp_path / "ace-relevance.jsonl"
+    entries = [{"event": "prefetch", "warmed": 3, "cancelled": False},
+               {"event": "domain_shift", "search_cache": "prefetch"},
+               {"event": "domain_shift", "search_cache": "prefetch"},
+               {"event": "domain_shift", "search_cache": "hit"},
+               {"event": "domain_shift", "search_cache": "miss"},
+               {"event": "search", "search_cache": "miss"}]
+    log.write_text("\n".join(json.dumps(e) for e in entries) + "\n")
+    stats = ace_prefetch.hit_rate([log, tmp_path / "missing.jsonl"])
+    assert (stats["runs"], stats["searches"], stats["prefetch_hit_rate"], stats["local_rate"]) == (
+        1, 4, 0.5, 0.75)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+ace_cli.run_search_batch(): coalesced multi-query search (v6.5.0).
+
+The fake ace-cli echoes the query it was asked and logs each call with its
+parent pid, so the tests can tell which process (client, worker or daemon
+batch child) ran the search.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SHARED_HOOKS = REPO_ROOT / "plugins" / "ace" / "shared-hooks"
+sys.path.insert(0, str(SHARED_HOOKS))
+sys.path.insert(0, str(SHARED_HOOKS / "utils"))
+
+import ace_cli  # noqa: E402
+import ace_cli_worker  # noqa: E402
+import ace_pattern_index  # noqa: E402
+
+FAKE_CLI = """#!{python}
+import json, os, sys
+query = sys.stdin.read().strip()
+domains = sys.argv[sys.argv.index('--allowed-domains') + 1] if '--allowed-domains' in sys.argv else None
+with open({calls!r}, 'a') as f:
+    f.write(json.dumps({{'query': query, 'ppid': os.getppid()}}) + '\\n')
+print(json.dumps({{'count': 1, 'similar_patterns': [
+    {{'id': 'ctx-' + query.replace(' ', '-'), 'content': query, 'domain': domains or 'any'}}]}}))
+"""
+
+
+@pytest.fixture
+def cli(fake_ace_cli):
+    return fake_ace_cli(FAKE_CLI, calls="calls.jsonl").records
+
+
+def first_id(text):
+    return json.loads(text)["similar_patterns"][0]["id"]
+
+
+QUERIES = [{"query": "auth login", "allowed_domains": "auth"},
+           {"query": "cache redis", "allowed_domains": "cache"},
+           {"query": "auth login", "allowed_domains": "auth"},
+           {"query": "auth login"}]
+
+
+def test_batch_dedupes_and_caches(cli):
+    infos = [{} for _ in QUERIES]
+    texts = ace_cli.run_search_batch(QUERIES, org="o", project="prj_b", cache_infos=infos)
+    assert [first_id(t) for t in texts] == ["ctx-auth-login", "ctx-cache-redis",
+                                           "ctx-auth-login", "ctx-auth-login"]
+    assert json.loads(texts[0])["similar_patterns"][0]["domain"] == "auth"
+    assert json.loads(texts[3])["similar_patterns"][0]["domain"] == "any"
+    assert len(cli()) == 3  # the duplicate domain search ran once
+    assert [i["status"] for i in infos] == ["miss"] * 4
+
+    again = ace_cli.run_search_batch(QUERIES, org="o", project="prj_b", cache_infos=infos)
+    assert again == texts and len(cli()) == 3
+    assert [i["status"] for i in infos] == ["hit"] * 4
+
+
+@pytest.fixture
+def worker(cli, monkeypatch):
+    monkeypatch.setenv("ACE_CLI_WORKER", "1")
+    ace_cli_worker._worker = None
+    yield
+    ace_cli_worker._close_worker()
+    ace_cli_worker._worker = None
+
+
+def test_batch_is_one_worker_round_trip(cli, worker, monkeypatch):
+    methods = []
+    original = ace_cli_worker.CliWorker.call
+    monkeypatch.setattr(ace_cli_worker.CliWorker, "call",
+                        lambda self, m, p, t: methods.append(m) or original(self, m, p, t))
+    texts = ace_cli.run_search_batch(QUERIES[:2], org="o", project="prj_w")
+    assert [first_id(t) for t in texts] == ["ctx-auth-login", "ctx-cache-redis"]
+    assert methods == ["search_batch"]
+
+
+def test_local_standin_worker_needs_no_backend(cli, worker, monkeypatch):
+    ace_pattern_index.upsert_patterns([
+        {"id": "ctx-jwt00001", "content": "Rotate JWT signing keys", "domain": "auth"},
+        {"id": "ctx-jwt00002", "content": "Cache JWT public keys", "domain": "cache"}], "o", "prj_l")
+    monkeypatch.setenv("ACE_CLI_WORKER_CMD",
+                       f"{sys.executable} {SHARED_HOOKS / 'utils' / 'ace_cli_worker.py'} --local")
+    texts = ace_cli.run_search_batch([{"query": "jwt keys", "allowed_domains": "auth"},
+                                      {"query": "jwt keys"}], org="o", project="prj_l")
+    assert [p["id"] for p in json.loads(texts[0])["similar_patterns"]] == ["ctx-jwt00001"]
+    assert json.loads(texts[1])["count"] == 2
+    assert cli() == []
+
+
+@pytest.fixture
+def hookd(cli, monkeypatch):
+    # Short dir: AF_UNIX paths are limited to ~108 bytes
+    sock_dir = tempfile.mkdtemp(prefix="hookd-")
+    monkeypatch.setenv("ACE_HOOKD_DIR", sock_dir)
+    monkeypatch.setenv("ACE_HOOKD_AUTOSTART", "0")
+    monkeypatch.setenv("ACE_SEARCH_COALESCE_MS", "400")
+    proc = subprocess.Popen([sys.executable, str(SHARED_HOOKS / "ace_hookd.py"), "serve"],
+                            env=dict(os.environ), stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        if any(p.endswith(".sock") for p in os.listdir(sock_dir)):
+            break
+        time.sleep(0.05)
+    yield proc
+    proc.terminate()
+    proc.wait(timeout=5)
+    shutil.rmtree(sock_dir, ignore_errors=True)
+
+
+def test_daemon_coalesces_concurrent_processes(cli, hookd, monkeypatch, tmp_path):
+    monkeypatch.setenv("ACE_HOOKD", "1")
+    script = ("import sys; sys.path[:0] = [{hooks!r}, {utils!r}]; import ace_cli; "
+              "print(ace_cli.run_domain_search(sys.argv[1], sys.argv[2], org='o', project='prj_d'))")
+    script = script.format(hooks=str(SHARED_HOOKS), utils=str(SHARED_HOOKS / "utils"))
+    procs = [subprocess.Popen([sys.executable, "-c", script, f"{domain} module", domain],
+                              stdout=subprocess.PIPE, text=True, cwd=tmp_path)
+             for domain in ("auth", "cache", "billing")]
+    outputs = [p.communicate(timeout=30)[0] for p in procs]
+
+    assert [first_id(o) for o in outputs] == ["ctx-auth-module", "ctx-cache-module",
+                                             "ctx-billing-module"]
+    calls = cli()
+    assert sorted(c["query"] for c in calls) == ["auth module", "billing module", "cache module"]
+    assert len({c["ppid"] for c in calls}) == 1  # one batch child ran all three
+    assert hookd.pid not in {c["ppid"] for c in calls}
+
+
+FAKE_WORKER = """import json, sys
+for line in sys.stdin:
+    request = json.loads(line)
+    method, params = request["method"], request.get("params") or {{}}
+    with open({log!r}, "a") as f:
+        f.write(json.dumps({{"method": method, "queries": params.get("queries")}}) + "\\n")
+    if method == "hello":
+        result = {{"protocol": 1}}
+    else:
+        result = {{"results": [{{"returncode": 0, "stderr": "", "stdout": json.dumps({{
+            "count": 1, "similar_patterns": [{{"id": "ctx-" + q["query"].replace(" ", "-"),
+                                              "content": q["query"], "domain": q["allowed_domains"]}}]}})}}
+            for q in params["queries"]]}}
+    print(json.dumps({{"jsonrpc": "2.0", "id": request["id"], "result": result}}), flush=True)
+"""
+
+
+def test_read_domain_shift_joins_the_pretooluse_batch(cli, hookd, monkeypatch, tmp_path):
+    """A PostToolUse(Read) shift and a PreToolUse shift in one burst: one search_batch."""
+    project = f"prj_burst{os.getpid()}"
+    (tmp_path / ".claude").mkdir(exist_ok=True)
+    (tmp_path / ".claude" / "settings.json").write_text(
+        json.dumps({"orgId": "o", "projectId": project}))
+    domains = Path(f"/tmp/ace-domains-{project}.json")
+    last_domain = Path(f"/tmp/ace-domain-{project}.txt")
+    domains.write_text(json.dumps({"auth": 1, "cache": 1}))
+    last_domain.write_text("billing\n")
+    worker_log = tmp_path / "worker.jsonl"
+    worker = tmp_path / "worker.py"
+    worker.write_text(FAKE_WORKER.format(log=str(worker_log)))
+    monkeypatch.setenv("ACE_HOOKD", "1")
+    monkeypatch.setenv("ACE_CLI_WORKER", "1")
+    monkeypatch.setenv("ACE_CLI_WORKER_CMD", f"{sys.executable} {worker}")
+    monkeypatch.delenv("ACE_LEGACY_HOOKS", raising=False)
+
+    scripts = REPO_ROOT / "plugins" / "ace" / "scripts"
+    hooks = [("ace_posttooluse_domain_inject.sh", "src/auth/login.py"),
+             ("ace_pretooluse_wrapper.sh", "src/cache/redis.py")]
+    try:
+        procs = [subprocess.Popen(["bash", str(scripts / script)], stdin=subprocess.PIPE,
+                                  stdout=subprocess.PIPE, text=True, cwd=tmp_path)
+                 for script, _ in hooks]
+        for proc, (_, path) in zip(procs, hooks):
+            proc.stdin.write(json.dumps({"session_id": "s1", "cwd": str(tmp_path),
+                                         "tool_name": "Read", "tool_input": {"file_path": path}}))
+            proc.stdin.close()
+        outputs = [json.loads(proc.stdout.read()) for proc in procs]
+        for proc in procs:
+            proc.wait(timeout=30)
+    finally:
+        domains.unlink(missing_ok=True)
+        last_domain.unlink(missing_ok=True)
+
+    contexts = [o["hookSpecificOutput"]["additionalContext"] for o in outputs]
+    assert "ctx-auth-login" in contexts[0] and "ctx-cache-redis" in contexts[1]
+    requests = [json.loads(line) for line in worker_log.read_text().splitlines()]
+    batches = [r["queries"] for r in requests if r["method"] == "search_batch"]
+    assert len(batches) == 1
+    assert sorted(q["query"] for q in batches[0]) == ["auth login", "cache redis"]
+    assert cli() == []  # no one-shot ace-cli search
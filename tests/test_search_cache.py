@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+ace_search_cache.py: local LRU of ace-cli search responses (v6.5.0).
+
+A fake ace-cli logs each search, so the tests can tell hits from misses.
+"""
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "plugins" / "ace" / "shared-hooks" / "utils"))
+
+import ace_cli  # noqa: E402
+import ace_search_cache  # noqa: E402
+
+FAKE_CLI = """#!{python}
+import json, os, sys
+query = sys.stdin.read().strip()
+with open({calls!r}, 'a') as f:
+    f.write(json.dumps(sys.argv[1:]) + '\\n')
+if 'fail' in query:
+    sys.exit(2)
+print(json.dumps({{'count': 1, 'similar_patterns': [{{'id': 'p1', 'content': query}}],
+                  'project': os.environ.get('ACE_PROJECT_ID')}}))
+"""
+
+
+@pytest.fixture
+def cli(fake_ace_cli):
+    fake = fake_ace_cli(FAKE_CLI)
+    return lambda: len(fake.lines())
+
+
+def test_normalised_query_hits(cli):
+    info = {}
+    first = ace_cli.run_search("Fix  the AUTH flow", org="o", project="prj_a", cache_info=info)
+    assert info["status"] == "miss"
+    second = ace_cli.run_search("fix the auth flow\n", org="o", project="prj_a", cache_info=info)
+    assert info["status"] == "hit"
+    assert first == second and cli() == 1
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"project": "prj_b"},
+    {"org": "other"},
+    {"session_id": "pinned-session"},
+])
+def test_key_dimensions_miss(cli, kwargs):
+    ace_cli.run_search("auth", **{"org": "o", "project": "prj_a", **kwargs})
+    ace_cli.run_search("auth", org="o", project="prj_a")
+    assert cli() == 2
+
+
+def test_domain_search_shares_cache_keyed_on_domain(cli):
+    info = {}
+    text = ace_cli.run_domain_search("auth login", "auth", org="o", project="prj_a", cache_info=info)
+    assert info["status"] == "miss" and json.loads(text)["count"] == 1
+    assert ace_cli.run_domain_search("auth login", "auth", org="o", project="prj_a", cache_info=info) == text
+    assert info["status"] == "hit"
+    ace_cli.run_domain_search("auth login", "billing", org="o", project="prj_a")
+    ace_cli.run_search("auth login", org="o", project="prj_a")  # no --allowed-domains
+    assert cli() == 3
+
+
+def test_failures_are_not_cached(cli):
+    assert ace_cli.run_search("please fail", project="prj_a") is None
+    assert ace_cli.run_search("please fail", project="prj_a") is None
+    assert cli() == 2
+
+
+def test_ttl_expiry(cli, monkeypatch):
+    ace_cli.run_search("auth", project="prj_a")
+    monkeypatch.setattr(ace_search_cache, "TTL_SECS", 0)
+    ace_cli.run_search("auth", project="prj_a")
+    assert cli() == 2
+
+
+def test_disabled(cli, monkeypatch):
+    monkeypatch.setenv("ACE_SEARCH_CACHE", "0")
+    info = {}
+    ace_cli.run_search("auth", project="prj_a", cache_info=info)
+    ace_cli.run_search("auth", project="prj_a")
+    assert info["status"] == "off" and cli() == 2
+    assert not ace_search_cache.get_db_path().exists()
+
+
+def test_lru_eviction_by_entries_and_bytes(cli, monkeypatch):
+    monkeypatch.setattr(ace_search_cache, "MAX_ENTRIES", 2)
+    ace_search_cache.put("a", '{"n": "a"}', project="p")
+    ace_search_cache.put("b", '{"n": "b"}', project="p")
+    assert ace_search_cache.get("a", project="p")  # a is now most recent
+    ace_search_cache.put("c", '{"n": "c"}', project="p")
+    assert ace_search_cache.get("b", project="p") is None
+    assert ace_search_cache.get("a", project="p") and ace_search_cache.get("c", project="p")
+
+    monkeypatch.setattr(ace_search_cache, "MAX_BYTES", 30)
+    ace_search_cache.put("d", '{"n": "' + "x" * 20 + '"}', project="p")
+    assert ace_search_cache.get("d", project="p") is not None
+    assert ace_search_cache.get("a", project="p") is None
+
+
+def test_learn_invalidates_only_its_project(cli):
+    ace_cli.run_search("auth", project="prj_a")
+    ace_cli.run_search("auth", project="prj_b")
+    assert not ace_search_cache.learn_changed_playbook({"patterns_created": 0, "helpful_delta": 3})
+    assert ace_search_cache.learn_changed_playbook({"patterns_pruned": 1})
+    assert ace_search_cache.invalidate_project("prj_a") == 1
+
+    ace_cli.run_search("auth", project="prj_a")
+    ace_cli.run_search("auth", project="prj_b")
+    assert cli() == 3
+
+
+@pytest.mark.parametrize("stats, expect_invalidated", [
+    ({"patterns_created": 1}, True),
+    ({"learning_statistics": {"patterns_updated": 2}}, True),  # nested CLI v3 shape
+    ({"patterns_created": 0, "helpful_delta": 1}, False),
+])
+def test_stop_hook_learn_invalidates(cli, stats, expect_invalidated):
+    from io import StringIO
+    from unittest.mock import MagicMock, patch
+
+    sys.path.insert(0, str(REPO_ROOT / "plugins" / "ace" / "shared-hooks"))
+    import ace_after_task
+
+    ace_search_cache.put("auth", '{"count": 1}', project="test-project")
+    event = {"hook_event_name": "Stop", "session_id": "s-learn",
+             "transcript_path": "/tmp/fake-transcript.jsonl"}
+    tools = [("Edit", '{"file_path": "/tmp/x.py"}', '{"success": true}', "tool-1")]
+    with patch('ace_after_task.get_context', return_value={'org': 'o', 'project': 'test-project'}), \
+         patch('ace_after_task.build_trajectory_from_accumulated_tools', return_value=(
+             [{"step": 1, "tool": "Edit", "action": "Edited x.py", "result": "Success"}], tools)), \
+         patch('ace_after_task.get_user_prompt_from_transcript', return_value="implement X"), \
+         patch('ace_after_task.recall_session', return_value=None), \
+         patch('ace_after_task.log_execution_metrics'), \
+         patch('ace_tool_accumulator.clear_session'), \
+         patch('subprocess.run', return_value=MagicMock(
+             returncode=0, stdout=json.dumps({"learning_statistics": stats}), stderr="")), \
+         patch('sys.stdin', StringIO(json.dumps(event))), \
+         patch('builtins.print'):
+        try:
+            ace_after_task.main()
+        except SystemExit:
+            pass
+
+    cached = ace_search_cache.get("auth", project="test-project")
+    assert (cached is None) == expect_invalidated
+
+
+def test_minhash_similarity():
+    sig = ace_search_cache.signature
+    assert ace_search_cache.similarity(sig("fix the test"), sig("Fix  the test")) == 1.0
+    assert ace_search_cache.similarity(sig("fix the test"), sig("fix the broken test")) >= 0.7
+    assert ace_search_cache.similarity(sig("fix the test"), sig("deploy billing service now")) < 0.2
+    assert sig("fix it") is None  # too short to match anything
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_near_duplicate_served_then_refreshed(cli):
+    ace_cli.run_search("fix the test", org="o", project="prj_a")
+    info = {}
+    response = ace_cli.run_search("fix the broken test", org="o", project="prj_a",
+                                  cache_info=info, allow_similar=True)
+    assert info["status"] == "similar" and info["similarity"] >= ace_search_cache.SIMILARITY
+    assert response["similar_patterns"][0]["content"] == "fix the test"
+
+    # The detached refresh stores the real result under the new query
+    assert wait_for(lambda: ace_search_cache.get("fix the broken test", "o", "prj_a"))
+    assert cli() == 2
+
+
+@pytest.mark.parametrize("query, kwargs", [
+    ("fix the broken test", {"project": "prj_b"}),       # other project
+    ("fix the broken test", {"allow_similar": False}),   # not UserPromptSubmit
+    ("deploy the billing service", {}),                   # not similar
+])
+def test_near_duplicate_misses(cli, query, kwargs):
+    ace_cli.run_search("fix the test", org="o", project="prj_a")
+    info = {}
+    ace_cli.run_search(query, **{"org": "o", "project": "prj_a", "cache_info": info,
+                                 "allow_similar": True, **kwargs})
+    assert info["status"] == "miss" and cli() == 2
+
+
+def test_v1_database_migrates(cli):
+    import sqlite3
+    path = ace_search_cache.get_db_path()
+    path.parent.mkdir(parents=True)
+    conn = sqlite3.connect(str(path))
+    ace_search_cache._migrate_v1(conn)
+    conn.execute("INSERT INTO search_cache VALUES ('k', NULL, 'p', 'fix the test', NULL, 0, '{}', 2, ?, ?)",
+                 (time.time(), time.time()))
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+    assert ace_search_cache.get_similar("fix the test", project="p") is None  # no signature yet
+    ace_search_cache.put("fix the test", '{"count": 2}', project="p")
+    assert ace_search_cache.get_similar("fix the broken test", project="p")[0] == '{"count": 2}'
+
+
+def test_eval_replays_relevance_log(tmp_path):
+    def search(query, ids, project="p"):
+        return json.dumps({"event": "search", "hook": "UserPromptSubmit", "project_id": project,
+                           "search_query": query, "top_patterns": [{"id": i} for i in ids]})
+
+    log = tmp_path / "ace-relevance.jsonl"
+    log.write_text("\n".join([
+        search("fix the test", ["a", "b"]),
+        search("fix the broken test", ["a", "c"]),
+        search("fix the broken test", ["a", "c"], project="other"),
+        search("deploy the billing service", ["d"]),
+        json.dumps({"event": "domain_shift", "search_query": "fix the test"}),
+    ]) + "\n")
+    report = {r["threshold"]: r for r in ace_search_cache.evaluate(log, [0.5, 1.0])}
+    assert report[0.5]["searches"] == 4
+    assert report[0.5]["hit_rate"] == 0.25 and report[0.5]["mean_overlap"] == round(1 / 3, 3)
+    assert report[1.0]["hit_rate"] == 0.0 and report[1.0]["mean_overlap"] is None
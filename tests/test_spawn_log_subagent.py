@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 """
-SubagentStop wrapper must write a spawn-log entry:
-  {event: "subagent_done", child_agent_id, parent_agent_id: "main", session_id, timestamp}
-to .claude/data/logs/ace-spawn-log.jsonl before invoking ace_after_task.py.
+SubagentStop wrapper must record the spawn:
+  {child_agent_id, parent_agent_id: "main", session_id, created_at}
+in the spawn_registry table of .claude/data/logs/ace-tools.db (v6.5.0; was
+ace-spawn-log.jsonl) before invoking ace_after_task.py.
 """
 import json
+import sqlite3
 import subprocess
 from pathlib import Path
 
@@ -28,23 +30,22 @@ def test_subagent_stop_writes_spawn_log(tmp_path):
         cwd=str(tmp_path),
     )
     # We don't require success from ace_after_task — only that the
-    # spawn log is written by the wrapper before it invokes the hook.
-    spawn_log = tmp_path / ".claude" / "data" / "logs" / "ace-spawn-log.jsonl"
-    assert spawn_log.exists(), (
-        f"Wrapper must write spawn log. stdout={proc.stdout!r} stderr={proc.stderr!r}"
+    # spawn is recorded by the wrapper before it invokes the hook.
+    db = tmp_path / ".claude" / "data" / "logs" / "ace-tools.db"
+    assert db.exists(), (
+        f"Wrapper must record the spawn. stdout={proc.stdout!r} stderr={proc.stderr!r}"
     )
-    lines = [json.loads(l) for l in spawn_log.read_text().splitlines() if l.strip()]
-    done = [e for e in lines if e.get("event") == "subagent_done"]
-    assert len(done) >= 1
-    entry = done[0]
-    assert entry["child_agent_id"] == "agent-abc-123"
-    assert entry["parent_agent_id"] == "main"
-    assert entry["session_id"] == "sess-sub-1"
-    assert entry.get("timestamp")
+    row = sqlite3.connect(db).execute(
+        "SELECT parent_agent_id, session_id, created_at FROM spawn_registry "
+        "WHERE child_agent_id = 'agent-abc-123'").fetchone()
+    assert row is not None
+    assert row[0] == "main"
+    assert row[1] == "sess-sub-1"
+    assert row[2]
 
 
 def test_subagent_stop_skips_when_no_agent_id(tmp_path):
-    """Missing agent_id → no spawn-log entry written."""
+    """Missing agent_id → no spawn registered."""
     event = {
         "session_id": "sess-no-agent",
         "cwd": str(tmp_path),
@@ -58,7 +59,7 @@ def test_subagent_stop_skips_when_no_agent_id(tmp_path):
         timeout=15,
         cwd=str(tmp_path),
     )
-    spawn_log = tmp_path / ".claude" / "data" / "logs" / "ace-spawn-log.jsonl"
-    if spawn_log.exists():
-        lines = [json.loads(l) for l in spawn_log.read_text().splitlines() if l.strip()]
-        assert not any(e.get("event") == "subagent_done" for e in lines)
+    db = tmp_path / ".claude" / "data" / "logs" / "ace-tools.db"
+    if db.exists():
+        count = sqlite3.connect(db).execute("SELECT COUNT(*) FROM spawn_registry").fetchone()[0]
+        assert count == 0
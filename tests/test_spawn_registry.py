@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Spawn registry: parent_agent_id lookup by primary key (v6.5.0).
+
+Replaces the reverse scan of the never-rotated ace-spawn-log.jsonl; an
+existing log is imported once by the first lookup.
+"""
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+SHARED_HOOKS = Path(__file__).parent.parent / 'plugins' / 'ace' / 'shared-hooks'
+sys.path.insert(0, str(SHARED_HOOKS))
+sys.path.insert(0, str(SHARED_HOOKS / 'utils'))
+
+import ace_tool_accumulator  # noqa: E402
+from ace_tool_accumulator import (  # noqa: E402
+    get_db_path, get_spawn_log_path, get_spawn_parent, import_spawn_log, prune_db, register_spawn,
+)
+
+
+def spawn_entry(child, parent='main', timestamp='2026-01-02T03:04:05Z', event='subagent_done'):
+    return {'timestamp': timestamp, 'event': event, 'session_id': 's1',
+            'child_agent_id': child, 'parent_agent_id': parent}
+
+
+@pytest.fixture
+def logs(tmp_path):
+    path = get_spawn_log_path(str(tmp_path))
+    path.parent.mkdir(parents=True)
+    return path
+
+
+def test_register_and_lookup(tmp_path):
+    wd = str(tmp_path)
+    assert get_spawn_parent('agent-1', wd) is None  # no database yet
+    assert register_spawn('agent-1', 's1', working_dir=wd)
+    assert register_spawn('agent-2', 's1', 'agent-1', wd)
+    assert (get_spawn_parent('agent-1', wd), get_spawn_parent('agent-2', wd)) == ('main', 'agent-1')
+    assert get_spawn_parent('agent-3', wd) is None
+    assert not register_spawn('', 's1', working_dir=wd)
+
+    # Re-registering updates the parent but keeps created_at
+    conn = sqlite3.connect(get_db_path(wd))
+    created = conn.execute("SELECT created_at FROM spawn_registry WHERE child_agent_id='agent-2'").fetchone()
+    register_spawn('agent-2', 's1', 'main', wd)
+    assert get_spawn_parent('agent-2', wd) == 'main'
+    assert conn.execute("SELECT created_at FROM spawn_registry WHERE child_agent_id='agent-2'").fetchone() == created
+
+
+def test_legacy_log_is_imported_once(tmp_path, logs):
+    wd = str(tmp_path)
+    entries = [spawn_entry('agent-1', 'main'), spawn_entry('agent-2'),
+               spawn_entry('agent-1', 'agent-9', '2026-01-03T00:00:00+00:00'),  # later entry wins
+               spawn_entry('agent-3', event='subagent_start')]
+    logs.write_text('\n'.join(json.dumps(e) for e in entries) + '\n{"truncated\n')
+
+    assert get_spawn_parent('agent-1', wd) == 'agent-9'
+    assert not logs.exists()
+    imported = logs.with_name(logs.name + '.imported')
+    assert imported.read_text().count('\n') == 5
+    assert get_spawn_parent('agent-3', wd) is None
+    row = sqlite3.connect(get_db_path(wd)).execute(
+        "SELECT session_id, created_at, updated_at FROM spawn_registry WHERE child_agent_id='agent-1'"
+    ).fetchone()
+    assert row == ('s1', '2026-01-02 03:04:05', '2026-01-03 00:00:00')
+
+    # A fallback write after the import is picked up by the next lookup
+    logs.write_text(json.dumps(spawn_entry('agent-4', 'agent-2')) + '\n')
+    assert get_spawn_parent('agent-4', wd) == 'agent-2'
+    assert imported.read_text().count('\n') == 6
+    assert import_spawn_log(wd) == 0
+
+
+def test_failed_import_keeps_entries(tmp_path, logs, monkeypatch):
+    logs.write_text(json.dumps(spawn_entry('agent-1')) + '\n')
+
+    def broken(*args, **kwargs):
+        raise sqlite3.OperationalError('disk I/O error')
+    monkeypatch.setattr(ace_tool_accumulator, 'init_db', broken)
+    with pytest.raises(sqlite3.OperationalError):
+        import_spawn_log(str(tmp_path))
+    assert json.loads(logs.read_text())['child_agent_id'] == 'agent-1'
+    assert list(logs.parent.iterdir()) == [logs]
+
+    monkeypatch.undo()
+    assert get_spawn_parent('agent-1', str(tmp_path)) == 'main'
+
+
+def test_prune_drops_old_spawns(tmp_path, monkeypatch):
+    wd = str(tmp_path)
+    register_spawn('agent-new', 's1', working_dir=wd)
+    conn = sqlite3.connect(get_db_path(wd))
+    conn.execute("INSERT INTO spawn_registry VALUES ('agent-old', 'main', 's0', "
+                 "datetime('now', '-10 days'), datetime('now', '-10 days'))")
+    conn.commit()
+
+    assert prune_db(wd)['deleted_spawns'] == 1
+    assert (get_spawn_parent('agent-old', wd), get_spawn_parent('agent-new', wd)) == (None, 'main')
+
+    monkeypatch.setattr(ace_tool_accumulator, 'SPAWN_MAX_AGE_HOURS', 0)  # 0 disables
+    conn.execute("UPDATE spawn_registry SET updated_at = datetime('now', '-100 days')")
+    conn.commit()
+    assert prune_db(wd)['deleted_spawns'] == 0
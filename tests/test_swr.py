@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+ace_swr.py: stale-while-revalidate injection for UserPromptSubmit (v6.5.0).
+
+The fake ace-cli numbers its searches, so every refresh returns one pattern
+the previous answer did not have.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SHARED_HOOKS = REPO_ROOT / "plugins" / "ace" / "shared-hooks"
+sys.path.insert(0, str(SHARED_HOOKS / "utils"))
+
+import ace_pattern_index  # noqa: E402
+import ace_search_cache  # noqa: E402
+import ace_swr  # noqa: E402
+
+FAKE_CLI = """#!{python}
+import json, os, sys
+cmd = sys.argv[1]
+if cmd == '--version':
+    print('1.0.11')
+elif cmd == 'whoami':
+    print(json.dumps({{'authenticated': True}}))
+else:
+    sys.stdin.read()
+    counter = {calls!r}
+    n = int(open(counter).read()) + 1 if os.path.exists(counter) else 1
+    open(counter, 'w').write(str(n))
+    print(json.dumps({{'count': 2, 'similar_patterns': [
+        {{'id': 'ctx-base0000', 'content': 'Keep migrations reversible', 'domain': 'db',
+          'confidence': 0.9, 'helpful': 3}},
+        {{'id': 'ctx-new%05d' % n, 'content': 'Pattern from search %d' % n, 'domain': 'db',
+          'confidence': 0.8, 'helpful': 1, 'retrieval_count': 7}}]}}))
+"""
+
+CONTEXT = {"org": "org_s", "project": "prj_swr"}
+RESPONSE = {"count": 1, "similar_patterns": [{"id": "ctx-cached01", "content": "cached"}]}
+
+
+@pytest.fixture
+def project(fake_ace_cli):
+    return fake_ace_cli(FAKE_CLI, env={"ACE_SEARCH_SWR": "1"}, calls="searches",
+                        settings={"orgId": CONTEXT["org"], "projectId": CONTEXT["project"]}).root
+
+
+def relevance_events(cwd, event):
+    log = cwd / ".claude" / "data" / "logs" / "ace-relevance.jsonl"
+    return [e for e in map(json.loads, log.read_text().splitlines()) if e["event"] == event]
+
+
+def test_immediate_result_sources(project, monkeypatch):
+    args = ("fix the flaky migration test", "o", "p")
+    assert ace_swr.immediate_result(*args, session_id="s1") is None
+
+    ace_swr.record_injection("s1", "earlier prompt", RESPONSE, "remote")
+    assert ace_swr.immediate_result(*args, session_id="s1")[1] == "session"
+
+    ace_pattern_index.upsert_patterns([{"id": "ctx-local001", "content": "flaky migration"}], "o", "p")
+    assert ace_swr.immediate_result(*args, session_id="s1")[1] == "local"
+
+    ace_search_cache.put("please fix the flaky migration test", json.dumps(RESPONSE), "o", "p")
+    assert ace_swr.immediate_result(*args, session_id="s1")[1] == "similar"
+
+    ace_search_cache.put(args[0], json.dumps(RESPONSE), "o", "p")
+    assert ace_swr.immediate_result(*args, session_id="s1") is None  # fresh: nothing to revalidate
+    monkeypatch.setattr(ace_search_cache, "TTL_SECS", 0)
+    response, source, age = ace_swr.immediate_result(*args, session_id="s1")
+    assert (response, source) == (RESPONSE, "cache") and age >= 0
+
+
+def test_fresh_result_becomes_update_once(project):
+    ace_swr.record_injection("s2", "q", RESPONSE, "cache")
+    fresh = {"similar_patterns": [{"id": "ctx-cached01"}, {"id": "ctx-fresh001", "content": "x",
+                                                           "retrieval_count": 3}]}
+    assert ace_swr.record_fresh("s2", "q", fresh, 120.0, "p") == [{"id": "ctx-fresh001", "content": "x"}]
+
+    update = ace_swr.take_update("s2", "pretooluse", "p")
+    assert update == {"similar_patterns": [{"id": "ctx-fresh001", "content": "x"}], "count": 1}
+    assert ace_swr.take_update("s2", "next_prompt", "p") is None
+    assert ace_swr.load_state("s2")["injected"]["response"] == fresh
+
+    refresh = relevance_events(project, "swr_refresh")[-1]
+    assert refresh["differs"] and refresh["overlap"] == 0.5 and refresh["stale_source"] == "cache"
+    assert relevance_events(project, "swr_update")[-1]["channel"] == "pretooluse"
+
+
+def test_superseded_refresh_is_only_logged(project):
+    ace_swr.record_injection("s3", "newer prompt", RESPONSE, "cache")
+    assert ace_swr.record_fresh("s3", "older prompt", {"similar_patterns": [{"id": "x"}]}, 50.0) is None
+    assert not ace_swr.get_update_path("s3").exists()
+    assert relevance_events(project, "swr_refresh")[-1]["superseded"] is True
+
+
+def run(cwd, script, *args, event):
+    proc = subprocess.run([sys.executable, str(SHARED_HOOKS / script), *args],
+                          input=json.dumps(event), capture_output=True, text=True,
+                          cwd=cwd, env=dict(os.environ), timeout=30)
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout) if proc.stdout.strip() else None
+
+
+def test_stale_injection_then_pretooluse_update(project, monkeypatch):
+    monkeypatch.setenv("ACE_SEARCH_CACHE_TTL", "1")
+    prompt = {"session_id": "s-swr", "prompt": "fix the migration"}
+
+    first = run(project, "ace_before_task.py", event=prompt)
+    context = first["hookSpecificOutput"]["additionalContext"]
+    assert 'freshness="fresh"' in context and "ctx-new00001" in context
+
+    time.sleep(1.1)  # cached entry is now past its TTL
+    second = run(project, "ace_before_task.py", event=prompt)
+    context = second["hookSpecificOutput"]["additionalContext"]
+    assert 'freshness="stale" stale-source="cache"' in context and "ctx-new00001" in context
+    assert "(cached, refreshing)" in second["systemMessage"]
+
+    update_file = ace_swr.get_update_path("s-swr")
+    deadline = time.monotonic() + 10
+    while not update_file.exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    tool = {"session_id": "s-swr", "hook_event_name": "PreToolUse", "tool_name": "Bash",
+            "tool_input": {"command": "ls"}}
+    update = run(project, "ace_hook.py", "PreToolUse", event=tool)
+    injected = update["hookSpecificOutput"]["additionalContext"]
+    assert injected.startswith('<ace-patterns freshness="fresh" update="true">')
+    assert "ctx-new00002" in injected and "ctx-base0000" not in injected
+    assert run(project, "ace_hook.py", "PreToolUse", event=tool) is None  # delivered once
+
+    assert relevance_events(project, "swr_refresh")[-1]["new_patterns"] == 1
+    assert relevance_events(project, "search")[-1]["search_cache"] == "stale"
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+ace-task-state.json: current-task sums kept by ACERelevanceLogger (v6.5.0).
+
+The statusline and Stop read this snapshot instead of decoding the whole
+ace-relevance.jsonl; it must always agree with a full replay of the log.
+"""
+import json
+import random
+import re
+import subprocess
+import sys
+from multiprocessing import get_context
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SHARED_HOOKS = REPO_ROOT / "plugins" / "ace" / "shared-hooks"
+STATUSLINE = REPO_ROOT / "plugins" / "ace" / "scripts" / "ace_statusline.sh"
+sys.path.insert(0, str(SHARED_HOOKS))
+sys.path.insert(0, str(SHARED_HOOKS / "utils"))
+
+import ace_relevance_logger  # noqa: E402
+from ace_relevance_logger import (  # noqa: E402
+    ACERelevanceLogger, read_task_state, task_state_from_log,
+)
+
+WRITERS = 8
+SEARCHES_PER_WRITER = 25
+
+
+def full_scan(log_path):
+    """The statusline's pre-v6.5.0 computation."""
+    events = [json.loads(line) for line in Path(log_path).read_text().splitlines() if line.strip()]
+    last_exec = max((i for i, e in enumerate(events) if e.get("event") == "execution"), default=-1)
+    current = events[last_exec + 1:]
+    searches = [e for e in current if e.get("event") == "search"]
+    return {
+        "patterns_injected": sum(s.get("patterns_injected", 0) for s in searches),
+        "avg_relevance": int(sum(s.get("avg_confidence", 0) for s in searches) / len(searches) * 100)
+        if searches else 0,
+        "domains_count": len({d for s in searches for d in s.get("domains", [])}),
+        "domain_shifts": sum(1 for e in current if e.get("event") == "domain_shift"),
+    }
+
+
+def snapshot(log_dir):
+    state = json.loads((Path(log_dir) / "ace-task-state.json").read_text())
+    return {k: state[k] for k in ("patterns_injected", "avg_relevance", "domains_count", "domain_shifts")}
+
+
+def search(logger, injected, confidence, domains):
+    logger.log_search_metrics(
+        hook="UserPromptSubmit", session_id="s1", user_prompt="p", search_query="q",
+        patterns_returned=[{}] * (injected + 1),
+        patterns_injected=[{"id": f"ctx-{i}", "confidence": confidence} for i in range(injected)],
+        domains=domains)
+
+
+def _writer(log_dir: str, writer: int) -> None:
+    logger = ACERelevanceLogger(log_dir)
+    for i in range(SEARCHES_PER_WRITER):
+        search(logger, 1, 0.5, [f"d{writer}"])
+
+
+def test_snapshot_matches_full_scan(tmp_path):
+    logger = ACERelevanceLogger(str(tmp_path))
+    rng = random.Random(3)
+    for step in range(300):
+        roll = rng.random()
+        if roll < 0.6:
+            search(logger, rng.randint(0, 5), round(rng.random(), 3),
+                   rng.sample(["auth", "cache", "db", "api", "ui"], rng.randint(0, 3)))
+        elif roll < 0.8:
+            logger.log_domain_shift(session_id="s1", from_domain="a", to_domain="b",
+                                    file_path="x.py", patterns_found=2, search_succeeded=True)
+        elif roll < 0.9:
+            logger.log_execution_metrics(session_id="s1", patterns_used=[], tools_executed=4,
+                                         state_changing_tools=1, success=True,
+                                         execution_time_seconds=1.0, learning_sent=True)
+        else:
+            logger.log_preflight(session_id="s1", budget_ms=500, steps_ms={"search": 3.0}, outcome="ok")
+        assert snapshot(tmp_path) == full_scan(logger.log_path), step
+
+
+def test_execution_resets_and_other_events_skip_snapshot(tmp_path):
+    logger = ACERelevanceLogger(str(tmp_path))
+    logger.log_preflight(session_id="s1", budget_ms=500, steps_ms={"search": 3.0}, outcome="ok")
+    assert not logger.task_state_path.exists()
+
+    search(logger, 3, 0.8, ["auth", "cache"])
+    search(logger, 1, 0.4, ["auth"])
+    state = json.loads(logger.task_state_path.read_text())
+    assert (state["searches"], state["patterns_injected"], state["avg_relevance"], state["domains"]) == (
+        2, 4, 60, ["auth", "cache"])
+
+    logger.log_execution_metrics(session_id="s1", patterns_used=["ctx-1"], tools_executed=4,
+                                 state_changing_tools=1, success=True,
+                                 execution_time_seconds=1.0, learning_sent=True)
+    state = json.loads(logger.task_state_path.read_text())
+    assert state["searches"] == state["patterns_injected"] == state["domains_count"] == 0
+    assert state["task_started"] == json.loads(
+        logger.log_path.read_text().splitlines()[-1])["timestamp"]
+
+
+def test_missing_snapshot_is_rebuilt_from_log(tmp_path):
+    logger = ACERelevanceLogger(str(tmp_path))
+    search(logger, 2, 0.9, ["auth"])
+    logger.log_execution_metrics(session_id="s1", patterns_used=[], tools_executed=1,
+                                 state_changing_tools=0, success=True,
+                                 execution_time_seconds=1.0, learning_sent=True)
+    search(logger, 5, 0.5, ["db"])
+
+    logger.task_state_path.unlink()  # e.g. a log written before v6.5.0
+    assert read_task_state(str(tmp_path))["patterns_injected"] == 5
+    assert logger.task_state_path.exists()
+
+    logger.task_state_path.write_text("{not json")
+    search(logger, 1, 0.5, ["api"])
+    assert snapshot(tmp_path) == full_scan(logger.log_path)
+    assert task_state_from_log(tmp_path / "missing.jsonl")["searches"] == 0
+
+
+def test_concurrent_writers_lose_no_updates(tmp_path):
+    with get_context("fork").Pool(WRITERS) as pool:
+        pool.starmap(_writer, [(str(tmp_path), w) for w in range(WRITERS)])
+    state = read_task_state(str(tmp_path))
+    assert state["searches"] == WRITERS * SEARCHES_PER_WRITER
+    assert state["domains_count"] == WRITERS
+
+
+def run_statusline(cwd):
+    proc = subprocess.run(["bash", str(STATUSLINE)], capture_output=True, text=True, timeout=10,
+                          input=json.dumps({"cwd": str(cwd), "session_id": "s1",
+                                            "context_window": {"used_percentage": 10}}))
+    assert proc.returncode == 0, proc.stderr
+    return re.sub(r"\033\[[0-9;]*m", "", proc.stdout.splitlines()[1])
+
+
+def test_statusline_reads_snapshot(tmp_path):
+    logger = ACERelevanceLogger(str(tmp_path / ".claude/data/logs"))
+    search(logger, 3, 0.8, ["auth", "cache"])
+    logger.log_domain_shift(session_id="s1", from_domain="auth", to_domain="cache",
+                            file_path="x.py", patterns_found=2, search_succeeded=True)
+    line = run_statusline(tmp_path)
+    assert "3 injected 80%" in line and "2 domains 1 shifts" in line
+
+    # Without the snapshot the statusline falls back to scanning the log
+    logger.task_state_path.unlink()
+    assert run_statusline(tmp_path) == line
+
+    # The snapshot is what it reads: a huge log no longer matters
+    logger.task_state_path.write_text(json.dumps(dict(
+        ace_relevance_logger.new_task_state(), patterns_injected=7, avg_relevance=50)))
+    assert "7 injected 50%" in run_statusline(tmp_path)
+
+
+def test_stop_eval_metrics_use_snapshot(tmp_path):
+    import ace_hook
+    log_dir = tmp_path / ".claude/data/logs"
+    logger = ACERelevanceLogger(str(log_dir))
+    search(logger, 2, 0.5, ["auth", "db"])
+    assert ace_hook._task_relevance_metrics(str(log_dir / "ace-relevance.jsonl")) == {
+        "patterns_injected": 2, "avg_relevance": 50, "domains": 2, "tools_executed": 0}
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+ace_transcript.py: reverse transcript reading for the Stop hook (v6.5.0).
+"""
+import json
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SHARED_HOOKS = REPO_ROOT / "plugins" / "ace" / "shared-hooks"
+sys.path.insert(0, str(SHARED_HOOKS))
+sys.path.insert(0, str(SHARED_HOOKS / "utils"))
+
+import ace_transcript  # noqa: E402
+from ace_after_task import get_user_prompt_from_transcript  # noqa: E402
+
+
+def user(content):
+    return {"type": "user", "message": {"role": "user", "content": content}}
+
+
+def assistant(text):
+    return {"type": "assistant", "message": {"role": "assistant",
+                                             "content": [{"type": "text", "text": text}]}}
+
+
+def tool_result(text):
+    return user([{"type": "tool_result", "tool_use_id": "toolu_1", "content": text}])
+
+
+def write(path, entries, separators=None):
+    path.write_text("\n".join(json.dumps(e, separators=separators) for e in entries) + "\n")
+    return path
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 65536])
+def test_reverse_lines_match_forward_read(tmp_path, chunk_size):
+    rng = random.Random(chunk_size)
+    lines = ["x" * rng.randint(0, 40) + f" line {i}" for i in range(200)]
+    path = tmp_path / "t.jsonl"
+    path.write_bytes(("\n".join(lines) + "\n\n  \n").encode())
+    expected = [line.encode() for line in reversed(lines)]
+    assert list(ace_transcript.iter_lines_reverse(path, chunk_size)) == expected
+
+    path.write_bytes("\n".join(lines).encode())  # no trailing newline
+    assert list(ace_transcript.iter_lines_reverse(path, chunk_size)) == expected
+
+
+def test_reverse_lines_empty_file(tmp_path):
+    path = tmp_path / "empty.jsonl"
+    path.write_bytes(b"")
+    assert list(ace_transcript.iter_lines_reverse(path)) == []
+
+
+def test_last_prompt_skips_tool_results_and_assistant(tmp_path):
+    path = write(tmp_path / "t.jsonl", [
+        user("first request that is long enough"),
+        assistant("ok"),
+        user([{"type": "text", "text": "refactor the cache layer"}]),
+        assistant("working"),
+        tool_result("file contents"),
+        assistant("done"),
+    ])
+    assert get_user_prompt_from_transcript(str(path)) == "refactor the cache layer"
+
+
+def test_last_prompt_tolerates_spacing_short_and_broken_lines(tmp_path):
+    path = write(tmp_path / "t.jsonl", [user("please add retries to the uploader")],
+                 separators=(", ", ": "))
+    with open(path, "a") as f:
+        f.write(json.dumps(user("short")) + "\n")          # too short: skipped
+        f.write('{"message": {"role":"user", "content": "trunc')  # partial final line
+    assert get_user_prompt_from_transcript(str(path)) == "please add retries to the uploader"
+
+
+def test_prompt_is_truncated(tmp_path):
+    path = write(tmp_path / "t.jsonl", [user("y" * 5000)])
+    assert get_user_prompt_from_transcript(str(path)) == "y" * 2000
+
+
+def test_missing_or_promptless_transcript(tmp_path):
+    assert get_user_prompt_from_transcript(str(tmp_path / "nope.jsonl")) == "No user prompt found"
+    path = write(tmp_path / "t.jsonl", [assistant("hello"), tool_result("x")])
+    assert get_user_prompt_from_transcript(str(path)) == "No user prompt found"
+
+
+def test_only_user_lines_are_decoded(tmp_path, monkeypatch):
+    path = write(tmp_path / "t.jsonl", [user("the real request is here")] +
+                 [assistant(f"step {i}") for i in range(500)])
+    decoded = []
+    real_loads = json.loads
+    monkeypatch.setattr(ace_transcript.json, "loads", lambda s: decoded.append(s) or real_loads(s))
+    assert ace_transcript.find_last_user_prompt(path) == "the real request is here"
+    assert len(decoded) == 1